@@ -0,0 +1,94 @@
+"""release 下 debug 日志的热路径开销:改动前(调用方先拼 f-string,log 里再丢)vs 现在(%-参数原样入环)。
+
+取 Conn._log_timing 那条每请求一发的 debug 作样本。「drop」是改动前的写法:f-string 照拼,
+log 进门判级别后丢弃;「ring」是现在:只把 (时刻, 标签, 模板, 参数) 塞进定长环。
+qq-provider 的 make_log 同理,一并给出。
+
+运行:python bench/bench_debug_ring.py
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+import timeit
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("bench")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import log as log_mod  # noqa: E402
+
+N = 200_000
+decky_stub.logger.setLevel(logging.INFO)  # release
+
+
+def _dropped(source, origin, level, msg):
+    """改动前的 log():release 下 debug 进门就丢。"""
+    if not decky_stub.logger.isEnabledFor(log_mod._LEVELS[level]):
+        return
+
+
+def bridge_cases():
+    name, cmd, ms = "provider", "search_songs", 123.4
+    drop = lambda: _dropped("bridge", "own", "debug", f"{name} {cmd} {ms:.0f}ms")  # noqa: E731
+    ring = lambda: log_mod.log("bridge", "own", "debug", "%s %s %.0fms", name, cmd, ms)  # noqa: E731
+    return drop, ring
+
+
+def qq_cases():
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "qq-provider"))
+    del sys.modules["log"]  # 同名模块:换成 qq-provider 的 log.py
+    import log as qq_log
+
+    qq_log.DEBUG = False
+    out = asyncio.Queue()
+    songs = list(range(30))
+
+    def old_log(level, where, msg):
+        if level == "debug" and not qq_log.DEBUG:
+            return
+        out.put_nowait(msg)
+
+    new_log = qq_log.make_log(out)
+    drop = lambda: old_log("debug", "search_songs", f"-> {len(songs)} songs")  # noqa: E731
+    ring = lambda: new_log("debug", "search_songs", "-> %d songs", len(songs))  # noqa: E731
+    return drop, ring, qq_log
+
+
+def per_call_ns(fn) -> float:
+    return min(timeit.repeat(fn, number=N, repeat=5)) / N * 1e9
+
+
+def main():
+    print(f"release debug log, {N} calls, best of 5")
+    print(f"{'where':<8}{'mode':<8}{'ns/call':>10}")
+    drop, ring = bridge_cases()
+    for mode, fn in (("drop", drop), ("ring", ring)):
+        print(f"{'bridge':<8}{mode:<8}{per_call_ns(fn):>10.0f}")
+    t0 = time.perf_counter()
+    log_mod.format_records(log_mod.dump_ring())
+    print(f"bridge ring dump ({log_mod.DEBUG_RING} records): {(time.perf_counter() - t0) * 1000:.2f} ms")
+    drop, ring, qq_log = qq_cases()
+    for mode, fn in (("drop", drop), ("ring", ring)):
+        print(f"{'qq':<8}{mode:<8}{per_call_ns(fn):>10.0f}")
+    t0 = time.perf_counter()
+    qq_log.dump_ring()
+    print(f"qq ring dump ({qq_log.DEBUG_RING} records): {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
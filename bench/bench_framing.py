@@ -0,0 +1,94 @@
+"""分帧解码吞吐:v1(readline 逐字节找 \\n)vs v2(长度前缀 readexactly)。
+
+只测 bridge 侧的「从 StreamReader 切出一帧」这一步,不含 json.loads(两版相同)。
+载荷取真实形状:50 首一页的 Song 列表、500 个 id 的 liked_ids、2000 首的整单。
+
+运行:python bench/bench_framing.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+import protocol  # noqa: E402
+
+COVER = "https://y.qq.com/music/photo_new/T002R300x300M000{}.jpg"
+
+
+def song(i: int) -> dict:
+    return {
+        "mid": f"00{i:012d}",
+        "name": f"歌曲 {i}",
+        "singer": "歌手 A / 歌手 B",
+        "album": f"专辑 {i % 97}",
+        "duration": 200 + i % 60,
+        "cover": COVER.format(f"album{i:010d}"),
+        "vip": i % 3 == 0,
+        "media_mid": f"media{i:012d}",
+    }
+
+
+PAYLOADS = {
+    "page(50 songs)": {"id": 1, "ok": True, "data": {"songs": [song(i) for i in range(50)]}},
+    "liked_ids(500)": {"id": 1, "ok": True, "data": {"ids": [f"00{i:012d}" for i in range(500)]}},
+    "playlist(2000)": {"id": 1, "ok": True, "data": {"songs": [song(i) for i in range(2000)]}},
+}
+
+
+async def decode(data: bytes, frames: int, v1: bool) -> float:
+    """真 UDS 上收 frames 帧:写端一次性灌入,读端按 Conn._read_loop 的方式切帧。"""
+    got = asyncio.Event()
+
+    async def on_conn(reader, _writer):
+        t0 = time.perf_counter()
+        for _ in range(frames):
+            if v1:
+                await reader.readline()  # 改动前的 Conn._read_loop
+            else:
+                await protocol.read_frame(reader)
+        on_conn.secs = time.perf_counter() - t0
+        got.set()
+
+    path = f"/tmp/bench-framing-{os.getpid()}.sock"
+    server = await asyncio.start_unix_server(on_conn, path, limit=protocol.LINE_LIMIT)
+    _, writer = await asyncio.open_unix_connection(path)
+    writer.write(data)
+    await writer.drain()
+    await got.wait()
+    writer.close()
+    server.close()
+    os.unlink(path)
+    return on_conn.secs
+
+
+def main():
+    print(f"{'payload':<16}{'frame':>10}{'v1 MB/s':>12}{'v2 MB/s':>12}{'v2/v1':>8}")
+    for name, msg in PAYLOADS.items():
+        one = len(protocol.encode_frame(msg, 1))
+        frames = max(10, 10_000_000 // one)  # 每组约 10 MB
+        rates = []
+        for v in (1, 2):
+            data = protocol.encode_frame(msg, v) * frames
+            secs = min(asyncio.run(decode(data, frames, v == 1)) for _ in range(5))
+            rates.append(len(data) / secs / 1e6)
+        print(f"{name:<16}{one:>9}B{rates[0]:>12.0f}{rates[1]:>12.0f}{rates[1] / rates[0]:>7.2f}x")
+
+    # 改动前 Conn 用的是 StreamReader 默认 64 KiB 行长上限:整单 2000 首直接 ValueError
+    async def default_limit():
+        r = asyncio.StreamReader()
+        r.feed_data(protocol.encode_frame(PAYLOADS["playlist(2000)"], 1))
+        r.feed_eof()
+        await r.readline()
+
+    try:
+        asyncio.run(default_limit())
+        print("v1 @ default 64 KiB limit, 500 KB frame: ok")
+    except ValueError as e:
+        print(f"v1 @ default 64 KiB limit, 500 KB frame: {type(e).__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""child 日志转发:每条在事件循环上的开销,同步写文件 vs 后台线程写(start_pipeline)。
+
+decky.logger 挂一个真 FileHandler(临时目录);两种模式都转发同样 N 条 child 日志,
+令牌桶调到不限流,只比写盘这一步。us/msg 是总耗时摊到每条;max 取 log.forward 的最大单条。
+「stall」一行给 FileHandler 每 STALL_EVERY 条加一次 STALL_S 的阻塞,模拟 SD 卡回写卡顿
+(page cache 够快时后台线程反而多一次入队开销,它防的是这种卡顿)。
+
+运行:python bench/bench_log_forward.py
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("bench")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import log as log_mod  # noqa: E402
+import metrics  # noqa: E402
+
+N = 20000
+STALL_EVERY = 500
+STALL_S = 0.02
+log_mod.CHILD_BURST = log_mod.CHILD_RATE = float(N)  # 只测写盘,不让限流掺进来
+
+
+class _StallingFileHandler(logging.FileHandler):
+    def emit(self, record):
+        super().emit(record)
+        self.n = getattr(self, "n", 0) + 1
+        if self.n % STALL_EVERY == 0:
+            time.sleep(STALL_S)
+
+
+def forward(pipeline: bool, stall: bool) -> tuple[float, float]:
+    metrics.reset()
+    log_mod._buckets.clear()
+    logger = log_mod.decky.logger
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = (_StallingFileHandler if stall else logging.FileHandler)(os.path.join(tmp, "plugin.log"))
+        logger.addHandler(handler)
+        if pipeline:
+            log_mod.start_pipeline()
+        t0 = time.perf_counter()
+        for i in range(N):
+            log_mod.log("provider", "socket", "info", f"cmd search ok in {i} ms")
+        secs = time.perf_counter() - t0
+        log_mod.stop_pipeline()
+        logger.removeHandler(handler)
+        handler.close()
+    return secs, metrics.snapshot()["timings"]["log.forward"]["max_ms"]
+
+
+def main():
+    print(f"{N} forwarded child log lines, FileHandler")
+    print(f"{'disk':<8}{'mode':<12}{'ms':>10}{'us/msg':>10}{'max ms':>10}")
+    for disk, stall in (("fast", False), ("stall", True)):
+        for name, pipeline in (("sync", False), ("pipeline", True)):
+            secs, worst = min(forward(pipeline, stall) for _ in range(5))
+            print(f"{disk:<8}{name:<12}{secs * 1000:>10.1f}{secs / N * 1e6:>10.2f}{worst:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""qq-provider 目录包:冷启首开与每次启动的耗时,改动前(首次用到时现解)vs 现在(后台预解 + 清单)。
+
+造一个仿 Nuitka standalone 的目录包(FILES 个文件、共约 SIZE_MB,随机内容 → gzip 压不动,
+与真包里的 .so 接近),打成 tar.gz 当作 remote_binary 装下的 bin/qq-provider。
+
+- 冷启首开:新装后第一次切到 QQ,_ensure_provider 在 spawn 之前要等 qq_exe 多久。
+  改动前是现解整包;现在 Bridge.start 已在后台解完(多算一遍 sha256 写清单),首开只剩拿锁。
+  「prefetch」一行是后台那次的耗时,不在事件循环上,用户也不等它(除非开机就立刻点 QQ)。
+- 每次启动:包已解好时 qq_exe 的耗时。改动前只 isfile;现在按清单 stat 一遍(后台线程里)。
+- 补缺:删掉 MISSING 个文件后的那次启动。改动前 isfile(入口)还在就不管,spawn 才炸;
+  现在从归档单独补回。
+
+spawn + 连入本身不受这次改动影响,不计在内。解包耗时随盘走:临时目录多在 page cache / tmpfs 上,
+SD 卡上现解要慢一个数量级,差距只会更大。运行:python bench/bench_qq_bundle.py
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("bench")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+
+FILES = 300
+SIZE_MB = 60
+MISSING = 3
+bridge_mod.log = lambda *_a, **_k: None
+
+
+def _old_qq_exe() -> str:
+    """改动前的 qq_exe:入口文件在就直接用,否则首次用到时现解整包。"""
+    bin_dir = os.path.join(decky_stub.DECKY_PLUGIN_DIR, "bin")
+    exe = os.path.join(bin_dir, "qq-provider", "qq-provider")
+    if os.path.isfile(exe):
+        return exe
+    tarball = os.path.join(bin_dir, "qq-provider")
+    tmp = os.path.join(bin_dir, ".qq-unpack")
+    shutil.rmtree(tmp, ignore_errors=True)
+    with tarfile.open(tarball) as tf:
+        tf.extractall(tmp)
+    os.chmod(os.path.join(tmp, "qq-provider", "qq-provider"), 0o755)
+    aside = tarball + ".tar.gz"
+    os.rename(tarball, aside)
+    os.rename(os.path.join(tmp, "qq-provider"), os.path.join(bin_dir, "qq-provider"))
+    os.remove(aside)
+    os.rmdir(tmp)
+    return exe
+
+
+def make_archive(root: str) -> str:
+    tree = os.path.join(root, "src", "qq-provider")
+    os.makedirs(os.path.join(tree, "lib"))
+    size = SIZE_MB * (1 << 20) // FILES
+    for i in range(FILES):
+        name = "qq-provider" if i == 0 else os.path.join("lib", f"mod{i}.so")
+        with open(os.path.join(tree, name), "wb") as f:
+            f.write(os.urandom(size))
+    archive = os.path.join(root, "qq-provider.tar.gz")
+    with tarfile.open(archive, "w:gz", compresslevel=1) as tf:
+        tf.add(tree, arcname="qq-provider")
+    return archive
+
+
+def install(root: str, archive: str, name: str) -> str:
+    """一次全新安装:bin/qq-provider 是原样落下的归档。返回插件目录。"""
+    plugin = os.path.join(root, name)
+    os.makedirs(os.path.join(plugin, "bin"))
+    shutil.copy(archive, os.path.join(plugin, "bin", "qq-provider"))
+    return plugin
+
+
+def timed(plugin: str, fn, fresh: bool = True) -> float:
+    """fresh:模拟一次新的 bridge 进程(清单校验每个进程做一遍)。"""
+    decky_stub.DECKY_PLUGIN_DIR = plugin
+    if fresh:
+        bridge_mod._qq_checked.clear()
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def drop_files(plugin: str):
+    lib = os.path.join(plugin, "bin", "qq-provider", "lib")
+    for name in sorted(os.listdir(lib))[:MISSING]:
+        os.remove(os.path.join(lib, name))
+
+
+def bundle_bad(plugin: str) -> list[str]:
+    bin_dir = os.path.join(plugin, "bin")
+    files = bridge_mod.bundle.load(os.path.join(bin_dir, "qq-provider.manifest.json"))
+    return bridge_mod.bundle.check(os.path.join(bin_dir, "qq-provider"), files)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        archive = make_archive(root)
+        mb = os.path.getsize(archive) / (1 << 20)
+        print(f"synthetic bundle: {FILES} files, {SIZE_MB}MB ({mb:.0f}MB archive)")
+        print(f"{'case':<22}{'before ms':>12}{'after ms':>12}")
+
+        old, new = install(root, archive, "old"), install(root, archive, "new")
+        prefetch = timed(new, bridge_mod.qq_exe)  # Bridge.start 的后台预解
+        cold_old = timed(old, _old_qq_exe)
+        cold_new = timed(new, bridge_mod.qq_exe, fresh=False)  # 同一个 bridge 进程里首次切到 QQ
+        print(f"{'cold first launch':<22}{cold_old:>12.1f}{cold_new:>12.1f}")
+        print(f"{'  prefetch (bg)':<22}{'-':>12}{prefetch:>12.1f}")
+
+        warm_old = min(timed(old, _old_qq_exe) for _ in range(5))
+        warm_new = min(timed(new, bridge_mod.qq_exe) for _ in range(5))
+        print(f"{'startup (unpacked)':<22}{warm_old:>12.2f}{warm_new:>12.2f}")
+
+        drop_files(old)
+        drop_files(new)
+        broken_old = timed(old, _old_qq_exe)
+        repair_new = timed(new, bridge_mod.qq_exe)
+        print(f"{f'startup ({MISSING} missing)':<22}{broken_old:>12.2f}{repair_new:>12.1f}")
+        ok = not bundle_bad(new)
+        print(f"  before: spawn then fails on the missing files; after: repaired={ok}")
+
+
+if __name__ == "__main__":
+    main()
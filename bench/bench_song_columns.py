@@ -0,0 +1,85 @@
+"""Song 列表线上体积与解码耗时:dict 数组 vs 列式编码(表头 + 行数组 + 封面前缀字典)。
+
+provider 侧用 qq-provider/protocol.py 的 encode_songs 编码(与真实 _song_brief 同形状),
+bridge 侧计「json.loads + 还原成 Song dict 数组」(decode_songs,list callable 的出口)
+和「json.loads + 直接映射成队列项」(_songs_to_items,整单播放的路径)。
+
+运行:python bench/bench_song_columns.py
+"""
+
+import importlib.util
+import json
+import logging
+import os
+import sys
+import time
+import types
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "py_modules"))
+decky_stub = types.ModuleType("decky")  # bridge 导入时要的 Decky 运行时模块
+decky_stub.DECKY_PLUGIN_DIR = decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("bench")
+sys.modules.setdefault("decky", decky_stub)
+
+import protocol  # noqa: E402
+from bridge import _songs_to_items  # noqa: E402
+
+# qq-provider 的协议模块与 bridge 的同名,按路径单独加载
+_spec = importlib.util.spec_from_file_location("qq_protocol", os.path.join(HERE, "..", "qq-provider", "protocol.py"))
+qq_protocol = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(qq_protocol)
+
+COVER = "https://y.qq.com/music/photo_new/T002R300x300M000{}.jpg"
+
+
+def song(i: int) -> dict:
+    return {
+        "mid": f"00{i:012d}",
+        "name": f"歌曲 {i}",
+        "singer": "歌手 A / 歌手 B",
+        "album": f"专辑 {i % 97}",
+        "duration": 200 + i % 60,
+        "cover": COVER.format(f"album{i % 400:06d}") if i % 10 else "",
+        "vip": i % 3 == 0,
+        "media_mid": f"media{i:012d}",
+    }
+
+
+def best(fn, rounds: int) -> float:
+    times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    print(f"{'songs':>6}{'rows B':>11}{'cols B':>11}{'ratio':>7}{'loads+list':>22}{'loads+items':>22}")
+    for n in (50, 500, 5000):
+        songs = [song(i) for i in range(n)]
+        plain = protocol.encode_frame(qq_protocol.ok(1, {"songs": songs}), 2)
+        packed = protocol.encode_frame(qq_protocol.pack_songs(qq_protocol.ok(1, {"songs": songs})), 2)
+        rounds = max(5, 20_000 // n)
+
+        def as_list(frame):
+            return lambda: protocol.decode_songs(json.loads(frame[4:])["data"]["songs"])
+
+        def as_items(frame):
+            return lambda: _songs_to_items(json.loads(frame[4:])["data"]["songs"])
+
+        assert as_list(packed)() == songs
+        lists = [best(as_list(f), rounds) * 1e3 for f in (plain, packed)]
+        items = [best(as_items(f), rounds) * 1e3 for f in (plain, packed)]
+        print(
+            f"{n:>6}{len(plain):>11}{len(packed):>11}{len(packed) / len(plain):>7.2f}"
+            f"{lists[0]:>10.3f}/{lists[1]:.3f}ms{items[0]:>10.3f}/{items[1]:.3f}ms"
+        )
+    encode = best(lambda: qq_protocol.encode_songs([song(i) for i in range(5000)]), 5) * 1e3
+    print(f"provider encode_songs(5000) incl. building rows: {encode:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
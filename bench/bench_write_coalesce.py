@@ -0,0 +1,86 @@
+"""写出合批:1000 个并发请求打到一个替身 child,逐帧 write+drain vs 写任务合批。
+
+替身 child 走真 UDS:逐帧读请求、立刻回 ok。「逐帧」用 WRITE_BUDGET=1 模拟改动前的
+写法(每帧一次 write + 一次 drain);「合批」用默认预算。两边只有 bridge 写出这一步不同。
+
+运行:python bench/bench_write_coalesce.py
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("bench")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import protocol  # noqa: E402
+
+N = 1000
+bridge_mod.log = lambda *_a, **_k: None
+bridge_mod.LANES = {lane: N for lane in bridge_mod.LANES}  # 只测写出,不让分道上限掺进来
+
+
+async def child(path: str):
+    reader, writer = await asyncio.open_unix_connection(path, limit=protocol.LINE_LIMIT)
+    n = 0
+    try:
+        while (frame := await protocol.read_frame(reader)) is not None:
+            req = json.loads(frame[0])
+            writer.write(protocol.encode_frame({"id": req["id"], "ok": True, "data": {}}))
+            n += 1
+            if n % 64 == 0:  # 两种模式下 child 侧开销保持一致
+                await writer.drain()
+    finally:
+        writer.close()
+
+
+async def round_trip(budget: int) -> tuple[float, int]:
+    bridge_mod.WRITE_BUDGET = budget
+    metrics.reset()
+    with tempfile.TemporaryDirectory() as tmp:
+        bridge_mod.RUNTIME = tmp
+        conn = bridge_mod.Conn("provider")
+        await conn.listen()
+        child_task = asyncio.create_task(child(conn.path))
+        await conn.connected.wait()
+        t0 = time.perf_counter()
+        resps = await asyncio.gather(*(conn.request("toplists", {"i": i}) for i in range(N)))
+        secs = time.perf_counter() - t0
+        assert all(r.ok for r in resps)
+        child_task.cancel()
+        await asyncio.gather(child_task, return_exceptions=True)
+        while conn.writer is not None:  # 等 bridge 读到 EOF 自己收尾
+            await asyncio.sleep(0.001)
+        await conn.close()
+    return secs, metrics.get("provider.write.flushes")
+
+
+def main():
+    print(f"{N} concurrent requests over UDS")
+    print(f"{'mode':<12}{'ms':>10}{'writes':>10}")
+    for name, budget in (("per-frame", 1), ("batched", 64 * 1024)):
+        secs, writes = min(asyncio.run(round_trip(budget)) for _ in range(5))
+        print(f"{name:<12}{secs * 1000:>10.1f}{writes:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,16 +15,16 @@ from bridge import Bridge
 CALLABLES = frozenset(
     """
     set_provider get_provider login logout get_account
-    play_queue get_playback play_radio fm_trash like_current like_state
+    play_queue play_all get_playback play_radio fm_trash like_current like_state
     get_comments get_user_assets add_to_playlist fav_playlist
     get_fav_songs get_listen_rank get_created_playlists get_fav_playlists
     get_queue queue_play queue_insert_next queue_append queue_remove queue_clear
     next_track prev_track set_play_mode pause resume seek volume
-    get_quality set_quality
+    get_quality set_quality get_hot_standby set_hot_standby
     search_songs search_playlists search_albums search_artists search_hot
     get_artist_detail get_album_detail get_lyric get_recommend
     get_playlist_songs get_toplists get_toplist_songs get_discover get_daily_songs
-    clear_cache get_cache_size clear_data
+    clear_cache get_cache_size clear_data dump_diagnostics
     """.split()
 )
 
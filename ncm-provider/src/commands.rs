@@ -94,16 +94,17 @@ pub async fn song_url(state: &State, id: u64, song_id: &str, quality: &str, tx:
     let base = maybe_cookie(Query::new().param("id", song_id), state.cookie().await);
     for (name, level) in ladder(quality) {
         let q = base.clone().param("level", level);
-        match with_timeout(state.client.song_url_v1(&q)).await {
+        match with_timeout(state.client().song_url_v1(&q)).await {
             // 不记 URL(含限时 token)
             Ok(Ok(r)) => match r.body["data"][0]["url"].as_str() {
                 Some(url) if !url.is_empty() => {
                     // 记下实际命中的档位:选了无损却降到 320k 时,没这条谁都查不出来
-                    let _ = tx.send(log_json(
-                        LogLevel::Debug,
-                        "song_url",
-                        &format!("id={song_id} want={quality} got={name}"),
-                    ));
+                    let args = [
+                        song_id.to_owned().into(),
+                        quality.to_owned().into(),
+                        (*name).into(),
+                    ];
+                    state.debug(tx, "song_url", "id={} want={} got={}", args);
                     return protocol::ok(id, json!({ "url": url, "quality": name }));
                 }
                 _ => continue, // 该档无 URL → 降到下一档
@@ -120,10 +121,21 @@ pub async fn song_url(state: &State, id: u64, song_id: &str, quality: &str, tx:
     protocol::err(id, ErrorCode::NoPlayable, "no_playable")
 }
 
+/// net_reset 后的连接预热:打一发廉价的匿名请求,把新 client 的 DNS + TLS 建好。
+/// 失败无所谓,第一条真请求照常自己建连。
+pub async fn prewarm(state: &State, tx: &Out) {
+    if with_timeout(state.client().search_hot_detail(&Query::new()))
+        .await
+        .map_or(true, |r| r.is_err())
+    {
+        state.debug(tx, "net_reset", "prewarm failed", []);
+    }
+}
+
 pub async fn logout(state: &State, id: u64) -> String {
     if state.credential().await.is_some() {
         let q = maybe_cookie(Query::new(), state.cookie().await);
-        let _ = with_timeout(state.client.logout(&q)).await; // 尽力而为
+        let _ = with_timeout(state.client().logout(&q)).await; // 尽力而为
     }
     *state.cookie.lock().await = None;
     protocol::ok_empty(id)
@@ -132,7 +144,7 @@ pub async fn logout(state: &State, id: u64) -> String {
 pub async fn account(state: &State, id: u64) -> String {
     let ck = state.cookie().await;
     let q = maybe_cookie(Query::new(), ck.clone());
-    let status = match call(state.client.login_status(&q), id).await {
+    let status = match call(state.client().login_status(&q), id).await {
         Ok(r) => r,
         Err(e) => return e,
     };
@@ -140,7 +152,7 @@ pub async fn account(state: &State, id: u64) -> String {
     // VIP 档位 code(前端 vipText() 本地化,不用服务端图标)。vip_info 失败/超时只是不显示,不影响账号。
     let mut vip = String::new();
     let vq = maybe_cookie(Query::new(), ck);
-    if let Ok(Ok(v)) = with_timeout(state.client.vip_info(&vq)).await {
+    if let Ok(Ok(v)) = with_timeout(state.client().vip_info(&vq)).await {
         let d = &v.body["data"];
         if d["redVipLevel"].as_i64().unwrap_or(0) > 0 {
             let annual = d["redVipAnnualCount"].as_i64().unwrap_or(0) > 0;
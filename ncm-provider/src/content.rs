@@ -6,14 +6,16 @@ use serde_json::{json, Value};
 
 use crate::commands::song_brief;
 use crate::protocol::{self, ErrorCode};
-use crate::provider_commands::{fetch, invalid, map_arr, maybe_cookie, paging, string_arg};
-use crate::state::{with_timeout, State};
+use crate::provider_commands::{
+    call, fetch, invalid, map_arr, maybe_cookie, paging, send_chunks, string_arg, MAX_STREAM_SONGS,
+};
+use crate::state::{with_timeout, Out, State};
 
 /// 发现页:个性化推荐歌单(匿名可用;登录后更个性化)
 pub async fn discover(state: &State, id: u64) -> String {
     let q = maybe_cookie(Query::new().param("limit", "12"), state.cookie().await);
     fetch(
-        state.client.personalized(&q),
+        state.client().personalized(&q),
         id,
         |b| json!({ "playlists": map_arr(&b["result"], playlist_brief) }),
     )
@@ -26,7 +28,7 @@ pub async fn daily_songs(state: &State, id: u64) -> String {
         return protocol::err(id, ErrorCode::NotLoggedIn, "not_logged_in");
     }
     let q = maybe_cookie(Query::new(), state.cookie().await);
-    match with_timeout(state.client.recommend_songs(&q)).await {
+    match with_timeout(state.client().recommend_songs(&q)).await {
         // 301 = cookie 失效
         Ok(Ok(r)) if r.body["code"].as_i64() == Some(301) => {
             protocol::err(id, ErrorCode::NotLoggedIn, "not_logged_in")
@@ -56,19 +58,42 @@ pub async fn playlist_songs(state: &State, id: u64, args: &Value) -> String {
         state.cookie().await,
     );
     fetch(
-        state.client.playlist_track_all(&q),
+        state.client().playlist_track_all(&q),
         id,
         |b| json!({ "songs": map_arr(&b["songs"], song_brief) }),
     )
     .await
 }
 
+/// 整张歌单(播放全部用):track_all 一发取全(上限 MAX_STREAM_SONGS),按块写 partial 帧,
+/// 终帧只带 total。浏览页仍走 playlist_songs 的 MAX_LIMIT 分页。
+pub async fn playlist_all(state: &State, id: u64, args: &Value, out: &Out) -> String {
+    let Ok(playlist_id) = string_arg(args, "id") else {
+        return invalid(id);
+    };
+    let q = maybe_cookie(
+        Query::new()
+            .param("id", &playlist_id)
+            .param("limit", &MAX_STREAM_SONGS.to_string())
+            .param("offset", "0"),
+        state.cookie().await,
+    );
+    match call(state.client().playlist_track_all(&q), id).await {
+        Ok(r) => {
+            let songs = map_arr(&r.body["songs"], song_brief);
+            let total = send_chunks(out, id, &songs);
+            protocol::ok(id, json!({ "total": total }))
+        }
+        Err(e) => e,
+    }
+}
+
 /// 榜单列表(P6):NCM 榜单本质是官方歌单,归一化成 Playlist 形状;
 /// 榜单曲目直接走 playlist_songs(main.rs 里 toplist_songs 别名到它)。
 pub async fn toplists(state: &State, id: u64) -> String {
     let q = maybe_cookie(Query::new(), state.cookie().await);
     fetch(
-        state.client.toplist(&q),
+        state.client().toplist(&q),
         id,
         |b| json!({ "toplists": map_arr(&b["list"], playlist_brief) }),
     )
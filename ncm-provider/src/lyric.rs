@@ -41,7 +41,7 @@ impl Line {
 
 pub async fn lyric(state: &State, id: u64, song_id: &str) -> String {
     let q = maybe_cookie(Query::new().param("id", song_id), state.cookie().await);
-    let body = match crate::provider_commands::call(state.client.lyric_new(&q), id).await {
+    let body = match crate::provider_commands::call(state.client().lyric_new(&q), id).await {
         Ok(r) => r.body,
         Err(e) => return e,
     };
@@ -1,4 +1,4 @@
-//! ncm-provider:网易云 provider。ncm-api-rs 作库,包一层 UDS + NDJSON server。
+//! ncm-provider:网易云 provider。ncm-api-rs 作库,包一层 UDS server(分帧见 wire crate)。
 //!
 //! bridge 作 server,provider 启动后连入 `--socket <path>`。协议与 qq-provider 对齐:
 //! 命令 set_credential / login / search / song_url;登录是长流程,以 login 事件上报。
@@ -6,12 +6,16 @@
 //!
 //! 本文件只做:连 socket、单写出、命令分发。各命令实现见 commands.rs / login.rs。
 
+use std::collections::HashMap;
+use std::sync::atomic::{AtomicBool, Ordering};
 use std::sync::Arc;
+use std::time::Instant;
 
-use serde_json::Value;
-use tokio::io::{AsyncBufReadExt, AsyncWriteExt, BufReader};
+use serde_json::{json, Value};
+use tokio::io::BufReader;
 use tokio::net::UnixStream;
 use tokio::sync::mpsc;
+use tokio::task::JoinHandle;
 
 mod commands;
 mod content;
@@ -22,41 +26,56 @@ mod protocol;
 mod provider_commands;
 mod state;
 
-use protocol::{log_json, ErrorCode, LogLevel};
-use state::{Out, State};
+use protocol::{log_json, ErrorCode, Incoming, LogLevel};
+use state::{Out, State, NET_TIMEOUT, STREAM_CMDS, STREAM_TIMEOUT};
 
 #[tokio::main]
 async fn main() -> Result<(), Box<dyn std::error::Error>> {
     let socket = arg("--socket").expect("--socket <path> required");
     let stream = UnixStream::connect(&socket).await?;
     let (rd, mut wr) = stream.into_split();
-    let mut lines = BufReader::new(rd).lines();
+    let mut rd = BufReader::new(rd);
 
     // 设备身份要跨进程持久化(见 device.rs):bridge 经环境变量注入目录
     let state_dir = std::env::var("DECKY_MUSIC_STATE_DIR").ok();
     let state = Arc::new(State::new(state_dir.as_deref()));
-    let debug = std::env::var("DECKY_MUSIC_DEBUG").is_ok(); // release 下不发 debug
 
-    // 单一写出:命令响应 + 事件汇到这里串行写回,避免并发写乱帧
+    // 单一写出:命令响应 + 事件汇到这里串行写回,避免并发写乱帧。
+    // 先按 v1 写;读循环收到第一帧 v2(bridge 认了 hello)后置位,之后改写 v2 帧。
     let (out_tx, mut out_rx) = mpsc::unbounded_channel::<String>();
+    let peer_v2 = Arc::new(AtomicBool::new(false));
+    let wr_v2 = Arc::clone(&peer_v2);
     tokio::spawn(async move {
         while let Some(line) = out_rx.recv().await {
-            if wr.write_all(line.as_bytes()).await.is_err()
-                || wr.write_all(b"\n").await.is_err()
-                || wr.flush().await.is_err()
-            {
+            let v2 = wr_v2.load(Ordering::Relaxed);
+            if protocol::write_frame(&mut wr, &line, v2).await.is_err() {
                 break;
             }
         }
     });
+    let _ = out_tx.send(protocol::hello());
 
     // 在跑的登录轮询;新登录来时 abort 掉,避免双循环并发 emit。
     let mut login_handle: Option<tokio::task::JoinHandle<()>> = None;
 
-    // NDJSON:每条一行 {json}\n(协议 v1)。命令处理后台化,慢上游不堵读循环。
-    while let Some(line) = lines.next_line().await? {
-        let req = match protocol::parse_request(&line) {
-            Ok(r) => r,
+    // 分帧逐帧识别(v1 行 / v2 长度前缀)。命令处理后台化,慢上游不堵读循环。
+    // 在途命令 id → 任务句柄,供 cancel 帧中止
+    let mut inflight: HashMap<u64, JoinHandle<()>> = HashMap::new();
+    let mut buf = Vec::new();
+    while let Some(version) = protocol::read_frame(&mut rd, &mut buf).await? {
+        if version >= 2 {
+            peer_v2.store(true, Ordering::Relaxed);
+        }
+        let req = match protocol::parse_incoming(&buf) {
+            Ok(Incoming::Request(r)) => r,
+            // 调用方(bridge)已不再等:中止在途任务,上游请求随 Future 一起 drop,不回包
+            Ok(Incoming::Cancel(id)) => {
+                if let Some(h) = inflight.remove(&id) {
+                    h.abort();
+                    state.debug(&out_tx, "cmd", "cancelled {}", [id.into()]);
+                }
+                continue;
+            }
             // 解析失败拿不到 id → 记录并丢弃
             Err(e) => {
                 let _ = out_tx.send(log_json(
@@ -67,9 +86,19 @@ async fn main() -> Result<(), Box<dyn std::error::Error>> {
                 continue;
             }
         };
-        if debug {
-            let _ = out_tx.send(log_json(LogLevel::Debug, "cmd", &req.cmd));
+        // 心跳:读循环里直接回,不后台化也不进 debug 日志(每 2s 一条)。
+        // 回不出来 = 运行时整体卡住(如上游自旋占满 worker),bridge 据此判死
+        if req.cmd == "ping" {
+            let _ = out_tx.send(protocol::ok_empty(req.id));
+            continue;
         }
+        // 诊断导出:整环回包,同样在读循环里直接回(要的就是卡住时也能拿到)
+        if req.cmd == "dump_debug" {
+            let records = state.ring.dump();
+            let _ = out_tx.send(protocol::ok(req.id, json!({ "records": records })));
+            continue;
+        }
+        state.debug(&out_tx, "cmd", "{}", [req.cmd.clone().into()]);
         match req.cmd.as_str() {
             "set_credential" => {
                 let cred = protocol::parse_args::<protocol::SetCredentialArgs>(&req)
@@ -82,6 +111,14 @@ async fn main() -> Result<(), Box<dyn std::error::Error>> {
                 let _ = out_tx.send(log_json(LogLevel::Info, "credential", msg));
                 let _ = out_tx.send(protocol::ok_empty(req.id));
             }
+            "net_reset" => {
+                // bridge 发现挂起 / 换网:换掉整个 client(连同死连接池),后台预热新连接
+                state.reset_client();
+                let (st, tx) = (Arc::clone(&state), out_tx.clone());
+                tokio::spawn(async move { commands::prewarm(&st, &tx).await });
+                let _ = out_tx.send(log_json(LogLevel::Info, "net_reset", "client reset"));
+                let _ = out_tx.send(protocol::ok_empty(req.id));
+            }
             "login" => {
                 // 长流程:后台跑,QR 与状态经 login 事件上报;命令本身即刻返 ok
                 if let Some(h) = login_handle.take() {
@@ -92,11 +129,35 @@ async fn main() -> Result<(), Box<dyn std::error::Error>> {
                 let _ = out_tx.send(protocol::ok_empty(req.id));
             }
             _ => {
+                // 排队时就已过期的请求再打上游只是白占连接 —— 不打,但立刻回 deadline_exceeded:
+                // 不回包的话 bridge 要干等满通道超时,再把这个好好的进程判死
+                let cap = if STREAM_CMDS.contains(&req.cmd.as_str()) {
+                    STREAM_TIMEOUT
+                } else {
+                    NET_TIMEOUT
+                };
+                let Some(budget) = req.budget(cap) else {
+                    let _ = out_tx.send(protocol::err(
+                        req.id,
+                        ErrorCode::DeadlineExceeded,
+                        "deadline_exceeded",
+                    ));
+                    state.debug(
+                        &out_tx,
+                        "cmd",
+                        "{} past deadline, dropped",
+                        [req.cmd.into()],
+                    );
+                    continue;
+                };
                 let (st, tx) = (Arc::clone(&state), out_tx.clone());
-                tokio::spawn(async move {
+                let (id, deadline) = (req.id, Instant::now() + budget);
+                let task = tokio::spawn(state::DEADLINE.scope(deadline, async move {
                     let resp = dispatch(st, tx.clone(), req).await;
                     let _ = tx.send(resp);
-                });
+                }));
+                inflight.retain(|_, h| !h.is_finished()); // 顺手清掉已完成的,表只留在途
+                inflight.insert(id, task);
             }
         }
     }
@@ -123,6 +184,7 @@ async fn dispatch(state: Arc<State>, out_tx: Out, req: protocol::Request) -> Str
         "discover" => content::discover(&state, req.id).await,
         "daily_songs" => content::daily_songs(&state, req.id).await,
         "playlist_songs" => content::playlist_songs(&state, req.id, &req.args).await,
+        "playlist_all" => content::playlist_all(&state, req.id, &req.args, &out_tx).await,
         "toplists" => content::toplists(&state, req.id).await,
         // NCM 榜单即歌单:曲目命令直接别名(同 {id,limit,offset} 参数)
         "toplist_songs" => content::playlist_songs(&state, req.id, &req.args).await,
@@ -134,6 +196,7 @@ async fn dispatch(state: Arc<State>, out_tx: Out, req: protocol::Request) -> Str
         "user_assets" => provider_commands::user_assets(&state, req.id).await,
         "liked_ids" => provider_commands::liked_ids(&state, req.id).await,
         "fav_songs" => provider_commands::fav_songs(&state, req.id, &req.args).await,
+        "fav_songs_all" => provider_commands::fav_songs_all(&state, req.id, &out_tx).await,
         "listen_rank" => provider_commands::listen_rank(&state, req.id, &req.args).await,
         "created_playlists" => {
             provider_commands::created_playlists(&state, req.id, &req.args).await
@@ -4,10 +4,10 @@
 use std::future::Future;
 
 use ncm_api_rs::{ApiResponse, NcmError, Query};
-use serde_json::Value;
+use serde_json::{json, Value};
 
 use crate::protocol::{self, ErrorCode};
-use crate::state::{with_timeout, State};
+use crate::state::{with_timeout, Out, State};
 
 mod comments;
 mod details;
@@ -18,8 +18,8 @@ mod search;
 pub use comments::comments;
 pub use details::{album_detail, artist_detail};
 pub use library::{
-    add_to_playlist, created_playlists, fav_playlist, fav_playlists, fav_songs, like_song,
-    liked_ids, listen_rank, user_assets,
+    add_to_playlist, created_playlists, fav_playlist, fav_playlists, fav_songs, fav_songs_all,
+    like_song, liked_ids, listen_rank, user_assets,
 };
 pub use radio::{fm_trash, radio_fetch};
 pub use search::{search_albums, search_artists, search_hot, search_playlists, search_songs};
@@ -27,6 +27,9 @@ pub use search::{search_albums, search_artists, search_hot, search_playlists, se
 const DEFAULT_LIMIT: i64 = 30;
 const DEFAULT_OFFSET: i64 = 0;
 const MAX_LIMIT: i64 = 50;
+/// 流式命令每条 partial 帧携带的歌曲数,以及整条流的上限(防超大歌单把内存/帧撑爆)。
+pub(crate) const STREAM_CHUNK: usize = 200;
+pub(crate) const MAX_STREAM_SONGS: usize = 5000;
 
 /// 上游调用统一三态:成功给响应,库错误 → provider_error,超时 → timeout。
 /// Err 即协议错误响应串,String 返回的命令 match 后直接 return,Result 命令用 `?`。
@@ -141,7 +144,11 @@ async fn current_uid(state: &State, id: u64) -> Result<(String, String), String>
     if let Some(uid) = state.uid.lock().await.clone() {
         return Ok((uid, cookie));
     }
-    let status = call(state.client.login_status(&Query::new().cookie(&cookie)), id).await?;
+    let status = call(
+        state.client().login_status(&Query::new().cookie(&cookie)),
+        id,
+    )
+    .await?;
     let uid = id_string(&status.body["profile"]["userId"]);
     if uid.is_empty() {
         return Err(protocol::err(id, ErrorCode::NotLoggedIn, "not_logged_in"));
@@ -157,6 +164,14 @@ fn id_string(v: &Value) -> String {
         .unwrap_or_default()
 }
 
+/// 把一批已归一化的歌曲按 STREAM_CHUNK 切成 partial 帧写出,返回写出的总数。
+pub(crate) fn send_chunks(out: &Out, id: u64, songs: &[Value]) -> usize {
+    for chunk in songs.chunks(STREAM_CHUNK) {
+        let _ = out.send(protocol::partial(id, json!({ "songs": chunk })));
+    }
+    songs.len()
+}
+
 pub(crate) fn map_arr(v: &Value, f: fn(&Value) -> Value) -> Vec<Value> {
     v.as_array()
         .map(|a| a.iter().map(f).collect())
@@ -166,7 +181,6 @@ pub(crate) fn map_arr(v: &Value, f: fn(&Value) -> Value) -> Vec<Value> {
 #[cfg(test)]
 mod tests {
     use super::*;
-    use serde_json::json;
 
     #[test]
     fn search_args_require_keyword_and_numeric_paging() {
@@ -268,4 +282,20 @@ mod tests {
             json!({"id":9,"ok":false,"error":{"code":"invalid_request","message":"invalid_request"}})
         );
     }
+
+    #[test]
+    fn send_chunks_splits_into_partial_frames() {
+        let (tx, mut rx) = tokio::sync::mpsc::unbounded_channel();
+        let songs: Vec<Value> = (0..STREAM_CHUNK + 1).map(|i| json!({ "id": i })).collect();
+        assert_eq!(send_chunks(&tx, 5, &songs), STREAM_CHUNK + 1);
+        let first: Value = serde_json::from_str(&rx.try_recv().unwrap()).unwrap();
+        let second: Value = serde_json::from_str(&rx.try_recv().unwrap()).unwrap();
+        assert_eq!(first["id"], 5);
+        assert_eq!(
+            first["partial"]["songs"].as_array().unwrap().len(),
+            STREAM_CHUNK
+        );
+        assert_eq!(second["partial"]["songs"], json!([{ "id": STREAM_CHUNK }]));
+        assert!(rx.try_recv().is_err());
+    }
 }
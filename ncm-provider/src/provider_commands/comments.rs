@@ -45,9 +45,9 @@ pub async fn comments(state: &State, id: u64, args: &Value) -> String {
         json!({ "comments": map_arr(list, comment_brief) })
     };
     match typ.as_str() {
-        "0" | "song" | "music" => fetch(state.client.comment_music(&q), id, pick).await,
-        "2" | "playlist" => fetch(state.client.comment_playlist(&q), id, pick).await,
-        "3" | "album" => fetch(state.client.comment_album(&q), id, pick).await,
+        "0" | "song" | "music" => fetch(state.client().comment_music(&q), id, pick).await,
+        "2" | "playlist" => fetch(state.client().comment_playlist(&q), id, pick).await,
+        "3" | "album" => fetch(state.client().comment_album(&q), id, pick).await,
         _ => invalid(id),
     }
 }
@@ -38,7 +38,7 @@ pub async fn artist_detail(state: &State, id: u64, args: &Value) -> String {
     };
     // /artists:歌手信息 + hotSongs 热门 50 首(artist_detail 端点不带歌,详情页会空)
     let q = maybe_cookie(Query::new().param("id", &artist_id), state.cookie().await);
-    fetch(state.client.artists(&q), id, |b| {
+    fetch(state.client().artists(&q), id, |b| {
         json!({
             "artist": artist_brief(&b["artist"]),
             "songs": map_arr(&b["hotSongs"], song_brief),
@@ -52,7 +52,7 @@ pub async fn album_detail(state: &State, id: u64, args: &Value) -> String {
         return invalid(id);
     };
     let q = maybe_cookie(Query::new().param("id", &album_id), state.cookie().await);
-    fetch(state.client.album(&q), id, |b| {
+    fetch(state.client().album(&q), id, |b| {
         json!({
             "album": album_brief(&b["album"]),
             "songs": map_arr(&b["songs"], song_brief),
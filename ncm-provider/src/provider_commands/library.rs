@@ -6,7 +6,8 @@ use crate::content::playlist_brief;
 use crate::protocol;
 
 use super::{
-    bool_arg, call, current_uid, fetch, id_string, invalid, map_arr, paging, string_arg, State,
+    bool_arg, call, current_uid, fetch, id_string, invalid, map_arr, paging, send_chunks,
+    string_arg, Out, State, MAX_STREAM_SONGS, STREAM_CHUNK,
 };
 
 pub(super) fn user_assets_data(uid: String, sub: &Value, fav_songs: usize) -> Value {
@@ -25,7 +26,7 @@ pub async fn user_assets(state: &State, id: u64) -> String {
         Err(e) => return e,
     };
     let sub = match call(
-        state.client.user_subcount(&Query::new().cookie(&cookie)),
+        state.client().user_subcount(&Query::new().cookie(&cookie)),
         id,
     )
     .await
@@ -34,7 +35,7 @@ pub async fn user_assets(state: &State, id: u64) -> String {
         Err(e) => return e,
     };
     let liked_q = Query::new().param("uid", &uid).cookie(&cookie);
-    let liked = match call(state.client.likelist(&liked_q), id).await {
+    let liked = match call(state.client().likelist(&liked_q), id).await {
         Ok(r) => r,
         Err(e) => return e,
     };
@@ -49,7 +50,7 @@ pub async fn liked_ids(state: &State, id: u64) -> String {
         Err(e) => return e,
     };
     let q = Query::new().param("uid", &uid).cookie(&cookie);
-    fetch(state.client.likelist(&q), id, |b| {
+    fetch(state.client().likelist(&q), id, |b| {
         let ids = b["ids"]
             .as_array()
             .map(|a| {
@@ -73,7 +74,7 @@ pub async fn fav_songs(state: &State, id: u64, args: &Value) -> String {
         Err(e) => return e,
     };
     let q = Query::new().param("uid", &uid).cookie(&cookie);
-    let liked = match call(state.client.likelist(&q), id).await {
+    let liked = match call(state.client().likelist(&q), id).await {
         Ok(r) => r,
         Err(e) => return e,
     };
@@ -94,13 +95,46 @@ pub async fn fav_songs(state: &State, id: u64, args: &Value) -> String {
     let ids = ids.join(",");
     let q = Query::new().param("ids", &ids).cookie(&cookie);
     fetch(
-        state.client.song_detail(&q),
+        state.client().song_detail(&q),
         id,
         |b| json!({ "songs": map_arr(&b["songs"], song_brief) }),
     )
     .await
 }
 
+/// 全部红心歌曲(播放全部用):likelist 取全量 id,再按 STREAM_CHUNK 一批批 song_detail,
+/// 每批写一条 partial 帧;终帧只带 total。
+pub async fn fav_songs_all(state: &State, id: u64, out: &Out) -> String {
+    let (uid, cookie) = match current_uid(state, id).await {
+        Ok(v) => v,
+        Err(e) => return e,
+    };
+    let q = Query::new().param("uid", &uid).cookie(&cookie);
+    let liked = match call(state.client().likelist(&q), id).await {
+        Ok(r) => r,
+        Err(e) => return e,
+    };
+    let ids = liked.body["ids"]
+        .as_array()
+        .map(|a| {
+            a.iter()
+                .map(id_string)
+                .filter(|s| !s.is_empty())
+                .take(MAX_STREAM_SONGS)
+                .collect::<Vec<_>>()
+        })
+        .unwrap_or_default();
+    let mut total = 0;
+    for batch in ids.chunks(STREAM_CHUNK) {
+        let q = Query::new().param("ids", &batch.join(",")).cookie(&cookie);
+        match call(state.client().song_detail(&q), id).await {
+            Ok(r) => total += send_chunks(out, id, &map_arr(&r.body["songs"], song_brief)),
+            Err(e) => return e,
+        }
+    }
+    protocol::ok(id, json!({ "total": total }))
+}
+
 pub async fn listen_rank(state: &State, id: u64, args: &Value) -> String {
     let Ok((limit, offset)) = paging(args) else {
         return invalid(id);
@@ -113,7 +147,7 @@ pub async fn listen_rank(state: &State, id: u64, args: &Value) -> String {
         .param("uid", &uid)
         .param("type", "1")
         .cookie(&cookie);
-    fetch(state.client.user_record(&q), id, |b| {
+    fetch(state.client().user_record(&q), id, |b| {
         let list = if b["weekData"].is_array() {
             &b["weekData"]
         } else {
@@ -140,7 +174,7 @@ async fn user_playlists(state: &State, id: u64) -> Result<(String, Vec<Value>),
         .param("uid", &uid)
         .param("limit", "1000")
         .cookie(&cookie);
-    let r = call(state.client.user_playlist(&q), id).await?;
+    let r = call(state.client().user_playlist(&q), id).await?;
     Ok((
         uid,
         r.body["playlist"].as_array().cloned().unwrap_or_default(),
@@ -199,7 +233,7 @@ pub async fn like_song(state: &State, id: u64, args: &Value) -> String {
         .param("uid", &uid)
         .param("like", if on { "true" } else { "false" })
         .cookie(&cookie);
-    fetch(state.client.song_like(&q), id, |_| json!({})).await
+    fetch(state.client().song_like(&q), id, |_| json!({})).await
 }
 
 /// 收藏 / 取消收藏歌单(/playlist/subscribe)。t=1 收藏、t=0 取消,库层按 t 选 path。
@@ -219,7 +253,7 @@ pub async fn fav_playlist(state: &State, id: u64, args: &Value) -> String {
         .cookie(&cookie)
         .param("id", &playlist_id)
         .param("t", if on { "1" } else { "0" });
-    match call(state.client.playlist_subscribe(&q), id).await {
+    match call(state.client().playlist_subscribe(&q), id).await {
         Ok(_) => protocol::ok(id, json!({ "success": true })),
         Err(e) => e,
     }
@@ -15,7 +15,7 @@ pub async fn radio_fetch(state: &State, id: u64, args: &Value) -> String {
     };
     let q = Query::new().param("kind", "ncm_fm").cookie(&cookie);
     fetch(
-        state.client.personal_fm(&q),
+        state.client().personal_fm(&q),
         id,
         |b| json!({ "songs": map_arr(&b["data"], song_brief) }),
     )
@@ -31,5 +31,5 @@ pub async fn fm_trash(state: &State, id: u64, args: &Value) -> String {
         Err(e) => return e,
     };
     let q = Query::new().param("id", &song_id).cookie(&cookie);
-    fetch(state.client.fm_trash(&q), id, |_| json!({})).await
+    fetch(state.client().fm_trash(&q), id, |_| json!({})).await
 }
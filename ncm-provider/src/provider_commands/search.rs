@@ -25,7 +25,7 @@ pub async fn search_songs(state: &State, id: u64, args: &Value) -> String {
     };
     let q = maybe_cookie(q, state.cookie().await);
     fetch(
-        state.client.cloudsearch(&q),
+        state.client().cloudsearch(&q),
         id,
         |b| json!({ "songs": map_arr(&b["result"]["songs"], song_brief) }),
     )
@@ -38,7 +38,7 @@ pub async fn search_playlists(state: &State, id: u64, args: &Value) -> String {
     };
     let q = maybe_cookie(q, state.cookie().await);
     fetch(
-        state.client.cloudsearch(&q),
+        state.client().cloudsearch(&q),
         id,
         |b| json!({ "playlists": map_arr(&b["result"]["playlists"], playlist_brief) }),
     )
@@ -87,7 +87,7 @@ pub async fn search_albums(state: &State, id: u64, args: &Value) -> String {
     };
     let q = maybe_cookie(q, state.cookie().await);
     fetch(
-        state.client.cloudsearch(&q),
+        state.client().cloudsearch(&q),
         id,
         |b| json!({ "albums": map_arr(&b["result"]["albums"], album_brief_clean) }),
     )
@@ -100,7 +100,7 @@ pub async fn search_artists(state: &State, id: u64, args: &Value) -> String {
     };
     let q = maybe_cookie(q, state.cookie().await);
     fetch(
-        state.client.cloudsearch(&q),
+        state.client().cloudsearch(&q),
         id,
         |b| json!({ "artists": map_arr(&b["result"]["artists"], artist_brief_clean) }),
     )
@@ -109,7 +109,7 @@ pub async fn search_artists(state: &State, id: u64, args: &Value) -> String {
 
 pub async fn search_hot(state: &State, id: u64) -> String {
     fetch(
-        state.client.search_hot_detail(&Query::new()),
+        state.client().search_hot_detail(&Query::new()),
         id,
         |b| json!({ "keywords": map_arr(&b["data"], hot_keyword) }),
     )
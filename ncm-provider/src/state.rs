@@ -1,13 +1,15 @@
 //! 共享类型:进程状态 State、写出通道 Out、上游超时。命令类型见 protocol.rs。
 
 use std::future::Future;
-use std::time::Duration;
+use std::sync::{Arc, RwLock};
+use std::time::{Duration, Instant};
 
 use ncm_api_rs::{create_client, ApiClient};
 use tokio::sync::{mpsc, Mutex};
 use tokio::time::{error::Elapsed, timeout};
 
 use crate::device::{self, Device};
+use crate::protocol::{log_json, render, DebugArg, DebugRing, LogLevel};
 
 /// 单一写出通道:命令响应 + 事件都经它串行写回 socket,避免并发写乱帧。
 pub type Out = mpsc::UnboundedSender<String>;
@@ -15,32 +17,81 @@ pub type Out = mpsc::UnboundedSender<String>;
 /// 上游网易云接口的统一超时:每个请求独立兜底,避免断网调用永久挂住 bridge。
 pub const NET_TIMEOUT: Duration = Duration::from_secs(15);
 
-/// 给上游 Future 套 NET_TIMEOUT。超时返回 Err(Elapsed)。
+/// 流式命令(playlist_all / fav_songs_all)整条命令的预算上限:单发上游仍受 NET_TIMEOUT 约束,
+/// 这里只放宽「一条命令里连打多发」的总时长。须与 bridge 的 STREAM_TIMEOUT 一致。
+pub const STREAM_TIMEOUT: Duration = Duration::from_secs(120);
+
+/// 以多条 partial 帧回传结果的命令。
+pub const STREAM_CMDS: &[&str] = &["playlist_all", "fav_songs_all"];
+
+tokio::task_local! {
+    /// 当前命令的截止时刻(由 bridge 的 deadline 折算),main 派发命令时 scope 进去。
+    pub static DEADLINE: Instant;
+}
+
+/// 给上游 Future 套超时:NET_TIMEOUT 与本命令剩余预算取小。一条命令里串行的几发上游请求
+/// 共用同一个截止时刻,不会各自再拿满 15s。超时返回 Err(Elapsed)。
 pub async fn with_timeout<F: Future>(fut: F) -> Result<F::Output, Elapsed> {
-    timeout(NET_TIMEOUT, fut).await
+    let cap = DEADLINE
+        .try_with(|d| d.saturating_duration_since(Instant::now()))
+        .map_or(NET_TIMEOUT, |left| left.min(NET_TIMEOUT));
+    timeout(cap, fut).await
 }
 
 /// provider 进程状态。凭证不自持久化(bridge 是真相源,经 set_credential 注入);
 /// 设备身份是唯一的例外,见 device.rs。
 pub struct State {
-    pub client: ApiClient, // create_client(None),cookie 走 Query 逐次覆盖
+    /// create_client(None),cookie 走 Query 逐次覆盖。net_reset 时整个换掉(连同连接池),
+    /// 在途命令手里的旧 Arc 照常用完
+    client: RwLock<Arc<ApiClient>>,
     pub cookie: Mutex<Option<String>>,
     /// uid 缓存:资产/电台类命令都要 uid,避免每个命令先打一发 login_status
     /// (一屏多命令时延叠加)。set_credential 时清空。
     pub uid: Mutex<Option<String>>,
     device: Device,
+    /// dev 模式(bridge 注入 DECKY_MUSIC_DEBUG):debug 日志照发;release 下只进 ring
+    dev: bool,
+    pub ring: DebugRing,
 }
 
 impl State {
     pub fn new(state_dir: Option<&str>) -> Self {
         Self {
-            client: create_client(None),
+            client: RwLock::new(Arc::new(create_client(None))),
             cookie: Mutex::new(None),
             uid: Mutex::new(None),
             device: device::load(state_dir),
+            dev: std::env::var("DECKY_MUSIC_DEBUG").is_ok(),
+            ring: DebugRing::new(),
         }
     }
 
+    /// debug 日志:dev 下发给 bridge;release 下不占 IPC,模板 + 原始参数记进 ring,
+    /// 等 dump_debug 来取时才拼字符串。
+    pub fn debug<const N: usize>(
+        &self,
+        tx: &Out,
+        place: &'static str,
+        msg: &'static str,
+        args: [DebugArg; N],
+    ) {
+        if self.dev {
+            let _ = tx.send(log_json(LogLevel::Debug, place, &render(msg, &args)));
+        } else {
+            self.ring.record(place, msg, args);
+        }
+    }
+
+    /// 当前上游 client。
+    pub fn client(&self) -> Arc<ApiClient> {
+        Arc::clone(&self.client.read().unwrap_or_else(|e| e.into_inner()))
+    }
+
+    /// 换一个全新的 client:挂起 / 换网后旧连接池里多半是死连接,下一发请求得先赔一次超时。
+    pub fn reset_client(&self) {
+        *self.client.write().unwrap_or_else(|e| e.into_inner()) = Arc::new(create_client(None));
+    }
+
     /// 发请求时实际带的 cookie:设备锚点 +(已登录则)凭证。
     ///
     /// 永远是 `Some`。未登录也要带锚点 —— 搜索、榜单这些匿名命令一样在暴露指纹,
@@ -17,6 +17,7 @@ pub(crate) enum AudioCmd {
     Volume(f32),
     Seek(f64),
     Stop,
+    NetReset,
 }
 
 /// 上报给 bridge 的事件,序列化成 NDJSON(协议 v1 event / log 格式)。
@@ -196,6 +197,13 @@ pub(crate) fn audio_thread(rx: mpsc::Receiver<AudioCmd>, ev: tmpsc::UnboundedSen
                     }
                 }
             }
+            Ok(AudioCmd::NetReset) => {
+                // 挂起 / 换网:在播的流趁缓冲还有货换条新连接(见 StreamProbe::reconnect);
+                // 新 load 本来就是新 client,不用管
+                if let Some(p) = &probe {
+                    p.reconnect();
+                }
+            }
             Ok(AudioCmd::Stop) => {
                 fade_out_playing(&sink, volume);
                 sink = None;
@@ -1,38 +1,42 @@
-use std::sync::atomic::{AtomicU64, Ordering};
+use std::collections::HashMap;
+use std::sync::atomic::{AtomicBool, AtomicU64, Ordering};
 use std::sync::{mpsc, Arc};
 
-use tokio::io::{AsyncBufReadExt, AsyncWriteExt, BufReader};
+use tokio::io::BufReader;
 use tokio::net::UnixStream;
 use tokio::sync::mpsc as tmpsc;
+use tokio::task::JoinHandle;
 
 use crate::audio::{audio_thread, AudioCmd, AudioEv};
 use crate::mpris;
-use crate::protocol::{self, ErrorCode};
-use crate::protocol::{log_json, LogLevel};
+use crate::protocol::{self, ErrorCode, Incoming};
+use crate::protocol::{log_json, DebugRing, LogLevel};
 use crate::stream::{open_http_stream, OpenError};
 
 pub(crate) async fn socket_loop(socket: &str) -> Result<(), Box<dyn std::error::Error>> {
     let stream = UnixStream::connect(socket).await?;
     let (rd, mut wr) = stream.into_split();
-    let mut lines = BufReader::new(rd).lines();
+    let mut rd = BufReader::new(rd);
 
     // 音频线程 + 两条 channel:cmd(tokio→audio,std mpsc)、event(audio→tokio,tokio mpsc)
     let (cmd_tx, cmd_rx) = mpsc::channel::<AudioCmd>();
     let (ev_tx, mut ev_rx) = tmpsc::unbounded_channel::<AudioEv>();
     std::thread::spawn(move || audio_thread(cmd_rx, ev_tx));
 
-    // 单一写出:命令响应 + 事件都汇到这里串行写回,避免并发写乱帧
+    // 单一写出:命令响应 + 事件都汇到这里串行写回,避免并发写乱帧。
+    // 先按 v1 写;读循环收到第一帧 v2(bridge 认了 hello)后置位,之后改写 v2 帧。
     let (out_tx, mut out_rx) = tmpsc::unbounded_channel::<String>();
+    let peer_v2 = Arc::new(AtomicBool::new(false));
+    let wr_v2 = Arc::clone(&peer_v2);
     tokio::spawn(async move {
         while let Some(line) = out_rx.recv().await {
-            if wr.write_all(line.as_bytes()).await.is_err()
-                || wr.write_all(b"\n").await.is_err()
-                || wr.flush().await.is_err()
-            {
+            let v2 = wr_v2.load(Ordering::Relaxed);
+            if protocol::write_frame(&mut wr, &line, v2).await.is_err() {
                 break;
             }
         }
     });
+    let _ = out_tx.send(protocol::hello());
 
     // MPRIS2:连 session bus 暴露 now-playing + 控制。失败降级 None(记 warn),绝不阻塞出声。
     let mpris = mpris::start(out_tx.clone()).await;
@@ -60,15 +64,34 @@ pub(crate) async fn socket_loop(socket: &str) -> Result<(), Box<dyn std::error::
     });
 
     let debug = std::env::var("DECKY_MUSIC_DEBUG").is_ok(); // release 下不发 debug 日志
+    let ring = DebugRing::new(); // release 下的 debug 记在这里,dump_debug 时整环回包
 
     // load 代次:每来一个 load(或 stop)自增;后台打开完成时代次已过 → 丢弃,
     // 迟到的旧 load 绝不夺播(修「UI 显示与实际播放不一致」)。
     let load_gen = Arc::new(AtomicU64::new(0));
+    // 在途 load 的 id → 任务句柄(其余命令都是即时应答,没有可取消的)
+    let mut loads: HashMap<u64, JoinHandle<()>> = HashMap::new();
 
-    // NDJSON:每条一行 {json}\n,UTF-8,单条 ≤ 1 MiB
-    while let Some(line) = lines.next_line().await? {
-        let req = match protocol::parse_request(&line) {
-            Ok(r) => r,
+    // 分帧逐帧识别:v1 一行一条 / v2 长度前缀(见 wire::read_frame)
+    let mut buf = Vec::new();
+    while let Some(version) = protocol::read_frame(&mut rd, &mut buf).await? {
+        if version >= 2 {
+            peer_v2.store(true, Ordering::Relaxed);
+        }
+        let req = match protocol::parse_incoming(&buf) {
+            Ok(Incoming::Request(r)) => r,
+            // bridge 不再等这条 load(切歌作废/超时):中止开流,不再白拉一条过期的流
+            Ok(Incoming::Cancel(id)) => {
+                if let Some(h) = loads.remove(&id) {
+                    h.abort();
+                    if debug {
+                        let _ = out_tx.send(log_json(LogLevel::Debug, "load", "cancelled"));
+                    } else {
+                        ring.record("load", "cancelled", []);
+                    }
+                }
+                continue;
+            }
             // 解析失败拿不到 id → 记录并丢弃(协议 v1 规则)
             Err(e) => {
                 let _ = out_tx.send(log_json(
@@ -79,12 +102,30 @@ pub(crate) async fn socket_loop(socket: &str) -> Result<(), Box<dyn std::error::
                 continue;
             }
         };
+        // 心跳:读循环里直接回,不进 debug 日志(每 2s 一条)。回不出来 = 本循环卡住了
+        if req.cmd == "ping" {
+            let _ = out_tx.send(protocol::ok_empty(req.id));
+            continue;
+        }
+        // 诊断导出:整环回包,同样在读循环里直接回
+        if req.cmd == "dump_debug" {
+            let records = ring.dump();
+            let _ = out_tx.send(protocol::ok(
+                req.id,
+                serde_json::json!({ "records": records }),
+            ));
+            continue;
+        }
         if debug {
             let _ = out_tx.send(log_json(LogLevel::Debug, "cmd", &req.cmd));
+        } else {
+            ring.record("cmd", "{}", [req.cmd.clone().into()]);
         }
         // load 后台化:慢 CDN 打开(可 20s+)不阻塞命令循环,pause/next/新 load 即时处理
         if req.cmd == "load" {
-            spawn_load(&load_gen, &cmd_tx, &out_tx, req);
+            let id = req.id;
+            loads.retain(|_, h| !h.is_finished());
+            loads.insert(id, spawn_load(&load_gen, &cmd_tx, &out_tx, req));
             continue;
         }
         // meta:更新 MPRIS 展示态,不碰音频线程(mpris 不可用时静默 ok)
@@ -116,7 +157,7 @@ fn spawn_load(
     cmd_tx: &mpsc::Sender<AudioCmd>,
     out_tx: &tmpsc::UnboundedSender<String>,
     req: protocol::Request,
-) {
+) -> JoinHandle<()> {
     let gen = load_gen.fetch_add(1, Ordering::SeqCst) + 1;
     let (gen_ref, cmd_tx, out_tx) = (Arc::clone(load_gen), cmd_tx.clone(), out_tx.clone());
     tokio::spawn(async move {
@@ -151,7 +192,7 @@ fn spawn_load(
             Err(_) => protocol::err(req.id, ErrorCode::MissingField, "url required"),
         };
         let _ = out_tx.send(resp);
-    });
+    })
 }
 
 async fn handle_request(cmd_tx: &mpsc::Sender<AudioCmd>, req: protocol::Request) -> String {
@@ -160,6 +201,7 @@ async fn handle_request(cmd_tx: &mpsc::Sender<AudioCmd>, req: protocol::Request)
         "pause" => send(cmd_tx, AudioCmd::Pause, req.id),
         "resume" => send(cmd_tx, AudioCmd::Resume, req.id),
         "stop" => send(cmd_tx, AudioCmd::Stop, req.id),
+        "net_reset" => send(cmd_tx, AudioCmd::NetReset, req.id),
         "volume" => match protocol::parse_args::<protocol::VolumeArgs>(&req) {
             Ok(a) => send(cmd_tx, AudioCmd::Volume(a.val as f32), req.id),
             Err(_) => protocol::err(req.id, ErrorCode::InvalidRequest, "bad volume args"),
@@ -193,6 +235,7 @@ mod tests {
                 id,
                 cmd: cmd.to_string(),
                 args,
+                deadline: None,
             },
         )
         .await;
@@ -97,6 +97,8 @@ struct BufferState {
     error: Option<&'static str>,
     stop: bool,
     generation: u64,
+    // net_reset:丢掉当前连接,换新 client 从 write_pos 续传(producer 下一轮取走)
+    reconnect: bool,
 }
 
 impl BufferState {
@@ -112,6 +114,7 @@ impl BufferState {
             error: None,
             stop: false,
             generation: 0,
+            reconnect: false,
         }
     }
 
@@ -168,10 +171,7 @@ impl BufferState {
 
 impl HttpRangeReader {
     fn open_url(url: &str) -> Result<Self, Box<dyn std::error::Error + Send + Sync>> {
-        let client = Client::builder()
-            .connect_timeout(CONNECT_TIMEOUT)
-            .timeout(RESPONSE_TIMEOUT)
-            .build()?;
+        let client = http_client()?;
         let (response, range_supported, content_length) = open_http_response(&client, url, 0)?;
         let shared = Arc::new(SharedBuffer {
             state: Mutex::new(BufferState::new(range_supported, content_length)),
@@ -208,6 +208,17 @@ impl StreamProbe {
     pub(crate) fn failure(&self) -> Option<&'static str> {
         self.shared.state.lock().error
     }
+
+    /// 挂起 / 换网后(bridge 下发 net_reset):旧连接多半已死,读到缓冲见底才发现就是一次
+    /// 卡顿。让 producer 趁缓冲还满时换新 client、按 Range 从 write_pos 重开。
+    /// producer 正卡在死连接的 read 里时要等那次 read 返回(超时)才轮到。
+    pub(crate) fn reconnect(&self) {
+        let mut state = self.shared.state.lock();
+        if state.range_supported {
+            state.reconnect = true;
+            self.shared.can_write.notify_all();
+        }
+    }
 }
 
 impl Read for HttpRangeReader {
@@ -289,9 +300,16 @@ impl Drop for HttpRangeReader {
     }
 }
 
+fn http_client() -> reqwest::Result<Client> {
+    Client::builder()
+        .connect_timeout(CONNECT_TIMEOUT)
+        .timeout(RESPONSE_TIMEOUT)
+        .build()
+}
+
 fn producer_loop(
     shared: Arc<SharedBuffer>,
-    client: Client,
+    mut client: Client,
     url: String,
     initial_response: Option<Response>,
     initial_generation: u64,
@@ -316,7 +334,7 @@ fn producer_loop(
                     continue;
                 }
                 state.trim_rewind();
-                if state.generation != response_generation {
+                if state.generation != response_generation || state.reconnect {
                     break state.generation;
                 }
                 if state.buffer.len() < BUFFER_HIGH_WATER {
@@ -325,6 +343,7 @@ fn producer_loop(
                 while state.buffer.len() > BUFFER_LOW_WATER
                     && !state.stop
                     && state.generation == response_generation
+                    && !state.reconnect
                 {
                     shared.can_write.wait(&mut state);
                     state.trim_rewind();
@@ -332,6 +351,12 @@ fn producer_loop(
             }
         };
 
+        if std::mem::take(&mut shared.state.lock().reconnect) {
+            response = None;
+            if let Ok(fresh) = http_client() {
+                client = fresh; // 旧连接池随旧 client 一起丢
+            }
+        }
         if response.is_none() || response_generation != generation {
             let start = shared.state.lock().write_pos;
             match open_http_response(&client, &url, start) {
@@ -541,6 +566,30 @@ mod tests {
         assert_eq!(probe.failure(), None);
     }
 
+    #[test]
+    fn reconnect_reopens_from_write_pos_without_gaps() {
+        let data: Vec<u8> = (0..=255).cycle().take(BUFFER_HIGH_WATER * 2).collect();
+        let (url, starts) = range_server(data.clone());
+        let mut reader = HttpRangeReader::open_url(&url).unwrap();
+        assert_eq!(starts.recv_timeout(StdDuration::from_secs(2)).unwrap(), 0);
+        // 等 producer 补到高水位停下(挂起前的典型状态:缓冲满、连接闲着)
+        let parked_at = loop {
+            let pos = reader.shared.state.lock().write_pos;
+            if pos >= BUFFER_HIGH_WATER as u64 {
+                break pos;
+            }
+            std::thread::sleep(StdDuration::from_millis(5));
+        };
+        reader.probe().reconnect();
+        assert_eq!(
+            starts.recv_timeout(StdDuration::from_secs(2)).unwrap(),
+            parked_at
+        );
+        let mut got = vec![0_u8; data.len()];
+        reader.read_exact(&mut got).unwrap();
+        assert_eq!(got, data);
+    }
+
     #[test]
     fn rodio_decoder_accepts_http_range_reader() {
         let (url, _starts) = range_server(wav_bytes(80_000));
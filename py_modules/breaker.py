@@ -0,0 +1,96 @@
+"""熔断器(circuit breaker):上游整体不可用时快速失败,而不是每个请求各赔一次超时。
+
+Deck 离线时每个浏览页都要等 provider 的 15s upstream_timeout,队列顺延也逐首撞一遍。
+按 (provider, 命令分级) 各一个熔断器:连续 BREAKER_THRESHOLD 次超时类失败即打开,
+之后同类请求直接回稳定的 `offline` 码;冷却到点由熔断器自己发一个廉价探测请求
+(半开),成功即关闭,失败则冷却翻倍(封顶 BREAKER_MAX_COOLDOWN)继续开着。
+只用 stdlib;探测经回调注入(async () -> bool),本模块不认识 Conn。
+"""
+
+import asyncio
+import time
+
+import metrics
+
+BREAKER_THRESHOLD = 3  # 连续这么多次超时类失败才打开:单次抖动由各自的重试消化
+BREAKER_COOLDOWN = 5.0  # 打开后首次探测前的冷却(秒)
+BREAKER_MAX_COOLDOWN = 60.0  # 探测连续失败时冷却翻倍的上限
+# 计入熔断的错误码:timeout(通道级,子进程不响应)/ upstream_timeout(provider 单次上游超时)。
+# 其余失败(无版权、未登录、参数错…)说明上游是通的,反而算一次成功。
+BREAKER_ERRORS = frozenset({"timeout", "upstream_timeout"})
+OFFLINE = "offline"  # 熔断期间快速失败的错误码(前端本地化为「网络不可用」)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class Breaker:
+    def __init__(self, name: str, probe, on_change=None):
+        self.name = name  # 指标前缀 / 日志名,如 "provider.qq.browse"
+        self.probe = probe  # async () -> bool:上游是否恢复
+        self.on_change = on_change  # (Breaker) -> None,状态变化时同步回调
+        self.state = CLOSED
+        self.failures = 0  # 连续超时类失败次数
+        self.cooldown = BREAKER_COOLDOWN
+        self.opened_at = 0.0
+        self._prober: asyncio.Task | None = None
+
+    def allow(self) -> bool:
+        """closed 放行;open / half_open(探测在途)一律快速失败。"""
+        if self.state == CLOSED:
+            return True
+        metrics.inc(f"{self.name}.rejected")
+        return False
+
+    def record(self, code: str | None):
+        """记一次请求结果:code 为失败响应的 error.code,成功为 None。"""
+        if code not in BREAKER_ERRORS:
+            # 上游答话了(成功或业务性失败):在途的老请求在熔断期间回来也算恢复
+            self.failures = 0
+            if self.state != CLOSED:
+                self._close()
+            return
+        self.failures += 1
+        if self.state == CLOSED and self.failures >= BREAKER_THRESHOLD:
+            self._open()
+
+    def _set(self, state: str):
+        self.state = state
+        if self.on_change:
+            self.on_change(self)
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        metrics.inc(f"{self.name}.opened")
+        self._set(OPEN)
+        if self._prober is None or self._prober.done():
+            self._prober = asyncio.create_task(self._probe_loop())
+
+    def _close(self):
+        self.failures = 0
+        self.cooldown = BREAKER_COOLDOWN
+        if self._prober and self._prober is not asyncio.current_task():
+            self._prober.cancel()
+        self._prober = None
+        self._set(CLOSED)
+
+    async def _probe_loop(self):
+        while self.state != CLOSED:
+            await asyncio.sleep(self.cooldown)
+            self._set(HALF_OPEN)
+            try:
+                ok = await self.probe()
+            except Exception:  # 探测本身出错按未恢复算,别放倒循环
+                ok = False
+            if self.state == CLOSED:  # 探测期间有老请求成功回来,已经关了
+                return
+            if ok:
+                self._close()
+                return
+            self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN)
+            self._set(OPEN)
+
+    def stop(self):
+        """provider 切换 / 卸载:停掉探测任务。"""
+        if self._prober:
+            self._prober.cancel()
+            self._prober = None
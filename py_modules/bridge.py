@@ -7,25 +7,181 @@ Decky 加进 sys.path 且被 CLI 打包。日志见 log.py。
 import asyncio
 import json
 import os
-import shutil
 import tarfile
+import threading
 import time
+from collections import deque
+from collections.abc import AsyncIterator
 
+import bundle
 import decky
+import metrics
 import protocol
-
-from log import DEV, clear_logs, log, log_dir_size, pump_stderr
+from breaker import BREAKER_ERRORS, CLOSED, OFFLINE, Breaker
+from journal import QueueJournal
+from log import (
+    DEV,
+    clear_logs,
+    dump_ring,
+    format_records,
+    log,
+    log_dir_size,
+    pump_stderr,
+    start_pipeline,
+    stop_pipeline,
+    write_diagnostics,
+)
+from netwatch import NetWatch
 from playback import Playback
+from store import SettingsStore
+from supervisor import CRASH_LOOP, SpawnSupervisor
 
 RUNTIME = decky.DECKY_PLUGIN_RUNTIME_DIR
 SETTINGS = os.path.join(decky.DECKY_PLUGIN_SETTINGS_DIR, "settings.json")
+CRASHES = os.path.join(decky.DECKY_PLUGIN_SETTINGS_DIR, "crashes.json")  # 子进程崩溃环,见 supervisor.py
+QUEUE_JOURNAL = os.path.join(decky.DECKY_PLUGIN_SETTINGS_DIR, "queue.journal")  # 普通队列,见 journal.py
+PROVIDER_START_TIMEOUT = 10  # provider 拉起后等连入的上限(秒);超时即杀,记一次短命
 REQUEST_TIMEOUT = 30  # 子进程响应上限(秒):song_url 最坏 ~20s;超时兜底防永久挂
+# 流式请求(request_stream)的整体上限:随 deadline 下发,provider 逐页各按上游兜底。
+# bridge 侧按帧计空闲超时(REQUEST_TIMEOUT),只要帧还在来就不算挂。
+STREAM_TIMEOUT = 120
+# 按命令分级的通道级超时(秒),都不超过 REQUEST_TIMEOUT。请求里带绝对 deadline,child 只用
+# 剩余预算(再扣一点余量),所以每条命令都保持 `curl < provider < bridge` 的不等式:
+#   control  —— player 控制面 / 即刻返回的命令,正常几毫秒,5s 没回就是子进程不响应
+#   browse   —— 浏览类只读命令;12s 不出来的页面用户早就走了,别让它占着 30s
+#   resolve  —— song_url / load:最坏 ~20s(逐档试音质 / 慢 CDN 首开重试)
+#   mutation —— 写操作(含可能刷新 token 的 set_credential)
+TIMEOUTS = {"control": 5, "browse": 12, "resolve": REQUEST_TIMEOUT, "mutation": 20}
+COMMAND_CLASS = {
+    **dict.fromkeys(
+        ("pause", "resume", "stop", "seek", "volume", "meta", "login", "net_reset", "dump_debug"), "control"
+    ),
+    **dict.fromkeys(("song_url", "load"), "resolve"),
+    **dict.fromkeys(
+        ("like_song", "add_to_playlist", "fav_playlist", "fm_trash", "logout", "set_credential"),
+        "mutation",
+    ),
+}  # 其余(搜索/榜单/歌单/详情/资产/歌词/电台批次…)都是 browse
+
+
+def request_timeout(cmd: str) -> float:
+    return min(TIMEOUTS[COMMAND_CLASS.get(cmd, "browse")], REQUEST_TIMEOUT)
+
+
 # 超过这个耗时的请求按 warn 记,好让 release 日志里也留下慢请求的痕迹
 SLOW_REQUEST_S = 2.0
+# 请求按优先级分道,每道各有在途上限:滚动网格一口气发的二十个浏览请求只在 interactive 道里
+# 排队,不会堵在用户刚按下那首歌的 song_url 前面。后台道(红心种子 / 电台补货)上限最小,
+# 永远让着前台。道由命令推出(LANE_OF),调用方可用 request(lane=...) 覆盖。
+LANES = {"playback": 4, "interactive": 6, "background": 2}
+LANE_OF = dict.fromkeys(
+    ("song_url", "load", "pause", "resume", "seek", "stop", "volume", "meta", "net_reset"), "playback"
+)  # 其余默认 interactive
+# 排队超过这个时长按 warn 记:生产日志里能直接看到队头阻塞
+SLOW_QUEUE_S = 0.5
+# 域事件分道,每道单消费者、道内保序、道间互不阻塞(见 Conn._pump_events):
+#   control   —— MPRIS 控制意图(媒体键)。与 UI callable 同语义,新意图经 _play_gen 作废旧意图,
+#                所以可以和自动切歌并发;排在 ended 后面就是「切歌期间媒体键没反应」。
+#   state     —— 状态转移:playing / paused、ended(自动切歌,可能连试几首)、error、login 等。默认道。
+#                playing / paused 不能丢也不能跑到 ended 前后去,否则 UI 停在错的播放态。
+#   telemetry —— 纯位置锚点(seeked)。有界;队尾是同类帧时新帧直接顶掉它(旧位置锚点没用)。
+CONTROL_EVENTS = frozenset({"control"})
+TELEMETRY_EVENTS = frozenset({"seeked"})
+TELEMETRY_QUEUE = 32
+# 写出合批:写任务每轮把队列里攒下的帧拼成一次 write + drain,单批不超过这个字节数
+WRITE_BUDGET = 64 * 1024
+# 热备(opt-in,settings["hot_standby"]):另一家 provider 常驻在自己的 socket 上、已注入凭证、
+# 缓存是热的,set_provider 只需把活跃 Conn 指过去。16GB 的 Deck 上跑着游戏也得撑得住,所以有预算:
+PROVIDERS = ("qq", "ncm")
+STANDBY_MAX_RSS_MB = 200  # 热备进程常驻内存上限(qq-provider 正常 ~60MB,ncm 更小),超了收掉
+STANDBY_MIN_AVAIL_MB = 1536  # 系统可用内存低于此值(游戏吃紧)时不起 / 收掉热备
+STANDBY_IDLE_S = 30 * 60  # 用户这么久没切过源就收掉热备;收掉后等用户下次切源再补起
+STANDBY_CHECK_S = 60  # 巡检间隔
+# 闲置停机:这么久没有前台请求(只在放歌时 song_url / 电台补货不算)就停掉 provider 收回内存,
+# 下一条命令发出前经 Conn._wake 懒拉起。离当前曲播完 PROVIDER_PREWAKE_S 时提前拉起,
+# 下一首的 song_url 不用现等 spawn。
+PROVIDER_IDLE_S = 15 * 60
+PROVIDER_PREWAKE_S = 20
+# player 中途崩溃后的自动恢复(见 _supervise_player):重新拉起到从中断处出声的目标耗时,
+# 超了按 warn 记;新进程连入的等待上限
+PLAYER_RECOVERY_SLO_S = 2.0
+PLAYER_CONNECT_S = 5.0
 # 音质上限档位(两个 provider 各自映射到自家 level/前缀,见各自的 LADDER)。
 # 语义是"上限":provider 从这档往下逐档试,保证无版权/非会员的歌仍能播。
 QUALITIES = ("standard", "high", "lossless")
 DEFAULT_QUALITY = "high"  # = 改动前的固定上限,老用户升级后行为不变
+# 可合并(single-flight)的命令白名单:只读、结果只取决于 (cmd, args)。UI 重挂载时会把
+# 榜单/热搜/推荐等再发一遍,而上一轮同样的请求还在途 —— 合并后共享一次上游调用。
+# 写操作(like_song / add_to_playlist / fav_playlist / fm_trash / login / logout /
+# set_credential)绝不能进来:两次点击就该是两次动作。
+COALESCE_CMDS = frozenset(
+    """
+    account user_assets liked_ids comments lyric recommend discover daily_songs
+    search_songs search_playlists search_albums search_artists search_hot
+    toplists toplist_songs playlist_songs artist_detail album_detail
+    fav_songs listen_rank created_playlists fav_playlists
+    """.split()
+)
+# 幂等命令:重发一次与发一次效果相同(只读查询 + song_url 解析)。子进程中途没了
+# (判死被杀 / 崩溃)时,这些命令在原 deadline 内等 bridge 重开子进程、重注入凭证后透明重发,
+# UI 不报错。写操作 / login / set_credential 不在内:对面可能已经执行了一半。
+IDEMPOTENT_CMDS = COALESCE_CMDS | frozenset({"song_url"})
+# child 从 deadline 里先扣掉的回包余量(秒),与 qq-provider protocol.py / wire 的 DEADLINE_MARGIN 同值
+CHILD_DEADLINE_MARGIN = 1.0
+# child 收到时调用方的 deadline 已过(排队太久),不打上游直接回的错误码。是调用方这边的超时,
+# 不是子进程不响应、也不是上游断网:不判死、不计熔断、不触发自动切歌的硬熔断
+DEADLINE_EXCEEDED = "deadline_exceeded"
+# 流式请求途中 / 发出前子进程就没了的终帧错误码。不是 timeout(那是「子进程不响应」,要判死、计熔断),
+# 连接已经断了,重开由下一条请求的 revive 负责
+PROVIDER_GONE = "provider_gone"
+# 重发前剩余预算至少要有这么多(秒):child 扣完余量后还得剩一段像样的上游预算,
+# 否则它一到就按过期回 timeout,这次重开白拉
+REPLAY_MIN_S = CHILD_DEADLINE_MARGIN + 2.0
+# 心跳:连上后每 HEARTBEAT_INTERVAL 秒发一个 ping(child 在读循环里直接回,不进命令任务),
+# 连续 HEARTBEAT_MISSES 个间隔没回就判死(走 on_dead)。卡死在 CPU 自旋里的子进程
+# 因此约 6s 内被发现,而不是等某个用户请求赔满 30s;没有请求在途时也一样。
+HEARTBEAT_INTERVAL = 2.0
+HEARTBEAT_MISSES = 3
+
+
+def _event_lane(msg: protocol.ChildEvent) -> str:
+    if msg.ev != "player":
+        return "state"
+    if msg.type in CONTROL_EVENTS:
+        return "control"
+    return "telemetry" if msg.type in TELEMETRY_EVENTS else "state"
+
+
+class EventLane:
+    """一条事件道:FIFO,单消费者。maxlen 给了就有界,并合并队尾同类事件、满了丢最旧。"""
+
+    def __init__(self, name: str, maxlen: int | None = None):
+        self.name = name  # 指标名:<conn>.events.<name>.*
+        self.maxlen = maxlen
+        self._items: deque = deque()
+        self._ready = asyncio.Event()
+
+    def put(self, msg: protocol.ChildEvent):
+        if self.maxlen is not None:
+            tail = self._items[-1] if self._items else None
+            if tail is not None and (tail.ev, tail.type) == (msg.ev, msg.type):
+                self._items[-1] = msg  # 还没处理的旧状态 / 旧位置被新的取代
+                metrics.inc(f"{self.name}.coalesced")
+                return
+            if len(self._items) >= self.maxlen:
+                self._items.popleft()
+                metrics.inc(f"{self.name}.dropped")
+        self._items.append(msg)
+        self._ready.set()
+
+    async def get(self) -> protocol.ChildEvent:
+        while not self._items:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._items.popleft()
+
+    def __len__(self) -> int:
+        return len(self._items)
 
 
 def BIN(name: str) -> str:
@@ -36,35 +192,63 @@ def BIN(name: str) -> str:
     return os.path.join(decky.DECKY_PLUGIN_DIR, "bin", name)
 
 
+# qq_exe 串行化:启动时的后台预解包与首个 _ensure_provider 可能同时进来(两个线程)
+_qq_lock = threading.Lock()
+_qq_checked: set[str] = set()  # 本进程已按清单校验过的 bin/ 目录:每次启动只校验一遍
+
+
 def qq_exe() -> str:
-    """qq-provider 可执行路径,必要时自解包。
+    """qq-provider 可执行路径,必要时自解包 / 按清单补缺(见 bundle.py)。
 
     Nuitka standalone 是目录包(tar.gz);remote_binary 安装时 Decky 只把资产原样存成
-    bin/qq-provider 文件、不解包(侧载则由 deploy.sh 解),首次用到时在这里自解。
+    bin/qq-provider 文件、不解包(侧载则由 deploy.sh 解,没有清单,不校验)。
     归档经 remote_binary 的 sha256 校验,内容可信;bin/ 由安装器创建、deck 可写。
-    阻塞(~秒级),调用方走 asyncio.to_thread。"""
+    Bridge.start 会在后台先调一次,首个 set_provider 通常已无需现解。
+    阻塞(解包 ~秒级),调用方走 asyncio.to_thread。"""
     bin_dir = os.path.join(decky.DECKY_PLUGIN_DIR, "bin")
-    exe = os.path.join(bin_dir, "qq-provider", "qq-provider")
-    if os.path.isfile(exe):
-        return exe
-    tarball = os.path.join(bin_dir, "qq-provider")
-    if not os.path.isfile(tarball):
-        return exe  # 归档也缺失:让 spawn 报自然错误
-    tmp = os.path.join(bin_dir, ".qq-unpack")
-    shutil.rmtree(tmp, ignore_errors=True)
-    with tarfile.open(tarball) as tf:
-        tf.extractall(tmp)  # 顶层即 qq-provider/ 目录
-    os.chmod(os.path.join(tmp, "qq-provider", "qq-provider"), 0o755)
-    # 目录顶掉同名 tar 文件:先挪开,目录就位后再删,中途失败不丢归档
-    aside = tarball + ".tar.gz"
-    os.rename(tarball, aside)
-    os.rename(os.path.join(tmp, "qq-provider"), os.path.join(bin_dir, "qq-provider"))
-    os.remove(aside)
-    os.rmdir(tmp)
-    log("bridge", "own", "info", "qq-provider unpacked")
+    tree = os.path.join(bin_dir, "qq-provider")
+    exe = os.path.join(tree, "qq-provider")
+    archive, manifest = tree + ".tar.gz", tree + ".manifest.json"
+    with _qq_lock:
+        if os.path.isfile(tree):
+            src = tree  # 新装 / 更新:归档原样落在 bin/qq-provider
+        elif not os.path.isdir(tree) and os.path.isfile(archive):
+            src = archive  # 整个目录没了(或上次解到一半被杀):从留着的归档重解
+        else:
+            if bin_dir not in _qq_checked:
+                _qq_checked.add(bin_dir)
+                _qq_check(bin_dir, tree, archive, manifest)
+            return exe  # 侧载 / 已解好;都缺失时让 spawn 报自然错误
+        t0 = time.monotonic()
+        bundle.unpack(src, bin_dir, archive, manifest)
+        _qq_checked.add(bin_dir)
+        secs = time.monotonic() - t0
+        metrics.observe("qq.unpack", secs)
+        log("bridge", "own", "info", f"qq-provider unpacked in {secs * 1000:.0f}ms")
     return exe
 
 
+def _qq_check(bin_dir: str, tree: str, archive: str, manifest: str):
+    """按清单 stat 一遍,缺了 / 大小不对的从归档补回。没有清单(侧载)不校验。"""
+    files = bundle.load(manifest)
+    if not files:
+        return
+    t0 = time.monotonic()
+    bad = bundle.check(tree, files)
+    metrics.observe("qq.check", time.monotonic() - t0)
+    if not bad:
+        return
+    log("bridge", "own", "warn", f"qq-provider bundle: {len(bad)} file(s) missing or truncated, repairing")
+    try:
+        still = bundle.repair(archive, bin_dir, files, bad)
+    except (OSError, tarfile.TarError) as e:
+        log("bridge", "own", "error", f"qq-provider repair failed: {type(e).__name__}")
+        return
+    metrics.inc("qq.repaired", len(bad) - len(still))
+    if still:
+        log("bridge", "own", "error", f"qq-provider bundle: {len(still)} file(s) still bad after repair")
+
+
 def _child_env() -> dict:
     # 子进程音频命门:player 走 libasound→pipewire-alsa,需 XDG_RUNTIME_DIR 指向用户 runtime
     # 才能连上 PipeWire 会话(游戏模式尤其)。Decky 若已设则保留,否则按 uid 兜底。
@@ -94,6 +278,30 @@ def stop_child(proc, hard: bool = False):
         pass  # 已经没了 —— 正是想要的结果
 
 
+def rss_mb(pid: int) -> int | None:
+    """进程常驻内存(MB),读 /proc/<pid>/status;读不到返回 None。"""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii", errors="replace") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def mem_available_mb() -> int | None:
+    """系统可用内存(MB),读 /proc/meminfo 的 MemAvailable;读不到返回 None。"""
+    try:
+        with open("/proc/meminfo", encoding="ascii", errors="replace") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
 async def spawn(source: str, *args: str) -> asyncio.subprocess.Process:
     log("bridge", "own", "info", f"spawn {source}: {' '.join(args)}")
     # ponytail: full-zip 装机经 Decky extractall 落地会丢执行位;spawn 前补 +x 兜底。
@@ -115,34 +323,81 @@ async def spawn(source: str, *args: str) -> asyncio.subprocess.Process:
 class Conn:
     """一个子进程的 UDS 连接:bridge 作 server,子进程连入。"""
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, enc: str | None = None):
         self.name = name  # "provider" | "player":日志 source + id 错配提示
+        self.enc = enc  # 请求里声明的可选响应编码(provider 用列式歌曲列表,见 protocol.iter_songs)
         self.path = os.path.join(RUNTIME, f"{name}.sock")
         self.writer: asyncio.StreamWriter | None = None
         self.server: asyncio.AbstractServer | None = None
         self.on_event = None  # ChildEvent(player/login/provider)时回调
-        self.on_dead = None  # 通道级 timeout(= 子进程整体不响应)时回调,由 Bridge 装
+        self.on_dead = None  # 通道级 timeout / 心跳丢失(= 子进程整体不响应)时回调,由 Bridge 装
+        # async () -> Conn | None:把子进程重新拉起并连上(含重注入凭证),幂等命令重发前调用,由 Bridge 装。
+        # 返回接班的 Conn(备胎转正时不是自己);None = 还是自己
+        self.revive = None
+        # 当前子进程身份(provider 名,由 Bridge 在 spawn 时设)。重发只发给同一身份的新进程:
+        # 切换 provider 时断开的在途请求不能拿另一家的结果回给原页面。
+        self.session: str | None = None
         self.pending: dict[int, asyncio.Future] = {}  # 在途请求:id → Future(响应按 id demux)
+        # 最近一次前台(interactive 道)请求的时刻。播放要用的 song_url / 后台补货不算,
+        # Bridge 据此判定 provider 闲置(见 PROVIDER_IDLE_S)
+        self.used_at = time.monotonic()
+        # Bridge 闲置停机时置位:进程是有意停掉的,下一条请求发出前先经 revive 拉起(见 _wake);
+        # 子进程连入即清
+        self.parked = False
+        # Bridge 广播 net_reset 后置位:下一条前台请求的耗时记 <name>.net.first_action
+        # (睡醒 / 换网后用户第一下操作要等多久),记完即清
+        self.net_reset = False
         self.connected: asyncio.Event = asyncio.Event()  # 子进程连入后置位
         self._next_id = 0
-        self._wlock = asyncio.Lock()  # 只保护写帧原子性;请求周期不再互相排队(修按键排队无响应)
-        self._events: asyncio.Queue = asyncio.Queue()  # 域事件顺序队列(单消费者,保序)
-        self._ev_task: asyncio.Task | None = None
+        # 写出用的协议版本:连入时按 v1,收到 child 的 hello 后升到双方共同的最高版本
+        self.proto = 1
+        # 写出经单个写任务合批(见 _flush_loop):请求只入队不等 drain,请求周期不互相排队
+        self._outq: asyncio.Queue | None = None
+        self._flusher: asyncio.Task | None = None
+        # 域事件分道(见 CONTROL_EVENTS / TELEMETRY_EVENTS),listen 时每道起一个消费任务
+        self._ev_lanes = {
+            "control": EventLane(f"{name}.events.control"),
+            "state": EventLane(f"{name}.events.state"),
+            "telemetry": EventLane(f"{name}.events.telemetry", TELEMETRY_QUEUE),
+        }
+        self._ev_tasks: list[asyncio.Task] = []
+        # single-flight:(cmd, 规范化 args) → 在途的共享请求任务,见 request(coalesce=True)
+        self._flights: dict[tuple[str, str], list] = {}
+        self._lanes = {lane: asyncio.Semaphore(cap) for lane, cap in LANES.items()}
+        self._streams: dict[int, asyncio.Queue] = {}  # 流式请求 id → 帧队列,见 request_stream
+        # 心跳参数(见 HEARTBEAT_*),可按连接调;任务随连接起停
+        self.heartbeat_interval = HEARTBEAT_INTERVAL
+        self.heartbeat_misses = HEARTBEAT_MISSES
+        self._heartbeat: asyncio.Task | None = None
+        # 熔断(见 breaker.py):Bridge 给 provider 装上探测命令 (cmd, args) 即启用;player 不接上游。
+        # 按 (session, 命令分级) 各一个,换 provider 时由 reset_breakers 清掉
+        self.breaker_probe: tuple[str, dict | None] | None = None
+        self.on_breaker = None  # (Breaker) -> None,熔断状态变化时回调,由 Bridge 装
+        self.breakers: dict[tuple[str | None, str], Breaker] = {}
+
+    def rename(self, name: str):
+        """转正 / 退位换名:日志与指标跟着走,事件道的指标名一并改(path 不动,socket 随 Conn 走)。"""
+        self.name = name
+        for kind, lane in self._ev_lanes.items():
+            lane.name = f"{name}.events.{kind}"
 
     async def listen(self):
         try:
             os.unlink(self.path)
         except FileNotFoundError:
             pass
-        self.server = await asyncio.start_unix_server(self._accept, self.path)
-        self._ev_task = asyncio.create_task(self._pump_events())
+        self.server = await asyncio.start_unix_server(
+            self._accept, self.path, limit=protocol.LINE_LIMIT
+        )
+        self._ev_tasks = [asyncio.create_task(self._pump_events(lane)) for lane in self._ev_lanes.values()]
 
-    async def _pump_events(self):
-        # 事件单消费者:绝不让 on_event 内联阻塞读循环 —— ended → 自动切歌会向本 Conn
+    async def _pump_events(self, lane: EventLane):
+        # 事件消费者:绝不让 on_event 内联阻塞读循环 —— ended → 自动切歌会向本 Conn
         # 发 load 并等响应,而响应只能由读循环收,内联即自死锁(每次自然播完卡 60s)。
-        # 独立任务消费还保证事件按到达顺序处理(playing/paused 不乱序)。
+        # 每道一个任务:道内按到达顺序处理(playing/paused/ended 不乱序);自动切歌连试几首
+        # 不可播的歌时只占住 state 道,媒体键和 seek 位置上报照常走。
         while True:
-            msg = await self._events.get()
+            msg = await lane.get()
             try:
                 if self.on_event:
                     await self.on_event(msg)
@@ -151,7 +406,9 @@ class Conn:
 
     async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
         self.writer = writer
+        self.parked = False
         self.connected.set()
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
         try:
             await self._read_loop(reader)
         except (ConnectionResetError, OSError) as e:
@@ -163,19 +420,32 @@ class Conn:
             self.disconnect()
 
     async def _read_loop(self, reader: asyncio.StreamReader):
-        # 单读循环 + 分流(协议 v1):log 事件直接落盘;domain 事件 → on_event;response → 队列。
+        # 单读循环 + 分流:log 事件直接落盘;domain 事件 → on_event;response → 队列。
         # 子进程在同一条连接上既回响应又推事件,必须在这里 demux,否则响应会被吞掉。
-        while line := await reader.readline():  # \n 分帧,同 Decky localsocket.py
+        # 分帧逐帧自动识别(v1 行 / v2 长度前缀),见 protocol.read_frame。
+        while True:
             try:
-                msg = protocol.decode_child_message(json.loads(line))
-            except (json.JSONDecodeError, protocol.ProtocolError) as e:
+                frame = await protocol.read_frame(reader)
+                if frame is None:
+                    break
+                msg = protocol.decode_child_message(json.loads(frame[0]))
+            except (json.JSONDecodeError, UnicodeDecodeError, protocol.ProtocolError) as e:
                 log("bridge", "own", "warn", f"bad {self.name} message: {e}")
                 continue
-            if isinstance(msg, protocol.LogEvent):
+            if isinstance(msg, protocol.Hello):
+                # 协商:取双方都支持的最高版本。之后 bridge 的写出改用它;child 看到
+                # 第一帧 v2 就跟着切(读端逐帧识别版本,切换点不需要对齐)。
+                self.proto = min(msg.proto, protocol.PROTO_VERSION)
+                log("bridge", "own", "info", f"{self.name} speaks protocol v{self.proto}")
+            elif isinstance(msg, protocol.LogEvent):
                 where = msg.where
                 log(self.name, "socket", msg.level, f"{where}: {msg.msg}" if where else msg.msg)
             elif isinstance(msg, protocol.ChildEvent):
-                self._events.put_nowait(msg)  # 入顺序队列,读循环不阻塞(见 _pump_events)
+                self._ev_lanes[_event_lane(msg)].put(msg)  # 入对应事件道,读循环不阻塞
+            elif msg.id in self._streams:  # 流式请求的 partial / 终帧,按到达顺序交给迭代方
+                self._streams[msg.id].put_nowait(msg)
+            elif isinstance(msg, protocol.ChildPartial):
+                pass  # 流已被放弃(cancel 帧在路上),剩下的 partial 直接丢
             else:  # ChildResponse:按 id 匹配在途请求;无主(已超时放弃)的迟到响应丢弃
                 fut = self.pending.pop(msg.id, None)
                 if fut and not fut.done():
@@ -191,56 +461,361 @@ class Conn:
         """
         self.connected.clear()
         self.writer = None
+        self.proto = 1  # 下一个连进来的可能是老版本 child,等它自己 hello
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._flusher:  # 没写出去的帧是给旧进程的,随写任务一起丢
+            self._flusher.cancel()
+            self._flusher = None
         for fut in list(self.pending.values()):
             if not fut.done():
                 fut.set_exception(ConnectionResetError(f"{self.name} gone"))
         self.pending.clear()
-
-    async def request(self, cmd: str, args: dict | None = None) -> protocol.ChildResponse:
+        for rid, q in self._streams.items():  # 流式请求同理:补一个终帧让迭代方立刻收尾
+            q.put_nowait(protocol.ChildResponse(rid, False, {}, protocol.ErrorBody(PROVIDER_GONE, PROVIDER_GONE)))
+        self._streams.clear()
+
+    async def request(
+        self, cmd: str, args: dict | None = None, coalesce: bool = False, lane: str | None = None
+    ) -> protocol.ChildResponse:
+        """发一条命令等响应。失败一律回 ChildResponse(ok=False),不抛。
+
+        coalesce=True(opt-in)且命令在 COALESCE_CMDS 白名单里时走 single-flight:与在途的
+        同 (cmd, args) 请求共享同一次往返与结果。各调用方经 shield 等待,谁先放弃都不影响
+        其余调用方。白名单外的命令忽略该开关,照常独立发送。
+        lane:覆盖按命令推出的优先级道(见 LANES),如电台后台补货走 "background"。"""
+        lane = lane or LANE_OF.get(cmd, "interactive")
+        if lane == "interactive":
+            self.used_at = time.monotonic()
+            if self.net_reset:
+                self.net_reset = False
+                return await self._first_action(cmd, args, coalesce, lane)
+        if not (coalesce and cmd in COALESCE_CMDS):
+            return await self._request(cmd, args, lane)
+        key = (cmd, json.dumps(args or {}, sort_keys=True, separators=(",", ":")))
+        entry = self._flights.get(key)  # [共享的往返任务, 等待者数]
+        if entry is None:
+            flight = asyncio.ensure_future(self._request(cmd, args, lane))
+            entry = self._flights[key] = [flight, 0]
+            flight.add_done_callback(
+                lambda f: self._flights.pop(key) if self._flights.get(key, (None,))[0] is f else None
+            )
+        else:
+            metrics.inc(f"{self.name}.coalesced")  # 省下的一次上游调用
+            log("bridge", "own", "debug", "%s %s joined in-flight request", self.name, cmd)
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                # 最后一个等待者也放弃了:整趟取消(_request 会给 child 发 cancel 帧);先出表,
+                # 免得新来的调用方搭上一趟已取消的车
+                if self._flights.get(key) is entry:
+                    del self._flights[key]
+                entry[0].cancel()
+
+    async def _first_action(
+        self, cmd: str, args: dict | None, coalesce: bool, lane: str
+    ) -> protocol.ChildResponse:
+        t0 = time.monotonic()
+        resp = await self.request(cmd, args, coalesce, lane)
+        secs = time.monotonic() - t0
+        metrics.observe(f"{self.name}.net.first_action", secs)
+        log("bridge", "own", "info", f"{self.name} first {cmd} after net reset: {secs * 1000:.0f}ms")
+        return resp
+
+    async def _request(
+        self, cmd: str, args: dict | None = None, lane: str = "interactive"
+    ) -> protocol.ChildResponse:
+        # 熔断打开时直接快速失败,连道都不排
+        breaker = self._breaker(cmd)
+        if breaker and not breaker.allow():
+            return protocol.ChildResponse(0, False, {}, protocol.ErrorBody(OFFLINE, OFFLINE))
+        # 先在所属道里排队拿在途名额;排队时长按道记下,队头阻塞在日志里看得见
+        t0 = time.monotonic()
+        async with self._lanes[lane]:
+            waited = time.monotonic() - t0
+            metrics.observe(f"{self.name}.lane.{lane}.wait", waited)
+            if waited >= SLOW_QUEUE_S:
+                log("bridge", "own", "warn", f"{self.name} {cmd} queued {waited * 1000:.0f}ms in {lane} lane")
+            resp, lost = await self._send(cmd, args)
+        code = None if resp.ok else resp.error.code
+        # 子进程不在(崩溃 / 重开中)是本机的事;deadline 过了是调用方的预算用完 —— 都不算上游断网,
+        # 也不算上游答话了(不清连击)
+        if breaker and not lost and code != DEADLINE_EXCEEDED:
+            breaker.record(code)
+        return resp
+
+    def _breaker(self, cmd: str) -> Breaker | None:
+        if self.breaker_probe is None:
+            return None
+        key = (self.session, COMMAND_CLASS.get(cmd, "browse"))
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = Breaker(
+                f"{self.name}.{key[0]}.{key[1]}.breaker", self._probe_upstream, self.on_breaker
+            )
+        return breaker
+
+    async def _probe_upstream(self) -> bool:
+        """熔断半开探测:绕过熔断与分道直接发一条廉价只读命令(子进程没了也会经重发路径重开)。
+        上游答话了(哪怕是业务性失败)就算恢复。"""
+        cmd, args = self.breaker_probe
+        resp, _ = await self._send(cmd, args)
+        return resp.ok or resp.error.code not in BREAKER_ERRORS
+
+    def reset_breakers(self):
+        """换 provider / 关闭:旧身份的熔断器连同探测任务一起作废。"""
+        for breaker in self.breakers.values():
+            breaker.stop()
+        self.breakers.clear()
+
+    async def _send(self, cmd: str, args: dict | None) -> tuple[protocol.ChildResponse, bool]:
+        """→ (响应, 是否没够着活的子进程)。后者的 timeout 是 bridge 自己合成的(子进程没了、
+        重开 / 拉起来不及),熔断据此不把本机崩溃循环当成上游断网。"""
+        budget = request_timeout(cmd)
+        deadline, session = time.monotonic() + budget, self.session
+        conn = self
+        if self.parked:
+            conn = await self._wake(budget)
+            # 仍按调用方的 deadline 走。拉起吃掉了大半预算时不发:剩下的不够 child 扣完余量再打上游,
+            # 它一到就按过期回;硬给更长的预算又越过调用方的 deadline,刚拉起的进程反被判超时杀掉
+            budget = deadline - time.monotonic()
+            if budget < REPLAY_MIN_S:
+                metrics.inc(f"{self.name}.wake.late")
+                log("bridge", "own", "warn", f"{self.name} woke too late for {cmd} ({budget:.1f}s left)")
+                return protocol.ChildResponse(0, False, {}, protocol.ErrorBody("timeout", "timeout")), True
+        resp, lost = await conn._attempt(cmd, args, budget)
+        if lost and cmd in IDEMPOTENT_CMDS and self.revive:
+            replayed = await self._replay(cmd, args, deadline, session)
+            if replayed is not None:
+                return replayed, False
+        return resp, lost
+
+    async def _wake(self, budget: float) -> "Conn":
+        """子进程是闲置停掉的(parked)而请求还没发出:先经 revive 拉起再发。还没发出去就谈不上
+        重复执行,所以不论幂等与否都安全。返回接班的 Conn(拉不起来就是自己)。
+        崩掉的不在这里重开:那条路走 _replay(只重发幂等命令)。"""
+        if not self.parked or self.revive is None:
+            return self
+        try:
+            conn = await asyncio.wait_for(asyncio.shield(self.revive()), budget)
+        except asyncio.TimeoutError:
+            return self
+        return conn or self
+
+    async def _replay(
+        self, cmd: str, args: dict | None, deadline: float, session: str | None
+    ) -> protocol.ChildResponse | None:
+        """子进程中途没了:等 revive 把它重开,再在原 deadline 的剩余预算内重发一次。
+        来不及 / 换了身份 / 没能重开时返回 None,调用方沿用原来的失败响应。"""
+        try:
+            # shield:调用方放弃等待时,重开照常做完(它还持着 provider_lock,半路取消会留下残局)
+            conn = await asyncio.wait_for(asyncio.shield(self.revive()), deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            return None
+        conn = conn or self  # 备胎转正后由另一个 Conn 接班
+        left = deadline - time.monotonic()
+        if conn.writer is None or conn.session != session or left < REPLAY_MIN_S:
+            return None
+        metrics.inc(f"{self.name}.replayed.{cmd}")
+        log("bridge", "own", "info", f"{self.name} respawned, replaying {cmd} ({left:.1f}s left)")
+        resp, _ = await conn._attempt(cmd, args, left)
+        return resp
+
+    async def _attempt(
+        self, cmd: str, args: dict | None, budget: float
+    ) -> tuple[protocol.ChildResponse, bool]:
+        """发一次、等一次 → (响应, 是否因子进程没了而失败)。后者是重发的判据。"""
         # 并发 demux(协议 v1 预留的升级):多请求可同时在途,响应按 id 匹配,
         # 一个挂着的慢请求(如慢 CDN 的 load)不再队头阻塞 pause/next 等其它命令。
         self._next_id += 1
         rid = self._next_id
+        timeout = protocol.ChildResponse(rid, False, {}, protocol.ErrorBody("timeout", "timeout"))
         if self.writer is None:  # 子进程已经没了(见 disconnect),别等满 30s 再说
-            return protocol.ChildResponse(rid, False, {}, protocol.ErrorBody("timeout", "timeout"))
+            return timeout, True
         fut: asyncio.Future = asyncio.get_running_loop().create_future()
         self.pending[rid] = fut
         t0 = time.monotonic()
+        deadline_ms = int((time.time() + budget) * 1000)  # 同机墙钟,child 据此算剩余预算
+        sent = False
         try:
-            async with self._wlock:  # 写帧原子,防并发写乱行
-                self.writer.write((json.dumps(protocol.request(rid, cmd, args)) + "\n").encode())
-                await self.writer.drain()
-            resp = await asyncio.wait_for(fut, REQUEST_TIMEOUT)
+            self._enqueue(protocol.encode_frame(protocol.request(rid, cmd, args, deadline_ms, self.enc), self.proto))
+            sent = True
+            resp = await asyncio.wait_for(fut, budget)
             self._log_timing(cmd, time.monotonic() - t0)
-            return resp
+            if not resp.ok and resp.error.code == DEADLINE_EXCEEDED:
+                metrics.inc(f"{self.name}.deadline_exceeded")
+            return resp, False
+        except asyncio.CancelledError:
+            # 调用方不等了(切歌作废旧意图 / 合并请求的最后一个等待者走了):让 child 也停手
+            if sent:
+                self._send_cancel(rid, cmd)
+            raise
         except asyncio.TimeoutError:
             # 协议 v1 里通道级 timeout 的含义就是「子进程整体不响应」。观测两次它都不会
             # 自己好转(issue #44 的 100% CPU 自旋:只有换进程能救),所以判死,让下一条
             # 命令重开一个,而不是把后面每个操作都拖 30s。
-            log("bridge", "own", "error", f"{self.name} request timeout: {cmd}")
+            log("bridge", "own", "error", f"{self.name} request timeout: {cmd} ({budget:g}s)")
+            self._send_cancel(rid, cmd)  # 判死前先知会:若它其实还活着,别再白跑这条
             if self.on_dead:
                 self.on_dead()
-            return protocol.ChildResponse(rid, False, {}, protocol.ErrorBody("timeout", "timeout"))
+            return timeout, False
         except (ConnectionResetError, OSError):
             # 等待期间子进程没了(disconnect 会把在途 future 全部置失败)
             log("bridge", "own", "warn", f"{self.name} died mid-request: {cmd}")
-            return protocol.ChildResponse(rid, False, {}, protocol.ErrorBody("timeout", "timeout"))
+            return timeout, True
         finally:
             self.pending.pop(rid, None)
 
+    async def request_stream(
+        self, cmd: str, args: dict | None = None, lane: str | None = None
+    ) -> AsyncIterator[protocol.ChildResponse]:
+        """流式请求:逐帧产出 ChildResponse —— 每个 partial 一个(ok=True,data 是该批),
+        最后是终帧(该 id 的常规响应,ok 或 error)。与 request 一样不抛。
+
+        大列表(整单 2000 首)不再需要几十次分页往返,也不会变成一个巨帧。空闲超时按帧计
+        (REQUEST_TIMEOUT),整体上限 STREAM_TIMEOUT 随 deadline 下发。提前放弃(break 后
+        aclose / 取消)会给 child 发 cancel;break 时请用 contextlib.aclosing 包住。"""
+        lane = lane or LANE_OF.get(cmd, "interactive")
+        if lane == "interactive":
+            self.used_at = time.monotonic()
+        conn = await self._wake(REQUEST_TIMEOUT)
+        if conn is not self:  # 备胎转正:整条流交给接班的 Conn
+            async for resp in conn.request_stream(cmd, args, lane):
+                yield resp
+            return
+        async with self._lanes[lane]:
+            self._next_id += 1
+            rid = self._next_id
+            timeout = protocol.ChildResponse(rid, False, {}, protocol.ErrorBody("timeout", "timeout"))
+            if self.writer is None:
+                yield protocol.ChildResponse(rid, False, {}, protocol.ErrorBody(PROVIDER_GONE, PROVIDER_GONE))
+                return
+            q: asyncio.Queue = asyncio.Queue()
+            self._streams[rid] = q
+            deadline_ms = int((time.time() + STREAM_TIMEOUT) * 1000)
+            t0, frames, done = time.monotonic(), 0, False
+            try:
+                self._enqueue(protocol.encode_frame(protocol.request(rid, cmd, args, deadline_ms, self.enc), self.proto))
+                while not done:
+                    try:
+                        msg = await asyncio.wait_for(q.get(), REQUEST_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        # 帧停了 REQUEST_TIMEOUT:与 request 超时同一含义(子进程不响应)
+                        log("bridge", "own", "error", f"{self.name} stream stalled: {cmd} after {frames} frames")
+                        self._send_cancel(rid, cmd)
+                        done = True
+                        if self.on_dead:
+                            self.on_dead()
+                        yield timeout
+                        return
+                    frames += 1
+                    if isinstance(msg, protocol.ChildPartial):
+                        yield protocol.ChildResponse(rid, True, msg.data)
+                        continue
+                    done = True
+                    self._log_timing(f"{cmd} (stream, {frames} frames)", time.monotonic() - t0)
+                    yield msg
+            finally:
+                self._streams.pop(rid, None)
+                if not done:  # 迭代方中途放弃
+                    self._send_cancel(rid, cmd)
+
+    async def _heartbeat_loop(self):
+        """连接存活期间的心跳:一次只有一个 ping 在途,没回就接着等同一个(不补发,
+        迟到的 pong 照样算活),每过一个间隔记一次 miss;攒够 heartbeat_misses 判死。
+        RTT 记入 {name}.heartbeat.rtt —— 读循环被饿住(事件循环卡顿)也会在这里先露头。"""
+        while True:
+            # 先等一个间隔再发:刚连上时 child 的 hello 还在路上,首个 ping 不必抢在协商前面
+            await asyncio.sleep(self.heartbeat_interval)
+            if self.writer is None:
+                return
+            self._next_id += 1
+            rid = self._next_id
+            fut: asyncio.Future = asyncio.get_running_loop().create_future()
+            self.pending[rid] = fut
+            t0 = time.monotonic()
+            deadline_ms = int((time.time() + self.heartbeat_interval) * 1000)
+            try:
+                self._enqueue(protocol.encode_frame(protocol.request(rid, "ping", None, deadline_ms), self.proto))
+                misses = 0
+                while True:
+                    try:
+                        # shield:单个间隔到点只算一次 miss,不作废这个 ping
+                        await asyncio.wait_for(asyncio.shield(fut), self.heartbeat_interval)
+                        break
+                    except asyncio.TimeoutError:
+                        misses += 1
+                        metrics.inc(f"{self.name}.heartbeat.missed")
+                        if misses >= self.heartbeat_misses:
+                            secs = time.monotonic() - t0
+                            log("bridge", "own", "error", f"{self.name} heartbeat lost ({secs:.1f}s without pong)")
+                            if self.on_dead:
+                                self.on_dead()
+                            return
+            except (ConnectionResetError, OSError):
+                return  # 连接没了:disconnect 会取消本任务,这里只是先一步收尾
+            finally:
+                self.pending.pop(rid, None)
+            # 老版本 child 不认 ping 会回 unknown_cmd:有回包就说明读循环活着,同样算数
+            metrics.observe(f"{self.name}.heartbeat.rtt", time.monotonic() - t0)
+
+    def _send_cancel(self, rid: int, cmd: str):
+        """发 cancel 帧(尽力而为)。与请求帧走同一个写队列,保证 cancel 不会抢到请求前面。"""
+        if self.writer is None:
+            return
+        self._enqueue(protocol.encode_frame(protocol.cancel(rid), self.proto))
+        metrics.inc(f"{self.name}.cancelled.{cmd}")
+
+    def _enqueue(self, frame: bytes):
+        """帧入写队列,按需拉起写任务。同步调用:请求方不再逐帧等 drain。"""
+        if self._flusher is None or self._flusher.done():
+            self._outq = asyncio.Queue()
+            self._flusher = asyncio.create_task(self._flush_loop(self._outq))
+        self._outq.put_nowait(frame)
+
+    async def _flush_loop(self, outq: asyncio.Queue):
+        # 单写者:等到第一帧后把同一轮事件循环里攒下的帧全部取出,拼成一次 write + drain。
+        # 一阵突发的请求因此只花一次系统调用和一次 drain 往返,而不是每帧各一次。
+        while True:
+            batch = [await outq.get()]
+            size = len(batch[0])
+            while size < WRITE_BUDGET and not outq.empty():
+                frame = outq.get_nowait()
+                batch.append(frame)
+                size += len(frame)
+            if self.writer is None:
+                continue
+            try:
+                self.writer.write(b"".join(batch))
+                await self.writer.drain()
+            except (ConnectionResetError, OSError) as e:
+                # 对面没了:读循环会见到 EOF 走 disconnect,在途请求由那边统一置失败
+                log("bridge", "own", "warn", f"{self.name} write failed: {type(e).__name__}")
+            metrics.inc(f"{self.name}.write.flushes")  # frames / flushes = 平均每批帧数
+            metrics.inc(f"{self.name}.write.frames", len(batch))
+
     def _log_timing(self, cmd: str, secs: float):
-        """请求耗时。debug 记全部(仅 dev 可见);超过阈值升 warn —— release 只有 INFO 以上,
+        """请求耗时。debug 记全部(dev 落盘,release 进环);超过阈值升 warn —— release 只有 INFO 以上,
         没这条的话用户报「插件变慢」时日志里一点线索都没有(见 issue #44 的排查)。
         阈值 2s:正常命令 p95 在 0.4s 量级,2s 已经是肉眼可感的卡顿。"""
         ms = secs * 1000
         if secs >= SLOW_REQUEST_S:
             log("bridge", "own", "warn", f"slow {self.name} request: {cmd} took {ms:.0f}ms")
         else:
-            log("bridge", "own", "debug", f"{self.name} {cmd} {ms:.0f}ms")
+            log("bridge", "own", "debug", "%s %s %.0fms", self.name, cmd, ms)
 
     async def close(self):
-        if self._ev_task:
-            self._ev_task.cancel()
+        for task in self._ev_tasks:
+            task.cancel()
+        if self._heartbeat:
+            self._heartbeat.cancel()
+        self.reset_breakers()
+        if self._flusher:
+            self._flusher.cancel()
         if self.writer:
             self.writer.close()
         if self.server:
@@ -250,8 +825,7 @@ class Conn:
 def _songs_to_items(songs) -> list[dict]:
     # provider 出 Song 形状(mid);队列项形状是 id(前端 toQueueItem 同款映射)。
     # 电台/后端直灌队列的路径必须在此边界归一,否则 playback 读 item["id"] 会炸。
-    if not isinstance(songs, list):
-        return []
+    # songs 可以是 dict 数组或列式编码,逐行还原后直接映射成队列项,不落中间数组。
     return [
         {
             "id": str(s.get("mid", "")),
@@ -261,7 +835,7 @@ def _songs_to_items(songs) -> list[dict]:
             "cover": s.get("cover", "") or "",
             "duration": s.get("duration", 0) or 0,
         }
-        for s in songs
+        for s in protocol.iter_songs(songs)
         if isinstance(s, dict) and s.get("mid")
     ]
 
@@ -300,6 +874,29 @@ def save_settings(data: dict):
         raise
 
 
+class ProviderSlot:
+    """活跃 provider 之外的一个备用进程位:独占一个 socket 的 Conn + 进程 + 身份。"""
+
+    def __init__(self, name: str):
+        self.name = name  # 不在前台时 Conn 用的日志名
+        self.conn = Conn(name, enc=protocol.SONG_COLUMNS)
+        self.sup = SpawnSupervisor(f"provider.{name}", CRASHES)  # 本位自己的崩溃连击,不与活跃方互相清零
+        self.proc: asyncio.subprocess.Process | None = None
+        self.which: str | None = None
+        self.used = time.monotonic()  # 用户上次切源的时刻(闲置淘汰按它算,起进程不算用)
+        self.idle = False  # 因闲置被收:用户再切一次源之前不补起
+        self.lock = asyncio.Lock()  # 串行化本位的起停;_ensure_provider 要接管它时也等这把锁
+
+    def ready(self, which: str | None) -> bool:
+        """起好了、连着、身份是 which。"""
+        alive = self.proc is not None and self.proc.returncode is None
+        return which is not None and self.which == which and alive and self.conn.connected.is_set()
+
+    def stop(self, hard: bool = False):
+        stop_child(self.proc, hard=hard)
+        self.proc = self.which = self.conn.session = None
+
+
 class Bridge:
     """总线实现:管理 player/provider 两个子进程,编排 UI 命令,路由子进程事件。"""
 
@@ -307,10 +904,25 @@ class Bridge:
         # 红心记忆:启动/登录后由 _kick_seed_liked 从服务器种全量,like 动作增量维护;
         # 切 provider 清空(两家 id 体系不通用)。
         self.liked_ids: set[str] = set()
+        self.offline: list[str] = []  # 当前 provider 打开着熔断的命令分级,变化时推给 UI
+        self.standby: ProviderSlot | None = None  # 热备位(start 里建),另一家,见 _promote
+        self.spare: ProviderSlot | None = None  # 备胎位(start 里建),同一家,判死后直接转正
+        # 崩溃循环检测:活跃 / 热备 / 备胎用同一个二进制,共用一个 provider 监护
+        self.provider_sup = SpawnSupervisor("provider", CRASHES)
+        self._prewake: asyncio.Task | None = None  # 闲置停机期间的提前拉起,见 _schedule_prewake
+        self.player_sup = SpawnSupervisor("player", CRASHES)
+        self.player_proc: asyncio.subprocess.Process | None = None
+        self.closing = False  # unload 中:子进程退出是我们关的,不再拉起
+        self.netwatch = NetWatch(self._net_reset)  # 挂起 / 换网检测,见 netwatch.py
+        # settings 写后落盘(见 store.py);save_settings 现取,测试可替换
+        self.store = SettingsStore(lambda: self.settings, lambda data: save_settings(data))
+        self.journal = QueueJournal(QUEUE_JOURNAL)
 
     async def start(self):
+        t0 = time.monotonic()
+        start_pipeline()  # 日志写盘挪到后台线程,见 log.py
         self.settings = load_settings()
-        self.provider = Conn("provider")
+        self.provider = Conn("provider", enc=protocol.SONG_COLUMNS)
         self.player = Conn("player")
         self.provider_proc: asyncio.subprocess.Process | None = None
         self.provider_which: str | None = None  # 当前已 spawn 的 provider
@@ -320,36 +932,56 @@ class Bridge:
             self.player,
             self.provider,
             self.settings.get("play_mode", "list_loop"),
-            persist=self._persist_queue,
+            journal=self.journal,
             radio_fetcher=self._radio_fetch,
             auth_retry=self._refresh_credential,
             quality=lambda: self.settings.get("quality", DEFAULT_QUALITY),
         )
         # 恢复上次的普通队列(只存了 id 类字段;不自动开播,见 QUEUE-BEHAVIOR §1.1)
-        self.playback.restore(self.settings.get("queue"))
+        self.playback.restore(self.journal.load() or self._migrate_queue())
+        self.standby = ProviderSlot("standby")
+        self.spare = ProviderSlot("spare")
         await self.provider.listen()
+        await self.standby.conn.listen()
+        await self.spare.conn.listen()
         await self.player.listen()
         self.player.on_event = self._on_player_event
-        self.provider.on_event = self._on_provider_event
-        self.provider.on_dead = self._provider_unresponsive
+        self.player.on_dead = self._player_unresponsive
+        self._wire_provider()
+        asyncio.create_task(self._provider_monitor())
+        asyncio.create_task(self.netwatch.run())
         log("bridge", "own", "info", f"started (dev={DEV})")
         # player 常驻:启动时即 spawn(注入 XDG_RUNTIME_DIR,见 _child_env)
         self.player_failed = False  # 启动失败态,get_playback 回灌给 UI(emit 易在前端 WS 未连时丢,#38)
         await self._spawn_player()
+        # qq-provider 目录包在后台先解好 / 按清单补缺(秒级),首次切到 QQ 不必现解
+        asyncio.create_task(self._prepare_qq())
         # 预设了 provider 就在加载时后台预拉起(不阻塞启动),省去 UI 首次 get_provider 的
         # spawn+连接延迟,避免面板闪一下"选源"再跳账号态。
         if self.settings.get("provider"):
             asyncio.create_task(self._ensure_provider(self.settings["provider"]))
         asyncio.create_task(self._credential_refresh_loop())
+        metrics.observe("bridge.start", time.monotonic() - t0)
+
+    async def _prepare_qq(self):
+        try:
+            await asyncio.to_thread(qq_exe)
+        except (OSError, tarfile.TarError) as e:
+            # 不在这里报 UI:真切到 QQ 时 _boot 会再试一次,失败照常报 provider_start_failed
+            log("bridge", "own", "warn", f"qq-provider prepare failed: {type(e).__name__}")
 
     async def _spawn_player(self):
         """player 常驻,启动即拉起。缺二进制(remote_binary 下载失败)不裸炸 _main:
         兜住 OSError + 给 UI 报 player_start_failed,否则整个后端起不来且 UI 无任何提示。
-        (provider 侧同款兜底见 _ensure_provider。)"""
+        (provider 侧同款兜底见 _ensure_provider。)中途退出由 _supervise_player 拉起。"""
         try:
-            await spawn("player", BIN("player"), "--socket", self.player.path)
+            proc = await spawn("player", BIN("player"), "--socket", self.player.path)
+            self.player_sup.started(proc, self.player.connected)
+            self.player_proc = proc
             self.player_failed = False
+            asyncio.create_task(self._supervise_player(proc))
         except OSError as e:
+            self.player_sup.failed("player_start_failed")
             self.player_failed = True
             log("bridge", "own", "error", f"player spawn failed: {type(e).__name__}")
             await decky.emit(
@@ -361,6 +993,39 @@ class Bridge:
                 },
             )
 
+    async def _supervise_player(self, proc):
+        """player 中途没了(解码 panic、ALSA 异常、判死被杀)就重新拉起:恢复音量,在播的话
+        重新解析当前曲并从中断处接上(Playback.player_lost + resume)。恢复耗时记
+        player.recovery,目标 PLAYER_RECOVERY_SLO_S 内;崩溃循环时按 player 监护退避。"""
+        code = await proc.wait()
+        if self.closing or proc is not self.player_proc:
+            return
+        t0 = time.monotonic()
+        metrics.inc("player.crashed")
+        was_playing = self.playback.player_lost()
+        log("bridge", "own", "error", f"player exited ({code}), respawning (was_playing={was_playing})")
+        wait = self.player_sup.backoff()
+        if wait:
+            await asyncio.sleep(wait)
+        await self._spawn_player()
+        try:
+            await asyncio.wait_for(self.player.connected.wait(), PLAYER_CONNECT_S)
+        except asyncio.TimeoutError:
+            log("bridge", "own", "error", "respawned player did not connect")
+            return  # 它若后来连上,按播放键照样走 resume 冷启动
+        await self.player.request("volume", {"val": self.settings.get("volume", 0.8)})
+        if was_playing:
+            await self.playback.resume()
+        secs = time.monotonic() - t0
+        metrics.observe("player.recovery", secs)
+        level = "warn" if secs > PLAYER_RECOVERY_SLO_S else "info"
+        log("bridge", "own", level, f"player recovered in {secs * 1000:.0f}ms")
+
+    def _player_unresponsive(self):
+        """player 判死(心跳丢失 / 通道超时):杀掉,由 _supervise_player 拉起接上。"""
+        log("bridge", "own", "warn", "player unresponsive, killing it for respawn")
+        stop_child(self.player_proc, hard=True)
+
     async def _refresh_credential(self) -> bool:
         """重注入当前凭证触发 provider 侧过期检测/刷新(QQ musickey 有效期撑不过长会话;
         NCM 无刷新概念,幂等无害)。返回是否真的刷新了(供播放失败重试判断值不值得再试)。"""
@@ -372,7 +1037,7 @@ class Bridge:
         new_cred = r.data.get("refreshed") if r.ok else None
         if new_cred:
             self.settings.setdefault("accounts", {})[which] = new_cred
-            save_settings(self.settings)
+            await self.store.save_now()
             log("bridge", "own", "info", f"{which} credential refreshed mid-session, persisted")
             return True
         return False
@@ -385,7 +1050,7 @@ class Bridge:
             try:
                 await self._refresh_credential()
             except Exception as e:
-                log("bridge", "own", "debug", f"credential refresh loop: {type(e).__name__}")
+                log("bridge", "own", "debug", "credential refresh loop: %s", type(e).__name__)
 
     def _provider_unresponsive(self):
         """provider 判死:直接杀掉,下一条命令会经 _ensure_provider 重开一个。
@@ -394,96 +1059,401 @@ class Bridge:
         自愈 —— issue #44 那次是 100% CPU 自旋在 niquests 的多路复用抽干循环里,连它
         自己的 15s 上游超时都跑不了。不杀的话之后每个操作都得先赔 30s,直到用户重启 Steam。
 
-        SIGKILL 而非 SIGTERM:卡死的进程未必还能体面退出。杀完不立刻重开,是因为下一条
-        命令自然会走 _ensure_provider(connected 已被 disconnect 清掉),省一次无谓 spawn。
+        SIGKILL 而非 SIGTERM:卡死的进程未必还能体面退出。备胎就绪时立刻转正(毫秒级,
+        在途的幂等请求随之重发过去);没有备胎则不立刻重开 —— 下一条命令自然会走
+        _ensure_provider(connected 已被 disconnect 清掉),省一次无谓 spawn。
         """
         if self.provider_proc is None or self.provider_proc.returncode is not None:
             return  # 已经在换了 / 已经没了:并发超时时这里会被连着调用好几次
         log("bridge", "own", "warn", "provider unresponsive, killing it for respawn")
         stop_child(self.provider_proc, hard=True)
         self.provider_proc = None
+        if self.spare is not None and self.spare.ready(self.provider_which):
+            asyncio.create_task(self._revive_provider())
+
+    def _on_breaker(self, breaker: Breaker):
+        """熔断状态变化:按当前 provider 汇总打开着的分级,汇总变了才推一条 provider/offline
+        事件 —— UI 据此挂一条「网络不可用」横幅、恢复时撤下,而不是每个失败请求各报一次。"""
+        log("bridge", "own", "info", f"{breaker.name} -> {breaker.state}")
+        session = self.provider.session
+        classes = sorted(
+            cls for (who, cls), b in self.provider.breakers.items() if who == session and b.state != CLOSED
+        )
+        if classes != self.offline:
+            self.offline = classes
+            asyncio.create_task(self._emit_offline())
+
+    async def _emit_offline(self):
+        data = {"offline": bool(self.offline), "classes": list(self.offline)}
+        await decky.emit("provider", {"ev": "provider", "type": "offline", "data": data})
+
+    async def _revive_provider(self) -> "Conn":
+        """Conn.revive:幂等命令在途时 provider 没了,重发前把它重新拉起(含重注入凭证)。
+        与 UI 的下一条命令走同一个 _ensure_provider,并发调用由 provider_lock 合成一次 spawn。
+        返回现在的活跃 Conn —— 备胎转正后它已不是发起重发的那个 Conn。"""
+        await self._ensure_provider(self.settings.get("provider"))
+        return self.provider
 
     async def _ensure_provider(self, which: str | None):
         """幂等:确保 which("qq"/"ncm"/None)对应的 provider 进程在运行。
-        同一时刻只有一个 provider;重复调用不重复 spawn(靠 provider_lock 串行化 + 存活检查)。"""
+        同一时刻只有一个活跃 provider;重复调用不重复 spawn(靠 provider_lock 串行化 + 存活检查)。
+        开了热备时,切到的正是热备那家就只把活跃 Conn 指过去(见 _promote),不冷启。"""
         async with self.provider_lock:
+            if which != self.provider_which and self.provider.breakers:
+                self.provider.reset_breakers()  # 熔断按 provider 计,换了源重新来过
+                if self.offline:
+                    self.offline = []
+                    await self._emit_offline()
             if which is None:
                 stop_child(self.provider_proc)
-                self.provider_proc = self.provider_which = None
+                self.provider_proc = self.provider_which = self.provider.session = None
                 self.provider_error = None
+                self.provider.parked = False
                 return
             alive = self.provider_proc is not None and self.provider_proc.returncode is None
             if self.provider_which == which and alive and self.provider.connected.is_set():
+                self._kick_slots()
                 return  # 已在运行同一 provider → 幂等返回,不重复 spawn
+            if which != self.provider_which and self._standby_wanted(which):
+                # 热备可能正在起的就是这家:等它起完直接接管,别再冷启第二份
+                async with self.standby.lock:
+                    if self.standby.ready(which):
+                        await self._promote(self.standby, keep=True)
+                        return
+            elif which == self.provider_which and self.spare is not None:
+                # 判死 / 崩溃后的重开:备胎就绪就直接转正,省掉整条 spawn + 连入
+                async with self.spare.lock:
+                    if self.spare.ready(which):
+                        await self._promote(self.spare, keep=False)
+                        return
             stop_child(self.provider_proc)  # 切换 provider / 顶掉判死的旧进程
             self.provider_proc = None
             self.provider_which = which
-            self.provider.connected.clear()
-            try:
-                # qq-provider 是 Nuitka standalone 目录包,正式安装落的是 tar.gz → 自解包
-                binpath = await asyncio.to_thread(qq_exe) if which == "qq" else BIN("ncm-provider")
-                self.provider_proc = await spawn("provider", binpath, "--socket", self.provider.path)
-            except (OSError, tarfile.TarError) as e:
-                # 解包/拉起失败不裸炸(曾致 UI"点了没反应"):落日志 + 给 UI 报错
-                self.provider_error = "provider_start_failed"
-                log("bridge", "own", "error", f"provider {which} spawn failed: {type(e).__name__}")
-                await decky.emit(
-                    "provider",
-                    {
-                        "ev": "provider",
-                        "type": "error",
-                        "data": {
-                            "code": "provider_start_failed",
-                            "message": "provider_start_failed",
-                        },
-                    },
-                )
-                return
-            # 等 provider 连入后注入已存 credential(provider 无状态,不自存;bridge 是唯一真相源)
-            try:
-                await asyncio.wait_for(self.provider.connected.wait(), timeout=10)
-            except asyncio.TimeoutError:
-                self.provider_error = "provider_start_timeout"
-                log("bridge", "own", "error", f"provider {which} startup timeout")
+            parked, t0 = self.provider.parked, time.monotonic()
+            self.provider_proc, code = await self._boot(self.provider, which)
+            if code:
+                self.provider_error = code
                 await decky.emit(
                     "provider",
-                    {
-                        "ev": "provider",
-                        "type": "error",
-                        "data": {
-                            "code": "provider_start_timeout",
-                            "message": "provider_start_timeout",
-                        },
-                    },
+                    {"ev": "provider", "type": "error", "data": {"code": code, "message": code}},
                 )
                 return
             self.provider_error = None  # connected 成功:provider 已起
-            cred = (self.settings.get("accounts") or {}).get(which)
-            if cred:
-                r = await self.provider.request("set_credential", {"cred": cred})
-                # provider 刷新了过期凭证 → 回传新凭证,持久化(下次注入用新的)。ncm 无此字段 → None
-                new_cred = r.data.get("refreshed") if r.ok else None
-                if new_cred:
-                    self.settings.setdefault("accounts", {})[which] = new_cred
-                    save_settings(self.settings)
-                    log("bridge", "own", "info", f"{which} credential auto-refreshed, persisted")
-                self._kick_seed_liked()
+            await self._inject_credential(self.provider, which)
+            if parked:
+                secs = time.monotonic() - t0
+                metrics.observe("provider.idle.respawn", secs)
+                log("bridge", "own", "info", f"provider {which} woke from idle in {secs * 1000:.0f}ms")
+            self._kick_slots()
+
+    async def _boot(
+        self, conn: Conn, which: str, sup: SpawnSupervisor | None = None
+    ) -> tuple[asyncio.subprocess.Process | None, str | None]:
+        """在 conn 的 socket 上拉起 which 并等它连入 → (进程, 失败 code)。不注入凭证、不报 UI。
+        启动超时的进程直接杀掉:留着它只会占内存,还会被当成「活过了观察期」洗掉崩溃连击。
+        sup:该位的监护(默认活跃方的);崩溃循环退避期内不拉起,直接回 provider_crash_loop。"""
+        sup = sup or self.provider_sup
+        wait = sup.backoff()
+        if wait:
+            log("bridge", "own", "debug", "provider %s crash loop, %.0fs left", which, wait)
+            return None, CRASH_LOOP
+        conn.session = which
+        conn.connected.clear()
+        t0 = time.monotonic()  # 含解包:冷启首开的耗时就看这个
+        try:
+            # qq-provider 是 Nuitka standalone 目录包,正式安装落的是 tar.gz → 自解包
+            binpath = await asyncio.to_thread(qq_exe) if which == "qq" else BIN("ncm-provider")
+            proc = await spawn("provider", binpath, "--socket", conn.path)
+        except (OSError, tarfile.TarError) as e:
+            # 解包/拉起失败不裸炸(曾致 UI"点了没反应"):落日志,由调用方决定要不要报 UI
+            log("bridge", "own", "error", f"provider {which} spawn failed: {type(e).__name__}")
+            sup.failed("provider_start_failed")
+            return None, "provider_start_failed"
+        sup.started(proc, conn.connected)
+        # 连入与退出谁先到等谁:一起就崩的进程不必干等满 PROVIDER_START_TIMEOUT
+        connected = asyncio.ensure_future(conn.connected.wait())
+        exited = asyncio.ensure_future(proc.wait())
+        await asyncio.wait((connected, exited), timeout=PROVIDER_START_TIMEOUT, return_when=asyncio.FIRST_COMPLETED)
+        connected.cancel()
+        exited.cancel()
+        if conn.connected.is_set():
+            metrics.observe(f"provider.{which}.boot", time.monotonic() - t0)
+            return proc, None
+        if proc.returncode is not None:  # 早退已由监护记一次短命
+            log("bridge", "own", "error", f"provider {which} exited during startup ({proc.returncode})")
+            return proc, "provider_start_failed"
+        log("bridge", "own", "error", f"provider {which} startup timeout")
+        stop_child(proc, hard=True)
+        sup.failed("provider_start_timeout")
+        return None, "provider_start_timeout"
+
+    async def _inject_credential(self, conn: Conn, which: str):
+        """连入后注入已存 credential(provider 无状态,不自存;bridge 是唯一真相源)。
+        活跃 provider 注入完顺带种红心。"""
+        cred = (self.settings.get("accounts") or {}).get(which)
+        if not cred:
+            return
+        r = await conn.request("set_credential", {"cred": cred})
+        # provider 刷新了过期凭证 → 回传新凭证,持久化(下次注入用新的)。ncm 无此字段 → None
+        new_cred = r.data.get("refreshed") if r.ok else None
+        if new_cred:
+            self.settings.setdefault("accounts", {})[which] = new_cred
+            await self.store.save_now()
+            log("bridge", "own", "info", f"{which} credential auto-refreshed, persisted")
+        if conn is self.provider:
+            self._kick_seed_liked()
+
+    def _wire_provider(self):
+        """事件 / 判死 / 熔断回调只装在活跃 provider 的 Conn 上;备用位的 Conn 判死只杀它自己。
+        revive 各 Conn 都留着:转正前在途的幂等请求要能经它重发到新的活跃方。"""
+        self.provider.rename("provider")
+        self.provider.on_event = self._on_provider_event
+        self.provider.on_dead = self._provider_unresponsive
+        self.provider.revive = self._revive_provider
+        self.provider.breaker_probe = ("search_hot", None)  # 两家都有、只读、响应小
+        self.provider.on_breaker = self._on_breaker
+        for slot in self._slots():
+            conn = slot.conn
+            conn.rename(slot.name)
+            conn.on_event = conn.breaker_probe = conn.on_breaker = None
+            conn.on_dead = lambda slot=slot: self._slot_unresponsive(slot)
+            conn.revive = self._revive_provider
+        self.playback.provider = self.provider
+
+    def _slots(self) -> list[ProviderSlot]:
+        """已建好的备用位(start 之前为空)。"""
+        return [slot for slot in (self.standby, self.spare) if slot is not None]
+
+    # ---- 热备(opt-in):另一家 provider 常驻、已登录、缓存热,切源只换指针 ----
+
+    def _standby_wanted(self, which: str | None) -> bool:
+        """which 值得热备:开关开着,且那家存过凭证(没登录过的源不值得常驻一个进程)。"""
+        if not self.settings.get("hot_standby") or which is None or self.standby is None:
+            return False
+        return bool((self.settings.get("accounts") or {}).get(which))
+
+    async def _promote(self, slot: ProviderSlot, keep: bool):
+        """备用位转正:活跃 Conn 与 slot 的 Conn 对调(连同进程与身份)。keep=True(热备)时旧的
+        活跃方还活着就留在 slot 里作新热备,切回来同样是瞬时的;备胎转正时旧的是判死的,直接清掉。
+        调用方持有 provider_lock 与 slot.lock。"""
+        t0 = time.monotonic()
+        # 旧 Conn 的熔断器连同探测任务作废(否则探测一直打在退下来的连接上),横幅跟着撤;
+        # 转正的进程从头计
+        self.provider.reset_breakers()
+        if self.offline:
+            self.offline = []
+            await self._emit_offline()
+        old = (self.provider, self.provider_proc, self.provider_which)
+        self.provider, self.provider_proc, self.provider_which = slot.conn, slot.proc, slot.which
+        slot.conn, slot.proc, slot.which = old
+        slot.used = time.monotonic()
+        if not (keep and self._standby_wanted(slot.which) and slot.ready(slot.which)):
+            slot.stop()
+        self._wire_provider()
+        self.provider_error = None
+        # 热备可能闲置了几小时、备胎从没注入过:注入一次(过期的 musickey 顺带刷新),热进程上是毫秒级往返
+        await self._inject_credential(self.provider, self.provider_which)
+        secs = time.monotonic() - t0
+        metrics.observe(f"provider.{slot.name}.promote", secs)
+        ms = secs * 1000
+        log("bridge", "own", "info", f"provider -> {self.provider_which} ({slot.name} promoted in {ms:.0f}ms)")
+        self._kick_slots()
+
+    def _touch_standby(self):
+        """用户切了源 / 刚开热备:闲置计时从现在算,闲置收掉的热备可以再补起。"""
+        if self.standby is not None:
+            self.standby.used, self.standby.idle = time.monotonic(), False
+
+    def _kick_slots(self):
+        """按需在后台补起热备 / 备胎(不阻塞调用方,也不占 provider_lock)。"""
+        if self.standby and self.settings.get("hot_standby") and not self.standby.lock.locked():
+            asyncio.create_task(self._fill_standby())
+        if self.spare and not self.spare.lock.locked():
+            asyncio.create_task(self._fill_spare())
+
+    async def _fill_spare(self):
+        """备胎:与活跃方同一家、已连入,但不注入凭证 —— 转正时再注入,免得两个进程各自刷新
+        同一份凭证。内存吃紧时不起(同热备的 STANDBY_MIN_AVAIL_MB)。"""
+        async with self.spare.lock:
+            slot, which = self.spare, self.provider_which
+            if which is None:
+                slot.stop()
+                return
+            if slot.ready(which):
+                return
+            avail = mem_available_mb()
+            if avail is not None and avail < STANDBY_MIN_AVAIL_MB:
+                log("bridge", "own", "info", f"spare provider skipped: {avail}MB available")
+                return
+            slot.stop()  # 换了源 / 半死的旧备胎
+            slot.which = which
+            slot.proc, code = await self._boot(slot.conn, which, slot.sup)
+            if code:
+                slot.stop()
+                return
+            log("bridge", "own", "info", f"spare {which} provider ready")
+
+    async def _fill_standby(self):
+        async with self.standby.lock:
+            slot = self.standby
+            other = next((p for p in PROVIDERS if p != self.provider_which), None)
+            if self.provider_which is None or not self._standby_wanted(other):
+                slot.stop()
+                return
+            if slot.idle or slot.ready(other):
+                return  # 闲置收掉的等用户再切源(_touch_standby)
+            avail = mem_available_mb()
+            if avail is not None and avail < STANDBY_MIN_AVAIL_MB:
+                log("bridge", "own", "info", f"hot standby skipped: {avail}MB available")
+                return
+            slot.stop()  # 身份不对 / 半死的旧热备
+            slot.which = other
+            slot.proc, code = await self._boot(slot.conn, other, slot.sup)
+            if code:
+                slot.stop()
+                return
+            await self._inject_credential(slot.conn, other)
+            log("bridge", "own", "info", f"hot standby {other} ready")
+
+    def _slot_unresponsive(self, slot: ProviderSlot):
+        log("bridge", "own", "warn", f"{slot.name} {slot.which} provider unresponsive, dropping it")
+        slot.stop(hard=True)
+
+    def _evict(self, slot: ProviderSlot) -> str | None:
+        """巡检:备用进程该收掉吗 → 原因(None = 留着)。预算说明见 STANDBY_*。
+        备胎是判死后的救命稻草,不按闲置收,只让着内存。"""
+        if slot.proc is None:
+            return None
+        if slot is self.standby:
+            if not self.settings.get("hot_standby"):
+                return "disabled"
+            if time.monotonic() - slot.used > STANDBY_IDLE_S:
+                return "idle"
+        rss = rss_mb(slot.proc.pid)
+        if rss is not None and rss > STANDBY_MAX_RSS_MB:
+            return f"rss {rss}MB"
+        avail = mem_available_mb()
+        if avail is not None and avail < STANDBY_MIN_AVAIL_MB:
+            return f"{avail}MB available"
+        return None
+
+    async def _provider_monitor(self):
+        """巡检:收掉超预算的备用进程;provider 闲置够久就整个停掉(见 _park_provider)。"""
+        while True:
+            await asyncio.sleep(STANDBY_CHECK_S)
+            for slot in self._slots():
+                if slot.lock.locked():
+                    continue  # 正在起:下一轮再看
+                reason = self._evict(slot)
+                if reason:
+                    log("bridge", "own", "info", f"{slot.name} {slot.which} provider evicted: {reason}")
+                    metrics.inc(f"provider.{slot.name}.evicted")
+                    slot.idle = reason == "idle"
+                    slot.stop()
+            if self._idle_due():
+                await self._park_provider()
+
+    # ---- 闲置停机:只在放歌、没人浏览时停掉 provider,下一条命令 / 下一首前懒拉起 ----
+
+    def _until_next(self) -> float:
+        """离当前曲播完还有几秒;没在播 / 不知道时长为 inf。"""
+        pb = self.playback
+        if not pb.playing or not 0 <= pb.index < len(pb.queue):
+            return float("inf")
+        duration = pb.queue[pb.index].get("duration") or 0
+        if not duration:
+            return float("inf")
+        return duration - pb.pos - max(0.0, time.time() - pb.wall / 1000)
+
+    def _idle_due(self) -> bool:
+        proc = self.provider_proc
+        return (
+            proc is not None
+            and proc.returncode is None
+            and not self.provider.pending
+            and not self.offline  # 熔断探测要用它
+            and time.monotonic() - self.provider.used_at > PROVIDER_IDLE_S
+            and self._until_next() > PROVIDER_PREWAKE_S  # 眼看就要切歌了,停了还得马上拉起
+        )
+
+    async def _park_provider(self):
+        """停掉闲置的 provider(连同热备 / 备胎)收回内存。Conn 标 parked:之后的请求发出前
+        经 revive 懒拉起,播放中则按 _schedule_prewake 赶在下一首之前拉起。"""
+        async with self.provider_lock:
+            if not self._idle_due():  # 等锁期间来了请求
+                return
+            procs = [self.provider_proc] + [slot.proc for slot in self._slots() if slot.proc]
+            mb = sum(rss_mb(proc.pid) or 0 for proc in procs)
+            self.provider.parked = True
+            self.provider.disconnect()  # 先断开:停机期间的请求直接走 _wake,不会发给将退出的进程
+            stop_child(self.provider_proc)
+            self.provider_proc = None
+            for slot in self._slots():
+                if not slot.lock.locked():
+                    slot.stop()
+            metrics.inc("provider.idle.parked")
+            metrics.inc("provider.idle.reclaimed_mb", mb)
+            log("bridge", "own", "info", f"provider idle, stopped ({mb}MB reclaimed)")
+        self._schedule_prewake()
+
+    def _schedule_prewake(self):
+        """provider 闲置停着时,赶在当前曲播完前 PROVIDER_PREWAKE_S 把它拉起;暂停 / 切歌时重排。"""
+        if self._prewake:
+            self._prewake.cancel()
+            self._prewake = None
+        left = self._until_next()
+        if self.provider.parked and left != float("inf"):
+            self._prewake = asyncio.create_task(self._prewake_provider(left - PROVIDER_PREWAKE_S))
+
+    async def _prewake_provider(self, delay: float):
+        await asyncio.sleep(max(0.0, delay))
+        if self.provider.parked:
+            metrics.inc("provider.idle.prewake")
+            # shield:下一条播放事件会重排(取消)本任务,拉起做到一半别被打断
+            await asyncio.shield(self._revive_provider())
+
+    async def _net_reset(self, reason: str):
+        """挂起 / 换网后:给在线的子进程(活跃 / 热备 / 备胎 provider + player)广播 net_reset,
+        各自丢掉连接池、预热新连接。停着的(parked)不发:拉起时本来就是新连接。
+        老版本 child 回 unknown_cmd,无害。"""
+        metrics.inc(f"net.reset.{reason}")
+        conns = [self.provider, *(slot.conn for slot in self._slots()), self.player]
+        live = [conn for conn in conns if conn.writer is not None]
+        self.provider.net_reset = True
+        resps = await asyncio.gather(*(conn.request("net_reset") for conn in live))
+        failed = [conn.name for conn, resp in zip(live, resps) if not resp.ok]
+        log("bridge", "own", "info", f"net reset ({reason}): {len(live)} children, failed={failed}")
+
+    async def get_hot_standby(self) -> bool:
+        return bool(self.settings.get("hot_standby"))
+
+    async def set_hot_standby(self, on: bool) -> bool:
+        """热备开关(默认关)。开:后台补起另一家;关:下一轮巡检收掉(这里直接收)。"""
+        self.settings["hot_standby"] = bool(on)
+        self.store.mark()
+        log("bridge", "own", "info", f"hot standby -> {bool(on)}")
+        if on:
+            self._touch_standby()
+            self._kick_slots()
+        elif not self.standby.lock.locked():
+            self.standby.stop()
+        return bool(on)
 
     def _kick_seed_liked(self):
         # 红心种子(P6):后台拉服务器已收藏 id 全集灌 liked_ids,跨会话点亮与服务器一致。
         # 双端 liked_ids 命令:NCM likelist 全量;QQ get_fav_song 大 num 一发拉全(quaverq 实证)。
         async def seed():
             try:
-                r = await self.provider.request("liked_ids")
+                r = await self.provider.request("liked_ids", coalesce=True, lane="background")
                 if r.ok:
                     ids = {str(i) for i in r.data.get("ids", []) if i}
                     self.liked_ids |= ids  # 合并,不覆盖本会话已点的
                     log("bridge", "own", "info", f"liked seed: {len(ids)} ids")
                 else:
                     code = r.error.code if r.error else "provider_error"
-                    log("bridge", "own", "debug", f"liked seed skipped: {code}")
+                    log("bridge", "own", "debug", "liked seed skipped: %s", code)
             except Exception as e:
-                log("bridge", "own", "debug", f"liked seed failed: {e}")
+                log("bridge", "own", "debug", "liked seed failed: %s", e)
 
         asyncio.create_task(seed())
 
@@ -491,8 +1461,9 @@ class Bridge:
         if self.settings.get("provider") != which:
             await self.playback.queue_clear()
             self.liked_ids.clear()  # 两家 id 体系不通用
+            self._touch_standby()
         self.settings["provider"] = which
-        save_settings(self.settings)
+        self.store.mark()
         await self._ensure_provider(which)
 
     async def get_provider(self) -> dict:
@@ -501,8 +1472,9 @@ class Bridge:
         which = self.settings.get("provider")
         await self._ensure_provider(which)
         logged_in = bool((self.settings.get("accounts") or {}).get(which))
-        log("bridge", "own", "debug", f"get_provider -> {which} loggedIn={logged_in}")
-        return {"provider": which, "loggedIn": logged_in, "error": self.provider_error}
+        log("bridge", "own", "debug", "get_provider -> %s loggedIn=%s", which, logged_in)
+        error = self.provider_error or (OFFLINE if self.offline else None)  # 熔断中也回灌,同 #38
+        return {"provider": which, "loggedIn": logged_in, "error": error}
 
     async def login(self, login_type: str | None = None):
         await self.provider.request("login", {"type": login_type})
@@ -511,27 +1483,28 @@ class Bridge:
         which = self.settings.get("provider")
         await self.provider.request("logout")
         (self.settings.get("accounts") or {}).pop(which, None)
-        save_settings(self.settings)
+        await self.store.save_now()
         await self.provider.request("set_credential", {"cred": None})
         log("bridge", "own", "info", f"{which} logged out")
 
     async def get_account(self) -> dict:
         # UI callable 返回沿用旧形状(账号字段平铺);失败回空对象,前端按空账号渲染。
-        r = await self.provider.request("account")
+        r = await self.provider.request("account", coalesce=True)
         return r.data if r.ok else {}
 
-    def _persist_queue(self, items: list, index: int):
-        # 队列落盘:id 类字段 + 展示字段(恢复后浮层/徽章直接是真名字真封面),
-        # 白名单键,绝不存解析出的播放 URL(限时 vkey)
-        keys = ("id", "media_mid", "name", "singer", "cover", "duration")
-        self.settings["queue"] = {
-            "items": [{k: x.get(k, "") for k in keys} for x in items],
-            "index": index,
-        }
-        save_settings(self.settings)
+    def _migrate_queue(self) -> dict | None:
+        """老版本把队列存在 settings["queue"]:挪进队列日志,settings 里删掉。"""
+        saved = self.settings.pop("queue", None)
+        if not isinstance(saved, dict) or not isinstance(saved.get("items"), list):
+            return None
+        self.journal.replace(saved["items"], saved.get("index", 0))
+        self.store.mark()
+        log("bridge", "own", "info", f"queue migrated to journal ({len(saved['items'])} items)")
+        return saved
 
     async def _radio_fetch(self, kind: str) -> list[dict]:
-        r = await self.provider.request("radio_fetch", {"kind": kind})
+        # 只给 playback 的补货用(开播走 play_radio):后台道,不跟前台抢名额
+        r = await self.provider.request("radio_fetch", {"kind": kind}, lane="background")
         if not r.ok:
             code = r.error.code if r.error else "provider_error"
             log("bridge", "own", "warn", f"radio_fetch failed kind={kind}: {code}")
@@ -577,7 +1550,7 @@ class Bridge:
 
     async def get_comments(self, song_id: str) -> dict:
         # 热评(P5f;NCM 专属命令,QQ 调用会得 unknown_cmd → 空列表 + error)
-        r = await self.provider.request("comments", {"id": song_id, "limit": 30})
+        r = await self.provider.request("comments", {"id": song_id, "limit": 30}, coalesce=True)
         if r.ok:
             return {"ok": True, "comments": r.data.get("comments", [])}
         return {"ok": False, "comments": [], "error": r.error.code if r.error else "provider_error"}
@@ -585,16 +1558,17 @@ class Bridge:
     # ---- 我的资产(P5e;provider 命令两端已就绪,此处透传) ----
 
     async def get_user_assets(self) -> dict:
-        r = await self.provider.request("user_assets")
+        r = await self.provider.request("user_assets", coalesce=True)
         if r.ok:
             return {"ok": True, **r.data}
         return {"ok": False, "error": r.error.code if r.error else "provider_error"}
 
     async def _list_cmd(self, cmd: str, key: str, limit: int = 50, extra: dict | None = None) -> dict:
         # 列表类命令统一形状:{ok, <key>: [...], error?}。首页 50 条(翻页 P6)
-        r = await self.provider.request(cmd, {"limit": limit, **(extra or {})})
+        r = await self.provider.request(cmd, {"limit": limit, **(extra or {})}, coalesce=True)
         if r.ok:
-            return {"ok": True, key: r.data.get(key, [])}
+            items = r.data.get(key, [])
+            return {"ok": True, key: protocol.decode_songs(items) if key == "songs" else items}
         code = r.error.code if r.error else "provider_error"
         detail = r.error.message if r.error else ""
         # 失败必落日志(UI 只有 error banner,无迹可查的瞬时抖动全靠这里定位)
@@ -623,9 +1597,9 @@ class Bridge:
     # ---- 歌手/专辑详情(P6):双端 {artist|album, songs} ----
 
     async def _detail_cmd(self, cmd: str, item_id: str) -> dict:
-        r = await self.provider.request(cmd, {"id": item_id, "limit": 50})
+        r = await self.provider.request(cmd, {"id": item_id, "limit": 50}, coalesce=True)
         if r.ok:
-            return {"ok": True, **r.data}
+            return {"ok": True, **r.data, "songs": protocol.decode_songs(r.data.get("songs", []))}
         code = r.error.code if r.error else "provider_error"
         detail = r.error.message if r.error else ""
         log("bridge", "own", "warn", f"{cmd} failed id={item_id}: {code} {detail}")
@@ -683,6 +1657,32 @@ class Bridge:
     async def play_queue(self, items: list, start_index: int = 0):
         await self.playback.play_queue(items, start_index)
 
+    async def play_all(self, kind: str, item_id: str = "") -> dict:
+        """整单播放(歌单 / 我喜欢):经流式请求一次取全,不受前端已翻到第几页限制。
+        kind:"playlist"(item_id = 歌单 id)| "fav"。失败带稳定 error code 供前端 i18n。"""
+        if kind == "playlist":
+            songs, code = await self._fetch_all("playlist_all", {"id": item_id})
+        elif kind == "fav":
+            songs, code = await self._fetch_all("fav_songs_all", {})
+        else:
+            return {"ok": False, "error": "invalid_request"}
+        items = _songs_to_items(songs)
+        if code or not items:
+            return {"ok": False, "error": code or "no_results"}
+        await self.playback.play_queue(items, 0)
+        return {"ok": True, "count": len(items)}
+
+    async def _fetch_all(self, cmd: str, args: dict) -> tuple[list, str]:
+        """收齐一个流式列表命令的全部 partial → (songs, 错误码;成功为 "")。"""
+        songs: list = []
+        async for r in self.provider.request_stream(cmd, args):
+            if not r.ok:
+                code = r.error.code if r.error else "provider_error"
+                log("bridge", "own", "warn", f"{cmd} failed after {len(songs)} songs: {code}")
+                return songs, code
+            songs.extend(protocol.iter_songs(r.data.get("songs", [])))  # 终帧只带 total,没有 songs
+        return songs, ""
+
     async def get_playback(self) -> dict:
         # 前端挂载回灌:bridge 是播放/队列真相源(见 playback.snapshot);音量归 bridge 持久化
         return {
@@ -716,6 +1716,28 @@ class Bridge:
     async def get_cache_size(self) -> int:
         return log_dir_size()
 
+    async def dump_diagnostics(self) -> str:
+        """把各进程的 debug 环 + 指标 + 崩溃环写进日志目录的一个文件,返回文件名(附在反馈里)。
+        child 的环经 dump_debug 取(读循环里直接回);没起的不问,老版本回 unknown_cmd 的记一行原因。"""
+        conns = [self.provider, *(slot.conn for slot in self._slots()), self.player]
+        live = [conn for conn in conns if conn.writer is not None]
+        resps = await asyncio.gather(*(conn.request("dump_debug") for conn in live))
+        sups = (self.provider_sup, *(slot.sup for slot in self._slots()), self.player_sup)
+        crashes = [f"{sup.name} {json.dumps(r, ensure_ascii=False)}" for sup in sups for r in sup.ring]
+        sections = [
+            ("metrics", [metrics.summary()]),
+            ("crashes", crashes),
+            ("bridge", format_records(dump_ring())),
+        ]
+        for conn, resp in zip(live, resps):
+            if resp.ok:
+                sections.append((conn.name, format_records(resp.data.get("records", []))))
+            else:
+                sections.append((conn.name, [f"unavailable: {resp.error.code if resp.error else 'error'}"]))
+        name = await asyncio.to_thread(write_diagnostics, sections)
+        log("bridge", "own", "info", f"diagnostics dumped: {name} ({len(live)} children)")
+        return name
+
     async def clear_data(self) -> None:
         """恢复出厂:登出当前源 → 停播清队列 → settings 归默认并落盘。
         不碰 bin/(那是程序不是数据,删了不可恢复)。凭证/URL 不进日志(红线)。"""
@@ -726,6 +1748,8 @@ class Bridge:
                 await self.provider.request("set_credential", {"cred": None})
             except Exception as e:
                 log("bridge", "own", "warn", f"clear_data logout skipped: {type(e).__name__}")
+        if self.standby:  # 热备进程内存里还有另一家的凭证:直接停掉
+            self.standby.stop()
         try:  # 停 player + 清队列(会落盘,随后被覆盖);player 未连时 stop 会抛,不能挡住数据清除
             await self.playback.queue_clear()
         except Exception as e:
@@ -743,7 +1767,7 @@ class Bridge:
             await self.player.request("volume", {"val": 0.8})  # 同步 player 音量到默认
         except Exception:
             pass
-        save_settings(self.settings)
+        await self.store.save_now()
         log("bridge", "own", "info", "user data cleared")
 
     async def next_track(self):
@@ -755,7 +1779,7 @@ class Bridge:
     async def set_play_mode(self, mode: str):
         if self.playback.set_play_mode(mode):
             self.settings["play_mode"] = mode  # 播放模式归 bridge 持久化
-            save_settings(self.settings)
+            self.store.mark()
             await self.playback.push_current_meta()  # 同步 MPRIS LoopStatus/Shuffle
 
     async def get_quality(self) -> str:
@@ -770,7 +1794,7 @@ class Bridge:
         if quality not in QUALITIES:
             return self.settings.get("quality", DEFAULT_QUALITY)
         self.settings["quality"] = quality
-        save_settings(self.settings)
+        self.store.mark()
         log("bridge", "own", "info", f"quality cap -> {quality}")
         return quality
 
@@ -785,17 +1809,17 @@ class Bridge:
 
     async def volume(self, val: float):
         self.settings["volume"] = val  # 音量 bridge 持久化 + 直接下发 player
-        save_settings(self.settings)
+        self.store.mark()
         await self.player.request("volume", {"val": val})
 
     async def get_lyric(self, mid: str) -> dict:
         # 透传 provider 归一化歌词;失败回空歌词(前端显示占位,不报错)
-        r = await self.provider.request("lyric", {"id": mid})
+        r = await self.provider.request("lyric", {"id": mid}, coalesce=True)
         return r.data if r.ok else {"word_by_word": False, "lines": []}
 
     async def get_recommend(self) -> dict:
         # 推荐页数据(QQ);失败回空列表,UI 渲染可恢复空态
-        r = await self.provider.request("recommend")
+        r = await self.provider.request("recommend", coalesce=True)
         return r.data if r.ok else {"playlists": [], "newsongs": []}
 
     async def get_toplists(self) -> dict:
@@ -811,14 +1835,14 @@ class Bridge:
 
     async def get_discover(self) -> dict:
         # NCM 发现页;失败回空列表
-        r = await self.provider.request("discover")
+        r = await self.provider.request("discover", coalesce=True)
         return r.data if r.ok else {"playlists": []}
 
     async def get_daily_songs(self) -> dict:
         # NCM 每日推荐(需登录);失败带 error code 供前端 i18n(not_logged_in 等)
-        r = await self.provider.request("daily_songs")
+        r = await self.provider.request("daily_songs", coalesce=True)
         if r.ok:
-            return {"ok": True, "songs": r.data.get("songs", [])}
+            return {"ok": True, "songs": protocol.decode_songs(r.data.get("songs", []))}
         return {"ok": False, "songs": [], "error": r.error.code if r.error else "provider_error"}
 
     async def _on_player_event(self, ev: protocol.ChildEvent):
@@ -829,6 +1853,8 @@ class Bridge:
             await self._handle_mpris_control(ev.data)
             return
         await self.playback.on_player_event(ev)
+        if ev.type in ("playing", "paused", "ended"):
+            self._schedule_prewake()
 
     async def _handle_mpris_control(self, data: dict):
         action = data.get("action")
@@ -867,7 +1893,7 @@ class Bridge:
         if ev.ev == "login" and ev.type == "done":
             which = self.settings.get("provider")
             self.settings.setdefault("accounts", {})[which] = ev.data.get("cred")
-            save_settings(self.settings)
+            await self.store.save_now()
             log("bridge", "own", "info", f"{which} login success, credential persisted")
             self._kick_seed_liked()
             await decky.emit("login", {"ev": "login", "type": "done", "data": {}})
@@ -878,7 +1904,15 @@ class Bridge:
 
     async def unload(self):
         log("bridge", "own", "info", "unload: closing subprocesses and sockets")
+        self.closing = True
+        await self.store.flush()
+        log("bridge", "own", "info", self.store.summary())
+        log("bridge", "own", "info", f"session metrics: {metrics.summary()}")
         if self.provider_proc:
             self.provider_proc.terminate()
         await self.provider.close()
+        for slot in self._slots():
+            slot.stop()
+            await slot.conn.close()
         await self.player.close()
+        stop_pipeline()  # 排空日志队列:关机前最后几行不丢
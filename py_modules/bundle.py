@@ -0,0 +1,98 @@
+"""qq-provider 目录包:解包、完整性清单、按清单补缺。
+
+Nuitka standalone 是目录包(tar.gz),remote_binary 安装时 Decky 只把资产原样存成
+bin/qq-provider 文件。解包后归档留在 bin/qq-provider.tar.gz,并写一份清单(每个文件的
+大小 + sha256)。之后每次启动只按清单 stat 一遍(便宜,不读内容),缺了 / 大小不对的
+文件从归档里单独补回,不重解整包;补回的按清单里的 sha256 复核。
+全部阻塞,bridge 走 asyncio.to_thread。只用 stdlib。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+
+TOP = "qq-provider"  # 归档顶层目录名,也是可执行文件名(build-qq-provider.sh)
+
+
+def unpack(src: str, bin_dir: str, archive: str, manifest: str) -> dict:
+    """把归档 src 解成 bin_dir/qq-provider/,归档挪到 archive 留作补缺来源,写清单。返回清单。"""
+    tmp = os.path.join(bin_dir, ".qq-unpack")
+    shutil.rmtree(tmp, ignore_errors=True)
+    with tarfile.open(src) as tf:
+        tf.extractall(tmp)  # 顶层即 qq-provider/ 目录
+    top = os.path.join(tmp, TOP)
+    os.chmod(os.path.join(top, TOP), 0o755)
+    files = build(top)
+    # 目录顶掉同名 tar 文件:归档先挪开(不删,日后补缺要用),目录再就位;中途失败不丢归档
+    if src != archive:
+        os.replace(src, archive)
+    os.rename(top, os.path.join(bin_dir, TOP))
+    os.rmdir(tmp)
+    save(manifest, files)
+    return files
+
+
+def build(tree: str) -> dict:
+    """{相对路径: [大小, sha256]},只收普通文件。"""
+    files = {}
+    for root, _dirs, names in os.walk(tree):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.isfile(path) and not os.path.islink(path):
+                files[os.path.relpath(path, tree)] = [os.path.getsize(path), _sha256(path)]
+    return files
+
+
+def check(tree: str, files: dict) -> list[str]:
+    """按清单 stat:缺失或大小不符的相对路径(不读内容,几百个文件也是毫秒级)。"""
+    bad = []
+    for rel, (size, _digest) in files.items():
+        try:
+            if os.path.getsize(os.path.join(tree, rel)) != size:
+                bad.append(rel)
+        except OSError:
+            bad.append(rel)
+    return bad
+
+
+def repair(archive: str, bin_dir: str, files: dict, bad: list[str]) -> list[str]:
+    """从归档里只解出 bad 这些文件,按清单 sha256 复核,返回仍然不对的。归档缺失 / 损坏时抛
+    OSError / TarError。"""
+    wanted = {f"{TOP}/{rel}": rel for rel in bad}
+    with tarfile.open(archive) as tf:
+        for member in tf.getmembers():
+            if member.name in wanted:
+                tf.extract(member, bin_dir)
+    tree = os.path.join(bin_dir, TOP)
+    still = []
+    for rel in bad:
+        path = os.path.join(tree, rel)
+        if not os.path.isfile(path) or _sha256(path) != files[rel][1]:
+            still.append(rel)
+    return still
+
+
+def load(manifest: str) -> dict | None:
+    try:
+        with open(manifest, encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("files") if isinstance(data, dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def save(manifest: str, files: dict):
+    tmp = manifest + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"v": 1, "files": files}, f, separators=(",", ":"))
+    os.replace(tmp, manifest)
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
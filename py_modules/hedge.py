@@ -0,0 +1,87 @@
+"""对冲请求(hedged request):第一发迟迟不回时补发一发相同请求,取先成功的,取消另一发。
+
+只给开播关键路径上的 song_url 用:上游单次往返偶尔卡十几秒,而重发一次通常秒回。
+补发时机 = 近期观测延迟的分位数(HEDGE_PERCENTILE);补发受全局预算约束(每发请求攒
+HEDGE_BUDGET 个令牌,补发花 1 个,最多攒 HEDGE_BURST 个),整体多出的请求不超过约 5%,
+不会把 QQ vkey 接口的压力翻倍。只用 stdlib,Conn 走鸭子类型(request(cmd, args))。
+"""
+
+import asyncio
+import time
+from collections import deque
+
+import metrics
+
+HEDGE_PERCENTILE = 0.9  # 超过近期 p90 还没回才补发
+HEDGE_BUDGET = 0.05  # 补发请求占总请求的上限比例
+HEDGE_BURST = 2.0  # 令牌上限:闲置很久之后也最多连着补发这么多次
+HEDGE_MIN_DELAY = 0.25  # 补发时机下限(秒):p90 很小时别为几十毫秒的抖动补发
+HEDGE_MIN_SAMPLES = 10  # 样本不够时分位数没意义,不补发
+HEDGE_WINDOW = 64  # 只看最近这么多次成功请求的延迟
+
+
+class Hedger:
+    def __init__(self, name: str):
+        self.name = name  # 指标前缀,如 "song_url"
+        self._samples: deque[float] = deque(maxlen=HEDGE_WINDOW)
+        self._tokens = 0.0
+
+    def delay(self) -> float | None:
+        """补发时机(秒);样本不足返回 None(不补发)。"""
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return max(HEDGE_MIN_DELAY, ordered[int(HEDGE_PERCENTILE * (len(ordered) - 1))])
+
+    def _take(self) -> bool:
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def _timed(self, conn, cmd: str, args: dict | None) -> asyncio.Future:
+        """发一发请求;成功的记入延迟样本(被取消的输家不记)。"""
+        t0 = time.monotonic()
+        fut = asyncio.ensure_future(conn.request(cmd, args))
+
+        def done(f: asyncio.Future):
+            if not f.cancelled() and f.exception() is None and f.result().ok:
+                self._samples.append(time.monotonic() - t0)
+
+        fut.add_done_callback(done)
+        return fut
+
+    async def request(self, conn, cmd: str, args: dict | None = None):
+        """同 conn.request,但第一发超过 delay() 未回时(预算允许)补发一发。
+
+        先回的成功响应胜出;一发失败而另一发还在途时继续等它(通道级 timeout 除外)。
+        都失败则回最后那个失败。
+        本协程被取消 / 返回时,在途的那发一并取消(Conn 随之给 child 发 cancel 帧)。"""
+        self._tokens = min(HEDGE_BURST, self._tokens + HEDGE_BUDGET)
+        pending = {self._timed(conn, cmd, args)}
+        tasks, hedge = set(pending), None
+        try:
+            wait = self.delay()
+            if wait is not None:
+                done, _ = await asyncio.wait(pending, timeout=wait)
+                if not done and self._take():
+                    metrics.inc(f"{self.name}.hedged")
+                    hedge = self._timed(conn, cmd, args)
+                    pending.add(hedge)
+                    tasks.add(hedge)
+            last = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for f in done:
+                    last = f.result()
+                    if last.ok:
+                        if f is hedge:
+                            metrics.inc(f"{self.name}.hedge_won")
+                        return last
+                    if last.error and last.error.code == "timeout":
+                        return last  # 通道级超时 = 子进程整体不响应,另一发也等不来
+            return last
+        finally:
+            for f in tasks:
+                if not f.done():
+                    f.cancel()
@@ -0,0 +1,124 @@
+"""普通队列的追加式日志,独立于 settings.json。
+
+原来每次切歌都把整个队列(可达上千首)连同 cookie、偏好一起重写进 settings.json,只为改一个
+index。现在队列单独一个文件,JSON Lines:
+
+    {"v":1,"items":[...],"index":3}     第一行:快照
+    {"op":"set_index","i":4}            之后:追加的操作
+    {"op":"insert","at":5,"item":{...}}
+    {"op":"remove","at":2}
+
+切歌只追加一行 set_index(几十字节);插入 / 删除各一行。整队替换(play_queue / 清空)直接
+重写快照,顺带清掉操作;操作攒过 COMPACT_OPS 行也按内存镜像重写一次快照。快照走
+tmp + os.replace,与 settings.json 原来的写法同样原子;追加的最后一行若因崩溃只写了半截,
+回放时丢掉它(至多丢最后一个操作),下一次写先重写快照把它盖掉。阻塞写都很小,直接在事件循环里做。只用 stdlib。
+"""
+
+import json
+import os
+
+from log import log
+
+COMPACT_OPS = 256
+# 白名单键:id 类字段 + 展示字段(恢复后浮层 / 徽章直接是真名字真封面),
+# 绝不存解析出的播放 URL(限时 vkey)
+KEYS = ("id", "media_mid", "name", "singer", "cover", "duration")
+
+
+def _brief(item: dict) -> dict:
+    return {k: item.get(k, "") for k in KEYS}
+
+
+def _apply(items: list, index: int, op: dict) -> int:
+    """把一条操作作用到 (items, index) 上,返回新 index。与 Playback 里对应编辑的下标规则一致。"""
+    kind = op.get("op")
+    if kind == "set_index":
+        return int(op["i"])
+    if kind == "insert":
+        at = int(op["at"])
+        items.insert(at, op["item"])
+        return index + 1 if at <= index else index
+    if kind == "remove":
+        at = int(op["at"])
+        del items[at]
+        return index - 1 if at < index else index
+    raise ValueError(kind)
+
+
+class QueueJournal:
+    def __init__(self, path: str):
+        self.path = path
+        self.items: list[dict] = []  # 内存镜像:压缩时据此重写快照,不必回读文件
+        self.index = -1
+        # 快照之后追加了几行;None = 文件里还没有与镜像对齐的快照,下一次写先重写快照
+        self.ops: int | None = None
+
+    def load(self) -> dict | None:
+        """回放快照 + 操作,返回 {"items", "index"}(Playback.restore 的入参);没有日志时 None。"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return None
+        try:
+            head = json.loads(lines[0])
+            items, index = list(head["items"]), int(head["index"])
+        except (IndexError, ValueError, KeyError, TypeError):
+            log("bridge", "own", "warn", "queue journal snapshot unreadable, starting empty")
+            return None
+        ops: int | None = 0
+        for line in lines[1:]:
+            try:
+                index = _apply(items, index, json.loads(line))
+            except (ValueError, KeyError, TypeError, IndexError):
+                log("bridge", "own", "warn", f"queue journal: dropped bad op after {ops} ops")
+                # 半截的尾行(写到一半崩溃):之前的都算数。文件尾不再以完整行结束,
+                # 下一次写不能接着追加(会粘在半截行上、回放时一起丢),得先重写快照
+                ops = None
+                break
+            ops += 1
+        self.items, self.index, self.ops = items, index, ops
+        return {"items": items, "index": index}
+
+    def replace(self, items: list, index: int):
+        """整队替换:重写快照(也是压缩)。"""
+        self.items, self.index = [_brief(x) for x in items], index
+        self._snapshot()
+
+    def set_index(self, i: int):
+        if i != self.index:
+            self.index = i
+            self._append({"op": "set_index", "i": i})
+
+    def insert(self, at: int, item: dict):
+        item = _brief(item)
+        self.index = _apply(self.items, self.index, {"op": "insert", "at": at, "item": item})
+        self._append({"op": "insert", "at": at, "item": item})
+
+    def remove(self, at: int):
+        self.index = _apply(self.items, self.index, {"op": "remove", "at": at})
+        self._append({"op": "remove", "at": at})
+
+    def _append(self, op: dict):
+        if self.ops is None or self.ops >= COMPACT_OPS:
+            self._snapshot()
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self.ops += 1
+        except OSError as e:
+            self.ops = None  # 文件落后于镜像了:下一次写整体重写快照
+            log("bridge", "own", "warn", f"queue journal append failed: {type(e).__name__}")
+
+    def _snapshot(self):
+        tmp = self.path + ".tmp"
+        head = {"v": 1, "items": self.items, "index": self.index}
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json.dumps(head, ensure_ascii=False, separators=(",", ":")) + "\n")
+            os.replace(tmp, self.path)
+            self.ops = 0
+        except OSError as e:
+            log("bridge", "own", "warn", f"queue journal snapshot failed: {type(e).__name__}")
@@ -5,9 +5,14 @@
 """
 
 import logging
+import logging.handlers
 import os
+import queue
+import time
+from collections import deque
 
 import decky
+import metrics
 
 # dev/release 判定:deploy.sh 侧载时在插件目录 touch dev_mode;release 的 zip 不含它。
 DEV = os.path.exists(os.path.join(decky.DECKY_PLUGIN_DIR, "dev_mode"))
@@ -16,11 +21,114 @@ decky.logger.setLevel(logging.DEBUG if DEV else logging.INFO)
 
 _LEVELS = {"debug": logging.DEBUG, "info": logging.INFO, "warn": logging.WARNING, "error": logging.ERROR}
 
-
-def log(source: str, origin: str, level: str, msg: str):
+# 子进程转发来的日志(socket / stderr)按 source 各一个令牌桶限流:panic 循环或 debug 模式下
+# 逐条命令打日志的 child 不能把 bridge 拖进写日志里。每秒补 CHILD_RATE 条,最多攒 CHILD_BURST 条;
+# 被丢的条数在该 source 下一条放行的日志前补一行「N messages suppressed」,unload 时也补。
+# bridge 自己的日志(own)不限。
+CHILD_RATE = 20.0
+CHILD_BURST = 200
+_buckets: dict[str, list] = {}  # source → [令牌, 上次补充时刻, 已丢条数]
+# 写盘走后台线程(start_pipeline 后):事件循环里只格式化 + 入队,文件 I/O 在 QueueListener 里
+_pipeline: tuple[logging.handlers.QueueListener, logging.Handler, list, bool] | None = None
+# release 下被过滤掉的 debug 不丢,原样(不格式化)进定长环;dump_diagnostics 时才拼成文本。
+# 各 child 各有一个同样的环(qq-provider 的 log.py、Rust 的 wire::DebugRing),经 dump_debug 取回。
+DEBUG_RING = 512
+_ring: deque = deque(maxlen=DEBUG_RING)  # (epoch 秒, source, origin, msg, args)
+
+
+def log(source: str, origin: str, level: str, msg: str, *args):
     """source ∈ bridge|player|provider;origin ∈ own|socket|stderr;
-    level ∈ debug(仅 dev)|info|warn|error。"""
-    decky.logger.log(_LEVELS.get(level, logging.INFO), "[%s·%s] %s", source, origin, msg)
+    level ∈ debug(dev 落盘,release 进环)|info|warn|error。
+    msg 可带 %-占位符,args 惰性填入(同 logging):热路径上的 debug 在 release 下只是一次入环。"""
+    lvl = _LEVELS.get(level, logging.INFO)
+    if not decky.logger.isEnabledFor(lvl):
+        if lvl == logging.DEBUG:  # release 的 debug:不格式化、不占令牌,只入环
+            _ring.append((time.time(), source, origin, msg, args))
+        return
+    if args:
+        msg = _fmt(msg, args)
+    if origin == "own":
+        decky.logger.log(lvl, "[%s·%s] %s", source, origin, msg)
+        return
+    t0 = time.perf_counter()
+    if _admit(source):
+        decky.logger.log(lvl, "[%s·%s] %s", source, origin, msg)
+    metrics.observe("log.forward", time.perf_counter() - t0)  # 每条转发在事件循环上的开销
+
+
+def _fmt(msg: str, args: tuple) -> str:
+    if not args:
+        return msg
+    try:
+        return msg % args
+    except (TypeError, ValueError):
+        return f"{msg} {args!r}"
+
+
+def dump_ring() -> list[list]:
+    """bridge 自己的环,格式与 child 的 dump_debug 回包相同:[[epoch 毫秒, where, msg], ...]。"""
+    return [[int(at * 1000), f"{source}·{origin}", _fmt(msg, args)] for at, source, origin, msg, args in _ring]
+
+
+def _admit(source: str) -> bool:
+    now = time.monotonic()
+    bucket = _buckets.get(source)
+    if bucket is None:
+        bucket = _buckets[source] = [CHILD_BURST, now, 0]
+    bucket[0] = min(CHILD_BURST, bucket[0] + (now - bucket[1]) * CHILD_RATE)
+    bucket[1] = now
+    if bucket[0] < 1:
+        bucket[2] += 1
+        metrics.inc(f"log.suppressed.{source}")
+        return False
+    bucket[0] -= 1
+    if bucket[2]:
+        _report_suppressed(source, bucket)
+    return True
+
+
+def _report_suppressed(source: str, bucket: list):
+    decky.logger.warning("[%s·own] %d messages suppressed (rate limit)", source, bucket[2])
+    bucket[2] = 0
+
+
+def start_pipeline():
+    """把 decky.logger 的写盘挪到后台线程:原 handler(自己没有就用 root 的)交给 QueueListener,
+    logger 上只挂一个 QueueHandler。bridge 启动时调;不调则照旧同步写(测试 / 工具脚本)。"""
+    global _pipeline
+    if _pipeline is not None:
+        return
+    own = list(decky.logger.handlers)
+    targets = own or logging.getLogger().handlers[:]
+    if not targets:
+        return
+    q = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(q, *targets, respect_handler_level=True)
+    handler = logging.handlers.QueueHandler(q)
+    for h in own:
+        decky.logger.removeHandler(h)
+    propagate = decky.logger.propagate
+    decky.logger.propagate = bool(own) and propagate  # 借 root 的 handler 时别再冒泡写第二遍
+    decky.logger.addHandler(handler)
+    listener.start()
+    _pipeline = (listener, handler, own, propagate)
+
+
+def stop_pipeline():
+    """unload:补报各 source 还没报的丢弃条数,排空队列,handler 原样挂回。"""
+    global _pipeline
+    for source, bucket in _buckets.items():
+        if bucket[2]:
+            _report_suppressed(source, bucket)
+    if _pipeline is None:
+        return
+    listener, handler, own, propagate = _pipeline
+    _pipeline = None
+    decky.logger.removeHandler(handler)
+    listener.stop()  # 写完队列里剩下的再返回
+    for h in own:
+        decky.logger.addHandler(h)
+    decky.logger.propagate = propagate
 
 
 async def pump_stderr(source: str, stream):
@@ -71,3 +179,23 @@ def clear_logs() -> int:
 
 def log_dir_size() -> int:
     return dir_size(decky.DECKY_PLUGIN_LOG_DIR)
+
+
+def format_records(records: list) -> list[str]:
+    """dump_ring / child dump_debug 的 [[epoch 毫秒, where, msg], ...] → 可读行。"""
+    return [
+        f"{time.strftime('%H:%M:%S', time.localtime(ms / 1000))}.{int(ms) % 1000:03d} [{where}] {msg}"
+        for ms, where, msg in records
+    ]
+
+
+def write_diagnostics(sections: list[tuple[str, list[str]]]) -> str:
+    """各节写进日志目录下的 diagnostics-<时刻>.log,返回文件名。阻塞,调用方放线程里跑。
+    放日志目录:随「清理缓存」一起清,占用也计进缓存大小。"""
+    name = time.strftime("diagnostics-%Y%m%d-%H%M%S.log")
+    with open(os.path.join(decky.DECKY_PLUGIN_LOG_DIR, name), "w", encoding="utf-8") as f:
+        for title, lines in sections:
+            f.write(f"== {title} ==\n")
+            f.writelines(line + "\n" for line in lines)
+            f.write("\n")
+    return name
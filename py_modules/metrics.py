@@ -0,0 +1,52 @@
+"""bridge 进程内指标:计数器 + 耗时观测。只在内存里,unload 时落一行摘要日志。
+
+只用 stdlib、无锁(全在 Decky 的事件循环线程里调用)。名字用点分层级,如
+`provider.coalesced`、`player.lane.playback.wait`。
+"""
+
+_counters: dict[str, int] = {}
+_timings: dict[str, list[float]] = {}  # name → [次数, 总秒数, 最大秒数]
+
+
+def inc(name: str, n: int = 1) -> None:
+    _counters[name] = _counters.get(name, 0) + n
+
+
+def observe(name: str, secs: float) -> None:
+    t = _timings.get(name)
+    if t is None:
+        _timings[name] = [1, secs, secs]
+        return
+    t[0] += 1
+    t[1] += secs
+    if secs > t[2]:
+        t[2] = secs
+
+
+def get(name: str) -> int:
+    return _counters.get(name, 0)
+
+
+def snapshot() -> dict:
+    """{counters: {name: n}, timings: {name: {count, avg_ms, max_ms}}}。"""
+    return {
+        "counters": dict(_counters),
+        "timings": {
+            k: {"count": int(c), "avg_ms": round(s / c * 1000, 1), "max_ms": round(m * 1000, 1)}
+            for k, (c, s, m) in _timings.items()
+        },
+    }
+
+
+def summary() -> str:
+    """一行摘要,落日志用:`a=3 b=1 t(avg/max ms)=2.0/5.1`。"""
+    parts = [f"{k}={v}" for k, v in sorted(_counters.items())]
+    parts += [
+        f"{k}(avg/max ms)={s / c * 1000:.1f}/{m * 1000:.1f}" for k, (c, s, m) in sorted(_timings.items())
+    ]
+    return " ".join(parts) or "no metrics"
+
+
+def reset() -> None:
+    _counters.clear()
+    _timings.clear()
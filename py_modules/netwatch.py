@@ -0,0 +1,104 @@
+"""挂起 / 换网检测。
+
+Deck 睡眠唤醒后,子进程连接池里的 keep-alive 连接多半已被对端 / NAT 丢掉,却没收到 FIN:
+下一发请求要先在死连接上赔满超时才会重连。换 WiFi / 地址变了同理。这里只负责发现,
+发现后回调 on_change(reason),由 bridge 广播 net_reset 让各子进程换连接池。
+
+- 挂起:CLOCK_MONOTONIC 在挂起期间不走,墙钟照走。两次巡检之间墙钟比单调钟多走了
+  SUSPEND_GAP_S 以上 = 中间睡过一觉(NTP 微调远到不了这个量级)。
+- 换网:/proc/net/route 的默认路由(出口网卡 + 网关)与本机地址(IPv4 取 fib_trie 的
+  LOCAL 项,IPv6 取 if_inet6)组成指纹,变了即换网。读不到(非 Linux)时不判。
+只用 stdlib,读 /proc 是几 KB 的内存文件,放事件循环里读即可。
+"""
+
+import asyncio
+import time
+
+from log import log
+
+NET_CHECK_S = 5.0  # 巡检间隔
+SUSPEND_GAP_S = 10.0  # 墙钟比单调钟多走这么多秒即判挂起过(须明显大于巡检间隔的调度抖动)
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path, encoding="ascii", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def _default_routes(text: str) -> list[str]:
+    """/proc/net/route 里目的 0.0.0.0 / 掩码 0 的行 → ["网卡 网关"]。"""
+    routes = []
+    for line in text.splitlines()[1:]:
+        cols = line.split()
+        if len(cols) >= 8 and cols[1] == "00000000" and cols[7] == "00000000":
+            routes.append(f"{cols[0]} {cols[2]}")
+    return sorted(routes)
+
+
+def _local_v4(text: str) -> list[str]:
+    """/proc/net/fib_trie:`|-- 地址` 下一行是 `/32 host LOCAL` 的即本机地址(含 127.0.0.1)。"""
+    addrs, last = set(), None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("|--"):
+            last = line[3:].strip()
+        elif line == "/32 host LOCAL" and last:
+            addrs.add(last)
+    return sorted(addrs)
+
+
+def _local_v6(text: str) -> list[str]:
+    """/proc/net/if_inet6:每行 地址 序号 前缀长 scope flags 网卡;lo 不算。"""
+    return sorted(
+        f"{cols[5]} {cols[0]}" for cols in map(str.split, text.splitlines()) if len(cols) >= 6 and cols[5] != "lo"
+    )
+
+
+def fingerprint() -> str | None:
+    """当前网络指纹;/proc 不可读时 None(不判换网)。"""
+    route = _read("/proc/net/route")
+    if not route:
+        return None
+    parts = _default_routes(route) + _local_v4(_read("/proc/net/fib_trie")) + _local_v6(_read("/proc/net/if_inet6"))
+    return "|".join(parts)
+
+
+class NetWatch:
+    """周期巡检,发现挂起 / 换网时 await on_change("suspend" | "network")。"""
+
+    def __init__(self, on_change, read=fingerprint):
+        self.on_change = on_change
+        self.read = read
+        self._wall = time.time()
+        self._mono = time.monotonic()
+        self._net = read()
+
+    def poll(self) -> str | None:
+        """巡检一次:返回触发原因,没有变化时 None。挂起优先 —— 睡醒常伴随换网,一次重置就够。"""
+        wall, mono = time.time(), time.monotonic()
+        gap = (wall - self._wall) - (mono - self._mono)
+        self._wall, self._mono = wall, mono
+        net = self.read()
+        changed = net is not None and self._net is not None and net != self._net
+        if net is not None:
+            self._net = net
+        if gap > SUSPEND_GAP_S:
+            log("bridge", "own", "info", f"resumed from suspend (~{gap:.0f}s)")
+            return "suspend"
+        if changed:
+            log("bridge", "own", "info", "network changed")
+            return "network"
+        return None
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(NET_CHECK_S)
+            reason = self.poll()
+            if reason:
+                try:
+                    await self.on_change(reason)
+                except Exception as e:  # 重置失败不放倒巡检
+                    log("bridge", "own", "warn", f"net reset failed: {type(e).__name__}")
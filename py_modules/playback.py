@@ -11,6 +11,8 @@ import time
 
 import decky
 
+import retry
+from hedge import Hedger
 from log import log
 
 PLAY_MODES = ("list_loop", "single_loop", "shuffle")
@@ -21,17 +23,16 @@ PLAY_MODES = ("list_loop", "single_loop", "shuffle")
 #   timeout          = bridge 30s 请求上限,子进程整体不响应
 #   fetch_timeout    = player 首开慢网重试 ~21s/首
 #   upstream_timeout = provider 单次上游请求超时。瞬时抖动已由 _play_index 原地重试
-#                      同一首消化掉(见 UPSTREAM_RETRY_BACKOFF),还能走到这里说明重试也栽了
+#                      同一首消化掉(见 retry.POLICY),还能走到这里说明重试也栽了
+#   offline          = bridge 熔断器已打开(上游连续超时,见 breaker.py),快速失败
 # 软熔断 —— 连续 2 次才停。fetch_failed 单发可能只是这一首的 URL 坏了,跳过是对的;
 # 连着两首都拉不开基本是网断了。
 #   fetch_failed = player 拉流打不开
-# 其余(如 no_playable,秒回的单曲性失败)照常跳过,不计数。
-FUSE_ERRORS = ("timeout", "fetch_timeout", "upstream_timeout")
+# 其余(如 no_playable,秒回的单曲性失败)照常跳过,不计数。deadline_exceeded(请求到 provider 时
+# 调用方的预算已用完)也在此列:链路本身是好的。
+FUSE_ERRORS = ("timeout", "fetch_timeout", "upstream_timeout", "offline")
 SOFT_FUSE_ERRORS = ("fetch_failed",)
 
-# 上游瞬时超时的原地重试退避:够让一次抖动过去,又不至于让切歌明显卡顿。
-UPSTREAM_RETRY_BACKOFF = 0.5
-
 # 会让 sink 真正死掉的 player 错误码 —— 只有这些才记「断流中断处」供 resume 接上。
 # 其余(seek_failed:try_seek 失败但 sink 照常出声;audio_* :重载也救不回来)一律不动
 # 播放状态,否则 bridge 会与实际出声脱节,之后 resume 白重载一遍还往回跳。
@@ -61,7 +62,7 @@ class Playback:
         player,
         provider,
         play_mode: str = "list_loop",
-        persist=None,
+        journal=None,
         radio_fetcher=None,
         auth_retry=None,
         quality=None,
@@ -82,8 +83,15 @@ class Playback:
         # 断流中断处:player 报 error 后按播放键从这里接上,而不是从头重放。
         # 换歌 / 清队列必须清零,否则下一首会莫名跳到中间。
         self._resume_at = 0.0
-        self._persist = persist  # bridge 注入的落盘回调 (items, index) -> None;None = 不持久化
+        # bridge 注入的队列日志(journal.QueueJournal:replace / set_index / insert / remove);
+        # None = 不持久化。只记普通队列,见 _record
+        self._journal = journal
         self._play_gen = 0  # 播放意图代次:新意图作废在途旧意图(最后一次操作赢,不排队)
+        # 当前意图在途的 song_url/load 请求。新意图直接取消它:Conn 随之发 cancel 帧,
+        # provider 停掉上游解析、player 停掉开流 —— 连切几首不会把活堆在同一条上游连接上。
+        self._intent_req: asyncio.Future | None = None
+        # song_url 的对冲:第一发超过近期 p90 还没回就补发一发(全局预算 ~5%),见 hedge.py
+        self._url_hedge = Hedger("song_url")
 
         self._radio_kind = ""
         self._radio_fetcher = radio_fetcher  # async (kind) -> list[dict];bridge 注入 provider radio_fetch
@@ -101,8 +109,13 @@ class Playback:
         self._radio_kind = ""
         self.mode = "normal"
 
+    def _record(self, op: str, *args):
+        """普通队列的变化记进队列日志:切歌只追加一行 index,不重写整队。电台内容从不落盘。"""
+        if self._journal and self.mode == "normal":
+            getattr(self._journal, op)(*args)
+
     def restore(self, saved: dict | None):
-        """启动时从 settings 恢复普通队列(含展示字段;旧存档缺失则空串占位),不自动开播。"""
+        """启动时从队列日志恢复普通队列(含展示字段;旧存档缺失则空串占位),不自动开播。"""
         items = (saved or {}).get("items")
         if not isinstance(items, list) or not items:
             return
@@ -120,6 +133,9 @@ class Playback:
         ]
         idx = (saved or {}).get("index", 0)
         self.index = max(0, min(int(idx), len(self.queue) - 1)) if self.queue else -1
+        if len(self.queue) != len(items) or self.index != idx:
+            # 丢了没 id 的项 / 钳过下标:日志镜像得跟着对齐,否则之后的 insert/remove 下标对不上
+            self._record("replace", self.queue, self.index)
 
     # ---- 对外命令 ----
 
@@ -129,9 +145,12 @@ class Playback:
         self.queue = items or []
         if not self.queue:
             self.index = -1
+            self._record("replace", [], -1)
             await self._queue_changed()
             return
-        await self._play_index(max(0, min(start_index, len(self.queue) - 1)))
+        start = max(0, min(start_index, len(self.queue) - 1))
+        self._record("replace", self.queue, start)  # 整队换了:重写快照
+        await self._play_index(start)
         await self._queue_changed()
 
     async def next_track(self):
@@ -146,24 +165,35 @@ class Playback:
         - 重启回灌后 player 是空的(restore 不自动开播),此时 resume 对 player 是空操作;
         - 播放中途流彻底死了(见 on_player_event 的 error 分支),sink 已不可用。
         后者带 _resume_at,重新加载后跳回中断处,不从头重放。
-        bridge 与 player 同生共死,_loaded 按进程生命周期算。"""
+        _loaded 按 player 进程生命周期算(player 中途重启见 player_lost)。"""
         if not self._loaded and 0 <= self.index < len(self.queue):
             await self._play_index(self.index, seek_to=self._resume_at)
             return
         await self.player.request("resume")
 
+    def player_lost(self) -> bool:
+        """player 进程没了(崩溃 / 判死被杀):记下中断处,下次 resume 冷启动重新解析当前曲并接上,
+        与断流同一套 _resume_at。在播时位置按墙钟外推(playing 事件只在状态变化时报)。
+        返回当时是否在播(bridge 据此决定重启后要不要自动接着放)。"""
+        was_playing = self.playing and 0 <= self.index < len(self.queue)
+        if self.playing:
+            self.pos += max(0.0, (_now_ms() - self.wall) / 1000)
+        if self._loaded:
+            self._resume_at = self.pos
+        self._loaded = False
+        self.playing = False
+        return was_playing
+
     async def prev_track(self):
         if self.mode == "radio":
             return
         if self.queue:
             await self._play_index((self.index - 1) % len(self.queue))
 
-
     async def play_radio(self, kind: str, items: list[dict]):
         self._exit_radio()
         self.queue, self.index = [], -1
-        if self._persist:
-            self._persist([], -1)  # clear saved normal queue; never persist radio contents
+        self._record("replace", [], -1)  # clear saved normal queue; never persist radio contents
         self.mode, self._radio_kind = "radio", kind
         self.queue = items or []
         if not self.queue:
@@ -209,9 +239,11 @@ class Playback:
         # 无当前曲(空队列)时直接开播:否则曲子躺在队列里,Start 对空 sink 也无声
         if self.index < 0:
             self.queue = [item]
+            self._record("replace", self.queue, 0)
             await self._play_index(0)
         else:
             self.queue.insert(self.index + 1, item)
+            self._record("insert", self.index + 1, item)
         await self._queue_changed()
 
     async def queue_append(self, item: dict):
@@ -219,9 +251,11 @@ class Playback:
             return
         if self.index < 0:
             self.queue = [item]
+            self._record("replace", self.queue, 0)
             await self._play_index(0)
         else:
             self.queue.append(item)
+            self._record("insert", len(self.queue) - 1, item)
         await self._queue_changed()
 
     async def queue_remove(self, index: int):
@@ -233,6 +267,7 @@ class Playback:
         del self.queue[index]
         if index < self.index:
             self.index -= 1
+        self._record("remove", index)
         if removing_current:
             if self.queue:
                 await self._play_index(min(self.index, len(self.queue) - 1))  # 播补位的下一首
@@ -248,6 +283,7 @@ class Playback:
         """清空进入空态:停播 + 通知 UI 当前曲清空(QUEUE-BEHAVIOR §3.1)。"""
         self._exit_radio()
         self.queue, self.index = [], -1
+        self._record("replace", [], -1)
         self.playing, self.pos, self.wall = False, 0.0, _now_ms()
         self._resume_at = 0.0  # 队列都清空了,断流中断处不能留着
         await self.player.request("stop")
@@ -256,9 +292,7 @@ class Playback:
         await self._queue_changed()
 
     async def _queue_changed(self):
-        # 结构变化:落盘(只存 id 类字段,见 QUEUE-BEHAVIOR §1.1)+ 广播给浮层刷新
-        if self._persist and self.mode == "normal":
-            self._persist(self.queue, self.index)
+        # 结构变化:广播给浮层刷新(落盘已由各编辑经 _record 记进队列日志)
         await self._emit("queue", {"length": len(self.queue), "index": self.index, "mode": self.mode})
 
     def set_play_mode(self, mode: str) -> bool:
@@ -312,6 +346,20 @@ class Playback:
         log("bridge", "own", "warn", f"{place}: give up advancing, last error {code}")
         await self._emit("error", {"code": code, "message": code})
 
+    async def _intent_request(self, conn, cmd: str, args: dict, hedger: Hedger | None = None):
+        """播放意图内的请求:登记为 _intent_req,被更新的意图取代时由 _play_index 取消。
+        被取消时返回 None(调用方紧接着的代次检查会让位);本任务自身被取消则照常传播。
+        给了 hedger 就经它发(慢时补发一发),取消时两发一并取消。"""
+        req = asyncio.ensure_future(hedger.request(conn, cmd, args) if hedger else conn.request(cmd, args))
+        self._intent_req = req
+        try:
+            return await req
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if req.cancelled() and not (task and task.cancelling()):
+                return None
+            raise
+
     async def _play_index(self, i: int, quiet: bool = False, seek_to: float = 0.0) -> bool | None:
         """播放队列第 i 首。True 成功 / False 失败 / None 被更新的播放意图取代(静默让位)。
         quiet=True(自动顺延用):失败不发 error 事件,由调用方放弃时统一报一次,避免跳过
@@ -319,6 +367,8 @@ class Playback:
         seek_to>0(断流后接上用):load 成功后跳到该位置,失败则从头播(不报错)。"""
         self._play_gen += 1
         gen = self._play_gen
+        if self._intent_req is not None and not self._intent_req.done():
+            self._intent_req.cancel()
         self.index = i
         self._resume_at = 0.0  # 新的播放意图:作废上一次的断流中断处
         item = self.queue[i]
@@ -328,28 +378,18 @@ class Playback:
             "media_mid": item.get("media_mid", ""),
             "quality": self._quality(),
         }
-        r = await self.provider.request("song_url", args)
-        if gen != self._play_gen:
+        def live() -> bool:
+            return gen == self._play_gen
+
+        async def resolve():
+            resp = await self._intent_request(self.provider, "song_url", args, self._url_hedge)
+            return resp if live() else None
+
+        # 凭证刷新后重试 / 上游抖动原地重试同一首,都按 retry.POLICY 走
+        hooks = {"refresh_credential": self._auth_retry} if self._auth_retry else None
+        r = await retry.call("song_url", resolve, hooks, live, f" id={item.get('id', '')}")
+        if r is None:
             return None  # 等待期间用户又切了歌:让位,不发事件不碰状态
-        if not r.ok and r.error and r.error.code == "no_playable" and self._auth_retry:
-            # 可能是凭证过期的连带假象:刷新一次,真刷新了才重试(真无版权不浪费第二发)
-            if await self._auth_retry():
-                if gen != self._play_gen:
-                    return None
-                log("bridge", "own", "info", f"retry song_url after credential refresh id={item.get('id', '')}")
-                r = await self.provider.request("song_url", args)
-                if gen != self._play_gen:
-                    return None
-        if not r.ok and r.error and r.error.code == "upstream_timeout":
-            # 瞬时抖动(打游戏抢带宽等)不是这一首的问题,原地重试同一首 —— 顺延到下一首会让
-            # 用户看到歌无故消失,比报错更费解。重试仍失败则落到熔断,由调用方明确报错。
-            await asyncio.sleep(UPSTREAM_RETRY_BACKOFF)
-            if gen != self._play_gen:
-                return None
-            log("bridge", "own", "info", f"retry song_url after upstream timeout id={item.get('id', '')}")
-            r = await self.provider.request("song_url", args)
-            if gen != self._play_gen:
-                return None
         if not r.ok:
             self.last_error = r.error.code if r.error else "play_failed"
             message = r.error.message if r.error else "play_failed"
@@ -357,7 +397,7 @@ class Playback:
             if not quiet:
                 await self._emit("error", {"code": self.last_error, "message": message})
             return False
-        pr = await self.player.request("load", {"url": r.data["url"]})
+        pr = await self._intent_request(self.player, "load", {"url": r.data["url"]})
         if gen != self._play_gen:
             return None
         if not pr.ok:
@@ -385,8 +425,7 @@ class Playback:
             else:
                 code = sr.error.code if sr.error else "seek_failed"
                 log("bridge", "own", "warn", f"resume seek to {seek_to:.1f}s failed ({code}), from start")
-        if self._persist and self.mode == "normal":
-            self._persist(self.queue, self.index)  # index 变化落盘(结构没变,不发 queue 事件)
+        self._record("set_index", i)  # 只追加一行 index(结构没变,不发 queue 事件)
         log("bridge", "own", "info", f"queue -> {i + 1}/{len(self.queue)} (mode={self.mode if self.mode == 'radio' else self.play_mode})")
         # 告知 UI 当前曲(含展示信息,不依赖前端队列)
         await self._emit("track", {"index": i, "song": _public(item)})
@@ -1,15 +1,31 @@
-"""bridge ↔ child 协议 v1:构造 request、解码 child 消息(response/event/log)+ 严格校验。
+"""bridge ↔ child 协议:分帧(v1 NDJSON / v2 长度前缀)、构造 request、解码 child 消息
+(response/partial/event/log/hello)+ 严格校验;歌曲列表的列式编码解码(decode_songs)。
 
 见 issue #31。只用 stdlib(bridge 跑在 Decky 冻结的 CPython 里,严禁第三方依赖)。
 解码在边界尽早失败(ProtocolError),坏消息不塞进业务逻辑。
+分帧与 qq-provider/protocol.py、wire crate 是同一份规格,改一处三处一起改。
 """
 
+import asyncio
+import json
+from collections.abc import Iterator
 from dataclasses import dataclass
 from typing import Any
 
 JsonObject = dict[str, Any]
 _LOG_LEVELS = {"debug", "info", "warn", "error"}
 
+# 本端支持的最高协议版本。child 连入后先发 hello 声明自己的版本,bridge 取两者较小值。
+PROTO_VERSION = 2
+# v2 帧 = 4 字节大端长度 + JSON 载荷。载荷上限 16 MiB - 1,于是长度头首字节恒为 0x00,
+# 而 v1 行首必是 "{" —— 读端逐帧看首字节就能分辨,切换版本时不需要同步点。
+MAX_FRAME = (1 << 24) - 1
+# v1 单行上限(同 Decky BUFFER_LIMIT)。asyncio StreamReader 默认只有 64 KiB,
+# 500 个 id 的 liked_ids 就能撑爆(LimitOverrunError),连入时必须显式放大。
+LINE_LIMIT = 1 << 20
+# 歌曲列表的列式编码名。bridge 在请求里带 enc 声明能解;child 可以不理会,照发 dict 数组。
+SONG_COLUMNS = "cols"
+
 
 class ProtocolError(Exception):
     """协议解码/校验失败。"""
@@ -29,6 +45,14 @@ class ChildResponse:
     error: ErrorBody | None = None
 
 
+@dataclass(frozen=True)
+class ChildPartial:
+    """流式响应的中间帧:同 id 的若干 partial 之后,以该 id 的常规响应收尾(done 帧)。"""
+
+    id: int
+    data: JsonObject
+
+
 @dataclass(frozen=True)
 class ChildEvent:
     ev: str
@@ -43,26 +67,112 @@ class LogEvent:
     msg: str
 
 
+@dataclass(frozen=True)
+class Hello:
+    """child 连入后的首帧,声明它支持的最高协议版本(老 child 不发,按 v1 处理)。"""
+
+    proto: int
+
+
+# ---- 分帧 ----
+
+
+def encode_frame(msg: JsonObject, version: int = 1) -> bytes:
+    """按协议版本编码一帧:v1 = JSON + "\n";v2 = 4 字节大端长度 + JSON。"""
+    body = json.dumps(msg, ensure_ascii=False).encode()
+    if version < 2:
+        return body + b"\n"
+    if len(body) > MAX_FRAME:
+        raise ProtocolError(f"frame too large: {len(body)} bytes")
+    return len(body).to_bytes(4, "big") + body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[bytes, int] | None:
+    """读一帧 → (载荷, 版本);EOF(含帧中途断开)返回 None。
+
+    逐帧按首字节识别版本:0x00 是 v2 长度头,否则是 v1 的一行。v2 按长度 readexactly,
+    不逐字节扫 "\n",也不受 StreamReader 行长上限约束。
+    超过 LINE_LIMIT 的 v1 行丢到它的换行为止再抛 ProtocolError,流仍对齐,调用方可以接着读。"""
+    try:
+        head = await reader.readexactly(1)
+        if head == b"\x00":
+            n = int.from_bytes(await reader.readexactly(3), "big")
+            return await reader.readexactly(n), 2
+        return head + await reader.readuntil(b"\n"), 1
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        await _skip_line(reader)
+        raise ProtocolError("line too long") from None
+
+
+async def _skip_line(reader: asyncio.StreamReader):
+    """丢到下一个换行(含)为止。readline 超限时只清掉缓冲里已到的部分,这一行余下的字节
+    还在路上,不丢掉就会被当成下一帧读进来。"""
+    while True:
+        try:
+            await reader.readuntil(b"\n")
+            return
+        except asyncio.LimitOverrunError as e:  # 数据还留在缓冲里:按已扫过的长度丢掉,接着找
+            await reader.readexactly(e.consumed)
+        except asyncio.IncompleteReadError:
+            return
+
+
 # ---- 构造(bridge → child) ----
 
 
-def request(id: int, cmd: str, args: JsonObject | None = None) -> JsonObject:
-    return {"id": id, "cmd": cmd, "args": args or {}}
+def request(
+    id: int,
+    cmd: str,
+    args: JsonObject | None = None,
+    deadline_ms: int | None = None,
+    enc: str | None = None,
+) -> JsonObject:
+    """deadline_ms:绝对截止时刻(墙钟 epoch 毫秒)。child 只用剩余预算,过期未开工的直接丢。
+    enc:bridge 能解的可选响应编码(目前只有 SONG_COLUMNS)。"""
+    req = {"id": id, "cmd": cmd, "args": args or {}}
+    if deadline_ms is not None:
+        req["deadline"] = deadline_ms
+    if enc is not None:
+        req["enc"] = enc
+    return req
+
+
+def cancel(id: int) -> JsonObject:
+    """取消帧:bridge 不再等 id 的响应了,child 中止对应任务(不回包;已结束则忽略)。"""
+    return {"cancel": id}
 
 
 # ---- 解码(child → bridge) ----
 
 
-def decode_child_message(raw: object) -> ChildResponse | ChildEvent | LogEvent:
+def decode_child_message(
+    raw: object,
+) -> ChildResponse | ChildPartial | ChildEvent | LogEvent | Hello:
     if not isinstance(raw, dict):
         raise ProtocolError("message is not an object")
     if raw.get("ev") == "log":
         return _decode_log(raw)
+    if raw.get("ev") == "hello":
+        return _decode_hello(raw)
     if "ev" in raw:
         return _decode_event(raw)
+    if "partial" in raw:
+        return _decode_partial(raw)
     return _decode_response(raw)
 
 
+def _decode_partial(raw: dict) -> ChildPartial:
+    rid = raw.get("id")
+    if not isinstance(rid, int) or isinstance(rid, bool):
+        raise ProtocolError("partial missing integer id")
+    data = raw["partial"]
+    if not isinstance(data, dict):
+        raise ProtocolError("partial is not an object")
+    return ChildPartial(rid, data)
+
+
 def _decode_response(raw: dict) -> ChildResponse:
     rid = raw.get("id")
     if not isinstance(rid, int) or isinstance(rid, bool):
@@ -104,3 +214,61 @@ def _decode_log(raw: dict) -> LogEvent:
     if not isinstance(where, str) or not isinstance(msg, str):
         raise ProtocolError("log event where/msg must be strings")
     return LogEvent(level, where, msg)
+
+
+def _decode_hello(raw: dict) -> Hello:
+    data = raw.get("data", {})
+    proto = data.get("proto") if isinstance(data, dict) else None
+    if not isinstance(proto, int) or isinstance(proto, bool) or proto < 1:
+        raise ProtocolError("hello missing positive integer proto")
+    return Hello(proto)
+
+
+# ---- 歌曲列表(响应 data 里的 songs) ----
+#
+# 两种形状都合法:常规的 Song dict 数组;或列式
+#   {"cols": [字段...], "rows": [[值...], ...], "prefixes": {字段: [前缀...]}}
+# prefixes 里列出的字段,单元格可以是 [前缀下标, 余下部分](QQ 封面 URL 共用一长串 CDN 前缀)。
+# 这是数据载荷而非帧结构:坏行只跳过,不抛 ProtocolError(列表降级显示,不该让整条响应失败)。
+
+
+def iter_songs(songs: object) -> Iterator[JsonObject]:
+    """逐首产出 Song dict,列式按需逐行还原(调用方只取前几首时不会解整张表)。"""
+    if isinstance(songs, list):
+        yield from songs
+        return
+    if not isinstance(songs, dict):
+        return
+    cols, rows = songs.get("cols"), songs.get("rows")
+    if not isinstance(cols, list) or not isinstance(rows, list):
+        return
+    prefixes = songs.get("prefixes")
+    packed = [
+        (col, table)
+        for col in cols
+        if isinstance(prefixes, dict) and isinstance(table := prefixes.get(col), list)
+    ]
+    width = len(cols)
+    for row in rows:
+        if type(row) is not list or len(row) != width:
+            continue
+        song = dict(zip(cols, row))
+        for col, table in packed:
+            if type(cell := song[col]) is list:
+                song[col] = _unprefix(cell, table)
+        yield song
+
+
+def _unprefix(cell: list, table: list) -> str:
+    if len(cell) == 2:
+        idx, rest = cell
+        if isinstance(idx, int) and 0 <= idx < len(table) and isinstance(rest, str):
+            return f"{table[idx]}{rest}"
+    return ""
+
+
+def decode_songs(songs: object) -> list[JsonObject]:
+    """歌曲列表 → Song dict 数组(常规数组原样返回,不复制)。交给前端的出口用它。"""
+    if isinstance(songs, list):
+        return songs
+    return list(iter_songs(songs))
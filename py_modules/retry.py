@@ -0,0 +1,82 @@
+"""声明式重试策略:按 (命令, 错误码) 查表决定要不要再发、等多久、先做什么。
+
+此前重试散落在 _play_index 里(上游超时原地重试一次、no_playable 先刷新凭证再试),
+调参得翻 playback.py。现在都在 POLICY 一张表里:最多几发、指数退避 + 抖动、整体时间
+预算、重试前钩子(如 "refresh_credential":钩子回 False 就不重试 —— 凭证没过期说明
+是真无版权,不浪费第二发)。重试次数与重试耗时记入指标(retry.<cmd>.*)。
+只用 stdlib;发送与钩子经参数注入,本模块不认识 Conn。
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+
+import metrics
+from log import log
+
+
+@dataclass(frozen=True)
+class Rule:
+    attempts: int = 2  # 同一错误码下总共发几次(含首发)
+    backoff: float = 0.0  # 第一次重试前的等待(秒),之后每次乘 factor
+    factor: float = 2.0
+    jitter: float = 0.0  # 退避的相对抖动幅度(0.2 = ±20%),免得并发重试齐步走
+    budget: float | None = None  # 从首发算起的总时长上限(秒):等完退避就超了的不再重试
+    before: str | None = None  # 重试前先调的钩子名;钩子缺失或回 False 则不重试
+
+
+# (命令, 错误码) → 重试规则。未列出的组合不重试。
+POLICY: dict[tuple[str, str], Rule] = {
+    # QQ musickey 会话中途过期时所有歌报 no_playable(误导性「无权限」):刷新凭证后重试一次,
+    # 真刷新了才再发
+    ("song_url", "no_playable"): Rule(attempts=2, before="refresh_credential"),
+    # 上游瞬时抖动(打游戏抢带宽等)不是这一首的问题,原地重试同一首 —— 顺延到下一首会让
+    # 用户看到歌无故消失。退避够让一次抖动过去,又不至于让切歌明显卡顿;仍失败交给熔断报错。
+    ("song_url", "upstream_timeout"): Rule(attempts=2, backoff=0.5, jitter=0.2, budget=40.0),
+}
+
+
+def delay(rule: Rule, retry: int) -> float:
+    """第 retry 次重试(从 1 起)前的等待秒数。"""
+    base = rule.backoff * rule.factor ** (retry - 1)
+    return max(0.0, base * (1 + random.uniform(-rule.jitter, rule.jitter))) if base else 0.0
+
+
+async def call(
+    cmd: str, send, hooks: dict | None = None, live=None, label: str = "", policy: dict | None = None
+):
+    """send() 发一次(async,回带 ok/error 的响应;回 None 表示被取代)。失败时按 POLICY 重试,
+    返回最后一次的响应。live()(可选)在每次等待后检查,回 False 即放弃、返回 None ——
+    播放意图被更新的意图取代时调用方据此静默让位。label 只进日志(如歌曲 id)。"""
+    policy = POLICY if policy is None else policy
+    t0 = time.monotonic()
+    tries: dict[str, int] = {}  # 错误码 → 已重试次数,各码分别计
+    resp = await send()
+    while resp is not None and not resp.ok and resp.error:
+        code = resp.error.code
+        rule = policy.get((cmd, code))
+        n = tries.get(code, 0) + 1
+        if rule is None or n >= rule.attempts:
+            break
+        wait = delay(rule, n)
+        if rule.budget is not None and time.monotonic() - t0 + wait >= rule.budget:
+            metrics.inc(f"retry.{cmd}.{code}.over_budget")
+            break
+        if rule.before:
+            hook = (hooks or {}).get(rule.before)
+            if hook is None or not await hook():
+                break
+        if wait:
+            await asyncio.sleep(wait)
+        if live and not live():
+            return None
+        tries[code] = n
+        metrics.inc(f"retry.{cmd}.{code}")
+        log("bridge", "own", "info", f"retry {cmd} after {code} ({n}/{rule.attempts - 1}){label}")
+        resp = await send()
+    if tries:
+        metrics.observe(f"retry.{cmd}.time", time.monotonic() - t0)
+        if resp is not None and resp.ok:
+            metrics.inc(f"retry.{cmd}.recovered")
+    return resp
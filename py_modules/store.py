@@ -0,0 +1,78 @@
+"""settings 写后落盘(write-behind):改动只标脏,短防抖后在线程里整体原子写一次。
+
+拖音量条 / 连切歌时 settings 每秒被改十几次,原来每次都在事件循环里同步重写整个文件。
+现在一个防抖窗口(DEBOUNCE_S)内的改动合成一次写;凭证变化与 unload 调 flush 立即落盘,
+不吃防抖(凭证丢了要重新扫码,不值得冒险)。写本身仍是 tmp + os.replace(由调用方给的
+write 负责),在 asyncio.to_thread 里做;快照在事件循环里 deepcopy,写线程不碰活的 dict。
+每会话的改动数 / 实际写盘数记 settings.marked / settings.written。只用 stdlib。
+"""
+
+import asyncio
+import copy
+
+import metrics
+from log import log
+
+DEBOUNCE_S = 1.0
+
+
+class SettingsStore:
+    """data:() -> 当前 settings dict(Bridge 会整个换掉它,所以每次现取);write:(dict) -> None,阻塞。"""
+
+    def __init__(self, data, write, debounce: float = DEBOUNCE_S):
+        self.data = data
+        self.write = write
+        self.debounce = debounce
+        self.dirty = False
+        self._timer: asyncio.Task | None = None
+        self._lock: asyncio.Lock | None = None  # 串行化写盘:后写的快照一定后落盘
+
+    def mark(self):
+        """标脏,DEBOUNCE_S 后落盘;窗口内的后续改动搭同一次写。没有事件循环时(同步调用方)直接写。"""
+        metrics.inc("settings.marked")
+        self.dirty = True
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(copy.deepcopy(self.data()))
+            self.dirty = False
+            return
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._later())
+
+    async def _later(self):
+        await asyncio.sleep(self.debounce)
+        self._timer = None
+        await self.flush()
+
+    async def save_now(self):
+        """改动立即落盘,不等防抖(凭证变化 / 恢复出厂)。"""
+        metrics.inc("settings.marked")
+        self.dirty = True
+        await self.flush()
+
+    async def flush(self):
+        """有未落盘的改动就立刻写(凭证变化 / unload)。写失败保持脏,下次 mark / flush 再试。"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            snapshot = copy.deepcopy(self.data())
+            try:
+                await asyncio.to_thread(self._write, snapshot)
+            except OSError as e:
+                self.dirty = True
+                log("bridge", "own", "error", f"settings write failed: {type(e).__name__}")
+
+    def _write(self, snapshot: dict):
+        self.write(snapshot)
+        metrics.inc("settings.written")
+
+    def summary(self) -> str:
+        marked, written = metrics.get("settings.marked"), metrics.get("settings.written")
+        return f"settings: {marked} changes, {written} writes ({marked - written} saved)"
@@ -0,0 +1,104 @@
+"""子进程崩溃循环检测:起不来 / 一起就崩时指数退避,期间快速失败,而不是每次都赔一整套 spawn。
+
+provider 二进制坏了(解包残缺、缺库、设备档案损坏)时,每个 UI 调用都会走一遍
+_ensure_provider → spawn → 等连入,CPU 白烧、界面卡着。这里记下每个进程的退出码与存活时长:
+连续 CRASH_LOOP_THRESHOLD 次「短命」(起不来、连不上、CRASH_MIN_LIFE_S 内退出)即判定崩溃
+循环,之后的拉起按 CRASH_BACKOFF 起指数退避(封顶 CRASH_BACKOFF_MAX),退避期内直接回稳定的
+`provider_crash_loop` 码。连入过、且活过 CRASH_MIN_LIFE_S 的一次运行才清零 —— 光活着不算,
+启动时卡住、始终连不上的进程不能借存活时长把连击洗掉。活跃 / 热备 / 备胎各有一个监护,
+互不清对方的连击(转正后的进程仍记在拉起它的那个位上)。
+每次非正常退出追加进一个定长环(CRASH_RING),落盘到设置目录,供事后排查。
+只用 stdlib;bridge 在 spawn 前后调用,本模块不认识 Conn。
+"""
+
+import asyncio
+import json
+import os
+import signal
+import time
+from collections import deque
+
+import metrics
+from log import log
+
+CRASH_MIN_LIFE_S = 30.0  # 活不过这么久的退出算一次「短命」
+CRASH_LOOP_THRESHOLD = 3  # 连续这么多次短命才判定崩溃循环:偶发一次崩溃照常立刻重开
+CRASH_BACKOFF = 5.0  # 判定后首次退避(秒),之后每多一次短命翻倍
+CRASH_BACKOFF_MAX = 300.0
+CRASH_RING = 32  # 每个子进程落盘保留的最近退出记录条数
+CRASH_LOOP = "provider_crash_loop"  # 退避期内快速失败的错误码
+# 我们自己停掉的(切源 / 卸载 SIGTERM、判死 SIGKILL)不算崩溃
+STOP_CODES = frozenset({-signal.SIGTERM, -signal.SIGKILL})
+
+
+class SpawnSupervisor:
+    def __init__(self, name: str, path: str):
+        self.name = name  # 指标前缀 / 日志名 / 落盘键,如 "provider"
+        self.path = path  # 崩溃环文件(所有子进程共用一个 JSON,按 name 分键)
+        self.streak = 0  # 连续短命次数
+        self.until = 0.0  # 退避截止(monotonic)
+        self.ring: deque[dict] = deque(self._load().get(name, []), maxlen=CRASH_RING)
+
+    def backoff(self) -> float:
+        """还要退避多少秒;0 = 可以拉起。"""
+        left = self.until - time.monotonic()
+        if left <= 0:
+            return 0.0
+        metrics.inc(f"{self.name}.crash_loop.rejected")
+        return left
+
+    def started(self, proc, ready: asyncio.Event):
+        """拉起成功:在后台等它退出,记下退出码与存活时长。ready = 它的 Conn 的 connected。"""
+        asyncio.create_task(self._watch(proc, time.monotonic(), ready))
+
+    def failed(self, reason: str, life: float = 0.0):
+        """一次短命:拉不起来 / 连不上(reason 为错误码),或 _watch 见到的早退。"""
+        self._record(reason, life)
+        self.streak += 1
+        if self.streak < CRASH_LOOP_THRESHOLD:
+            return
+        wait = min(CRASH_BACKOFF * 2 ** (self.streak - CRASH_LOOP_THRESHOLD), CRASH_BACKOFF_MAX)
+        self.until = time.monotonic() + wait
+        metrics.inc(f"{self.name}.crash_loop")
+        msg = f"{self.name} crash loop ({self.streak} in a row), backing off {wait:.0f}s"
+        log("bridge", "own", "error", msg)
+
+    def reset(self):
+        self.streak, self.until = 0, 0.0
+
+    async def _watch(self, proc, t0: float, ready: asyncio.Event):
+        try:
+            code = await asyncio.wait_for(proc.wait(), CRASH_MIN_LIFE_S)
+        except asyncio.TimeoutError:
+            if ready.is_set():
+                self.reset()  # 连上了且活过了观察期:之前的短命不再连着算
+            code = await proc.wait()
+        life = time.monotonic() - t0
+        if code in STOP_CODES:
+            return
+        metrics.inc(f"{self.name}.crash")
+        log("bridge", "own", "warn", f"{self.name} exited with {code} after {life:.1f}s")
+        if life < CRASH_MIN_LIFE_S:
+            self.failed(f"exit {code}", life)
+        else:
+            self._record(f"exit {code}", life)
+
+    def _record(self, reason: str, life: float):
+        self.ring.append({"t": int(time.time()), "why": reason, "life": round(life, 1)})
+        try:
+            data = self._load()
+            data[self.name] = list(self.ring)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # 只是排查用的记录,写不进去不影响拉起
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
@@ -4,17 +4,38 @@ bridge 收 {"ev":"log",...} 后落 decky.logger(origin=socket)。日志一律英
 """
 
 import os
+import time
+from collections import deque
 
 DEBUG = bool(os.environ.get("DECKY_MUSIC_DEBUG"))  # bridge 在 dev 模式下注入
+# release 下 debug 不发,进定长环;bridge 发 dump_debug 时才格式化、整环回包
+DEBUG_RING = 512
+RING: deque = deque(maxlen=DEBUG_RING)  # (epoch 秒, where, msg, args)
 
 
 def make_log(out):
-    """返回 log(level, where, msg):把结构化日志事件塞进 out 队列。
-    release 下不发 debug(省 IPC)。level ∈ debug|info|warn|error。"""
+    """返回 log(level, where, msg, *args):把结构化日志事件塞进 out 队列。
+    msg 可带 %-占位符,args 惰性填入(同 logging)。release 下 debug 不发(省 IPC),
+    原样记进 RING,不做格式化。level ∈ debug|info|warn|error。"""
 
-    def log(level: str, where: str, msg: str):
+    def log(level: str, where: str, msg: str, *args):
         if level == "debug" and not DEBUG:
+            RING.append((time.time(), where, msg, args))
             return
-        out.put_nowait({"ev": "log", "level": level, "where": where, "msg": msg})
+        out.put_nowait({"ev": "log", "level": level, "where": where, "msg": _fmt(msg, args)})
 
     return log
+
+
+def _fmt(msg: str, args: tuple) -> str:
+    if not args:
+        return msg
+    try:
+        return msg % args
+    except (TypeError, ValueError):
+        return f"{msg} {args!r}"
+
+
+def dump_ring() -> list[list]:
+    """dump_debug 的回包:[[epoch 毫秒, where, msg], ...],旧 → 新。"""
+    return [[int(at * 1000), where, _fmt(msg, args)] for at, where, msg, args in RING]
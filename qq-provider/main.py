@@ -1,20 +1,21 @@
-"""qq-provider:QQ 音乐 provider。qqmusic_api 作库,包一层 UDS + NDJSON server。
+"""qq-provider:QQ 音乐 provider。qqmusic_api 作库,包一层 UDS server(协议 v1 NDJSON / v2 长度前缀)。
 
 bridge 作 server,provider 启动后连入 `--socket <path>`。无状态:credential 由 bridge
 经 set_credential 注入(登录成功后 bridge 持久化),provider 不自存。用 Nuitka
 --standalone 打包(scripts/build-qq-provider.sh)。
 
 命令:set_credential / login / song_url / search / lyric / recommend / playlist_songs。
-登录是长流程,以事件上报。
+登录是长流程,以事件上报。整单类命令(STREAM_CMDS)流式回包:逐页 partial 帧 + 终帧。
 """
 
 import argparse
 import asyncio
+import contextlib
 import json
 import os
 
 import protocol
-from log import make_log  # 日志实现见 log.py
+from log import dump_ring, make_log  # 日志实现见 log.py
 from qq import (
     QQ,
     account,
@@ -34,6 +35,12 @@ from qq.library import NotLoggedIn, _as_bool, _as_int, _as_str, _limit, _offset,
 # 上游调用兜底超时(秒):每个请求独立兜底,避免断网调用永久挂住 bridge。
 # 15s < bridge 的 30s,对齐 ncm 的 NET_TIMEOUT。
 UPSTREAM_TIMEOUT = 15
+# 写出合批的单批字节上限(与 bridge Conn 的 WRITE_BUDGET 同值)
+WRITE_BUDGET = 64 * 1024
+# 流式命令:逐页拉上游、每页一帧 partial。整体上限对齐 bridge 的 STREAM_TIMEOUT(随
+# deadline 下发时以 deadline 为准),每页仍按 UPSTREAM_TIMEOUT 单独兜底。
+STREAM_CMDS = frozenset({"playlist_all", "fav_songs_all"})
+STREAM_TIMEOUT = 120
 
 
 async def main():
@@ -41,16 +48,24 @@ async def main():
     parser.add_argument("--socket", required=True)
     args = parser.parse_args()
 
-    reader, writer = await asyncio.open_unix_connection(args.socket)
+    reader, writer = await asyncio.open_unix_connection(args.socket, limit=protocol.LINE_LIMIT)
     # 设备身份要跨进程持久化(见 qq/__init__.py 的 _device_path):bridge 经环境变量注入目录
     qq = QQ(state_dir=os.environ.get("DECKY_MUSIC_STATE_DIR"))
     await qq.ensure_device()  # 先把设备身份落盘,首个请求就用稳定身份
     out: asyncio.Queue = asyncio.Queue()  # 响应 + 事件汇到单写出,避免并发写乱帧
+    # 写出协议版本:先按 v1;bridge 发来第一帧 v2(说明它认了我们的 hello)后跟着切
+    wire = {"proto": 1}
 
     async def pump():
+        # 合批:等到第一条后把队列里已攒下的一并编码,一次 write + drain(单批受字节预算约束)。
+        # 一串响应 + 日志事件因此只花一次系统调用,而不是每帧各一次 drain 往返。
         while True:
-            line = await out.get()
-            writer.write((json.dumps(line, ensure_ascii=False) + "\n").encode())
+            batch = [protocol.encode_frame(await out.get(), wire["proto"])]
+            size = len(batch[0])
+            while size < WRITE_BUDGET and not out.empty():
+                batch.append(protocol.encode_frame(out.get_nowait(), wire["proto"]))
+                size += len(batch[-1])
+            writer.write(b"".join(batch))
             await writer.drain()
 
     def emit(typ: str, **data):
@@ -59,19 +74,30 @@ async def main():
 
     log = make_log(out)
 
+    out.put_nowait(protocol.hello())
     asyncio.create_task(pump())
-    in_flight: set[asyncio.Task] = set()
+    in_flight: dict[int, asyncio.Task] = {}  # 请求 id → 任务,cancel 帧按 id 中止
 
-    def track(coro):
+    def track(rid: int, coro):
         task = asyncio.create_task(coro)
-        in_flight.add(task)
-        task.add_done_callback(in_flight.discard)
+        in_flight[rid] = task
+        task.add_done_callback(lambda t: in_flight.pop(rid) if in_flight.get(rid) is t else None)
 
-    # NDJSON:每条一行 {json}\n,UTF-8(协议 v1)。命令处理后台化,慢上游不堵读循环。
-    while line := await reader.readline():
+    # 分帧逐帧识别(v1 行 / v2 长度前缀,见 protocol.read_frame)。命令处理后台化,慢上游不堵读循环。
+    while True:
         try:
-            raw = json.loads(line)
-        except json.JSONDecodeError:
+            frame = await protocol.read_frame(reader)
+        except protocol.ProtocolError as e:
+            log("warn", "protocol", str(e))
+            continue
+        if frame is None:
+            break
+        payload, version = frame
+        if version > wire["proto"]:
+            wire["proto"] = version
+        try:
+            raw = json.loads(payload)
+        except (json.JSONDecodeError, UnicodeDecodeError):
             log("warn", "protocol", "bad json frame")
             continue
         try:
@@ -83,16 +109,42 @@ async def main():
             else:
                 log("warn", "protocol", f"bad request: {e}")
             continue
-        track(_run_request(qq, req, emit, log, out))
+        if isinstance(req, protocol.Request) and req.cmd == "ping":
+            # 心跳:读循环里直接回,不开任务。回不出来 = 事件循环被卡住(issue #44 的自旋),bridge 据此判死
+            out.put_nowait(protocol.ok(req.id))
+            continue
+        if isinstance(req, protocol.Request) and req.cmd == "dump_debug":
+            # 诊断导出:整环回包,同样不开任务(要的就是卡住时也能拿到)
+            out.put_nowait(protocol.ok(req.id, {"records": dump_ring()}))
+            continue
+        if isinstance(req, protocol.Cancel):
+            # bridge 已不再等(切歌作废 / 超时):取消任务,在途上游请求随之中止。
+            # _run_request 见到的是「本任务被取消」,照常传播、不回包。
+            task = in_flight.get(req.id)
+            if task is not None:
+                task.cancel()
+                log("debug", "cmd", "cancelled #%d", req.id)
+            continue
+        track(req.id, _run_request(qq, req, emit, log, out))
 
 
 async def _run_request(qq: QQ, req: protocol.Request, emit, log, out):
+    # 预算取 bridge 给的剩余时间与上游兜底的较小者;排队时就已过期的请求再打上游只是白占连接 ——
+    # 不打,但立刻回 deadline_exceeded:不回包的话 bridge 要干等满通道超时,再把这个好好的进程判死;
+    # 也不能回 timeout —— 那是「子进程不响应」,bridge 会拿它计熔断。
+    streaming = req.cmd in STREAM_CMDS
+    budget = req.budget(STREAM_TIMEOUT if streaming else UPSTREAM_TIMEOUT)
+    if budget is None:
+        log("debug", "cmd", "%s past deadline, dropped", req.cmd)
+        await out.put(protocol.err(req.id, "deadline_exceeded"))
+        return
     try:
-        resp = await asyncio.wait_for(handle(qq, req, emit, log), UPSTREAM_TIMEOUT)
+        work = stream(qq, req, log, out) if streaming else handle(qq, req, emit, log)
+        resp = await asyncio.wait_for(work, budget)
     except TimeoutError:
         # wait_for 取消了在途协程。别让下一条命令继续用同一条(可能已废的)连接 ——
         # 真机上出现过一次超时后全线卡死到进程重启为止,见 issue #44。
-        log("warn", "cmd", f"{req.cmd} timed out after {UPSTREAM_TIMEOUT}s, resetting http client")
+        log("warn", "cmd", f"{req.cmd} timed out after {budget:g}s, resetting http client")
         qq.reset_client()
         resp = protocol.err(req.id, "upstream_timeout")
     except asyncio.CancelledError:
@@ -115,7 +167,48 @@ async def _run_request(qq: QQ, req: protocol.Request, emit, log, out):
         log("warn", "cmd", f"{req.cmd} failed: {name}")
         code = "upstream_timeout" if "Timeout" in name else "provider_error"
         resp = protocol.err(req.id, code)
-    await out.put(resp)
+    await out.put(protocol.pack_songs(resp) if req.enc == protocol.SONG_COLUMNS else resp)
+
+
+async def stream(qq: QQ, req: protocol.Request, log, out) -> dict:
+    """流式命令:每取到一页就发一帧 partial {songs},最后回 {total} 作终帧。
+
+    单页超时抛 TimeoutError,与普通命令走 _run_request 同一套处理(换 client、回
+    upstream_timeout);中途失败时 bridge 已收的 partial 作废,以终帧的错误码为准。"""
+    try:
+        match req.cmd:
+            case "playlist_all":
+                pages = playlist.all_songs(qq, _as_str(req.args, "id"))
+            case "fav_songs_all":
+                pages = library.all_fav_songs(qq)
+            case _:
+                return protocol.err(req.id, "unknown_cmd")
+        total = 0
+        async with contextlib.aclosing(pages):
+            while True:
+                try:
+                    songs = await asyncio.wait_for(anext(pages), UPSTREAM_TIMEOUT)
+                except StopAsyncIteration:
+                    break
+                if songs:
+                    total += len(songs)
+                    frame = protocol.partial(req.id, {"songs": songs})
+                    if req.enc == protocol.SONG_COLUMNS:
+                        frame = protocol.pack_songs(frame)
+                    await out.put(frame)
+        log("debug", req.cmd, "-> %d songs", total)
+        return protocol.ok(req.id, {"total": total})
+    except NotLoggedIn:
+        return protocol.err(req.id, "not_logged_in")
+    except ValueError as e:
+        return protocol.err(req.id, "invalid_request", str(e))
+
+
+async def _prewarm(qq: QQ, log):
+    try:
+        await asyncio.wait_for(search.hot_keywords(qq, 1), UPSTREAM_TIMEOUT)
+    except Exception as e:  # 预热失败无所谓,第一条真请求照常自己建连
+        log("debug", "net_reset", "prewarm failed: %s", type(e).__name__)
 
 
 async def handle(qq: QQ, req: protocol.Request, emit, log) -> dict:
@@ -138,6 +231,15 @@ async def handle(qq: QQ, req: protocol.Request, emit, log) -> dict:
                 kind = args.get("type") or "qq"
                 qq.login_task = asyncio.create_task(login.run(qq, emit, log, kind))
                 return protocol.ok(req.id)
+            case "net_reset":
+                # bridge 发现挂起 / 换网:旧连接池里多半是死连接,下一发请求得先赔一次超时。
+                # 换新 client,后台打一发廉价请求把新连接(DNS + TLS)建好
+                qq.reset_client()
+                if qq.warm_task and not qq.warm_task.done():
+                    qq.warm_task.cancel()
+                qq.warm_task = asyncio.create_task(_prewarm(qq, log))
+                log("info", "net_reset", "client reset")
+                return protocol.ok(req.id)
             case "logout":
                 await qq.logout()
                 log("info", "logout", "done")
@@ -149,51 +251,51 @@ async def handle(qq: QQ, req: protocol.Request, emit, log) -> dict:
                 # 不能用 _as_str:它对缺失/空值抛 ValueError → invalid_request,
                 # 那会让「没带 quality 的 song_url」直接放不出歌。缺就用默认档。
                 want = args.get("quality") or playback.DEFAULT_QUALITY
-                log("debug", "song_url", f"id={song_id} want={want}")
+                log("debug", "song_url", "id=%s want=%s", song_id, want)
                 url, got = await playback.song_url(qq, song_id, args.get("media_mid", ""), want)
                 if url:
                     # 记下实际命中的档位:选了无损却降到 320k 时,没这条谁都查不出来
-                    log("debug", "song_url", f"id={song_id} want={want} got={got}")
+                    log("debug", "song_url", "id=%s want=%s got=%s", song_id, want, got)
                     return protocol.ok(req.id, {"url": url, "quality": got})
                 log("warn", "song_url", f"no playable url id={song_id} (no rights / login / VIP)")
                 return protocol.err(req.id, "no_playable")
             case "search_songs":
                 songs = await search.songs(qq, keyword(args), _limit(args), _offset(args))
-                log("debug", "search_songs", f"-> {len(songs)} songs")
+                log("debug", "search_songs", "-> %d songs", len(songs))
                 return protocol.ok(req.id, {"songs": songs})
             case "search_playlists":
                 playlists = await search.playlists(qq, keyword(args), _limit(args), _offset(args))
-                log("debug", "search_playlists", f"-> {len(playlists)} lists")
+                log("debug", "search_playlists", "-> %d lists", len(playlists))
                 return protocol.ok(req.id, {"playlists": playlists})
             case "search_albums":
                 albums = await search.albums(qq, keyword(args), _limit(args), _offset(args))
-                log("debug", "search_albums", f"-> {len(albums)} albums")
+                log("debug", "search_albums", "-> %d albums", len(albums))
                 return protocol.ok(req.id, {"albums": albums})
             case "search_artists":
                 artists = await search.artists(qq, keyword(args), _limit(args), _offset(args))
-                log("debug", "search_artists", f"-> {len(artists)} artists")
+                log("debug", "search_artists", "-> %d artists", len(artists))
                 return protocol.ok(req.id, {"artists": artists})
             case "search_hot":
                 keywords = await search.hot_keywords(qq, _limit(args))
-                log("debug", "search_hot", f"-> {len(keywords)} keywords")
+                log("debug", "search_hot", "-> %d keywords", len(keywords))
                 return protocol.ok(req.id, {"keywords": keywords})
             case "user_assets":
                 return protocol.ok(req.id, await library.user_assets(qq))
             case "liked_ids":
                 ids = await library.liked_ids(qq)
-                log("debug", "liked_ids", f"-> {len(ids)} ids")
+                log("debug", "liked_ids", "-> %d ids", len(ids))
                 return protocol.ok(req.id, {"ids": ids})
             case "toplists":
                 toplists = await top.toplists(qq)
-                log("debug", "toplists", f"-> {len(toplists)} lists")
+                log("debug", "toplists", "-> %d lists", len(toplists))
                 return protocol.ok(req.id, {"toplists": toplists})
             case "toplist_songs":
                 songs = await top.songs(qq, _as_str(args, "id"), _limit(args), _offset(args))
-                log("debug", "toplist_songs", f"-> {len(songs)} songs")
+                log("debug", "toplist_songs", "-> %d songs", len(songs))
                 return protocol.ok(req.id, {"songs": songs})
             case "fav_songs":
                 songs = await library.fav_songs(qq, _limit(args), _offset(args))
-                log("debug", "fav_songs", f"-> {len(songs)} songs")
+                log("debug", "fav_songs", "-> %d songs", len(songs))
                 return protocol.ok(req.id, {"songs": songs})
             case "created_playlists":
                 playlists = await library.created_playlists(qq, _limit(args), _offset(args))
@@ -203,11 +305,11 @@ async def handle(qq: QQ, req: protocol.Request, emit, log) -> dict:
                 return protocol.ok(req.id, {"playlists": playlists})
             case "like_song":
                 ok = await library.like_song(qq, _as_str(args, "id"), _as_bool(args, "on"))
-                log("debug", "like_song", f"id={args.get('id', '')} on={args.get('on')} -> {ok}")
+                log("debug", "like_song", "id=%s on=%s -> %s", args.get("id", ""), args.get("on"), ok)
                 return protocol.ok(req.id, {"success": ok})
             case "fav_playlist":
                 ok = await library.fav_playlist(qq, _as_int(args, "id"), _as_bool(args, "on"))
-                log("debug", "fav_playlist", f"id={args.get('id', '')} on={args.get('on')} -> {ok}")
+                log("debug", "fav_playlist", "id=%s on=%s -> %s", args.get("id", ""), args.get("on"), ok)
                 return protocol.ok(req.id, {"success": ok})
             case "add_to_playlist":
                 ok = await library.add_to_playlist(
@@ -234,12 +336,11 @@ async def handle(qq: QQ, req: protocol.Request, emit, log) -> dict:
                 return protocol.ok(req.id, {"songs": songs})
             case "recommend":
                 data = await recommend.get(qq)
-                counts = f"{len(data['playlists'])} lists, {len(data['newsongs'])} songs"
-                log("debug", "recommend", counts)
+                log("debug", "recommend", "%d lists, %d songs", len(data["playlists"]), len(data["newsongs"]))
                 return protocol.ok(req.id, data)
             case "playlist_songs":
                 songs = await playlist.songs(qq, args.get("id", ""), _limit(args), _offset(args))
-                log("debug", "playlist_songs", f"id={args.get('id', '')} -> {len(songs)} songs")
+                log("debug", "playlist_songs", "id=%s -> %d songs", args.get("id", ""), len(songs))
                 return protocol.ok(req.id, {"songs": songs})
             case "lyric":
                 mid = args.get("id", "")
@@ -248,7 +349,7 @@ async def handle(qq: QQ, req: protocol.Request, emit, log) -> dict:
                 except Exception as e:  # 歌词非命门:拉取失败不崩进程,返 provider_error
                     log("warn", "lyric", f"failed: {type(e).__name__}")
                     return protocol.err(req.id, "provider_error")
-                log("debug", "lyric", f"id={mid} -> {len(data['lines'])} lines")
+                log("debug", "lyric", "id=%s -> %d lines", mid, len(data["lines"]))
                 return protocol.ok(req.id, data)
             case _:
                 return protocol.err(req.id, "unknown_cmd")
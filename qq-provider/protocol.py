@@ -1,14 +1,34 @@
-"""bridge ↔ qq-provider 协议 v1:解码 bridge 发来的 request + 构造 response/event。
+"""bridge ↔ qq-provider 协议:分帧(v1 NDJSON / v2 长度前缀)、解码 bridge 发来的 request
++ 构造 response/event。
 
-见 issue #31。返回 dict(qq-provider 的写出队列存 dict,由 pump 统一 json.dumps)。
-日志事件构造见 log.py(make_log)。
+见 issue #31。返回 dict(qq-provider 的写出队列存 dict,由 pump 统一 encode_frame)。
+日志事件构造见 log.py(make_log)。分帧与 bridge 的 py_modules/protocol.py、wire crate
+是同一份规格,改一处三处一起改。
 """
 
+import asyncio
+import json
+import os
+import time
 from dataclasses import dataclass
 from typing import Any
 
 JsonObject = dict[str, Any]
 
+# 本端支持的最高协议版本,连入后经 hello 事件告诉 bridge。
+PROTO_VERSION = 2
+# v2 帧 = 4 字节大端长度 + JSON;上限 16 MiB - 1,长度头首字节恒为 0x00(v1 行首是 "{")。
+MAX_FRAME = (1 << 24) - 1
+# v1 单行上限。asyncio 默认 64 KiB,连 bridge 时显式放大。
+LINE_LIMIT = 1 << 20
+# 给回包 + IPC 留的余量(秒):provider 必须赶在 bridge 的 deadline 之前把错误回过去。
+DEADLINE_MARGIN = 1.0
+# 歌曲列表的列式编码(bridge 在请求 enc 里声明能解才用)。短列表表头占比大,不值得编码。
+SONG_COLUMNS = "cols"
+COLUMNAR_MIN = 8
+# 做前缀字典压缩的字段(QQ 封面 URL 都是同一串 CDN 模板 + 专辑 mid)
+PREFIX_FIELDS = ("cover",)
+
 
 class ProtocolError(Exception):
     """请求解码/校验失败。"""
@@ -19,11 +39,70 @@ class Request:
     id: int
     cmd: str
     args: JsonObject
+    deadline: int | None = None  # bridge 给的绝对截止时刻,墙钟 epoch 毫秒
+    enc: str | None = None  # bridge 能解的可选响应编码(SONG_COLUMNS)
+
+    def budget(self, cap: float) -> float | None:
+        """本请求可用的上游预算(秒),不超过 cap;已过期(扣掉余量后)返回 None。"""
+        if self.deadline is None:
+            return cap
+        left = self.deadline / 1000 - time.time() - DEADLINE_MARGIN
+        return min(cap, left) if left > 0 else None
+
 
+@dataclass(frozen=True)
+class Cancel:
+    """bridge 不再等 id 的响应:中止对应任务,不回包。"""
+
+    id: int
 
-def decode_request(raw: object) -> Request:
+
+def encode_frame(msg: JsonObject, version: int = 1) -> bytes:
+    """按协议版本编码一帧:v1 = JSON + "\n";v2 = 4 字节大端长度 + JSON。"""
+    body = json.dumps(msg, ensure_ascii=False).encode()
+    if version < 2:
+        return body + b"\n"
+    if len(body) > MAX_FRAME:
+        raise ProtocolError(f"frame too large: {len(body)} bytes")
+    return len(body).to_bytes(4, "big") + body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[bytes, int] | None:
+    """读一帧 → (载荷, 版本);EOF 返回 None。首字节 0x00 是 v2 长度头,否则是 v1 的一行。
+    超过 LINE_LIMIT 的行丢到它的换行为止再抛 ProtocolError,流仍对齐。"""
+    try:
+        head = await reader.readexactly(1)
+        if head == b"\x00":
+            n = int.from_bytes(await reader.readexactly(3), "big")
+            return await reader.readexactly(n), 2
+        return head + await reader.readuntil(b"\n"), 1
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        await _skip_line(reader)
+        raise ProtocolError("line too long") from None
+
+
+async def _skip_line(reader: asyncio.StreamReader):
+    """丢到下一个换行(含)为止:这一行余下的字节不能当成下一帧。"""
+    while True:
+        try:
+            await reader.readuntil(b"\n")
+            return
+        except asyncio.LimitOverrunError as e:
+            await reader.readexactly(e.consumed)
+        except asyncio.IncompleteReadError:
+            return
+
+
+def decode_request(raw: object) -> Request | Cancel:
     if not isinstance(raw, dict):
         raise ProtocolError("request is not an object")
+    if "cancel" in raw:
+        cid = raw["cancel"]
+        if not isinstance(cid, int) or isinstance(cid, bool):
+            raise ProtocolError("cancel missing integer id")
+        return Cancel(cid)
     rid = raw.get("id")
     if not isinstance(rid, int) or isinstance(rid, bool):
         raise ProtocolError("request missing integer id")
@@ -33,13 +112,80 @@ def decode_request(raw: object) -> Request:
     args = raw.get("args", {})
     if not isinstance(args, dict):
         raise ProtocolError("request args is not an object")
-    return Request(rid, cmd, args)
+    deadline = raw.get("deadline")
+    if deadline is not None and (not isinstance(deadline, int) or isinstance(deadline, bool)):
+        raise ProtocolError("request deadline is not an integer")
+    enc = raw.get("enc")
+    if enc is not None and not isinstance(enc, str):
+        raise ProtocolError("request enc is not a string")
+    return Request(rid, cmd, args, deadline, enc)
 
 
 def ok(id: int, data: JsonObject | None = None) -> JsonObject:
     return {"id": id, "ok": True, "data": data or {}}
 
 
+def partial(id: int, data: JsonObject) -> JsonObject:
+    """流式响应的中间帧;同 id 最后仍以 ok/err 收尾(done 帧)。"""
+    return {"id": id, "partial": data}
+
+
+def pack_songs(msg: JsonObject) -> JsonObject:
+    """把响应 / partial 里的 songs 换成列式编码(见 encode_songs);其余消息原样返回。"""
+    key = "data" if "data" in msg else "partial"
+    body = msg.get(key)
+    if not isinstance(body, dict):
+        return msg
+    songs = body.get("songs")
+    if not isinstance(songs, list) or len(songs) < COLUMNAR_MIN:
+        return msg
+    if not all(isinstance(s, dict) for s in songs):
+        return msg
+    return {**msg, key: {**body, "songs": encode_songs(songs)}}
+
+
+def encode_songs(songs: list[JsonObject]) -> JsonObject:
+    """Song dict 数组 → {cols, rows, prefixes}。字段名只出现一次;PREFIX_FIELDS 里的字段按
+    「最后一个 / 之前的目录」分组取公共前缀,单元格写成 [前缀下标, 余下部分]。
+    解码见 bridge py_modules/protocol.py iter_songs,改一处两处一起改。"""
+    cols = list(songs[0])
+    for s in songs:  # 个别条目多出的字段也要保住
+        cols += [k for k in s if k not in cols]
+    rows = [[s.get(c, "") for c in cols] for s in songs]
+    prefixes = {}
+    for field in PREFIX_FIELDS:
+        if field not in cols:
+            continue
+        i = cols.index(field)
+        table, index = _prefix_table([r[i] for r in rows])
+        if not table:
+            continue
+        prefixes[field] = table
+        for r in rows:
+            v = r[i]
+            if isinstance(v, str) and (p := index.get(v[: v.rfind("/") + 1])) is not None:
+                r[i] = [p, v[len(table[p]) :]]  # 组内公共前缀,必然是 v 的前缀
+    out: JsonObject = {"cols": cols, "rows": rows}
+    if prefixes:
+        out["prefixes"] = prefixes
+    return out
+
+
+def _prefix_table(values: list) -> tuple[list[str], dict[str, int]]:
+    """按目录分组,每组(≥2 个值)取公共前缀 → (前缀表, 目录 → 前缀下标)。"""
+    groups: dict[str, list[str]] = {}
+    for v in values:
+        if isinstance(v, str) and "/" in v:
+            groups.setdefault(v[: v.rfind("/") + 1], []).append(v)
+    table, index = [], {}
+    for d, vs in groups.items():
+        if len(vs) < 2:
+            continue
+        index[d] = len(table)
+        table.append(os.path.commonprefix([min(vs), max(vs)]))
+    return table, index
+
+
 def err(id: int, code: str, message: str | None = None) -> JsonObject:
     return {"id": id, "ok": False, "error": {"code": code, "message": message or code}}
 
@@ -50,3 +196,8 @@ def event(ev: str, typ: str, data: JsonObject | None = None) -> JsonObject:
 
 def login_event(typ: str, data: JsonObject | None = None) -> JsonObject:
     return event("login", typ, data)
+
+
+def hello() -> JsonObject:
+    """连入后的首帧:声明本端支持的最高协议版本。"""
+    return event("hello", "hello", {"proto": PROTO_VERSION})
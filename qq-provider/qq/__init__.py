@@ -58,6 +58,7 @@ class QQ:
         # 库内部结构变动时的兜底 guid(进程内稳定)。正常路径见 get_guid()。
         self._fallback_guid = uuid.uuid4().hex
         self.login_task: asyncio.Task | None = None  # 在跑的登录轮询;新登录来时顶掉
+        self.warm_task: asyncio.Task | None = None  # net_reset 后的连接预热,见 main.handle
 
     async def ensure_device(self) -> None:
         """启动时把设备身份落到盘上并收紧权限。
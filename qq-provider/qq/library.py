@@ -4,6 +4,9 @@ from qq.search import _playlist_brief, _song_brief
 
 FAV_DIRID = 201
 MAX_LIMIT = 50
+# 流式整单:每页 STREAM_PAGE 首(与 liked_ids 的 num=500 同一实证上限),MAX 兜底防翻页不收敛
+STREAM_PAGE = 500
+MAX_STREAM_SONGS = 5000
 
 
 class NotLoggedIn(Exception):
@@ -109,6 +112,19 @@ async def fav_songs(q, limit: int = 20, offset: int = 0) -> list[dict]:
     return [_song_brief(s) for s in resp.songs[skip : skip + limit]]
 
 
+async def all_fav_songs(q):
+    """「我喜欢」整单逐页产出(流式命令 fav_songs_all 用)。页大小同 liked_ids 的实证上限。"""
+    cred = _credential(q)
+    for page in range(1, MAX_STREAM_SONGS // STREAM_PAGE + 1):
+        resp = await q.client.user.get_fav_song(
+            cred.encrypt_uin, page=page, num=STREAM_PAGE, credential=cred
+        )
+        songs = getattr(resp, "songs", None) or []
+        yield [_song_brief(s) for s in songs]
+        if len(songs) < STREAM_PAGE:
+            return
+
+
 async def created_playlists(q, limit: int = 20, offset: int = 0) -> list[dict]:
     cred = _credential(q)
     resp = await q.client.user.get_created_songlist(cred.musicid, credential=cred)
@@ -2,8 +2,22 @@
 
 from qq.search import _page_args, _song_brief
 
+# 流式整单(playlist_all):每页取数,短页即末页;MAX_SONGS 兜底防上游翻页不收敛
+STREAM_PAGE = 100
+MAX_SONGS = 5000
+
 
 async def songs(q, playlist_id: str, limit: int = 50, offset: int = 0) -> list[dict]:
     page, num, skip = _page_args(limit, offset)
     resp = await q.client.songlist.get_detail(int(playlist_id), num=num, page=page, onlysong=True)
     return [_song_brief(s) for s in resp.songs[skip : skip + limit]]
+
+
+async def all_songs(q, playlist_id: str):
+    """整单逐页产出 Song 列表(流式命令 playlist_all 用,每页一帧 partial)。"""
+    pid = int(playlist_id)
+    for page in range(1, MAX_SONGS // STREAM_PAGE + 1):
+        resp = await q.client.songlist.get_detail(pid, num=STREAM_PAGE, page=page, onlysong=True)
+        yield [_song_brief(s) for s in resp.songs]
+        if len(resp.songs) < STREAM_PAGE:
+            return
@@ -3,8 +3,11 @@
 运行:(cd qq-provider && uv run python -m unittest discover tests)
 """
 
+import asyncio
+import json
 import os
 import sys
+import time
 import unittest
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -37,6 +40,46 @@ class TestDecodeRequest(unittest.TestCase):
         with self.assertRaises(protocol.ProtocolError):
             protocol.decode_request({"id": 1, "cmd": "x", "args": []})
 
+    def test_cancel_frame(self):
+        self.assertEqual(protocol.decode_request({"cancel": 7}), protocol.Cancel(7))
+
+    def test_cancel_bad_id(self):
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_request({"cancel": "7"})
+
+    def test_deadline_optional(self):
+        self.assertIsNone(protocol.decode_request({"id": 1, "cmd": "x"}).deadline)
+        r = protocol.decode_request({"id": 1, "cmd": "x", "deadline": 1700000000000})
+        self.assertEqual(r.deadline, 1700000000000)
+
+    def test_deadline_not_int(self):
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_request({"id": 1, "cmd": "x", "deadline": "soon"})
+
+    def test_enc(self):
+        self.assertIsNone(protocol.decode_request({"id": 1, "cmd": "x"}).enc)
+        self.assertEqual(protocol.decode_request({"id": 1, "cmd": "x", "enc": "cols"}).enc, "cols")
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_request({"id": 1, "cmd": "x", "enc": 1})
+
+
+class TestBudget(unittest.TestCase):
+    def test_no_deadline_uses_cap(self):
+        self.assertEqual(protocol.Request(1, "x", {}).budget(15), 15)
+
+    def test_remaining_minus_margin(self):
+        deadline = int((time.time() + 5) * 1000)
+        b = protocol.Request(1, "x", {}, deadline).budget(15)
+        self.assertTrue(3.5 < b <= 5 - protocol.DEADLINE_MARGIN, b)
+
+    def test_capped(self):
+        deadline = int((time.time() + 60) * 1000)
+        self.assertEqual(protocol.Request(1, "x", {}, deadline).budget(15), 15)
+
+    def test_expired(self):
+        deadline = int((time.time() + 0.5) * 1000)  # 扣掉余量就已经没了
+        self.assertIsNone(protocol.Request(1, "x", {}, deadline).budget(15))
+
 
 class TestBuild(unittest.TestCase):
     def test_ok(self):
@@ -51,6 +94,9 @@ class TestBuild(unittest.TestCase):
             {"id": 6, "ok": False, "error": {"code": "no_playable", "message": "no_playable"}},
         )
 
+    def test_partial(self):
+        self.assertEqual(protocol.partial(4, {"songs": []}), {"id": 4, "partial": {"songs": []}})
+
     def test_event(self):
         self.assertEqual(
             protocol.event("player", "ended"), {"ev": "player", "type": "ended", "data": {}}
@@ -63,5 +109,89 @@ class TestBuild(unittest.TestCase):
         )
 
 
+class TestSongColumns(unittest.TestCase):
+    COVER = "https://y.qq.com/music/photo_new/T002R300x300M000"
+
+    def songs(self, n):
+        return [
+            {"mid": f"m{i}", "name": "n", "cover": f"{self.COVER}{i % 3}.jpg" if i % 4 else ""}
+            for i in range(n)
+        ]
+
+    def test_encode_shares_cover_prefix(self):
+        enc = protocol.encode_songs(self.songs(8))
+        self.assertEqual(enc["cols"], ["mid", "name", "cover"])
+        self.assertEqual(enc["prefixes"], {"cover": [self.COVER]})
+        self.assertEqual(enc["rows"][0], ["m0", "n", ""])
+        self.assertEqual(enc["rows"][1], ["m1", "n", [0, "1.jpg"]])
+
+    def test_lone_url_is_not_prefixed(self):
+        songs = [{"mid": "a", "cover": "http://x/a.jpg"}, {"mid": "b", "cover": ""}]
+        enc = protocol.encode_songs(songs)
+        self.assertNotIn("prefixes", enc)
+        self.assertEqual(enc["rows"][0], ["a", "http://x/a.jpg"])
+
+    def test_extra_fields_survive(self):
+        enc = protocol.encode_songs([{"mid": "a"}, {"mid": "b", "vip": True}])
+        self.assertEqual(enc["cols"], ["mid", "vip"])
+        self.assertEqual(enc["rows"], [["a", ""], ["b", True]])
+
+    def test_pack_songs_only_long_lists(self):
+        short = protocol.ok(1, {"songs": self.songs(protocol.COLUMNAR_MIN - 1)})
+        self.assertIs(protocol.pack_songs(short), short)
+        packed = protocol.pack_songs(protocol.partial(2, {"songs": self.songs(10)}))
+        self.assertEqual(len(packed["partial"]["songs"]["rows"]), 10)
+        err = protocol.err(3, "timeout")
+        self.assertIs(protocol.pack_songs(err), err)
+
+
+class TestFraming(unittest.TestCase):
+    def _read_all(self, data: bytes):
+        async def run():
+            r = asyncio.StreamReader(limit=protocol.LINE_LIMIT)
+            r.feed_data(data)
+            r.feed_eof()
+            out = []
+            while (frame := await protocol.read_frame(r)) is not None:
+                out.append(frame)
+            return out
+
+        return asyncio.run(run())
+
+    def test_v1_and_v2_frames_mix(self):
+        data = protocol.encode_frame({"id": 1, "cmd": "a"}) + protocol.encode_frame(
+            {"id": 2, "cmd": "b"}, 2
+        )
+        frames = self._read_all(data)
+        self.assertEqual([(json.loads(p)["cmd"], v) for p, v in frames], [("a", 1), ("b", 2)])
+
+    def test_v2_keeps_non_ascii_as_utf8(self):
+        f = protocol.encode_frame({"keyword": "周杰伦"}, 2)
+        self.assertEqual(int.from_bytes(f[:4], "big"), len(f) - 4)
+        self.assertEqual(json.loads(f[4:]), {"keyword": "周杰伦"})
+
+    def test_over_limit_line_is_skipped_to_its_newline(self):
+        async def run():
+            r = asyncio.StreamReader(limit=64)
+            r.feed_data(b"{" + b"x" * 200)
+
+            def rest():
+                r.feed_data(b"x" * 100 + b"\n" + protocol.encode_frame({"id": 1, "cmd": "a"}))
+                r.feed_eof()
+
+            asyncio.get_running_loop().call_later(0.01, rest)
+            with self.assertRaises(protocol.ProtocolError):
+                await protocol.read_frame(r)
+            return await protocol.read_frame(r)
+
+        payload, _ = asyncio.run(run())
+        self.assertEqual(json.loads(payload)["cmd"], "a")
+
+    def test_hello(self):
+        self.assertEqual(
+            protocol.hello(), {"ev": "hello", "type": "hello", "data": {"proto": 2}}
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
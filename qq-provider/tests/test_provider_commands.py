@@ -3,17 +3,20 @@
 import asyncio
 import os
 import sys
+import time
 import unittest
 from types import SimpleNamespace
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
+import log as log_mod  # noqa: E402
 import main as main_mod  # noqa: E402
 import protocol  # noqa: E402
 from main import _run_request, handle  # noqa: E402
 from qq import (  # noqa: E402
     QQ,  # noqa: E402
     library,
+    playlist,
     search,
 )
 from qq import account as account_mod  # noqa: E402
@@ -172,6 +175,21 @@ class TestProviderDispatch(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(resp["ok"], False)
         self.assertEqual(resp["error"]["code"], "not_logged_in")
 
+    async def test_net_reset_swaps_client_and_prewarms(self):
+        warmed = []
+
+        async def hot(q, limit=20):
+            warmed.append(limit)
+            return []
+
+        self.patch(search, "hot_keywords", hot)
+        qq = SimpleNamespace(resets=0, warm_task=None)
+        qq.reset_client = lambda: setattr(qq, "resets", qq.resets + 1)
+        resp = await handle(qq, protocol.Request(6, "net_reset", {}), None, lambda *a: None)
+        await qq.warm_task
+        self.assertEqual(resp, protocol.ok(6))
+        self.assertEqual((qq.resets, warmed), (1, [1]))
+
 
 class TestProviderLoginRequired(unittest.IsolatedAsyncioTestCase):
     async def test_user_assets_requires_credential_before_upstream(self):
@@ -251,6 +269,45 @@ class TestTimeoutResetsClient(unittest.IsolatedAsyncioTestCase):
         self.assertIs(qq.client, old, "没超时就别重建,否则每次都白付握手成本")
 
 
+class TestDeadlineBudget(unittest.IsolatedAsyncioTestCase):
+    """bridge 给的 deadline 收紧上游预算;排队时就过期的请求不打上游,立刻回 deadline_exceeded。"""
+
+    async def test_expired_request_is_answered_without_upstream(self):
+        out = asyncio.Queue()
+        called = []
+
+        async def spy(*_a, **_k):
+            called.append(1)
+            return protocol.ok(1, {})
+
+        original, main_mod.handle = main_mod.handle, spy
+        try:
+            req = protocol.Request(1, "search_hot", {}, int(time.time() * 1000) - 1)
+            await main_mod._run_request(QQ(), req, None, lambda *a: None, out)
+        finally:
+            main_mod.handle = original
+        self.assertEqual(called, [])
+        resp = out.get_nowait()  # bridge 据此立刻了结,不会等满超时再判死
+        self.assertEqual((resp["id"], resp["ok"], resp["error"]["code"]), (1, False, "deadline_exceeded"))
+
+    async def test_deadline_shortens_upstream_budget(self):
+        out = asyncio.Queue()
+
+        async def hang(*_a, **_k):
+            await asyncio.sleep(3600)
+
+        original, main_mod.handle = main_mod.handle, hang
+        try:
+            deadline = int((time.time() + protocol.DEADLINE_MARGIN + 0.1) * 1000)
+            req = protocol.Request(1, "search_hot", {}, deadline)
+            t0 = time.monotonic()
+            await main_mod._run_request(QQ(), req, None, lambda *a: None, out)
+        finally:
+            main_mod.handle = original
+        self.assertLess(time.monotonic() - t0, 1, "应按剩余预算超时,而不是等满 UPSTREAM_TIMEOUT")
+        self.assertEqual(out.get_nowait()["error"]["code"], "upstream_timeout")
+
+
 class TestCancelledErrorDoesNotEscape(unittest.IsolatedAsyncioTestCase):
     """CancelledError 是 BaseException,except Exception 接不住(issue #44)。
 
@@ -308,6 +365,79 @@ class TestCancelledErrorDoesNotEscape(unittest.IsolatedAsyncioTestCase):
         self.assertIsNotNone(qq_new)
 
 
+class TestStreamCommands(unittest.IsolatedAsyncioTestCase):
+    """整单命令逐页发 partial,终帧只带 total;失败时终帧带错误码。"""
+
+    def patch(self, module, name, fn):
+        original = getattr(module, name)
+        setattr(module, name, fn)
+        self.addCleanup(setattr, module, name, original)
+
+    async def _drain(self, req):
+        out = asyncio.Queue()
+        await _run_request(object(), req, None, lambda *a: None, out)
+        frames = []
+        while not out.empty():
+            frames.append(out.get_nowait())
+        return frames
+
+    async def test_playlist_all_sends_one_partial_per_page(self):
+        seen = {}
+
+        async def pages(_q, playlist_id):
+            seen["id"] = playlist_id
+            yield [{"mid": "a"}, {"mid": "b"}]
+            yield []  # 空页不发帧
+            yield [{"mid": "c"}]
+
+        self.patch(playlist, "all_songs", pages)
+        frames = await self._drain(protocol.Request(7, "playlist_all", {"id": "42"}))
+        self.assertEqual(seen["id"], "42")
+        self.assertEqual(
+            frames,
+            [
+                protocol.partial(7, {"songs": [{"mid": "a"}, {"mid": "b"}]}),
+                protocol.partial(7, {"songs": [{"mid": "c"}]}),
+                protocol.ok(7, {"total": 3}),
+            ],
+        )
+
+    async def test_columnar_when_requested(self):
+        songs = [{"mid": str(i), "cover": f"http://img/{i}.jpg"} for i in range(10)]
+
+        async def pages(_q, _pid):
+            yield songs
+
+        self.patch(playlist, "all_songs", pages)
+        req = protocol.Request(9, "playlist_all", {"id": "1"}, enc=protocol.SONG_COLUMNS)
+        first, _done = await self._drain(req)
+        self.assertEqual(first["partial"]["songs"], protocol.encode_songs(songs))
+
+    async def test_fav_songs_all_not_logged_in(self):
+        async def pages(_q):
+            raise NotLoggedIn()
+            yield  # pragma: no cover - 让它成为异步生成器
+
+        self.patch(library, "all_fav_songs", pages)
+        frames = await self._drain(protocol.Request(8, "fav_songs_all", {}))
+        self.assertEqual(frames, [protocol.err(8, "not_logged_in")])
+
+    async def test_all_songs_stops_on_short_page(self):
+        calls = []
+
+        class Songlist:
+            async def get_detail(self, pid, num, page, onlysong):
+                calls.append(page)
+                count = num if page == 1 else 1
+                return SimpleNamespace(songs=[SimpleNamespace()] * count)
+
+        self.patch(playlist, "_song_brief", lambda _s: {"mid": "x"})
+        q = SimpleNamespace(client=SimpleNamespace(songlist=Songlist()))
+        got = [len(p) async for p in playlist.all_songs(q, "5")]
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(got, [playlist.STREAM_PAGE, 1])
+
+
 class TestProviderConcurrency(unittest.IsolatedAsyncioTestCase):
     async def test_fast_read_response_is_not_blocked_by_slow_read(self):
         slow_started = asyncio.Event()
@@ -354,5 +484,40 @@ class TestProviderConcurrency(unittest.IsolatedAsyncioTestCase):
         await asyncio.gather(slow, fast)
 
 
+class TestDebugRing(unittest.TestCase):
+    def setUp(self):
+        self._saved = log_mod.DEBUG
+        log_mod.DEBUG = False  # release
+        log_mod.RING.clear()
+        self.addCleanup(lambda: setattr(log_mod, "DEBUG", self._saved))
+
+    def test_release_debug_goes_to_ring_unformatted(self):
+        formatted = []
+
+        class Probe:
+            def __str__(self):
+                formatted.append(1)
+                return "probe"
+
+        out = asyncio.Queue()
+        log = log_mod.make_log(out)
+        log("debug", "song_url", "id=%s want=%s", Probe(), "high")
+        log("info", "credential", "injected %s", "ok")
+        self.assertEqual(out.get_nowait()["msg"], "injected ok")
+        self.assertTrue(out.empty())  # debug 没走 IPC
+        self.assertEqual(formatted, [])  # 记环时不格式化
+        records = log_mod.dump_ring()
+        self.assertEqual([r[1:] for r in records], [["song_url", "id=probe want=high"]])
+        self.assertIsInstance(records[0][0], int)
+
+    def test_ring_keeps_only_the_latest(self):
+        log = log_mod.make_log(asyncio.Queue())
+        for i in range(log_mod.DEBUG_RING + 10):
+            log("debug", "cmd", "n=%d", i)
+        records = log_mod.dump_ring()
+        self.assertEqual(len(records), log_mod.DEBUG_RING)
+        self.assertEqual(records[-1][2], f"n={log_mod.DEBUG_RING + 9}")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,11 @@
-import { ButtonItem, DropdownItem, Navigation, PanelSection, PanelSectionRow } from "@decky/ui";
+import {
+  ButtonItem,
+  DropdownItem,
+  Navigation,
+  PanelSection,
+  PanelSectionRow,
+  ToggleField,
+} from "@decky/ui";
 import { toaster } from "@decky/api";
 import { useEffect, useState } from "react";
 
@@ -18,7 +25,7 @@ import {
 import { ROUTE } from "./Page";
 import { ErrorBanner } from "./ErrorBanner";
 import { Footer } from "./Footer";
-import { guard, reportError } from "./errors";
+import { clearError, guard, reportError } from "./errors";
 import { t } from "./i18n";
 import { setProviderSelected } from "./steamMenu";
 
@@ -39,6 +46,7 @@ const S = {
   primed: false,
   cacheSize: null as number | null,
   quality: null as Quality | null,
+  hotStandby: false,
 };
 
 function loginStatusText(status: string): string {
@@ -68,6 +76,8 @@ export function QAM() {
   const setCacheSize = (n: number | null) => ((S.cacheSize = n), ssz(n));
   const [quality, sqa] = useState<Quality | null>(S.quality);
   const setQuality = (q: Quality | null) => ((S.quality = q), sqa(q));
+  const [hotStandby, shs] = useState(S.hotStandby);
+  const setHotStandby = (on: boolean) => ((S.hotStandby = on), shs(on));
   const [confirmData, setConfirmData] = useState(false);
 
   const showAccount = async () => {
@@ -103,6 +113,15 @@ export function QAM() {
   // provider 进程级错误(如启动超时):报错并从加载态兜回选源,不然会永远卡"加载中"
   useEffect(() => {
     return onProvider((e) => {
+      if (e.type === "offline") {
+        // 熔断:两个面各挂一条横幅,恢复时撤下(期间各请求的 offline 失败落在同一条上,不叠)
+        const msg = errorText("offline");
+        for (const scope of ["qam", "page"] as const) {
+          if (e.data.offline) reportError(msg, scope);
+          else clearError(msg, scope);
+        }
+        return;
+      }
       reportError(errorText(e.data.code), "qam");
       if (S.view === "loading" || S.view === "qr") setView("pick");
     });
@@ -172,6 +191,10 @@ export function QAM() {
         .getQuality()
         .then(setQuality)
         .catch(() => {});
+      api
+        .getHotStandby()
+        .then(setHotStandby)
+        .catch(() => {});
     }
   }, [view]);
 
@@ -184,6 +207,17 @@ export function QAM() {
     }
   };
 
+  // 诊断文件落在日志目录,随后刷新一下占用
+  const doDumpDiagnostics = async () => {
+    try {
+      await api.dumpDiagnostics();
+      toaster.toast({ title: t("music"), body: t("diagnosticsSaved") });
+      setCacheSize(await api.getCacheSize());
+    } catch (e) {
+      reportError(e instanceof Error ? e.message : String(e), "qam");
+    }
+  };
+
   // 两段式确认:首点变确认标签,~4s 未再点自动复原(@decky/ui 的 ConfirmModal 本项目被混淆不可导入)
   const doClearData = async () => {
     if (!confirmData) {
@@ -368,6 +402,14 @@ export function QAM() {
           <PanelSectionRow>
             <div style={{ fontSize: "0.75em", opacity: 0.6 }}>{t("qualityDesc")}</div>
           </PanelSectionRow>
+          <PanelSectionRow>
+            <ToggleField
+              label={t("hotStandby")}
+              description={t("hotStandbyDesc")}
+              checked={hotStandby}
+              onChange={(on) => guard(async () => setHotStandby(await api.setHotStandby(on)))}
+            />
+          </PanelSectionRow>
         </PanelSection>
       )}
       {(view === "pick" || view === "account") && (
@@ -382,6 +424,11 @@ export function QAM() {
               {t("clearCache")}
             </ButtonItem>
           </PanelSectionRow>
+          <PanelSectionRow>
+            <ButtonItem layout="below" onClick={doDumpDiagnostics}>
+              {t("dumpDiagnostics")}
+            </ButtonItem>
+          </PanelSectionRow>
           <PanelSectionRow>
             <ButtonItem layout="below" onClick={doClearData}>
               {confirmData ? t("clearDataConfirm") : t("clearData")}
@@ -9,13 +9,19 @@ import { t } from "./i18n";
 // 非已知 code(= 库抛出的原始错误)原样显示,便于把真实错误暴露给用户。
 const ERR_CODES: Record<string, string> = {
   timeout: "errTimeout",
+  // 请求在 provider 那里排到时调用方的 deadline 已过:对用户同样是「超时,请重试」
+  deadline_exceeded: "errTimeout",
   // 区分两种超时:timeout = 后端整体不响应;upstream_timeout = 音乐源单次请求超时
   // (常见于打游戏抢带宽)。后者会先原地重试同一首,重试再失败才报到这里。
   upstream_timeout: "errUpstreamTimeout",
+  // bridge 熔断打开(上游连续超时):请求直接快速失败,恢复由 provider/offline 事件通知
+  offline: "errOffline",
   no_playable: "playError",
   play_failed: "playError",
   provider_start_timeout: "errProviderStart",
   provider_start_failed: "errProviderStart",
+  // provider 反复起不来 / 一起就崩:bridge 退避期内不再拉起,重试也没用
+  provider_crash_loop: "errProviderCrashLoop",
   player_start_failed: "errPlayerStart",
   // 首开分类:fetch_timeout = 慢网(等等再试),fetch_failed = 断网/连不上(查网络);
   // 中途断流也走 fetch_failed,同属网络异常
@@ -31,6 +37,9 @@ const ERR_CODES: Record<string, string> = {
   login_account_restricted: "errLoginRestricted",
   login_rate_limit: "errLoginRateLimit",
   provider_error: "errProvider",
+  // 整单流式拉取途中音乐源进程没了(崩溃 / 被判死);下一次请求会把它重新拉起
+  provider_gone: "errProvider",
+  no_results: "noResults", // 整单播放(play_all)取回空列表
 };
 export function errorText(msg: string): string {
   const key = ERR_CODES[msg];
@@ -147,6 +156,11 @@ export const api = {
   getDiscover: callable<[], DiscoverData>("get_discover"),
   getDailySongs: callable<[], SearchResult>("get_daily_songs"),
   playQueue: callable<[items: QueueItem[], startIndex: number], void>("play_queue"),
+  // 整单播放:bridge 经流式请求取全(不受前端已翻页数限制),开播后由 track 事件同步
+  playAll: callable<
+    [kind: "playlist" | "fav", itemId: string],
+    { ok: boolean; error?: string | null; count?: number }
+  >("play_all"),
   getPlayback: callable<[], PlaybackState>("get_playback"),
   playRadio: callable<[kind: RadioKind], { ok: boolean; error?: string | null }>("play_radio"),
   fmTrash: callable<[], void>("fm_trash"),
@@ -184,9 +198,14 @@ export const api = {
   // 音质上限。set 返回实际生效值(非法值被 bridge 拒掉时用于回填),只对下一首生效。
   getQuality: callable<[], Quality>("get_quality"),
   setQuality: callable<[quality: Quality], Quality>("set_quality"),
+  // 热备:另一家(已登录过的)音乐源常驻后台,切换即时。默认关;内存吃紧/闲置时 bridge 会自动收掉。
+  getHotStandby: callable<[], boolean>("get_hot_standby"),
+  setHotStandby: callable<[on: boolean], boolean>("set_hot_standby"),
   clearCache: callable<[], number>("clear_cache"),
   getCacheSize: callable<[], number>("get_cache_size"),
   clearData: callable<[], void>("clear_data"),
+  // 诊断导出:各进程最近的 debug 记录 + 指标 + 崩溃记录写进日志目录,返回文件名
+  dumpDiagnostics: callable<[], string>("dump_diagnostics"),
 };
 
 // 队列项:id(+QQ media_mid)供 bridge 解析地址;名/歌手/封面/时长供 bridge 存为真相源、回灌 UI。
@@ -273,11 +292,10 @@ export type LoginEvent =
   | { ev: "login"; type: "refuse"; data: Record<string, never> }
   | { ev: "login"; type: "error"; data: { code: string; message: string } };
 
-export type ProviderEvent = {
-  ev: "provider";
-  type: "error";
-  data: { code: string; message: string };
-};
+export type ProviderEvent =
+  | { ev: "provider"; type: "error"; data: { code: string; message: string } }
+  // 熔断状态汇总:offline=有命令分级在熔断;classes 为打开着的分级(browse/resolve/…)
+  | { ev: "provider"; type: "offline"; data: { offline: boolean; classes: string[] } };
 
 // 来自 Decky event bus 的是 unknown,先 guard 形状再交给组件,畸形事件直接忽略,不崩 UI。
 function isDomainEvent(v: unknown, ev: string): v is { ev: string; type: string; data: any } {
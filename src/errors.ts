@@ -12,6 +12,11 @@ export function reportError(msg: string | null, scope: ErrorScope = "page") {
   for (const l of listeners[scope]) l(msg);
 }
 
+/** 只在当前显示的仍是 msg 时清掉(恢复通知别误撤后来的其它错误)。 */
+export function clearError(msg: string, scope: ErrorScope = "page") {
+  if (current[scope] === msg) reportError(null, scope);
+}
+
 /** 订阅当前错误。返回 [消息, 清除函数]。 */
 export function useError(scope: ErrorScope = "page") {
   const [msg, setMsg] = useState<string | null>(current[scope]);
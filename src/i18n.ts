@@ -85,7 +85,9 @@ const STRINGS: Record<Lang, Record<string, string>> = {
     back: "返回",
     errTimeout: "请求超时,请重试",
     errUpstreamTimeout: "音乐源响应超时,请稍后重试",
+    errOffline: "音乐源暂时连不上,网络恢复后会自动重连",
     errProviderStart: "音乐源启动失败,请重试",
+    errProviderCrashLoop: "音乐源反复崩溃,稍后自动重试;持续出现请重装插件",
     errPlayerStart: "播放器启动失败,请尝试重新安装插件",
     errPlayback: "播放失败,请重试",
     errNetSlow: "网络缓慢,加载超时,请稍后重试",
@@ -107,10 +109,14 @@ const STRINGS: Record<Lang, Record<string, string>> = {
     quality_high: "高品质 320k",
     quality_lossless: "无损",
     qualityDesc: "按上限自动降级,无版权或非会员的歌曲仍会以较低音质播放。切歌后生效。",
+    hotStandby: "快速切换音乐源",
+    hotStandbyDesc: "让另一个已登录的音乐源在后台待命,切换即时完成。多占一些内存,游戏吃紧或长时间不切换时会自动释放。",
     storage: "存储",
     cacheUsage: "缓存占用",
     clearCache: "清理缓存",
     cacheCleared: "缓存已清理",
+    dumpDiagnostics: "导出诊断信息",
+    diagnosticsSaved: "诊断信息已保存到日志目录",
     clearData: "清除数据",
     clearDataConfirm: "再按一次确认清除",
     clearDataDesc: "登出所有账号并清空队列与偏好",
@@ -196,7 +202,9 @@ const STRINGS: Record<Lang, Record<string, string>> = {
     back: "Back",
     errTimeout: "Request timed out, try again",
     errUpstreamTimeout: "Music source timed out, try again",
+    errOffline: "Can't reach the music source — will reconnect when the network is back",
     errProviderStart: "Music source failed to start",
+    errProviderCrashLoop: "Music source keeps crashing — will retry shortly; reinstall the plugin if it persists",
     errPlayerStart: "Player failed to start — try reinstalling the plugin",
     errPlayback: "Playback failed, try again",
     errNetSlow: "Network is slow, loading timed out — try again later",
@@ -219,10 +227,15 @@ const STRINGS: Record<Lang, Record<string, string>> = {
     quality_lossless: "Lossless",
     qualityDesc:
       "Falls back automatically: tracks without rights or needing a subscription still play at a lower quality. Applies from the next track.",
+    hotStandby: "Fast source switching",
+    hotStandbyDesc:
+      "Keeps your other signed-in music source ready in the background so switching is instant. Uses extra memory; released automatically when a game needs it or after a while unused.",
     storage: "Storage",
     cacheUsage: "Cache used",
     clearCache: "Clear cache",
     cacheCleared: "Cache cleared",
+    dumpDiagnostics: "Save diagnostics",
+    diagnosticsSaved: "Diagnostics saved to the log folder",
     clearData: "Clear data",
     clearDataConfirm: "Press again to confirm",
     clearDataDesc: "Logs out all accounts; clears queue & preferences",
@@ -140,6 +140,14 @@ export function playQueue(songs: Song[], startIndex: number) {
   guard(() => api.playQueue(songs.map(toQueueItem), startIndex));
 }
 
+/** 整单播放(歌单 / 我喜欢):bridge 取全后开播,current 随 track 事件同步,不做乐观更新。 */
+export function playAll(kind: "playlist" | "fav", id: string) {
+  guard(async () => {
+    const r = await api.playAll(kind, id);
+    if (!r.ok) reportError(errorText(r.error || "provider_error"));
+  });
+}
+
 export const nextTrack = () => guard(() => api.nextTrack());
 export const prevTrack = () => guard(() => api.prevTrack());
 export const togglePlay = () => guard(() => (state.playing ? api.pause() : api.resume()));
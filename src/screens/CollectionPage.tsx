@@ -20,6 +20,7 @@ export function CollectionPage({
   songs,
   empty = false,
   loadMore,
+  onPlayAll,
 }: {
   cover: string;
   roundCover?: boolean; // 歌手页头像用圆形
@@ -28,6 +29,7 @@ export function CollectionPage({
   songs: Song[] | null; // null = 加载中
   empty?: boolean; // 无选中项(未经入口直进路由)
   loadMore?: () => void; // 分页取数(歌单详情);滚近列表底部触发
+  onPlayAll?: () => void; // 覆盖「播放全部」:歌单交给 bridge 取全单,不止已加载的几页
 }) {
   const shortcuts = usePlaybackShortcuts();
   const coverStyle = {
@@ -73,7 +75,7 @@ export function CollectionPage({
               // 进入详情页立即取焦(Valve nav 原生 prop,decky 类型未声明,经 spread 透传)
               {...({ autoFocus: true } as object)}
               disabled={!songs?.length}
-              onClick={() => songs?.length && playQueue(songs, 0)}
+              onClick={() => songs?.length && (onPlayAll ? onPlayAll() : playQueue(songs, 0))}
               style={{ minWidth: 0, width: "auto", padding: "0.5em 1.5em", flexShrink: 0 }}
             >
               {t("playAll")}
@@ -2,10 +2,15 @@
 // 页内子视图的 onCancelButton 拦不住系统返回,故用真路由 + B 原生返回(P5c 教训)。
 
 import { api } from "../api";
+import { playAll } from "../player/usePlayer";
 import { makePagedDetail } from "./pagedDetail";
 
 export const DETAIL_ROUTE = "/music-playlist";
 
-const detail = makePagedDetail(DETAIL_ROUTE, (id, offset) => api.getPlaylistSongs(id, offset));
+const detail = makePagedDetail(
+  DETAIL_ROUTE,
+  (id, offset) => api.getPlaylistSongs(id, offset),
+  (id) => playAll("playlist", id)
+);
 export const openPlaylistDetail = detail.open;
 export const PlaylistDetailPage = detail.Page;
@@ -10,7 +10,8 @@ import { CollectionPage } from "./CollectionPage";
 
 export function makePagedDetail(
   route: string,
-  fetchSongs: (id: string, offset: number) => Promise<SearchResult>
+  fetchSongs: (id: string, offset: number) => Promise<SearchResult>,
+  playAll?: (id: string) => void // 整单播放(歌单有;榜单走默认的已加载列表)
 ) {
   let current: Playlist | null = null;
 
@@ -43,6 +44,7 @@ export function makePagedDetail(
         subtitle={subtitle}
         songs={songs}
         loadMore={loadMore}
+        onPlayAll={item && playAll ? () => playAll(item.id) : undefined}
       />
     );
   }
@@ -0,0 +1,198 @@
+"""熔断单测:连续超时类失败后打开、快速回 offline;冷却后半开探测,上游恢复即关闭。
+按 (provider, 命令分级) 各自计数。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_breaker
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import breaker  # noqa: E402
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import protocol  # noqa: E402
+
+
+def _fail(code="upstream_timeout"):
+    return protocol.ChildResponse(1, False, {}, protocol.ErrorBody(code, code))
+
+
+class _ScriptedConn(bridge_mod.Conn):
+    """_send 按 self.upstream 回:"down" → upstream_timeout,"up" → ok,其余当错误码回。记下发过的命令。"""
+
+    def __init__(self):
+        super().__init__("provider")
+        self.session = "qq"
+        self.breaker_probe = ("search_hot", None)
+        self.upstream = "down"
+        self.sent = []
+
+    async def _send(self, cmd, args):
+        self.sent.append(cmd)
+        if self.upstream == "up":
+            return protocol.ChildResponse(1, True, {}), False
+        return _fail() if self.upstream == "down" else _fail(self.upstream), False
+
+
+class TestBreaker(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self._saved = breaker.BREAKER_COOLDOWN
+        breaker.BREAKER_COOLDOWN = 0.01
+
+    def tearDown(self):
+        breaker.BREAKER_COOLDOWN = self._saved
+
+    def test_opens_after_threshold_and_ignores_non_timeout_errors(self):
+        async def run():
+            b = breaker.Breaker("t", probe=lambda: asyncio.sleep(10))
+            for _ in range(breaker.BREAKER_THRESHOLD - 1):
+                b.record("upstream_timeout")
+            b.record("no_playable")  # 上游答话了:计数清零
+            for _ in range(breaker.BREAKER_THRESHOLD - 1):
+                b.record("timeout")
+            closed = b.state
+            b.record("timeout")
+            opened = (b.state, b.allow())
+            b.stop()
+            return closed, opened
+
+        closed, opened = asyncio.run(run())
+        self.assertEqual(closed, breaker.CLOSED)
+        self.assertEqual(opened, (breaker.OPEN, False))
+        self.assertEqual(metrics.get("t.rejected"), 1)
+
+    def test_failed_probe_backs_off_then_recovers(self):
+        results = [False, True]
+        states = []
+
+        async def probe():
+            return results.pop(0)
+
+        async def run():
+            b = breaker.Breaker("t", probe, on_change=lambda br: states.append(br.state))
+            for _ in range(breaker.BREAKER_THRESHOLD):
+                b.record("upstream_timeout")
+            await asyncio.sleep(0.2)
+            return b
+
+        b = asyncio.run(run())
+        self.assertEqual(b.state, breaker.CLOSED)
+        self.assertEqual(b.cooldown, breaker.BREAKER_COOLDOWN)
+        self.assertEqual(states, ["open", "half_open", "open", "half_open", "closed"])
+
+    def test_late_success_closes_open_breaker(self):
+        async def run():
+            b = breaker.Breaker("t", probe=lambda: asyncio.sleep(10))
+            for _ in range(breaker.BREAKER_THRESHOLD):
+                b.record("timeout")
+            b.record(None)
+            return b.state, b._prober
+
+        self.assertEqual(asyncio.run(run()), (breaker.CLOSED, None))
+
+
+class TestConnBreaker(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self._saved = (breaker.BREAKER_COOLDOWN, bridge_mod.log)
+        breaker.BREAKER_COOLDOWN = 0.01
+        bridge_mod.log = lambda *_a, **_k: None
+
+    def tearDown(self):
+        breaker.BREAKER_COOLDOWN, bridge_mod.log = self._saved
+
+    def test_fast_fail_then_probe_closes(self):
+        conn = _ScriptedConn()
+
+        async def run():
+            for _ in range(breaker.BREAKER_THRESHOLD):
+                await conn.request("search_songs", {"keyword": "x"})
+            sent = len(conn.sent)
+            fast = await conn.request("toplists")
+            other = await conn.request("like_song", {"id": "1", "on": True})  # mutation 道独立计数
+            conn.upstream = "up"
+            await asyncio.sleep(0.1)
+            again = await conn.request("toplists")
+            conn.reset_breakers()
+            return sent, fast, other, again
+
+        sent, fast, other, again = asyncio.run(run())
+        self.assertEqual(sent, breaker.BREAKER_THRESHOLD)
+        self.assertEqual(fast.error.code, "offline")
+        self.assertEqual(other.error.code, "upstream_timeout")  # 真发出去了
+        self.assertIn("search_hot", conn.sent)  # 半开探测用的廉价命令
+        self.assertTrue(again.ok)
+
+    def test_breakers_are_per_provider(self):
+        conn = _ScriptedConn()
+
+        async def run():
+            for _ in range(breaker.BREAKER_THRESHOLD):
+                await conn.request("toplists")
+            conn.session = "ncm"
+            resp = await conn.request("toplists")
+            conn.reset_breakers()
+            return resp
+
+        self.assertEqual(asyncio.run(run()).error.code, "upstream_timeout")
+
+    def test_dead_child_does_not_count_as_offline(self):
+        conn = bridge_mod.Conn("provider")  # writer 为 None:子进程崩了 / 正在重开
+        conn.session, conn.breaker_probe = "qq", ("search_hot", None)
+
+        async def run():
+            resps = [await conn.request("toplists") for _ in range(breaker.BREAKER_THRESHOLD + 1)]
+            state = conn._breaker("toplists").state
+            conn.reset_breakers()
+            return resps, state
+
+        resps, state = asyncio.run(run())
+        self.assertEqual([r.error.code for r in resps], ["timeout"] * (breaker.BREAKER_THRESHOLD + 1))
+        self.assertEqual(state, breaker.CLOSED)  # 不亮「离线」横幅、不挡后续请求
+
+    def test_deadline_exceeded_neither_counts_nor_resets(self):
+        conn = _ScriptedConn()
+        n = breaker.BREAKER_THRESHOLD
+
+        async def run():
+            for _ in range(n - 1):
+                await conn.request("toplists")
+            conn.upstream = bridge_mod.DEADLINE_EXCEEDED
+            for _ in range(n):
+                await conn.request("toplists")  # 调用方自己的预算用完:不是断网
+            mid = conn._breaker("toplists").state
+            conn.upstream = "down"
+            await conn.request("toplists")  # 之前的连击还在,这一下凑满
+            state = conn._breaker("toplists").state
+            conn.reset_breakers()
+            return mid, state
+
+        self.assertEqual(asyncio.run(run()), (breaker.CLOSED, breaker.OPEN))
+
+    def test_player_conn_never_breaks(self):
+        conn = bridge_mod.Conn("player")
+        self.assertIsNone(conn._breaker("load"))
+
+
+if __name__ == "__main__":
+    unittest.main()
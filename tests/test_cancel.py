@@ -0,0 +1,149 @@
+"""取消帧单测:调用方不再等某条请求时,bridge 必须给 child 发 cancel{id}。
+
+快速连切时旧意图的 song_url / load 若不取消,provider 仍在解析、player 仍在开流,活全堆在
+同一条上游连接上。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_cancel
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import protocol  # noqa: E402
+from playback import Playback  # noqa: E402
+
+
+class _FakeWriter:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, data):  # 写任务会把一批 v1 帧拼成一次 write
+        self.frames += [json.loads(line) for line in data.splitlines()]
+
+    async def drain(self):
+        pass
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestConnCancel(unittest.TestCase):
+    def setUp(self):
+        self.conn = bridge_mod.Conn("provider")
+        self.conn.writer = _FakeWriter()
+        self._saved_log = bridge_mod.log
+        bridge_mod.log = lambda *_a, **_k: None
+
+    def tearDown(self):
+        bridge_mod.log = self._saved_log
+
+    def test_caller_cancel_sends_cancel_frame(self):
+        async def run():
+            task = asyncio.create_task(self.conn.request("song_url", {"id": "x"}))
+            await _settle()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+        req, cancel = self.conn.writer.frames
+        self.assertEqual(cancel, {"cancel": req["id"]})
+        self.assertEqual(self.conn.pending, {})
+
+    def test_timeout_sends_cancel_frame(self):
+        saved = bridge_mod.REQUEST_TIMEOUT
+        bridge_mod.REQUEST_TIMEOUT = 0.01
+        try:
+            resp = asyncio.run(self.conn.request("song_url"))
+        finally:
+            bridge_mod.REQUEST_TIMEOUT = saved
+        self.assertEqual(resp.error.code, "timeout")
+        self.assertEqual(self.conn.writer.frames[-1], {"cancel": self.conn.writer.frames[0]["id"]})
+
+    def test_answered_request_sends_no_cancel(self):
+        async def run():
+            task = asyncio.create_task(self.conn.request("song_url"))
+            await _settle()
+            rid, fut = next(iter(self.conn.pending.items()))
+            fut.set_result(protocol.ChildResponse(rid, True, {}, None))
+            await task
+
+        asyncio.run(run())
+        self.assertEqual(len(self.conn.writer.frames), 1)
+
+    def test_coalesced_flight_cancelled_only_when_last_waiter_leaves(self):
+        async def run():
+            a = asyncio.create_task(self.conn.request("toplists", {}, coalesce=True))
+            b = asyncio.create_task(self.conn.request("toplists", {}, coalesce=True))
+            await _settle()
+            a.cancel()
+            await _settle()
+            self.assertEqual(len(self.conn.writer.frames), 1, "还有人在等,不能取消")
+            b.cancel()
+            await _settle()
+            await asyncio.gather(a, b, return_exceptions=True)
+
+        asyncio.run(run())
+        req, cancel = self.conn.writer.frames
+        self.assertEqual(cancel, {"cancel": req["id"]})
+        self.assertEqual(self.conn._flights, {})
+
+
+class _HangingConn:
+    """song_url 永不返回(慢上游),记录被取消的请求。"""
+
+    def __init__(self):
+        self.calls, self.cancelled = [], []
+
+    async def request(self, cmd, args=None):
+        self.calls.append(cmd)
+        if cmd == "song_url" and len(self.calls) == 1:
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                self.cancelled.append(cmd)
+                raise
+        return types.SimpleNamespace(ok=True, data={"url": "http://x"}, error=None)
+
+
+class TestPlaybackSupersede(unittest.TestCase):
+    def test_new_intent_cancels_in_flight_song_url(self):
+        provider = _HangingConn()
+        pb = Playback(_HangingConn(), provider)
+        songs = [{"id": str(i), "media_mid": "", "name": "", "singer": ""} for i in range(2)]
+
+        async def run():
+            first = asyncio.create_task(pb.play_queue(songs, 0))
+            await _settle()
+            await pb.play_queue(songs, 1)
+            return await first
+
+        asyncio.run(run())
+        self.assertEqual(provider.cancelled, ["song_url"])
+        self.assertEqual(pb.index, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""single-flight 单测:同 (cmd, args) 的并发只读请求共享一次往返,写操作永不合并。
+
+UI 重挂载会把榜单/热搜/推荐再发一遍,而上一轮还在途;不合并的话每个重复请求都各打一次上游。
+decky 是 Decky 运行时注入的模块,测试里打桩。运行:python -m unittest tests.test_coalesce
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import protocol  # noqa: E402
+
+
+class _FakeWriter:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, data):  # 写任务会把一批 v1 帧拼成一次 write
+        self.frames += data.splitlines()
+
+    async def drain(self):
+        pass
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.conn = bridge_mod.Conn("provider")
+        self.conn.writer = _FakeWriter()
+        self._saved_log = bridge_mod.log
+        bridge_mod.log = lambda *_a, **_k: None
+        metrics.reset()
+
+    def tearDown(self):
+        bridge_mod.log = self._saved_log
+
+    def _burst(self, calls):
+        """并发发出 calls,等它们都挂上后把每个在途 id 应答掉,返回 (响应, 实际写出帧数)。"""
+
+        async def run():
+            tasks = [asyncio.create_task(self.conn.request(*c[:2], **c[2])) for c in calls]
+            for _ in range(5):
+                await asyncio.sleep(0)
+            for rid, fut in list(self.conn.pending.items()):
+                fut.set_result(protocol.ChildResponse(rid, True, {"rid": rid}, None))
+            return await asyncio.gather(*tasks)
+
+        resps = asyncio.run(run())
+        return resps, len(self.conn.writer.frames)
+
+    def test_identical_reads_share_one_request(self):
+        calls = [("toplists", {"limit": 100}, {"coalesce": True})] * 4
+        resps, sent = self._burst(calls)
+        self.assertEqual(sent, 1)
+        self.assertEqual({r.data["rid"] for r in resps}, {resps[0].data["rid"]})
+        self.assertEqual(metrics.get("provider.coalesced"), 3)
+        self.assertEqual(self.conn._flights, {})  # 完成后出表,下一轮重新发
+
+    def test_args_are_canonicalised(self):
+        calls = [
+            ("search_songs", {"keyword": "a", "offset": 0}, {"coalesce": True}),
+            ("search_songs", {"offset": 0, "keyword": "a"}, {"coalesce": True}),
+            ("search_songs", {"keyword": "b", "offset": 0}, {"coalesce": True}),
+        ]
+        _, sent = self._burst(calls)
+        self.assertEqual(sent, 2)
+
+    def test_opt_in_only(self):
+        _, sent = self._burst([("toplists", None, {})] * 3)
+        self.assertEqual(sent, 3)
+
+    def test_mutations_never_coalesce(self):
+        for cmd in ("like_song", "add_to_playlist", "fav_playlist", "login", "logout", "set_credential"):
+            self.assertNotIn(cmd, bridge_mod.COALESCE_CMDS)
+        _, sent = self._burst([("like_song", {"id": "1", "on": True}, {"coalesce": True})] * 2)
+        self.assertEqual(sent, 2)
+
+    def test_one_caller_giving_up_does_not_cancel_the_others(self):
+        async def run():
+            a = asyncio.create_task(self.conn.request("toplists", None, coalesce=True))
+            b = asyncio.create_task(self.conn.request("toplists", None, coalesce=True))
+            for _ in range(5):
+                await asyncio.sleep(0)
+            a.cancel()
+            await asyncio.sleep(0)
+            rid, fut = next(iter(self.conn.pending.items()))
+            fut.set_result(protocol.ChildResponse(rid, True, {}, None))
+            return await b
+
+        self.assertTrue(asyncio.run(run()).ok)
+
+
+if __name__ == "__main__":
+    unittest.main()
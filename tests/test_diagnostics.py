@@ -0,0 +1,139 @@
+"""debug 环 + 诊断导出单测:release 下 debug 不格式化、只入环;dump_diagnostics 向在线 child
+要 dump_debug,连同 bridge 自己的环、指标、崩溃环写进日志目录。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_diagnostics
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import log as log_mod  # noqa: E402
+import protocol  # noqa: E402
+from bridge import Bridge, Conn, ProviderSlot  # noqa: E402
+
+
+class _Writer:
+    """替身 child:dump_debug 回一条记录,别的命令回 unknown_cmd(老版本 child)。"""
+
+    def __init__(self, conn, records=None):
+        self.conn = conn
+        self.records = records
+
+    def write(self, data):
+        for line in data.splitlines():
+            msg = json.loads(line)
+            fut = self.conn.pending.get(msg.get("id"))
+            if fut is None or fut.done():
+                continue
+            if self.records is not None:
+                fut.set_result(protocol.ChildResponse(msg["id"], True, {"records": self.records}))
+            else:
+                err = protocol.ErrorBody("unknown_cmd", "")
+                fut.set_result(protocol.ChildResponse(msg["id"], False, {}, err))
+
+    async def drain(self):
+        pass
+
+
+def _connected(conn, records=None):
+    conn.writer = _Writer(conn, records)
+    conn.connected.set()
+    return conn
+
+
+class _Probe:
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "probe"
+
+
+class TestDebugRing(unittest.TestCase):
+    def setUp(self):
+        log_mod._ring.clear()
+        self.logger = log_mod.decky.logger
+        self._level = self.logger.level
+        self.logger.setLevel(logging.INFO)  # release
+
+    def tearDown(self):
+        self.logger.setLevel(self._level)
+
+    def test_release_debug_is_ringed_without_formatting(self):
+        probe = _Probe()
+        log_mod.log("bridge", "own", "debug", "%s %s %.0fms", "provider", probe, 12.4)
+        self.assertEqual(probe.formatted, 0)
+        [(at, where, msg)] = log_mod.dump_ring()
+        self.assertEqual((where, msg), ("bridge·own", "provider probe 12ms"))
+        self.assertIsInstance(at, int)
+        self.assertIn("[bridge·own] provider probe 12ms", log_mod.format_records(log_mod.dump_ring())[0])
+
+    def test_ring_is_bounded(self):
+        for i in range(log_mod.DEBUG_RING + 5):
+            log_mod.log("bridge", "own", "debug", "n=%d", i)
+        records = log_mod.dump_ring()
+        self.assertEqual(len(records), log_mod.DEBUG_RING)
+        self.assertEqual(records[0][2], "n=5")
+
+    def test_dev_debug_is_written_not_ringed(self):
+        self.logger.setLevel(logging.DEBUG)
+        log_mod.log("bridge", "own", "debug", "n=%d", 1)
+        self.assertEqual(log_mod.dump_ring(), [])
+
+
+class TestDumpDiagnostics(unittest.TestCase):
+    def setUp(self):
+        self._saved = bridge_mod.log
+        bridge_mod.log = lambda *_a, **_k: None
+        self.tmp = tempfile.TemporaryDirectory()
+        self._log_dir = getattr(log_mod.decky, "DECKY_PLUGIN_LOG_DIR", None)
+        log_mod.decky.DECKY_PLUGIN_LOG_DIR = self.tmp.name
+        log_mod._ring.clear()
+        b = self.b = Bridge()
+        b.provider = _connected(Conn("provider"), [[1_700_000_000_123, "cmd", "search_songs"]])
+        b.player = _connected(Conn("player"))  # 老版本:不认 dump_debug
+        b.standby = ProviderSlot("standby")
+        b.spare = ProviderSlot("spare")  # 没起:不问
+
+    def tearDown(self):
+        bridge_mod.log = self._saved
+        log_mod.decky.DECKY_PLUGIN_LOG_DIR = self._log_dir
+        self.tmp.cleanup()
+
+    def test_rings_from_live_children_land_in_the_log_dir(self):
+        name = asyncio.run(self.b.dump_diagnostics())
+        self.assertTrue(name.startswith("diagnostics-"))
+        with open(os.path.join(self.tmp.name, name), encoding="utf-8") as f:
+            text = f.read()
+        for title in ("metrics", "crashes", "bridge", "provider", "player"):
+            self.assertIn(f"== {title} ==", text)
+        self.assertIn("[cmd] search_songs", text)
+        self.assertIn("unavailable: unknown_cmd", text)
+        self.assertNotIn("== spare ==", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
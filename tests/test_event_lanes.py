@@ -0,0 +1,136 @@
+"""事件分道单测:ended 触发的自动切歌占住 state 道时,媒体键与进度上报照常处理;
+telemetry 道有界并合并过时的位置帧,位置帧再多也挤不掉 playing/paused。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_event_lanes
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import protocol  # noqa: E402
+
+
+def _ev(typ, **data):
+    return protocol.ChildEvent("player", typ, data)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestEventLane(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_tail_of_same_type_is_replaced(self):
+        lane = bridge_mod.EventLane("t", maxlen=4)
+        lane.put(_ev("playing", pos=1))
+        lane.put(_ev("playing", pos=2))
+        lane.put(_ev("paused", pos=2))
+        lane.put(_ev("playing", pos=3))
+        got = [asyncio.run(lane.get()) for _ in range(len(lane))]
+        self.assertEqual([(e.type, e.data["pos"]) for e in got], [("playing", 2), ("paused", 2), ("playing", 3)])
+        self.assertEqual(metrics.get("t.coalesced"), 1)
+
+    def test_full_lane_drops_oldest(self):
+        lane = bridge_mod.EventLane("t", maxlen=2)
+        for typ in ("playing", "paused", "seeked"):
+            lane.put(_ev(typ))
+        self.assertEqual([asyncio.run(lane.get()).type for _ in range(len(lane))], ["paused", "seeked"])
+        self.assertEqual(metrics.get("t.dropped"), 1)
+
+    def test_unbounded_lane_keeps_everything(self):
+        lane = bridge_mod.EventLane("t")
+        lane.put(_ev("ended"))
+        lane.put(_ev("ended"))
+        self.assertEqual(len(lane), 2)
+
+    def test_routing(self):
+        self.assertEqual(bridge_mod._event_lane(_ev("control", action="next")), "control")
+        self.assertEqual(bridge_mod._event_lane(_ev("seeked")), "telemetry")
+        self.assertEqual(bridge_mod._event_lane(_ev("playing")), "state")
+        self.assertEqual(bridge_mod._event_lane(_ev("paused")), "state")
+        self.assertEqual(bridge_mod._event_lane(_ev("ended")), "state")
+        self.assertEqual(bridge_mod._event_lane(protocol.ChildEvent("login", "playing", {})), "state")
+
+
+class TestLanesDoNotBlockEachOther(unittest.TestCase):
+    def test_control_and_telemetry_run_while_ended_is_busy(self):
+        seen = []
+
+        async def run():
+            conn = bridge_mod.Conn("player")
+            release = asyncio.Event()
+
+            async def on_event(ev):
+                seen.append(ev.type)
+                if ev.type == "ended":
+                    await release.wait()  # 自动切歌连试几首,卡在 song_url / load 上
+
+            conn.on_event = on_event
+            conn._ev_tasks = [asyncio.create_task(conn._pump_events(lane)) for lane in conn._ev_lanes.values()]
+            for ev in (_ev("ended"), _ev("control", action="next"), _ev("seeked", pos=1.0)):
+                conn._ev_lanes[bridge_mod._event_lane(ev)].put(ev)
+            await _settle()
+            busy = list(seen)
+            release.set()
+            await _settle()
+            for t in conn._ev_tasks:
+                t.cancel()
+            return busy
+
+        busy = asyncio.run(run())
+        self.assertEqual(sorted(busy), ["control", "ended", "seeked"])
+
+    def test_telemetry_flood_keeps_play_state_in_order_with_ended(self):
+        seen = []
+
+        async def run():
+            conn = bridge_mod.Conn("player")
+
+            async def on_event(ev):
+                seen.append((ev.type, ev.data.get("pos")))
+
+            conn.on_event = on_event
+            evs = [_ev("seeked", pos=float(i)) for i in range(bridge_mod.TELEMETRY_QUEUE * 2)]
+            evs[10:10] = [_ev("playing", pos=10.0)]
+            evs[40:40] = [_ev("paused", pos=40.0)]
+            evs.append(_ev("ended"))
+            for ev in evs:
+                conn._ev_lanes[bridge_mod._event_lane(ev)].put(ev)
+            conn._ev_tasks = [asyncio.create_task(conn._pump_events(lane)) for lane in conn._ev_lanes.values()]
+            await _settle()
+            for t in conn._ev_tasks:
+                t.cancel()
+
+        metrics.reset()
+        asyncio.run(run())
+        self.assertGreater(metrics.get("player.events.telemetry.coalesced"), 0)  # 位置帧被顶掉了
+        state = [e for e in seen if e[0] in ("playing", "paused", "ended")]
+        self.assertEqual(state, [("playing", 10.0), ("paused", 40.0), ("ended", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+"""协议分帧单测:v1 NDJSON 与 v2 长度前缀共存 + hello 版本协商。
+
+钉住两件事:读端逐帧识别版本(切换点不需要同步),以及 v2 不再受 asyncio StreamReader
+64 KiB 行长上限约束 —— 大响应(几百个 id 的 liked_ids)曾有撑爆的风险。
+
+decky 是 Decky 运行时注入的模块,测试里打桩。运行:python -m unittest tests.test_framing
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import protocol  # noqa: E402
+
+
+def _reader(data: bytes) -> asyncio.StreamReader:
+    r = asyncio.StreamReader(limit=protocol.LINE_LIMIT)
+    r.feed_data(data)
+    r.feed_eof()
+    return r
+
+
+async def _read_all(data: bytes) -> list[tuple[bytes, int]]:
+    r, out = _reader(data), []
+    while (frame := await protocol.read_frame(r)) is not None:
+        out.append(frame)
+    return out
+
+
+class TestCodec(unittest.TestCase):
+    def test_v1_is_a_json_line(self):
+        self.assertEqual(protocol.encode_frame({"a": 1}), b'{"a": 1}\n')
+
+    def test_v2_is_big_endian_length_prefixed(self):
+        f = protocol.encode_frame({"a": 1}, 2)
+        self.assertEqual(f[:4], (8).to_bytes(4, "big"))
+        self.assertEqual(json.loads(f[4:]), {"a": 1})
+
+    def test_mixed_stream_detected_per_frame(self):
+        data = protocol.encode_frame({"n": 1}) + protocol.encode_frame({"n": 2}, 2)
+        frames = asyncio.run(_read_all(data))
+        self.assertEqual([(json.loads(p)["n"], v) for p, v in frames], [(1, 1), (2, 2)])
+
+    def test_v2_frame_beyond_default_line_limit(self):
+        big = {"ids": [str(i) * 40 for i in range(5000)]}  # ~200 KB,远超 64 KiB
+        frames = asyncio.run(_read_all(protocol.encode_frame(big, 2)))
+        self.assertEqual(json.loads(frames[0][0]), big)
+
+    def test_truncated_v2_frame_is_eof(self):
+        f = protocol.encode_frame({"a": 1}, 2)
+        self.assertEqual(asyncio.run(_read_all(f[:-3])), [])
+
+    def test_over_limit_line_is_skipped_to_its_newline(self):
+        async def run():
+            r = asyncio.StreamReader(limit=64)
+            r.feed_data(b"{" + b"x" * 200)  # 超限时这一行的换行还没到
+
+            def rest():
+                r.feed_data(b"x" * 100 + b"\n" + protocol.encode_frame({"n": 1}))
+                r.feed_eof()
+
+            asyncio.get_running_loop().call_later(0.01, rest)
+            with self.assertRaises(protocol.ProtocolError):
+                await protocol.read_frame(r)
+            return await protocol.read_frame(r), await protocol.read_frame(r)
+
+        frame, eof = asyncio.run(run())
+        self.assertEqual(json.loads(frame[0]), {"n": 1})  # 余下半行没被当成下一帧
+        self.assertIsNone(eof)
+
+    def test_hello_decodes(self):
+        msg = protocol.decode_child_message({"ev": "hello", "type": "hello", "data": {"proto": 2}})
+        self.assertEqual(msg, protocol.Hello(2))
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_child_message({"ev": "hello", "type": "hello", "data": {}})
+
+
+class TestNegotiation(unittest.TestCase):
+    """真 UDS 上跑一遍:child 发 hello → bridge 改发 v2 → child 也回 v2。"""
+
+    def setUp(self):
+        self._saved = (bridge_mod.RUNTIME, bridge_mod.log)
+        self.tmp = tempfile.TemporaryDirectory()
+        bridge_mod.RUNTIME = self.tmp.name
+        bridge_mod.log = lambda *_a, **_k: None
+
+    def tearDown(self):
+        bridge_mod.RUNTIME, bridge_mod.log = self._saved
+        self.tmp.cleanup()
+
+    def _run(self, child_hello: bool):
+        async def run():
+            conn = bridge_mod.Conn("provider")
+            await conn.listen()
+            reader, writer = await asyncio.open_unix_connection(conn.path)
+            if child_hello:
+                writer.write(protocol.encode_frame({"ev": "hello", "type": "hello", "data": {"proto": 2}}))
+            await asyncio.wait_for(conn.connected.wait(), 1)
+            for _ in range(50):  # 等 bridge 读到 hello
+                if conn.proto == 2 or not child_hello:
+                    break
+                await asyncio.sleep(0.01)
+
+            async def child():
+                payload, version = await protocol.read_frame(reader)
+                req = json.loads(payload)
+                writer.write(protocol.encode_frame({"id": req["id"], "ok": True, "data": {}}, version))
+                await writer.drain()
+                return version
+
+            child_task = asyncio.create_task(child())
+            resp = await conn.request("toplists")
+            version = await child_task
+            writer.close()
+            await conn.close()
+            return resp, version
+
+        return asyncio.run(run())
+
+    def test_hello_upgrades_to_v2(self):
+        resp, version = self._run(child_hello=True)
+        self.assertTrue(resp.ok)
+        self.assertEqual(version, 2)
+
+    def test_silent_child_stays_on_v1(self):
+        resp, version = self._run(child_hello=False)
+        self.assertTrue(resp.ok)
+        self.assertEqual(version, 1)
+
+
+class _CountingWriter:
+    def __init__(self):
+        self.writes, self.drains = [], 0
+
+    def write(self, data):
+        self.writes.append(data)
+
+    async def drain(self):
+        self.drains += 1
+
+
+class TestWriteBatching(unittest.TestCase):
+    """写出合批:同一轮事件循环里入队的帧拼成一次 write + drain,单批受字节预算约束。"""
+
+    def setUp(self):
+        self._saved = (bridge_mod.log, bridge_mod.WRITE_BUDGET)
+        bridge_mod.log = lambda *_a, **_k: None
+
+    def tearDown(self):
+        bridge_mod.log, bridge_mod.WRITE_BUDGET = self._saved
+
+    def _burst(self, n: int) -> _CountingWriter:
+        conn = bridge_mod.Conn("provider")
+        conn.writer = _CountingWriter()
+
+        async def run():
+            tasks = [asyncio.create_task(conn.request("toplists", {"i": i})) for i in range(n)]
+            for _ in range(5):
+                await asyncio.sleep(0)
+            for rid, fut in list(conn.pending.items()):
+                fut.set_result(protocol.ChildResponse(rid, True, {}, None))
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+        return conn.writer
+
+    def test_burst_is_one_write(self):
+        w = self._burst(5)
+        self.assertEqual((len(w.writes), w.drains), (1, 1))
+        ids = [json.loads(line)["id"] for line in w.writes[0].splitlines()]
+        self.assertEqual(ids, [1, 2, 3, 4, 5], "合批不能打乱帧序")
+
+    def test_budget_splits_batches(self):
+        bridge_mod.WRITE_BUDGET = 1  # 每批只放得下一帧
+        w = self._burst(3)
+        self.assertEqual(len(w.writes), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""心跳单测:子进程读循环卡死时,没有请求在途也要在几个心跳间隔内判死;
+活着的子进程按时回 pong,RTT 记入健康指标。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_heartbeat
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import protocol  # noqa: E402
+
+
+class _PongWriter:
+    """子进程读循环:answer=True 时对 ping 即刻回 ok,False 时收下不回(卡死)。"""
+
+    def __init__(self, conn, answer=True):
+        self.conn = conn
+        self.answer = answer
+        self.pings = 0
+
+    def write(self, data):
+        for line in data.splitlines():
+            msg = json.loads(line)
+            if msg.get("cmd") != "ping":
+                continue
+            self.pings += 1
+            fut = self.conn.pending.get(msg["id"])
+            if self.answer and fut and not fut.done():
+                fut.set_result(protocol.ChildResponse(msg["id"], True, {}))
+
+    async def drain(self):
+        pass
+
+
+class TestHeartbeat(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.conn = bridge_mod.Conn("provider")
+        self.conn.heartbeat_interval = 0.02
+        self.dead = []
+        self.conn.on_dead = lambda: self.dead.append(1)
+        self._saved_log = bridge_mod.log
+        bridge_mod.log = lambda *_a, **_k: None
+
+    def tearDown(self):
+        bridge_mod.log = self._saved_log
+
+    def _run(self, writer, secs):
+        async def run():
+            self.conn.writer = writer
+            task = asyncio.create_task(self.conn._heartbeat_loop())
+            await asyncio.sleep(secs)
+            finished = task.done()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return finished
+
+        return asyncio.run(run())
+
+    def test_stalled_child_declared_dead_without_requests(self):
+        finished = self._run(_PongWriter(self.conn, answer=False), 0.3)
+        self.assertTrue(finished)  # 判死后心跳自己收手
+        self.assertEqual(self.dead, [1])
+        self.assertEqual(metrics.get("provider.heartbeat.missed"), bridge_mod.HEARTBEAT_MISSES)
+        self.assertEqual(self.conn.pending, {})
+
+    def test_live_child_keeps_beating(self):
+        writer = _PongWriter(self.conn)
+        self.assertFalse(self._run(writer, 0.15))
+        self.assertEqual(self.dead, [])
+        self.assertGreaterEqual(writer.pings, 3)
+        self.assertGreaterEqual(metrics.snapshot()["timings"]["provider.heartbeat.rtt"]["count"], 3)
+
+    def test_unknown_cmd_reply_counts_as_alive(self):
+        """老版本 child 不认 ping:回 unknown_cmd 也说明读循环活着。"""
+
+        class OldChild(_PongWriter):
+            def write(self, data):
+                for line in data.splitlines():
+                    msg = json.loads(line)
+                    fut = self.conn.pending.get(msg["id"])
+                    if fut and not fut.done():
+                        err = protocol.ErrorBody("unknown_cmd", "ping")
+                        fut.set_result(protocol.ChildResponse(msg["id"], False, {}, err))
+
+        self._run(OldChild(self.conn), 0.15)
+        self.assertEqual(self.dead, [])
+
+    def test_disconnect_stops_heartbeat(self):
+        async def run():
+            self.conn.writer = _PongWriter(self.conn, answer=False)
+            self.conn._heartbeat = asyncio.create_task(self.conn._heartbeat_loop())
+            await asyncio.sleep(0.01)
+            task = self.conn._heartbeat
+            self.conn.disconnect()
+            await asyncio.gather(task, return_exceptions=True)
+            return task
+
+        self.assertTrue(asyncio.run(run()).cancelled())
+        self.assertEqual(self.dead, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""song_url 对冲单测:第一发慢过近期 p90 时补发一发,先成功者胜,输家被取消;补发受预算约束。
+
+运行:python -m unittest tests.test_hedge
+"""
+
+import asyncio
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+import hedge  # noqa: E402
+import metrics  # noqa: E402
+
+
+def _resp(ok=True, code=""):
+    err = types.SimpleNamespace(code=code, message=code) if code else None
+    return types.SimpleNamespace(ok=ok, data={"url": "u"} if ok else {}, error=err)
+
+
+class ScriptedConn:
+    """第 n 发请求按 delays[n] 秒后回 results[n](默认 ok);记录被取消的请求序号。"""
+
+    def __init__(self, delays, results=None):
+        self.delays = delays
+        self.results = results or [_resp()] * len(delays)
+        self.sent = 0
+        self.cancelled = []
+
+    async def request(self, cmd, args=None):
+        n = self.sent
+        self.sent += 1
+        try:
+            await asyncio.sleep(self.delays[n])
+        except asyncio.CancelledError:
+            self.cancelled.append(n)
+            raise
+        return self.results[n]
+
+
+def _warm(h, secs=0.01, tokens=hedge.HEDGE_BURST):
+    """灌满延迟样本与令牌,让对冲立刻可用。"""
+    h._samples.extend([secs] * hedge.HEDGE_MIN_SAMPLES)
+    h._tokens = tokens
+
+
+class TestHedger(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self._saved_min = hedge.HEDGE_MIN_DELAY
+        hedge.HEDGE_MIN_DELAY = 0.01
+
+    def tearDown(self):
+        hedge.HEDGE_MIN_DELAY = self._saved_min
+
+    def test_no_samples_no_hedge(self):
+        h = hedge.Hedger("song_url")
+        conn = ScriptedConn([0.05])
+        r = asyncio.run(h.request(conn, "song_url"))
+        self.assertTrue(r.ok)
+        self.assertEqual(conn.sent, 1)
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        h = hedge.Hedger("song_url")
+        _warm(h)
+        conn = ScriptedConn([1.0, 0.01])
+        r = asyncio.run(h.request(conn, "song_url"))
+        self.assertTrue(r.ok)
+        self.assertEqual(conn.sent, 2)
+        self.assertEqual(conn.cancelled, [0])
+        self.assertEqual(metrics.get("song_url.hedged"), 1)
+        self.assertEqual(metrics.get("song_url.hedge_won"), 1)
+
+    def test_fast_primary_sends_once(self):
+        h = hedge.Hedger("song_url")
+        _warm(h, secs=0.2)
+        conn = ScriptedConn([0.01])
+        asyncio.run(h.request(conn, "song_url"))
+        self.assertEqual(conn.sent, 1)
+
+    def test_budget_limits_hedges(self):
+        h = hedge.Hedger("song_url")
+        _warm(h, tokens=0.0)  # 令牌耗尽:慢也不补发
+        conn = ScriptedConn([0.05])
+        asyncio.run(h.request(conn, "song_url"))
+        self.assertEqual(conn.sent, 1)
+        self.assertAlmostEqual(h._tokens, hedge.HEDGE_BUDGET)
+
+    def test_failed_hedge_waits_for_primary(self):
+        h = hedge.Hedger("song_url")
+        _warm(h)
+        conn = ScriptedConn([0.1, 0.0], [_resp(), _resp(False, "upstream_timeout")])
+        r = asyncio.run(h.request(conn, "song_url"))
+        self.assertTrue(r.ok)
+        self.assertEqual(metrics.get("song_url.hedge_won"), 0)
+
+    def test_channel_timeout_returns_at_once(self):
+        h = hedge.Hedger("song_url")
+        _warm(h)
+        conn = ScriptedConn([0.05, 5.0], [_resp(False, "timeout"), _resp()])
+        r = asyncio.run(h.request(conn, "song_url"))
+        self.assertEqual(r.error.code, "timeout")
+        self.assertEqual(conn.cancelled, [1])
+
+    def test_caller_cancel_cancels_both(self):
+        h = hedge.Hedger("song_url")
+        _warm(h)
+        conn = ScriptedConn([5.0, 5.0])
+
+        async def run():
+            task = asyncio.create_task(h.request(conn, "song_url"))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+        self.assertEqual(sorted(conn.cancelled), [0, 1])
+
+    def test_delay_is_percentile_of_window(self):
+        h = hedge.Hedger("song_url")
+        h._samples.extend([0.1 * i for i in range(1, 11)])
+        self.assertAlmostEqual(h.delay(), 0.9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+"""闲置停机单测:只在放歌、没有前台请求时停掉 provider;停着时请求发出前懒拉起(写操作也不丢);
+播放中赶在当前曲播完前提前拉起。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_idle
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import protocol  # noqa: E402
+from bridge import Bridge, Conn  # noqa: E402
+
+
+class _LiveProc:
+    def __init__(self, pid=1):
+        self.pid = pid
+        self.returncode = None
+
+    def kill(self):
+        self.returncode = -9
+
+    def terminate(self):
+        self.returncode = -15
+
+
+class _AnsweringWriter:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def write(self, data):
+        for line in data.splitlines():
+            msg = json.loads(line)
+            fut = self.conn.pending.get(msg.get("id"))
+            if fut and not fut.done():
+                fut.set_result(protocol.ChildResponse(msg["id"], True, {"cmd": msg["cmd"]}))
+
+    async def drain(self):
+        pass
+
+
+def _playback(playing=False, duration=200, pos=0.0):
+    return types.SimpleNamespace(
+        playing=playing,
+        index=0,
+        queue=[{"id": "1", "duration": duration}],
+        pos=pos,
+        wall=time.time() * 1000,
+    )
+
+
+class TestIdlePark(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self._saved = (bridge_mod.log, bridge_mod.rss_mb)
+        bridge_mod.log = lambda *_a, **_k: None
+        bridge_mod.rss_mb = lambda _pid: 60
+        b = self.b = Bridge()
+        b.provider = Conn("provider")
+        b.provider.writer = _AnsweringWriter(b.provider)
+        b.provider.used_at = time.monotonic() - bridge_mod.PROVIDER_IDLE_S - 1
+        b.provider_proc, b.provider_which = _LiveProc(), "qq"
+        b.provider_lock = asyncio.Lock()
+        b.playback = _playback()
+
+    def tearDown(self):
+        bridge_mod.log, bridge_mod.rss_mb = self._saved
+
+    def test_idle_provider_is_parked(self):
+        proc = self.b.provider_proc
+        asyncio.run(self.b._park_provider())
+        self.assertIsNotNone(proc.returncode)
+        self.assertIsNone(self.b.provider_proc)
+        self.assertTrue(self.b.provider.parked)
+        self.assertIsNone(self.b.provider.writer)
+        self.assertEqual(metrics.get("provider.idle.reclaimed_mb"), 60)
+
+    def test_not_idle_when_browsing_or_track_ending(self):
+        self.assertTrue(self.b._idle_due())
+        self.b.playback = _playback(playing=True, duration=200, pos=190)
+        self.assertFalse(self.b._idle_due())  # 眼看就要切歌
+        self.b.playback = _playback(playing=True, duration=200, pos=10)
+        self.assertTrue(self.b._idle_due())  # 播放中照样停,song_url 不算前台请求
+
+        async def browse():
+            await self.b.provider.request("toplists")
+
+        asyncio.run(browse())
+        self.assertFalse(self.b._idle_due())
+
+
+class TestIdleWake(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self._saved = bridge_mod.log
+        bridge_mod.log = lambda *_a, **_k: None
+        b = self.b = Bridge()
+        b.provider = Conn("provider")
+        b.provider.parked = True
+        self.woken = 0
+
+        async def revive():
+            self.woken += 1
+            b.provider.writer = _AnsweringWriter(b.provider)
+            b.provider.parked = False
+
+        b.provider.revive = revive
+        b._revive_provider = revive
+
+    def tearDown(self):
+        bridge_mod.log = self._saved
+
+    def test_parked_conn_wakes_before_sending_mutation(self):
+        resp = asyncio.run(self.b.provider.request("like_song", {"id": "1", "on": True}))
+        self.assertTrue(resp.ok)  # 写操作也不丢:还没发出去就先拉起
+        self.assertEqual(self.woken, 1)
+
+    def test_slow_wake_keeps_the_callers_deadline(self):
+        sent = []
+
+        async def slow_revive():
+            await asyncio.sleep(0.05)  # 拉起吃掉了几乎整个预算
+            writer = self.b.provider.writer = _AnsweringWriter(self.b.provider)
+            writer.write = sent.append
+            self.b.provider.parked = False
+
+        self.b.provider.revive = slow_revive
+        saved = bridge_mod.TIMEOUTS
+        bridge_mod.TIMEOUTS = {**saved, "control": bridge_mod.REPLAY_MIN_S + 0.03}
+        try:
+            resp = asyncio.run(self.b.provider.request("pause"))
+        finally:
+            bridge_mod.TIMEOUTS = saved
+        self.assertEqual(resp.error.code, "timeout")  # 立刻了结,不带着越过 deadline 的预算发过去
+        self.assertEqual(sent, [])
+        self.assertEqual(metrics.get("provider.wake.late"), 1)
+
+    def test_prewake_before_track_ends(self):
+        self.b.playback = _playback(playing=True, duration=200, pos=200 - bridge_mod.PROVIDER_PREWAKE_S)
+
+        async def run():
+            self.b._schedule_prewake()
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        self.assertEqual(self.woken, 1)
+        self.assertEqual(metrics.get("provider.idle.prewake"), 1)
+
+    def test_paused_cancels_prewake(self):
+        self.b.playback = _playback(playing=True, duration=200, pos=100)
+
+        async def run():
+            self.b._schedule_prewake()
+            task = self.b._prewake
+            self.b.playback.playing = False
+            self.b._schedule_prewake()
+            await asyncio.sleep(0)
+            return task
+
+        self.assertTrue(asyncio.run(run()).cancelled())
+        self.assertIsNone(self.b._prewake)
+        self.assertEqual(self.woken, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
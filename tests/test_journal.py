@@ -0,0 +1,139 @@
+"""队列日志单测:快照 + 追加操作回放出与内存一致的队列;切歌只追加一行;半截尾行丢掉不坏
+整体;攒够操作自动压缩;老 settings["queue"] 迁移。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_journal
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import journal  # noqa: E402
+from journal import QueueJournal  # noqa: E402
+from playback import Playback  # noqa: E402
+
+
+def item(i):
+    return {"id": str(i), "media_mid": "", "name": f"song{i}", "singer": "", "cover": "", "duration": 200}
+
+
+class TestQueueJournal(unittest.TestCase):
+    def setUp(self):
+        self._saved = journal.log
+        journal.log = lambda *_a, **_k: None
+        self.path = os.path.join(tempfile.mkdtemp(), "queue.journal")
+        self.j = QueueJournal(self.path)
+
+    def tearDown(self):
+        journal.log = self._saved
+
+    def test_replay_matches_edits(self):
+        self.j.replace([item(i) for i in range(5)], 2)
+        self.j.insert(3, item("x"))
+        self.j.remove(0)  # 当前曲前面删一首 → index 跟着减
+        self.j.set_index(3)
+        got = QueueJournal(self.path).load()
+        self.assertEqual([x["id"] for x in got["items"]], ["1", "2", "x", "3", "4"])
+        self.assertEqual(got["index"], 3)
+
+    def test_track_change_appends_a_few_bytes(self):
+        self.j.replace([item(i) for i in range(2000)], 0)
+        size = os.path.getsize(self.path)
+        self.j.set_index(1)
+        self.assertLess(os.path.getsize(self.path) - size, 32)
+
+    def test_torn_tail_is_dropped(self):
+        self.j.replace([item(1), item(2)], 0)
+        self.j.set_index(1)
+        with open(self.path, "a") as f:
+            f.write('{"op":"remove","a')  # 写到一半崩溃
+        got = QueueJournal(self.path).load()
+        self.assertEqual((len(got["items"]), got["index"]), (2, 1))
+
+    def test_writes_after_torn_tail_survive_reload(self):
+        self.j.replace([item(i) for i in range(5)], 0)
+        self.j.set_index(1)
+        with open(self.path, "a") as f:
+            f.write('{"op":"set_index","i')  # 写到一半崩溃
+        j = QueueJournal(self.path)
+        self.assertEqual(j.load()["index"], 1)
+        j.set_index(3)  # 重启后的操作不能粘在半截行上
+        j.set_index(4)
+        got = QueueJournal(self.path).load()
+        self.assertEqual((len(got["items"]), got["index"]), (5, 4))
+
+    def test_compacts_after_threshold(self):
+        self.j.replace([item(1), item(2)], 0)
+        for n in range(journal.COMPACT_OPS + 1):
+            self.j.set_index(n % 2 ^ 1)
+        with open(self.path) as f:
+            self.assertLessEqual(len(f.read().splitlines()), 2)
+        self.assertEqual(QueueJournal(self.path).load()["index"], self.j.index)
+
+    def test_first_write_without_snapshot_snapshots(self):
+        self.j.set_index(0)  # 没 load 过也没 replace 过:不能只写一行孤零零的操作
+        self.assertEqual(QueueJournal(self.path).load(), {"items": [], "index": 0})
+
+
+class TestRestoreResync(unittest.TestCase):
+    def setUp(self):
+        self._saved = journal.log
+        journal.log = lambda *_a, **_k: None
+        self.path = os.path.join(tempfile.mkdtemp(), "queue.journal")
+
+    def tearDown(self):
+        journal.log = self._saved
+
+    def test_edits_after_normalizing_restore_replay_cleanly(self):
+        noid = dict(item(0), id="")  # restore 会丢掉它,日志镜像得跟着丢
+        QueueJournal(self.path).replace([item(1), noid, item(2), item(3)], 3)
+        j = QueueJournal(self.path)
+        pb = Playback(player=None, provider=None, journal=j)
+        pb.restore(j.load())
+        self.assertEqual(([x["id"] for x in pb.queue], pb.index), (["1", "2", "3"], 2))
+        asyncio.run(pb.queue_remove(0))
+        asyncio.run(pb.queue_append(item(4)))
+        got = QueueJournal(self.path).load()
+        self.assertEqual([x["id"] for x in got["items"]], [x["id"] for x in pb.queue])
+        self.assertEqual(got["index"], pb.index)
+
+
+class TestQueueMigration(unittest.TestCase):
+    def test_settings_queue_moves_into_journal(self):
+        saved = (bridge_mod.log, journal.log)
+        bridge_mod.log = journal.log = lambda *_a, **_k: None
+        try:
+            b = bridge_mod.Bridge()
+            b.journal = QueueJournal(os.path.join(tempfile.mkdtemp(), "queue.journal"))
+            b.settings = {"queue": {"items": [item(1), item(2)], "index": 1}}
+            b.store.write = lambda _data: None
+            got = b._migrate_queue()
+        finally:
+            bridge_mod.log, journal.log = saved
+        self.assertEqual(got["index"], 1)
+        self.assertNotIn("queue", b.settings)
+        self.assertEqual(b.journal.load()["items"][1]["id"], "2")
+
+
+if __name__ == "__main__":
+    unittest.main()
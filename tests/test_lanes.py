@@ -0,0 +1,134 @@
+"""优先级分道单测:浏览请求再多也不能堵住播放关键的 song_url,各道在途数有上限。
+
+decky 是 Decky 运行时注入的模块,测试里打桩。运行:python -m unittest tests.test_lanes
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import protocol  # noqa: E402
+
+
+class _FakeWriter:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, data):  # 写任务会把一批 v1 帧拼成一次 write
+        self.frames += [json.loads(line) for line in data.splitlines()]
+
+    async def drain(self):
+        pass
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestLanes(unittest.TestCase):
+    def setUp(self):
+        self.conn = bridge_mod.Conn("provider")
+        self.conn.writer = _FakeWriter()
+        self._saved_log = bridge_mod.log
+        bridge_mod.log = lambda *_a, **_k: None
+        metrics.reset()
+
+    def tearDown(self):
+        bridge_mod.log = self._saved_log
+
+    def _sent(self):
+        return [f["cmd"] for f in self.conn.writer.frames if "cmd" in f]
+
+    def _answer_all(self):
+        for rid, fut in list(self.conn.pending.items()):
+            if not fut.done():
+                fut.set_result(protocol.ChildResponse(rid, True, {}, None))
+
+    def test_browse_burst_does_not_block_song_url(self):
+        cap = bridge_mod.LANES["interactive"]
+
+        async def run():
+            browse = [
+                asyncio.create_task(self.conn.request("playlist_songs", {"id": str(i)}))
+                for i in range(cap + 10)
+            ]
+            await _settle()
+            self.assertEqual(len(self._sent()), cap, "interactive 道在途不超过上限")
+            play = asyncio.create_task(self.conn.request("song_url", {"id": "x"}))
+            await _settle()
+            self.assertEqual(self._sent()[-1], "song_url", "song_url 不排在浏览请求后面")
+            while self.conn.pending:  # 逐批应答,排队的浏览请求随名额释放陆续发出
+                self._answer_all()
+                await _settle()
+            await asyncio.gather(play, *browse)
+
+        asyncio.run(run())
+        self.assertEqual(len(self._sent()), cap + 11)
+        self.assertEqual(metrics.snapshot()["timings"]["provider.lane.interactive.wait"]["count"], cap + 10)
+        self.assertEqual(metrics.snapshot()["timings"]["provider.lane.playback.wait"]["count"], 1)
+
+    def test_lane_override(self):
+        cap = bridge_mod.LANES["background"]
+
+        async def run():
+            tasks = [
+                asyncio.create_task(self.conn.request("radio_fetch", {"n": i}, lane="background"))
+                for i in range(cap + 1)
+            ]
+            await _settle()
+            self.assertEqual(len(self._sent()), cap)
+            # 同一命令走默认 interactive 道不受后台道上限影响
+            fg = asyncio.create_task(self.conn.request("radio_fetch", {"n": "fg"}))
+            await _settle()
+            self.assertEqual(len(self._sent()), cap + 1)
+            while self.conn.pending:
+                self._answer_all()
+                await _settle()
+            await asyncio.gather(fg, *tasks)
+
+        asyncio.run(run())
+
+    def test_cancel_while_queued_sends_nothing(self):
+        cap = bridge_mod.LANES["background"]
+
+        async def run():
+            held = [
+                asyncio.create_task(self.conn.request("liked_ids", {"n": i}, lane="background"))
+                for i in range(cap)
+            ]
+            queued = asyncio.create_task(self.conn.request("liked_ids", {"n": "q"}, lane="background"))
+            await _settle()
+            queued.cancel()
+            await asyncio.gather(queued, return_exceptions=True)
+            self._answer_all()
+            await asyncio.gather(*held)
+
+        asyncio.run(run())
+        self.assertEqual(len(self.conn.writer.frames), cap, "没发出去的请求既不写请求也不写 cancel")
+
+
+if __name__ == "__main__":
+    unittest.main()
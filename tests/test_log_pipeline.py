@@ -0,0 +1,93 @@
+"""日志管道单测:child 日志按 source 令牌桶限流并补报丢弃条数,bridge 自己的日志不限;
+start_pipeline 后写盘在后台线程,stop_pipeline 排空并挂回原 handler。
+decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_log_pipeline
+"""
+
+import logging
+import os
+import sys
+import threading
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import log as log_mod  # noqa: E402
+import metrics  # noqa: E402
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines, self.threads = [], set()
+
+    def emit(self, record):
+        self.lines.append(record.getMessage())
+        self.threads.add(threading.current_thread().name)
+
+
+class TestLogPipeline(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        log_mod._buckets.clear()
+        self.logger = logging.getLogger("test-log-pipeline")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.out = _Collect()
+        self.logger.addHandler(self.out)
+        self._saved = log_mod.decky.logger
+        log_mod.decky.logger = self.logger
+
+    def tearDown(self):
+        log_mod.stop_pipeline()
+        log_mod.decky.logger = self._saved
+        self.logger.removeHandler(self.out)
+
+    def test_child_flood_is_rate_limited_with_summary(self):
+        for i in range(log_mod.CHILD_BURST + 50):
+            log_mod.log("provider", "stderr", "warn", f"panic {i}")
+        for _ in range(10):
+            log_mod.log("bridge", "own", "info", "still here")  # bridge 自己的不限
+        log_mod.log("player", "socket", "info", "other source has its own bucket")
+        self.assertEqual(sum("panic" in x for x in self.out.lines), log_mod.CHILD_BURST)
+        self.assertEqual(self.out.lines.count("[bridge·own] still here"), 10)
+        self.assertIn("[player·socket] other source has its own bucket", self.out.lines)
+        self.assertGreaterEqual(metrics.get("log.suppressed.provider"), 49)
+        log_mod.stop_pipeline()  # unload 补报
+        self.assertTrue(any("messages suppressed" in x and "provider" in x for x in self.out.lines))
+        self.assertEqual(metrics.snapshot()["timings"]["log.forward"]["count"], log_mod.CHILD_BURST + 51)
+
+    def test_release_debug_from_child_costs_no_tokens(self):
+        for _ in range(log_mod.CHILD_BURST * 2):
+            log_mod.log("provider", "socket", "debug", "cmd")
+        log_mod.log("provider", "socket", "warn", "real")
+        self.assertEqual(self.out.lines, ["[provider·socket] real"])
+
+    def test_pipeline_writes_off_thread_and_restores_handlers(self):
+        before = list(self.logger.handlers)  # pytest 也可能挂了自己的捕获 handler
+        log_mod.start_pipeline()
+        self.assertNotIn(self.out, self.logger.handlers)
+        log_mod.log("bridge", "own", "info", "queued")
+        log_mod.stop_pipeline()
+        self.assertEqual(self.out.lines, ["[bridge·own] queued"])
+        self.assertNotIn(threading.current_thread().name, self.out.threads)
+        self.assertEqual(self.logger.handlers, before)
+
+
+if __name__ == "__main__":
+    unittest.main()
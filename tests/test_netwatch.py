@@ -0,0 +1,154 @@
+"""挂起 / 换网单测:墙钟跳变判挂起、默认路由 / 地址变化判换网;发现后给在线子进程广播
+net_reset(停着的不发),并记下之后第一条前台请求的耗时。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_netwatch
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import netwatch  # noqa: E402
+import protocol  # noqa: E402
+from bridge import Bridge, Conn, ProviderSlot  # noqa: E402
+from netwatch import NetWatch  # noqa: E402
+
+ROUTE = (
+    "Iface\tDestination\tGateway\tFlags\tRefCnt\tUse\tMetric\tMask\tMTU\tWindow\tIRTT\n"
+    "wlan0\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\t0\t0\t0\n"
+    "wlan0\t0001A8C0\t00000000\t0001\t0\t0\t600\t00FFFFFF\t0\t0\t0\n"
+)
+FIB_TRIE = """Main:
+  +-- 0.0.0.0/0 3 0 5
+     |-- 0.0.0.0
+        /0 universe UNICAST
+     |-- 192.168.1.23
+        /32 host LOCAL
+"""
+
+
+class _Writer:
+    def __init__(self, conn):
+        self.conn = conn
+        self.cmds = []
+
+    def write(self, data):
+        for line in data.splitlines():
+            msg = json.loads(line)
+            self.cmds.append(msg["cmd"])
+            fut = self.conn.pending.get(msg.get("id"))
+            if fut and not fut.done():
+                fut.set_result(protocol.ChildResponse(msg["id"], True, {}))
+
+    async def drain(self):
+        pass
+
+
+def _connected(conn):
+    conn.writer = _Writer(conn)
+    conn.connected.set()
+    return conn
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_default_route_and_local_addresses(self):
+        self.assertEqual(netwatch._default_routes(ROUTE), ["wlan0 0101A8C0"])
+        self.assertEqual(netwatch._local_v4(FIB_TRIE), ["192.168.1.23"])
+        v6 = "fe800000000000000000000000000001 03 40 20 80 wlan0\n00000000000000000000000000000001 01 80 10 80 lo\n"
+        self.assertEqual(netwatch._local_v6(v6), ["wlan0 fe800000000000000000000000000001"])
+
+
+class TestNetWatch(unittest.TestCase):
+    def setUp(self):
+        self._saved = netwatch.log
+        netwatch.log = lambda *_a, **_k: None
+        self.net = "wlan0 gw1"
+        self.w = NetWatch(None, read=lambda: self.net)
+
+    def tearDown(self):
+        netwatch.log = self._saved
+
+    def test_quiet_when_nothing_changed(self):
+        self.assertIsNone(self.w.poll())
+
+    def test_wall_clock_jump_means_suspend(self):
+        self.w._wall -= netwatch.SUSPEND_GAP_S + 50  # 单调钟没走,墙钟多走了一分钟
+        self.net = "wlan0 gw2"  # 睡醒顺带换了网:一次重置就够
+        self.assertEqual(self.w.poll(), "suspend")
+        self.assertIsNone(self.w.poll())
+
+    def test_route_change_means_network(self):
+        self.net = "wlan0 gw2"
+        self.assertEqual(self.w.poll(), "network")
+        self.assertIsNone(self.w.poll())
+
+    def test_unreadable_proc_never_triggers(self):
+        self.net = None
+        self.assertIsNone(self.w.poll())
+        self.net = "wlan0 gw1"
+        self.assertIsNone(self.w.poll())
+
+
+class TestNetReset(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self._saved = bridge_mod.log
+        bridge_mod.log = lambda *_a, **_k: None
+        b = self.b = Bridge()
+        b.provider = _connected(Conn("provider"))
+        b.player = _connected(Conn("player"))
+        b.standby = ProviderSlot("standby")
+        _connected(b.standby.conn)
+        b.spare = ProviderSlot("spare")  # 没起:不发
+
+    def tearDown(self):
+        bridge_mod.log = self._saved
+
+    def test_broadcast_to_live_children_only(self):
+        asyncio.run(self.b._net_reset("suspend"))
+        for conn in (self.b.provider, self.b.player, self.b.standby.conn):
+            self.assertEqual(conn.writer.cmds, ["net_reset"])
+        self.assertIsNone(self.b.spare.conn.writer)
+        self.assertEqual(metrics.get("net.reset.suspend"), 1)
+
+    def test_first_foreground_request_after_reset_is_timed(self):
+        async def run():
+            await self.b._net_reset("network")
+            await self.b.provider.request("song_url", {"id": "1"})  # 播放道不算用户操作
+            await self.b.provider.request("search_hot")
+            await self.b.provider.request("toplists")
+
+        asyncio.run(run())
+        timing = metrics.snapshot()["timings"]["provider.net.first_action"]
+        self.assertEqual(timing["count"], 1)
+        self.assertFalse(self.b.provider.net_reset)
+
+    def test_net_reset_does_not_count_as_foreground_use(self):
+        used_at = self.b.provider.used_at
+        asyncio.run(self.b._net_reset("network"))
+        self.assertEqual(self.b.provider.used_at, used_at)  # 不耽误闲置停机
+
+
+if __name__ == "__main__":
+    unittest.main()
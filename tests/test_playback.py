@@ -52,12 +52,20 @@ def run(coro):
     return asyncio.run(coro)
 
 
+class _Journal:
+    """记下 Playback 发给队列日志的操作。"""
+
+    def __init__(self):
+        self.ops = []
+
+    def __getattr__(self, op):
+        return lambda *args: self.ops.append((op, *args))
+
+
 class TestQueueEdit(unittest.TestCase):
     def setUp(self):
-        self.persisted = []
-        self.pb = Playback(
-            FakeConn(), FakeConn(), persist=lambda q, i: self.persisted.append((len(q), i))
-        )
+        self.journal = _Journal()
+        self.pb = Playback(FakeConn(), FakeConn(), journal=self.journal)
 
     def test_insert_next_after_current(self):
         run(self.pb.play_queue([item("a"), item("b")], 0))
@@ -103,9 +111,15 @@ class TestQueueEdit(unittest.TestCase):
         self.assertEqual(self.pb.queue[0]["name"], "歌A")
         self.assertEqual(self.pb.queue[1]["name"], "")  # 旧存档缺字段 → 空串占位
 
-    def test_persist_called_on_edits(self):
-        run(self.pb.play_queue([item("a")], 0))
-        self.assertTrue(self.persisted)
+    def test_edits_are_journaled_as_ops(self):
+        run(self.pb.play_queue([item("a"), item("b")], 0))
+        run(self.pb.queue_insert_next(item("x")))
+        run(self.pb.queue_play(2))
+        run(self.pb.queue_remove(0))
+        ops = [op[0] for op in self.journal.ops]
+        self.assertEqual(ops, ["replace", "set_index", "insert", "set_index", "remove"])
+        self.assertEqual(self.journal.ops[2][1:], (1, item("x")))  # 插在当前曲之后
+        self.assertEqual(self.journal.ops[-1][1:], (0,))
 
     def test_resume_after_restore_cold_starts_current(self):
         # 重启回灌后 player 没 load 过:resume 应加载当前曲(而非发空操作 resume)
@@ -161,9 +175,7 @@ class TestQueueEdit(unittest.TestCase):
             br.settings = {"provider": "qq", "play_mode": "list_loop"}
             br.provider = FakeConn()
             br.player = FakeConn()
-            br.playback = Playback(
-                br.player, br.provider, persist=lambda q, i: saved.append((list(q), i))
-            )
+            br.playback = Playback(br.player, br.provider, journal=_Journal())
             await br.playback.play_radio("qq_guess", [item("a"), item("b")])
 
             ensured = []
@@ -278,6 +290,17 @@ class TestSongsToItems(unittest.TestCase):
 
         self.assertEqual(_songs_to_items(None), [])
 
+    def test_columnar_songs(self):
+        from py_modules.bridge import _songs_to_items  # noqa: PLC0415
+
+        packed = {
+            "cols": ["mid", "name", "cover", "media_mid"],
+            "rows": [["9", "n", [0, "x.jpg"], "mm"], ["", "no-mid", "", ""]],
+            "prefixes": {"cover": ["http://img/"]},
+        }
+        (item,) = _songs_to_items(packed)
+        self.assertEqual((item["id"], item["cover"], item["media_mid"]), ("9", "http://img/x.jpg", "mm"))
+
 
 class TestRadioSongShapeRegression(unittest.TestCase):
     """回归:电台队列项缺 id(旧 bug 是 Song 形状直灌)不再 KeyError,走失败路径。"""
@@ -295,7 +318,7 @@ class RecordingConn:
     def __init__(self):
         self.calls = []
 
-    async def request(self, cmd, args=None):
+    async def request(self, cmd, args=None, **_opts):  # coalesce 等调度开关不影响透传
         self.calls.append((cmd, args))
         return types.SimpleNamespace(ok=True, data={}, error=None)
 
@@ -309,6 +332,16 @@ class TestListCmdPaging(unittest.TestCase):
         run(self.bridge.get_fav_songs(50))
         self.assertEqual(self.bridge.provider.calls[0], ("fav_songs", {"limit": 50, "offset": 50}))
 
+    def test_columnar_songs_decoded_for_frontend(self):
+        packed = {"cols": ["mid", "name"], "rows": [["a", "x"], ["b", "y"]]}
+
+        async def request(cmd, args=None, **_opts):
+            return types.SimpleNamespace(ok=True, data={"songs": packed}, error=None)
+
+        self.bridge.provider.request = request
+        resp = run(self.bridge.get_fav_songs())
+        self.assertEqual(resp["songs"], [{"mid": "a", "name": "x"}, {"mid": "b", "name": "y"}])
+
     def test_search_keyword_and_offset_passthrough(self):
         run(self.bridge.search_songs("k", 100))
         self.assertEqual(
@@ -483,11 +516,11 @@ class TestUpstreamTimeoutRetriesSameSong(unittest.TestCase):
     """
 
     def setUp(self):
-        import playback as playback_mod
+        import retry
 
-        self._old = playback_mod.UPSTREAM_RETRY_BACKOFF
-        playback_mod.UPSTREAM_RETRY_BACKOFF = 0  # 测试不真睡
-        self.addCleanup(setattr, playback_mod, "UPSTREAM_RETRY_BACKOFF", self._old)
+        key = ("song_url", "upstream_timeout")
+        self.addCleanup(retry.POLICY.__setitem__, key, retry.POLICY[key])
+        retry.POLICY[key] = retry.Rule(attempts=retry.POLICY[key].attempts)  # 测试不真睡
 
     def test_transient_timeout_plays_the_intended_song(self):
         """只抖一次:重试后该放的还是原来那首,不跳过。"""
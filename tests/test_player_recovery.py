@@ -0,0 +1,151 @@
+"""player 崩溃恢复单测:进程中途退出即重新拉起、恢复音量,在播则从中断处(按墙钟外推)接上;
+unload 期间的退出不拉起;判死直接杀。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_player_recovery
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import protocol  # noqa: E402
+from bridge import Bridge, Conn  # noqa: E402
+from playback import Playback  # noqa: E402
+
+
+class _Proc:
+    def __init__(self):
+        self.pid = 1
+        self.returncode = None
+        self._exited = asyncio.get_running_loop().create_future()
+
+    def exit(self, code):
+        self.returncode = code
+        self._exited.set_result(code)
+
+    def kill(self):
+        self.exit(-9)
+
+    def terminate(self):
+        self.exit(-15)
+
+    async def wait(self):
+        return await self._exited
+
+
+class _Writer:
+    def __init__(self, conn):
+        self.conn = conn
+        self.frames = []
+
+    def write(self, data):
+        for line in data.splitlines():
+            msg = json.loads(line)
+            self.frames.append(msg)
+            fut = self.conn.pending.get(msg.get("id"))
+            if fut and not fut.done():
+                fut.set_result(protocol.ChildResponse(msg["id"], True, {}))
+
+    async def drain(self):
+        pass
+
+
+class TestPlayerRecovery(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.procs = []
+        self.resumed = 0
+
+        async def fake_spawn(*_args):
+            proc = _Proc()
+            self.procs.append(proc)
+            b.player.writer = _Writer(b.player)  # 新进程连入
+            b.player.connected.set()
+            return proc
+
+        async def resume():
+            self.resumed += 1
+
+        self._saved = (bridge_mod.spawn, bridge_mod.log)
+        bridge_mod.spawn = fake_spawn
+        bridge_mod.log = lambda *_a, **_k: None
+        b = self.b = Bridge()
+        b.settings = {"volume": 0.5}
+        b.player = Conn("player")
+        b.playback = types.SimpleNamespace(player_lost=lambda: True, resume=resume)
+        b.player_sup.failed = b.player_sup.started = lambda *_a: None  # 不落盘崩溃环
+
+    def tearDown(self):
+        bridge_mod.spawn, bridge_mod.log = self._saved
+
+    def _crash(self, code=-6, closing=False):
+        async def run():
+            await self.b._spawn_player()
+            self.b.player.disconnect()
+            self.b.closing = closing
+            self.procs[0].exit(code)
+            for _ in range(20):
+                await asyncio.sleep(0)
+
+        asyncio.run(run())
+
+    def test_crash_respawns_with_volume_and_resumes(self):
+        self._crash()
+        self.assertEqual(len(self.procs), 2)
+        self.assertIs(self.b.player_proc, self.procs[1])
+        volume = [f for f in self.b.player.writer.frames if f["cmd"] == "volume"]
+        self.assertEqual(volume[0]["args"], {"val": 0.5})
+        self.assertEqual(self.resumed, 1)
+        self.assertEqual(metrics.get("player.crashed"), 1)
+        self.assertEqual(metrics.snapshot()["timings"]["player.recovery"]["count"], 1)
+
+    def test_exit_during_unload_is_not_respawned(self):
+        self._crash(code=0, closing=True)
+        self.assertEqual(len(self.procs), 1)
+        self.assertEqual(self.resumed, 0)
+
+    def test_unresponsive_player_is_killed(self):
+        async def run():
+            await self.b._spawn_player()
+            self.b._player_unresponsive()
+            return self.procs[0].returncode
+
+        self.assertEqual(asyncio.run(run()), -9)
+
+
+class TestPlayerLost(unittest.TestCase):
+    def test_resume_point_extrapolated_from_wall_clock(self):
+        pb = Playback(player=None, provider=None)
+        pb.queue, pb.index = [{"id": "1"}], 0
+        pb.playing, pb._loaded = True, True
+        pb.pos, pb.wall = 10.0, int(time.time() * 1000) - 3000
+        self.assertTrue(pb.player_lost())
+        self.assertAlmostEqual(pb._resume_at, 13.0, delta=0.5)
+        self.assertFalse(pb._loaded)  # 下次 resume 冷启动重新解析
+        self.assertFalse(pb.player_lost())  # 已不在播
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -35,6 +35,7 @@ from bridge import Bridge  # noqa: E402
 
 class _FakePlayer:
     path = "/tmp/player.sock"
+    connected = asyncio.Event()
 
 
 class TestPlayerSpawn(unittest.TestCase):
@@ -81,6 +82,8 @@ class _FakeProviderConn:
     def __init__(self):
         self.connected = asyncio.Event()
         self.path = "/tmp/provider.sock"
+        self.breakers = {}
+        self.parked = False
 
 
 class TestProviderSpawn(unittest.TestCase):
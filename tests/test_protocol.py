@@ -22,6 +22,10 @@ class TestBuild(unittest.TestCase):
     def test_request_default_args(self):
         self.assertEqual(protocol.request(2, "account"), {"id": 2, "cmd": "account", "args": {}})
 
+    def test_request_enc(self):
+        req = protocol.request(3, "fav_songs", enc=protocol.SONG_COLUMNS)
+        self.assertEqual(req["enc"], "cols")
+
 
 class TestDecodeResponse(unittest.TestCase):
     def test_success(self):
@@ -101,5 +105,40 @@ class TestDemux(unittest.TestCase):
             protocol.decode_child_message("nope")
 
 
+class TestSongColumns(unittest.TestCase):
+    COVER = "https://y.qq.com/music/photo_new/T002R300x300M000"
+
+    def test_plain_list_passes_through(self):
+        songs = [{"mid": "a"}]
+        self.assertIs(protocol.decode_songs(songs), songs)
+
+    def test_columns_with_prefixes(self):
+        packed = {
+            "cols": ["mid", "cover"],
+            "rows": [["a", [0, "x.jpg"]], ["b", ""], ["c", "http://other/c.jpg"]],
+            "prefixes": {"cover": [self.COVER]},
+        }
+        self.assertEqual(
+            protocol.decode_songs(packed),
+            [
+                {"mid": "a", "cover": self.COVER + "x.jpg"},
+                {"mid": "b", "cover": ""},
+                {"mid": "c", "cover": "http://other/c.jpg"},
+            ],
+        )
+
+    def test_bad_rows_are_skipped(self):
+        packed = {
+            "cols": ["mid", "cover"],
+            "rows": [["a"], "junk", ["b", [9, "x"]]],
+            "prefixes": {"cover": [self.COVER]},
+        }
+        self.assertEqual(protocol.decode_songs(packed), [{"mid": "b", "cover": ""}])
+
+    def test_garbage_is_empty(self):
+        self.assertEqual(protocol.decode_songs(None), [])
+        self.assertEqual(protocol.decode_songs({"cols": "x", "rows": []}), [])
+
+
 if __name__ == "__main__":
     unittest.main()
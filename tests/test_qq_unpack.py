@@ -1,8 +1,10 @@
-"""qq_exe 自解包单测:remote_binary 安装落的是 tar.gz 文件,bridge 首次用到时自解。"""
+"""qq_exe 自解包单测:remote_binary 安装落的是 tar.gz 文件,bridge 首次用到时自解;
+解包留下归档与清单,之后启动按清单补回缺失 / 截断的文件。"""
 
 import io
 import logging
 import os
+import shutil
 import stat
 import sys
 import tarfile
@@ -29,6 +31,7 @@ sys.modules.setdefault("decky", decky_stub)
 decky_stub = sys.modules["decky"]
 
 import bridge  # noqa: E402
+import bundle  # noqa: E402
 
 
 def _make_tarball(path: str):
@@ -38,6 +41,10 @@ def _make_tarball(path: str):
         info = tarfile.TarInfo("qq-provider/qq-provider")
         info.size = len(data)
         tf.addfile(info, io.BytesIO(data))
+        lib = b"\x7fELF" + b"\0" * 60
+        info = tarfile.TarInfo("qq-provider/lib/libfoo.so")
+        info.size = len(lib)
+        tf.addfile(info, io.BytesIO(lib))
 
 
 class TestQqUnpack(unittest.TestCase):
@@ -49,9 +56,12 @@ class TestQqUnpack(unittest.TestCase):
         self._saved = (decky_stub.DECKY_PLUGIN_DIR, decky_stub.DECKY_PLUGIN_RUNTIME_DIR)
         decky_stub.DECKY_PLUGIN_DIR = self.plugin.name
         decky_stub.DECKY_PLUGIN_RUNTIME_DIR = self.runtime.name
+        self._saved_log = bridge.log
+        bridge.log = lambda *_a, **_k: None
 
     def tearDown(self):
         decky_stub.DECKY_PLUGIN_DIR, decky_stub.DECKY_PLUGIN_RUNTIME_DIR = self._saved
+        bridge.log = self._saved_log
         os.chmod(self.bin, 0o755)
         self.plugin.cleanup()
         self.runtime.cleanup()
@@ -71,6 +81,37 @@ class TestQqUnpack(unittest.TestCase):
         # tar 文件已让位,重复调用幂等
         self.assertEqual(bridge.qq_exe(), exe)
 
+    def _restart(self):
+        bridge._qq_checked.clear()  # 新的 bridge 进程:清单再校验一遍
+
+    def test_unpack_keeps_archive_and_writes_manifest(self):
+        _make_tarball(os.path.join(self.bin, "qq-provider"))
+        bridge.qq_exe()
+        self.assertTrue(os.path.isfile(os.path.join(self.bin, "qq-provider.tar.gz")))
+        files = bundle.load(os.path.join(self.bin, "qq-provider.manifest.json"))
+        self.assertEqual(sorted(files), ["lib/libfoo.so", "qq-provider"])
+        self.assertEqual(files["lib/libfoo.so"][0], 64)
+
+    def test_missing_and_truncated_files_repaired_from_archive(self):
+        _make_tarball(os.path.join(self.bin, "qq-provider"))
+        exe = bridge.qq_exe()
+        lib = os.path.join(self.bin, "qq-provider", "lib", "libfoo.so")
+        os.remove(lib)
+        with open(exe, "w") as f:
+            f.write("#!")  # 截断
+        self._restart()
+        bridge.qq_exe()
+        self.assertEqual(os.path.getsize(lib), 64)
+        self.assertEqual(open(exe, "rb").read(), b"#!/bin/sh\n")
+
+    def test_deleted_tree_reunpacked_from_archive(self):
+        _make_tarball(os.path.join(self.bin, "qq-provider"))
+        exe = bridge.qq_exe()
+        shutil.rmtree(os.path.join(self.bin, "qq-provider"))
+        self._restart()
+        self.assertEqual(bridge.qq_exe(), exe)
+        self.assertTrue(os.path.isfile(exe))
+
     def test_missing_binary_returns_natural_path(self):
         # 什么都没有:返回常规路径,让 spawn 报出自然的 FileNotFoundError
         self.assertEqual(
@@ -45,7 +45,12 @@ class TestSetQuality(unittest.TestCase):
         bridge_mod.save_settings = self.saved
 
     def test_valid_value_persists(self):
-        got = asyncio.run(self.b.set_quality("lossless"))
+        async def run():
+            got = await self.b.set_quality("lossless")
+            await self.b.store.flush()  # 写后落盘:防抖窗口没到就强制刷
+            return got
+
+        got = asyncio.run(run())
         self.assertEqual(got, "lossless")
         self.assertEqual(self.b.settings["quality"], "lossless")
         self.assertEqual(self.written[-1]["quality"], "lossless")
@@ -0,0 +1,150 @@
+"""重发单测:provider 中途被杀 / 崩溃时,幂等命令等它重开后在原 deadline 内透明重发;
+写操作与换了 provider 的请求照旧失败。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_replay
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import protocol  # noqa: E402
+
+
+class _SilentWriter:
+    """旧进程:收下请求不回(随后被判死)。"""
+
+    def __init__(self):
+        self.frames = []
+
+    def write(self, data):
+        self.frames += [json.loads(line) for line in data.splitlines()]
+
+    async def drain(self):
+        pass
+
+
+class _AnsweringWriter(_SilentWriter):
+    """新进程:每条请求都回 ok {"cmd": ...}。"""
+
+    def __init__(self, conn):
+        super().__init__()
+        self.conn = conn
+
+    def write(self, data):
+        for line in data.splitlines():
+            msg = json.loads(line)
+            self.frames.append(msg)
+            fut = self.conn.pending.get(msg.get("id"))
+            if fut and not fut.done():
+                fut.set_result(protocol.ChildResponse(msg["id"], True, {"cmd": msg["cmd"]}))
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.conn = bridge_mod.Conn("provider")
+        self.conn.session = "qq"
+        self.conn.writer = _SilentWriter()
+        self.revived = 0
+
+        async def revive():
+            self.revived += 1
+            self.conn.writer = _AnsweringWriter(self.conn)
+
+        self.conn.revive = revive
+        self._saved_log = bridge_mod.log
+        bridge_mod.log = lambda *_a, **_k: None
+
+    def tearDown(self):
+        bridge_mod.log = self._saved_log
+
+    def _die_mid_request(self, cmd, args=None):
+        async def run():
+            task = asyncio.create_task(self.conn.request(cmd, args))
+            await _settle()
+            self.conn.disconnect()  # 判死被杀:读循环见 EOF
+            return await task
+
+        return asyncio.run(run())
+
+    def test_idempotent_read_is_replayed(self):
+        resp = self._die_mid_request("search_songs", {"keyword": "x"})
+        self.assertTrue(resp.ok)
+        self.assertEqual(resp.data, {"cmd": "search_songs"})
+        self.assertEqual(self.revived, 1)
+        self.assertEqual(metrics.get("provider.replayed.search_songs"), 1)
+
+    def test_song_url_is_replayed(self):
+        self.assertTrue(self._die_mid_request("song_url", {"id": "1"}).ok)
+
+    def test_mutation_is_not_replayed(self):
+        resp = self._die_mid_request("like_song", {"id": "1", "on": True})
+        self.assertFalse(resp.ok)
+        self.assertEqual(resp.error.code, "timeout")
+        self.assertEqual(self.revived, 0)
+
+    def test_provider_switch_is_not_replayed(self):
+        async def switch():
+            self.revived += 1
+            self.conn.session = "ncm"
+            self.conn.writer = _AnsweringWriter(self.conn)
+
+        self.conn.revive = switch
+        resp = self._die_mid_request("playlist_songs", {"id": "1"})
+        self.assertFalse(resp.ok)
+        self.assertEqual(self.revived, 1)
+
+    def test_already_dead_conn_revives_before_sending(self):
+        self.conn.disconnect()
+        resp = asyncio.run(self.conn.request("toplists"))
+        self.assertTrue(resp.ok)
+        self.assertEqual(self.revived, 1)
+
+    def test_no_time_left_gives_up(self):
+        async def slow_revive():
+            await asyncio.sleep(0.2)
+            self.conn.writer = _AnsweringWriter(self.conn)
+
+        self.conn.revive = slow_revive
+        saved = bridge_mod.REPLAY_MIN_S
+        bridge_mod.REPLAY_MIN_S = bridge_mod.request_timeout("lyric")  # 重开完剩余必然不够
+        try:
+            resp = self._die_mid_request("lyric", {"id": "1"})
+        finally:
+            bridge_mod.REPLAY_MIN_S = saved
+        self.assertFalse(resp.ok)
+
+    def test_replay_floor_leaves_the_child_an_upstream_budget(self):
+        # 重发下限若不高于 child 的回包余量,child 扣完就是负预算,一到就按过期回 timeout
+        self.assertGreaterEqual(bridge_mod.REPLAY_MIN_S - bridge_mod.CHILD_DEADLINE_MARGIN, 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,6 +8,7 @@ decky 是 Decky 运行时注入的模块,测试里打桩。运行:python -m unit
 """
 
 import asyncio
+import json
 import logging
 import os
 import sys
@@ -52,7 +53,7 @@ class TestRequestTiming(unittest.TestCase):
         self.logs = []
         self._saved_log = bridge_mod.log
         self._saved_slow = bridge_mod.SLOW_REQUEST_S
-        bridge_mod.log = lambda src, origin, level, msg: self.logs.append((level, msg))
+        bridge_mod.log = lambda src, origin, level, msg, *args: self.logs.append((level, msg % args))
 
     def tearDown(self):
         bridge_mod.log = self._saved_log
@@ -100,5 +101,38 @@ class TestRequestTiming(unittest.TestCase):
         self.assertNotIn("debug", [lv for lv, _ in self.logs])
 
 
+class TestCommandBudget(unittest.TestCase):
+    """分级超时 + deadline 下发:每级都得保持 provider 预算 < bridge 等待。"""
+
+    def test_class_timeouts_capped_by_request_timeout(self):
+        self.assertEqual(bridge_mod.request_timeout("pause"), bridge_mod.TIMEOUTS["control"])
+        self.assertEqual(bridge_mod.request_timeout("search"), bridge_mod.TIMEOUTS["browse"])
+        self.assertEqual(bridge_mod.request_timeout("song_url"), bridge_mod.REQUEST_TIMEOUT)
+        for t in bridge_mod.TIMEOUTS.values():
+            self.assertLessEqual(t, bridge_mod.REQUEST_TIMEOUT)
+
+    def test_request_carries_deadline_within_budget(self):
+        conn = bridge_mod.Conn("provider")
+        conn.writer = _FakeWriter()
+        saved_log, bridge_mod.log = bridge_mod.log, lambda *a: None
+
+        async def run():
+            task = asyncio.create_task(conn.request("search", {"keyword": "x"}))
+            while not conn.pending:
+                await asyncio.sleep(0)
+            rid, fut = next(iter(conn.pending.items()))
+            fut.set_result(protocol.ChildResponse(rid, True, {}, None))
+            await task
+
+        try:
+            before = bridge_mod.time.time()
+            asyncio.run(run())
+        finally:
+            bridge_mod.log = saved_log
+        sent = json.loads(conn.writer.lines[0])
+        budget_ms = sent["deadline"] - before * 1000
+        self.assertTrue(0 < budget_ms <= bridge_mod.TIMEOUTS["browse"] * 1000 + 1, budget_ms)
+
+
 if __name__ == "__main__":
     unittest.main()
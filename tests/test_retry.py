@@ -0,0 +1,114 @@
+"""重试策略单测:按 (命令, 错误码) 查表重试,退避指数增长带抖动,受总预算与钩子约束,
+次数与耗时进指标。
+运行:python -m unittest tests.test_retry
+"""
+
+import asyncio
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+import metrics  # noqa: E402
+import retry  # noqa: E402
+
+
+def _resp(code=""):
+    err = types.SimpleNamespace(code=code, message=code) if code else None
+    return types.SimpleNamespace(ok=not code, data={}, error=err)
+
+
+class Scripted:
+    """第 n 次 send() 回 codes[n](空串 = 成功)。"""
+
+    def __init__(self, *codes):
+        self.codes = list(codes)
+        self.sent = 0
+
+    async def __call__(self):
+        code = self.codes[min(self.sent, len(self.codes) - 1)]
+        self.sent += 1
+        return _resp(code)
+
+
+class TestRetry(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self._saved_log = retry.log
+        retry.log = lambda *_a, **_k: None
+
+    def tearDown(self):
+        retry.log = self._saved_log
+
+    def _call(self, send, rule, hooks=None, live=None, code="upstream_timeout"):
+        return asyncio.run(retry.call("song_url", send, hooks, live, policy={("song_url", code): rule}))
+
+    def test_retries_until_success(self):
+        send = Scripted("upstream_timeout", "upstream_timeout", "")
+        r = self._call(send, retry.Rule(attempts=3))
+        self.assertTrue(r.ok)
+        self.assertEqual(send.sent, 3)
+        self.assertEqual(metrics.get("retry.song_url.upstream_timeout"), 2)
+        self.assertEqual(metrics.get("retry.song_url.recovered"), 1)
+        self.assertEqual(metrics.snapshot()["timings"]["retry.song_url.time"]["count"], 1)
+
+    def test_attempts_cap_and_unlisted_codes(self):
+        send = Scripted("upstream_timeout")
+        self.assertFalse(self._call(send, retry.Rule(attempts=2)).ok)
+        self.assertEqual(send.sent, 2)
+        send = Scripted("no_playable")
+        self._call(send, retry.Rule(attempts=5))  # 表里只有 upstream_timeout
+        self.assertEqual(send.sent, 1)
+
+    def test_backoff_grows_with_bounded_jitter(self):
+        rule = retry.Rule(backoff=0.5, factor=2.0, jitter=0.2)
+        for n, base in ((1, 0.5), (2, 1.0), (3, 2.0)):
+            for _ in range(20):
+                self.assertTrue(base * 0.8 <= retry.delay(rule, n) <= base * 1.2)
+        self.assertEqual(retry.delay(retry.Rule(), 1), 0.0)
+
+    def test_budget_stops_retrying(self):
+        send = Scripted("upstream_timeout")
+        self._call(send, retry.Rule(attempts=5, backoff=1.0, budget=0.5))
+        self.assertEqual(send.sent, 1)
+        self.assertEqual(metrics.get("retry.song_url.upstream_timeout.over_budget"), 1)
+
+    def test_hook_gates_retry(self):
+        calls = []
+
+        async def refresh(result):
+            calls.append(result)
+            return result
+
+        rule = retry.Rule(before="refresh_credential")
+        send = Scripted("no_playable", "")
+        r = self._call(send, rule, {"refresh_credential": lambda: refresh(True)}, code="no_playable")
+        self.assertTrue(r.ok)
+        send = Scripted("no_playable", "")
+        r = self._call(send, rule, {"refresh_credential": lambda: refresh(False)}, code="no_playable")
+        self.assertFalse(r.ok)  # 没真刷新:不浪费第二发
+        self.assertEqual(send.sent, 1)
+        send = Scripted("no_playable", "")
+        self._call(send, rule, code="no_playable")  # 钩子缺失同样不重试
+        self.assertEqual((send.sent, calls), (1, [True, False]))
+
+    def test_superseded_caller_gets_none(self):
+        send = Scripted("upstream_timeout", "")
+        self.assertIsNone(self._call(send, retry.Rule(), live=lambda: False))
+        self.assertEqual(send.sent, 1)
+
+    def test_codes_counted_separately(self):
+        policy = {
+            ("song_url", "no_playable"): retry.Rule(attempts=2),
+            ("song_url", "upstream_timeout"): retry.Rule(attempts=2),
+        }
+        send = Scripted("no_playable", "upstream_timeout", "")
+        r = asyncio.run(retry.call("song_url", send, policy=policy))
+        self.assertTrue(r.ok)
+        self.assertEqual(send.sent, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+"""备胎单测:provider 判死 / 崩溃后就绪的同家备胎直接转正、不冷启;在途的幂等请求
+重发到转正后的 Conn。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_spare
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import breaker as breaker_mod  # noqa: E402
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import protocol  # noqa: E402
+from bridge import Bridge, Conn, ProviderSlot  # noqa: E402
+
+
+class _LiveProc:
+    def __init__(self, pid=1):
+        self.pid = pid
+        self.returncode = None
+
+    def kill(self):
+        self.returncode = -9
+
+    def terminate(self):
+        self.returncode = -15
+
+
+class _Writer:
+    """回 ok {"cmd": ...};answer=False 时收下不回(卡死的旧进程)。"""
+
+    def __init__(self, conn, answer=True):
+        self.conn, self.answer = conn, answer
+        self.cmds = []
+
+    def write(self, data):
+        for line in data.splitlines():
+            msg = json.loads(line)
+            self.cmds.append(msg["cmd"])
+            fut = self.conn.pending.get(msg.get("id"))
+            if self.answer and fut and not fut.done():
+                fut.set_result(protocol.ChildResponse(msg["id"], True, {"cmd": msg["cmd"]}))
+
+    async def drain(self):
+        pass
+
+
+def _connected(conn, which, answer=True):
+    conn.session = which
+    conn.writer = _Writer(conn, answer)
+    conn.connected.set()
+    return conn
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class TestSpare(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.spawned = []
+
+        async def no_spawn(*args):
+            self.spawned.append(args)
+            raise OSError("no spawn in tests")
+
+        self._saved = (bridge_mod.spawn, bridge_mod.log, bridge_mod.save_settings)
+        bridge_mod.spawn = no_spawn
+        bridge_mod.log = lambda *_a, **_k: None
+        bridge_mod.save_settings = lambda _s: None
+        b = self.b = Bridge()
+        b.settings = {"provider": "qq", "accounts": {"qq": {"c": 1}}}
+        b.provider = _connected(Conn("provider"), "qq", answer=False)
+        b.provider_proc, b.provider_which, b.provider_error = _LiveProc(1), "qq", None
+        b.provider_lock = asyncio.Lock()
+        b.spare = ProviderSlot("spare")
+        _connected(b.spare.conn, "qq")
+        b.spare.proc, b.spare.which = _LiveProc(2), "qq"
+        b.playback = types.SimpleNamespace(provider=b.provider)
+        b._kick_seed_liked = lambda: None
+        self.kicks = []
+        b._kick_slots = lambda: self.kicks.append(1)  # 补新备胎另测,这里只看转正本身有没有 spawn
+        b._wire_provider()
+
+    def tearDown(self):
+        bridge_mod.spawn, bridge_mod.log, bridge_mod.save_settings = self._saved
+
+    def test_dead_provider_promotes_spare_without_spawning(self):
+        old, spare = self.b.provider, self.b.spare.conn
+        old_proc = self.b.provider_proc
+        old.disconnect()
+        old_proc.returncode = 1  # 崩溃
+
+        async def run():
+            await self.b._ensure_provider("qq")
+            return list(self.spawned)
+
+        self.assertEqual(asyncio.run(run()), [])
+        self.assertIs(self.b.provider, spare)
+        self.assertIs(self.b.playback.provider, spare)
+        self.assertEqual((self.b.provider.name, self.b.provider_proc.pid), ("provider", 2))
+        self.assertIn("set_credential", spare.writer.cmds)  # 转正时才注入凭证
+        self.assertIsNone(self.b.spare.proc)  # 旧进程不留作备胎
+        self.assertTrue(self.kicks)  # 转正后补新备胎
+        self.assertEqual(metrics.snapshot()["timings"]["provider.spare.promote"]["count"], 1)
+
+    def test_unresponsive_provider_fails_over_to_spare(self):
+        spare = self.b.spare.conn
+
+        async def run():
+            task = asyncio.create_task(self.b.provider.request("search_songs", {"keyword": "x"}))
+            await _settle()
+            self.b.provider.disconnect()  # 判死杀进程:读循环见 EOF
+            self.b._provider_unresponsive()
+            return await task
+
+        resp = asyncio.run(run())
+        self.assertEqual(self.spawned, [])
+        self.assertIs(self.b.provider, spare)
+        self.assertTrue(resp.ok)  # 在途的幂等请求重发到了转正后的 Conn
+        self.assertEqual(resp.data, {"cmd": "search_songs"})
+
+    def test_promote_while_breaker_open_retires_old_breakers(self):
+        old = self.b.provider
+        old.breaker_probe = ("search_hot", None)
+        emitted = []
+
+        async def capture(_ev, payload):
+            emitted.append(payload["data"])
+
+        async def run():
+            breaker = old._breaker("toplists")
+            for _ in range(breaker_mod.BREAKER_THRESHOLD):
+                breaker.record("upstream_timeout")
+            await _settle()
+            opened = list(self.b.offline)
+            prober = breaker._prober
+            old.disconnect()
+            self.b.provider_proc.returncode = 1
+            await self.b._ensure_provider("qq")  # 备胎转正
+            await _settle()
+            return opened, prober
+
+        saved = bridge_mod.decky.emit
+        bridge_mod.decky.emit = capture
+        try:
+            opened, prober = asyncio.run(run())
+        finally:
+            bridge_mod.decky.emit = saved
+        self.assertEqual(opened, ["browse"])
+        self.assertIsNot(self.b.provider, old)
+        self.assertEqual(old.breakers, {})
+        self.assertTrue(prober.cancelled() or prober.done())  # 探测不再打在退下来的连接上
+        self.assertEqual(self.b.offline, [])
+        self.assertEqual(emitted[-1], {"offline": False, "classes": []})  # 横幅撤下
+
+    def test_spare_skipped_under_memory_pressure(self):
+        self.b.spare.stop()
+        saved = bridge_mod.mem_available_mb
+        bridge_mod.mem_available_mb = lambda: bridge_mod.STANDBY_MIN_AVAIL_MB - 1
+        try:
+            asyncio.run(self.b._fill_spare())
+        finally:
+            bridge_mod.mem_available_mb = saved
+        self.assertEqual(self.spawned, [])
+        self.assertIsNone(self.b.spare.proc)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""热备单测:切到热备那家只对调活跃 Conn、不冷启;旧的活跃方留作新热备;
+巡检按闲置 / 常驻内存 / 系统可用内存收掉热备;闲置按上次切源算,闲置收掉的等再切源才补起。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_standby
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+from bridge import Bridge, Conn, ProviderSlot  # noqa: E402
+
+
+class _LiveProc:
+    def __init__(self, pid=1):
+        self.pid = pid
+        self.returncode = None
+
+    def kill(self):
+        self.returncode = -9
+
+    def terminate(self):
+        self.returncode = -15
+
+
+def _connected(conn, which):
+    conn.session = which
+    conn.connected.set()
+    return conn
+
+
+class TestHotStandby(unittest.TestCase):
+    def setUp(self):
+        self.spawned = []
+
+        async def no_spawn(*args):
+            self.spawned.append(args)
+            raise OSError("no spawn in tests")
+
+        self._saved = (bridge_mod.spawn, bridge_mod.log, bridge_mod.save_settings)
+        bridge_mod.spawn = no_spawn
+        bridge_mod.log = lambda *_a, **_k: None
+        bridge_mod.save_settings = lambda _s: None
+        b = self.b = Bridge()
+        b.settings = {"provider": "qq", "hot_standby": True, "accounts": {"qq": {"c": 1}, "ncm": {"c": 2}}}
+        b.provider = _connected(Conn("provider"), "qq")
+        b.provider_proc, b.provider_which, b.provider_error = _LiveProc(1), "qq", None
+        b.provider_lock = asyncio.Lock()
+        b.standby = ProviderSlot("standby")
+        _connected(b.standby.conn, "ncm")
+        b.standby.proc, b.standby.which = _LiveProc(2), "ncm"
+        b.playback = types.SimpleNamespace(provider=b.provider)
+
+    def tearDown(self):
+        bridge_mod.spawn, bridge_mod.log, bridge_mod.save_settings = self._saved
+
+    def test_switch_promotes_standby_without_spawning(self):
+        qq_conn, ncm_conn = self.b.provider, self.b.standby.conn
+        asyncio.run(self.b._ensure_provider("ncm"))
+        self.assertEqual(self.spawned, [])
+        self.assertIs(self.b.provider, ncm_conn)
+        self.assertIs(self.b.playback.provider, ncm_conn)  # 播放编排也指过去了
+        self.assertEqual((self.b.provider_which, self.b.provider_proc.pid), ("ncm", 2))
+        self.assertEqual(self.b.provider.name, "provider")
+        # 事件道的指标名跟着换:转正后的丢帧 / 合并记在 provider 名下,退位的记在 standby 名下
+        self.assertEqual(self.b.provider._ev_lanes["telemetry"].name, "provider.events.telemetry")
+        self.assertEqual(qq_conn._ev_lanes["state"].name, "standby.events.state")
+        # 旧的活跃方还活着:留作新热备,切回来同样瞬时
+        self.assertIs(self.b.standby.conn, qq_conn)
+        self.assertTrue(self.b.standby.ready("qq"))
+        self.assertIsNone(qq_conn.on_event)
+
+    def test_no_standby_when_disabled_or_not_logged_in(self):
+        self.b.settings["hot_standby"] = False
+        self.assertFalse(self.b._standby_wanted("ncm"))
+        self.b.settings["hot_standby"] = True
+        del self.b.settings["accounts"]["ncm"]
+        self.assertFalse(self.b._standby_wanted("ncm"))
+        asyncio.run(self.b._ensure_provider("ncm"))
+        self.assertEqual(len(self.spawned), 1)  # 冷启
+
+    def test_eviction_policy(self):
+        saved = (bridge_mod.rss_mb, bridge_mod.mem_available_mb)
+        try:
+            bridge_mod.rss_mb = lambda _pid: 50
+            bridge_mod.mem_available_mb = lambda: 8000
+            self.assertIsNone(self.b._evict(self.b.standby))
+            bridge_mod.rss_mb = lambda _pid: bridge_mod.STANDBY_MAX_RSS_MB + 1
+            self.assertTrue(self.b._evict(self.b.standby).startswith("rss"))
+            bridge_mod.rss_mb = lambda _pid: 50
+            bridge_mod.mem_available_mb = lambda: bridge_mod.STANDBY_MIN_AVAIL_MB - 1
+            self.assertIn("available", self.b._evict(self.b.standby))
+            bridge_mod.mem_available_mb = lambda: 8000
+            self.b.standby.used = time.monotonic() - bridge_mod.STANDBY_IDLE_S - 1
+            self.assertEqual(self.b._evict(self.b.standby), "idle")
+            self.b.settings["hot_standby"] = False
+            self.assertEqual(self.b._evict(self.b.standby), "disabled")
+        finally:
+            bridge_mod.rss_mb, bridge_mod.mem_available_mb = saved
+
+    def test_switch_restarts_the_idle_clock(self):
+        self.b.standby.used = time.monotonic() - bridge_mod.STANDBY_IDLE_S - 1
+        asyncio.run(self.b._ensure_provider("ncm"))
+        self.assertLess(time.monotonic() - self.b.standby.used, 1)  # 切走的 qq 成了热备,从现在算
+
+    def test_idle_evicted_standby_waits_for_next_switch(self):
+        slot = self.b.standby
+        slot.stop()
+        slot.idle = True  # 巡检因闲置收掉
+        asyncio.run(self.b._fill_standby())  # 打开 QAM(_ensure_provider → _kick_slots)不补起
+        self.assertEqual(self.spawned, [])
+        self.b._touch_standby()  # 用户切源(set_provider)
+        asyncio.run(self.b._fill_standby())
+        self.assertEqual(len(self.spawned), 1)
+
+    def test_disable_stops_standby(self):
+        proc = self.b.standby.proc
+        asyncio.run(self.b.set_hot_standby(False))
+        self.assertIsNotNone(proc.returncode)
+        self.assertIsNone(self.b.standby.proc)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""settings 写后落盘单测:防抖窗口内的多次改动合成一次写;save_now / flush 立即写;
+写线程拿的是快照;写失败保持脏下次再试。
+运行:python -m unittest tests.test_store
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+import metrics  # noqa: E402
+import store  # noqa: E402
+from store import SettingsStore  # noqa: E402
+
+
+class TestSettingsStore(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self._saved = store.log
+        store.log = lambda *_a, **_k: None
+        self.settings = {"volume": 0.0}
+        self.written = []
+        self.s = SettingsStore(lambda: self.settings, self.written.append, debounce=0.02)
+
+    def tearDown(self):
+        store.log = self._saved
+
+    def test_volume_drag_coalesces_into_one_write(self):
+        async def run():
+            for i in range(20):
+                self.settings["volume"] = i / 20
+                self.s.mark()
+            await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+        self.assertEqual(self.written, [{"volume": 0.95}])
+        self.assertEqual((metrics.get("settings.marked"), metrics.get("settings.written")), (20, 1))
+        self.assertIn("19 saved", self.s.summary())
+
+    def test_save_now_and_flush_skip_the_debounce(self):
+        async def run():
+            self.settings["accounts"] = {"qq": {"c": 1}}
+            await self.s.save_now()
+            self.assertEqual(len(self.written), 1)
+            self.s.mark()
+            await self.s.flush()  # unload
+            self.assertEqual(len(self.written), 2)
+            await self.s.flush()  # 不脏不写
+
+        asyncio.run(run())
+        self.assertEqual(len(self.written), 2)
+
+    def test_writer_gets_a_snapshot(self):
+        async def run():
+            self.s.mark()
+            await self.s.flush()
+            self.settings["volume"] = 1.0
+
+        asyncio.run(run())
+        self.assertEqual(self.written, [{"volume": 0.0}])
+
+    def test_failed_write_stays_dirty(self):
+        def boom(_data):
+            raise OSError("disk full")
+
+        self.s.write = boom
+
+        async def run():
+            await self.s.save_now()
+            self.assertTrue(self.s.dirty)
+            self.s.write = self.written.append
+            await self.s.flush()
+
+        asyncio.run(run())
+        self.assertEqual(self.written, [{"volume": 0.0}])
+        self.assertFalse(self.s.dirty)
+
+    def test_sync_caller_without_loop_writes_through(self):
+        self.s.mark()
+        self.assertEqual(len(self.written), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
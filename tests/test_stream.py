@@ -0,0 +1,225 @@
+"""流式响应单测:一条请求 → 若干 partial 帧 + 一条终帧(request_stream / play_all)。
+
+整单 2000 首以前要翻几十页往返;流式后一发请求、逐块到达。decky 是 Decky 运行时注入
+的模块,测试里打桩。
+运行:python -m unittest tests.test_stream
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import protocol  # noqa: E402
+from bridge import Bridge  # noqa: E402
+
+
+class _FakeWriter:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, data):  # 写任务会把一批 v1 帧拼成一次 write
+        self.frames += [json.loads(line) for line in data.splitlines()]
+
+    async def drain(self):
+        pass
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def _line(obj) -> bytes:
+    return (json.dumps(obj) + "\n").encode()
+
+
+class TestDecodePartial(unittest.TestCase):
+    def test_partial_frame(self):
+        msg = protocol.decode_child_message({"id": 3, "partial": {"songs": []}})
+        self.assertEqual(msg, protocol.ChildPartial(3, {"songs": []}))
+
+    def test_partial_must_be_object(self):
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_child_message({"id": 3, "partial": [1]})
+
+
+class TestRequestStream(unittest.TestCase):
+    def setUp(self):
+        self.conn = bridge_mod.Conn("provider")
+        self.conn.writer = _FakeWriter()
+        self._saved_log = bridge_mod.log
+        bridge_mod.log = lambda *_a, **_k: None
+
+    def tearDown(self):
+        bridge_mod.log = self._saved_log
+
+    def _serve(self, reader, frames):
+        """读到请求帧后把 frames(id 由请求补上)喂给读循环。"""
+
+        async def run():
+            await _settle()
+            rid = self.conn.writer.frames[0]["id"]
+            for f in frames:
+                reader.feed_data(_line({"id": rid, **f}))
+            await _settle()
+
+        return run()
+
+    def test_partials_then_done(self):
+        async def run():
+            reader = asyncio.StreamReader()
+            loop = asyncio.create_task(self.conn._read_loop(reader))
+            frames = [
+                {"partial": {"songs": [1, 2]}},
+                {"partial": {"songs": [3]}},
+                {"ok": True, "data": {"total": 3}},
+            ]
+            serve = asyncio.create_task(self._serve(reader, frames))
+            got = [r async for r in self.conn.request_stream("playlist_all", {"id": "9"})]
+            await serve
+            loop.cancel()
+            return got
+
+        got = asyncio.run(run())
+        self.assertEqual([r.data for r in got], [{"songs": [1, 2]}, {"songs": [3]}, {"total": 3}])
+        self.assertTrue(all(r.ok for r in got))
+        req = self.conn.writer.frames[0]
+        self.assertEqual((req["cmd"], req["args"]), ("playlist_all", {"id": "9"}))
+        self.assertIn("deadline", req)
+        self.assertEqual(len(self.conn.writer.frames), 1)  # 正常收尾不发 cancel
+        self.assertEqual(self.conn._streams, {})
+
+    def test_early_close_sends_cancel(self):
+        async def run():
+            reader = asyncio.StreamReader()
+            loop = asyncio.create_task(self.conn._read_loop(reader))
+            serve = asyncio.create_task(self._serve(reader, [{"partial": {"songs": [1]}}]))
+            async with contextlib.aclosing(self.conn.request_stream("fav_songs_all")) as it:
+                async for _ in it:
+                    break
+            await serve
+            await _settle()
+            loop.cancel()
+
+        asyncio.run(run())
+        req, cancel = self.conn.writer.frames
+        self.assertEqual(cancel, {"cancel": req["id"]})
+        self.assertEqual(self.conn._streams, {})
+
+    def test_disconnect_terminates_stream(self):
+        async def run():
+            it = self.conn.request_stream("playlist_all", {"id": "9"})
+            first = asyncio.create_task(anext(it))
+            await _settle()
+            self.conn.disconnect()
+            left = dict(self.conn._streams)
+            resp = await first
+            rest = [r async for r in it]
+            return left, resp, rest
+
+        left, resp, rest = asyncio.run(run())
+        self.assertEqual(left, {})  # 与 pending 一样当场清掉
+        self.assertFalse(resp.ok)
+        self.assertEqual(resp.error.code, bridge_mod.PROVIDER_GONE)  # 连接断了,不是不响应
+        self.assertEqual(rest, [])
+
+    def test_not_connected_yields_provider_gone(self):
+        self.conn.writer = None
+
+        async def run():
+            return [r async for r in self.conn.request_stream("playlist_all")]
+
+        (resp,) = asyncio.run(run())
+        self.assertEqual(resp.error.code, bridge_mod.PROVIDER_GONE)
+
+
+class StreamingConn:
+    """按命令回放预置帧序列的假 provider(只实现 request_stream)。"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.calls = []
+
+    async def request_stream(self, cmd, args=None, **_opts):
+        self.calls.append((cmd, args))
+        for f in self.frames:
+            yield f
+
+
+def _partial(songs):
+    return protocol.ChildResponse(1, True, {"songs": songs})
+
+
+def _song(i):
+    return {"mid": str(i), "name": f"s{i}", "singer": "a", "cover": "", "duration": 1}
+
+
+class TestPlayAll(unittest.TestCase):
+    def setUp(self):
+        self.bridge = Bridge.__new__(Bridge)  # 不 start():只测 callable → 流式命令 → 队列
+        self.queued = []
+
+        async def play_queue(items, start):
+            self.queued.append((items, start))
+
+        self.bridge.playback = types.SimpleNamespace(play_queue=play_queue)
+        self._saved_log = bridge_mod.log
+        bridge_mod.log = lambda *_a, **_k: None
+
+    def tearDown(self):
+        bridge_mod.log = self._saved_log
+
+    def test_playlist_collects_every_partial(self):
+        done = protocol.ChildResponse(1, True, {"total": 3})
+        frames = [_partial([_song(1), _song(2)]), _partial([_song(3)]), done]
+        self.bridge.provider = StreamingConn(frames)
+        resp = asyncio.run(self.bridge.play_all("playlist", "77"))
+        self.assertEqual(resp, {"ok": True, "count": 3})
+        self.assertEqual(self.bridge.provider.calls, [("playlist_all", {"id": "77"})])
+        items, start = self.queued[0]
+        self.assertEqual([it["id"] for it in items], ["1", "2", "3"])
+        self.assertEqual(start, 0)
+
+    def test_error_after_partials_plays_nothing(self):
+        err = protocol.ChildResponse(1, False, {}, protocol.ErrorBody("upstream_timeout", "x"))
+        self.bridge.provider = StreamingConn([_partial([_song(1)]), err])
+        resp = asyncio.run(self.bridge.play_all("fav"))
+        self.assertEqual(resp, {"ok": False, "error": "upstream_timeout"})
+        self.assertEqual(self.bridge.provider.calls, [("fav_songs_all", {})])
+        self.assertEqual(self.queued, [])
+
+    def test_empty_list_is_no_results(self):
+        self.bridge.provider = StreamingConn([protocol.ChildResponse(1, True, {"total": 0})])
+        self.assertEqual(asyncio.run(self.bridge.play_all("fav")), {"ok": False, "error": "no_results"})
+
+    def test_unknown_kind_is_invalid(self):
+        self.bridge.provider = StreamingConn([])
+        resp = asyncio.run(self.bridge.play_all("album", "1"))
+        self.assertEqual(resp, {"ok": False, "error": "invalid_request"})
+        self.assertEqual(self.bridge.provider.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
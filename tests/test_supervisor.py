@@ -0,0 +1,199 @@
+"""崩溃循环单测:连续短命后指数退避、期间 _boot 不拉起直接回 provider_crash_loop;
+我们自己停掉的不算崩溃;连上过且活过观察期才清零;启动超时的进程被杀掉;各位的连击互不影响;崩溃环落盘、定长、重启后还在。decky 是 Decky 运行时注入的模块,测试里打桩。
+运行:python -m unittest tests.test_supervisor
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import sys
+import tempfile
+import time
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "py_modules"))
+
+decky_stub = types.ModuleType("decky")
+decky_stub.DECKY_PLUGIN_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_RUNTIME_DIR = "/tmp"
+decky_stub.DECKY_PLUGIN_SETTINGS_DIR = "/tmp"
+decky_stub.logger = logging.getLogger("test-decky")
+
+
+async def _emit(*_a, **_k):
+    pass
+
+
+decky_stub.emit = _emit
+sys.modules.setdefault("decky", decky_stub)
+
+import bridge as bridge_mod  # noqa: E402
+import metrics  # noqa: E402
+import supervisor  # noqa: E402
+from supervisor import SpawnSupervisor  # noqa: E402
+
+
+class _ExitedProc:
+    def __init__(self, code):
+        self.returncode = code
+
+    async def wait(self):
+        return self.returncode
+
+
+class _HungProc:
+    """起来了但一直不连、不退,直到被杀。"""
+
+    def __init__(self):
+        self.returncode = None
+        self.killed = asyncio.Event()
+
+    def kill(self):
+        self.returncode = -signal.SIGKILL
+        self.killed.set()
+
+    def terminate(self):
+        self.kill()
+
+    async def wait(self):
+        await self.killed.wait()
+        return self.returncode
+
+
+def _ready(connected: bool) -> asyncio.Event:
+    ev = asyncio.Event()
+    if connected:
+        ev.set()
+    return ev
+
+
+class TestSupervisor(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.path = os.path.join(tempfile.mkdtemp(), "crashes.json")
+        self._saved_log = supervisor.log
+        supervisor.log = lambda *_a, **_k: None
+
+    def tearDown(self):
+        supervisor.log = self._saved_log
+
+    def test_backoff_after_threshold_and_doubles(self):
+        sup = SpawnSupervisor("provider", self.path)
+        for _ in range(supervisor.CRASH_LOOP_THRESHOLD - 1):
+            sup.failed("provider_start_failed")
+        self.assertEqual(sup.backoff(), 0.0)  # 偶发崩溃照常立刻重开
+        sup.failed("provider_start_failed")
+        first = sup.backoff()
+        self.assertTrue(0 < first <= supervisor.CRASH_BACKOFF)
+        sup.failed("provider_start_failed")
+        self.assertGreater(sup.backoff(), first * 1.5)
+        self.assertEqual(metrics.get("provider.crash_loop"), 2)
+        sup.reset()
+        self.assertEqual(sup.backoff(), 0.0)
+
+    def test_early_exit_counts_but_our_stops_do_not(self):
+        sup = SpawnSupervisor("provider", self.path)
+
+        async def run():
+            for code in (1, -signal.SIGTERM, -signal.SIGKILL, -signal.SIGSEGV):
+                await sup._watch(_ExitedProc(code), asyncio.get_running_loop().time(), _ready(True))
+
+        asyncio.run(run())
+        self.assertEqual(sup.streak, 2)
+        self.assertEqual([r["why"] for r in sup.ring], ["exit 1", f"exit {-signal.SIGSEGV}"])
+
+    def test_survival_resets_only_after_connect(self):
+        saved = supervisor.CRASH_MIN_LIFE_S
+        supervisor.CRASH_MIN_LIFE_S = 0.01
+
+        async def survive(connected: bool) -> int:
+            sup = SpawnSupervisor("provider", self.path)
+            sup.streak = 2
+            proc = _HungProc()
+            asyncio.get_running_loop().call_later(0.05, proc.kill)
+            await sup._watch(proc, time.monotonic(), _ready(connected))
+            return sup.streak
+
+        try:
+            self.assertEqual(asyncio.run(survive(False)), 2)  # 活着但从没连上:连击照旧
+            self.assertEqual(asyncio.run(survive(True)), 0)
+        finally:
+            supervisor.CRASH_MIN_LIFE_S = saved
+
+    def test_ring_persisted_capped_and_reloaded(self):
+        sup = SpawnSupervisor("provider", self.path)
+        SpawnSupervisor("player", self.path).failed("player_start_failed")
+        for i in range(supervisor.CRASH_RING + 5):
+            sup.failed(f"exit {i}")
+        again = SpawnSupervisor("provider", self.path)
+        self.assertEqual(len(again.ring), supervisor.CRASH_RING)
+        self.assertEqual(again.ring[-1]["why"], f"exit {supervisor.CRASH_RING + 4}")
+        self.assertEqual(again.streak, 0)  # 退避不跨重启,只留排查记录
+        self.assertEqual(len(SpawnSupervisor("player", self.path).ring), 1)
+
+
+class TestBootBackoff(unittest.TestCase):
+    def setUp(self):
+        self.spawned = []
+
+        async def no_spawn(*args):
+            self.spawned.append(args)
+            raise OSError("no spawn in tests")
+
+        self._saved = (bridge_mod.spawn, bridge_mod.log, supervisor.log)
+        bridge_mod.spawn = no_spawn
+        bridge_mod.log = supervisor.log = lambda *_a, **_k: None
+        self.b = bridge_mod.Bridge()
+        self.b.provider_sup = SpawnSupervisor("provider", os.path.join(tempfile.mkdtemp(), "c.json"))
+
+    def tearDown(self):
+        bridge_mod.spawn, bridge_mod.log, supervisor.log = self._saved
+
+    def test_boot_fails_fast_while_backing_off(self):
+        conn = bridge_mod.Conn("provider")
+
+        async def run():
+            return [await self.b._boot(conn, "ncm") for _ in range(supervisor.CRASH_LOOP_THRESHOLD + 2)]
+
+        codes = [code for _proc, code in asyncio.run(run())]
+        n = supervisor.CRASH_LOOP_THRESHOLD
+        self.assertEqual(codes[:n], ["provider_start_failed"] * n)
+        self.assertEqual(codes[n:], [supervisor.CRASH_LOOP] * 2)
+        self.assertEqual(len(self.spawned), n)  # 退避期内不再拉起
+
+    def test_startup_timeout_kills_the_process(self):
+        hung = _HungProc()
+
+        async def spawn_hung(*args):
+            self.spawned.append(args)
+            return hung
+
+        bridge_mod.spawn = spawn_hung
+        saved = bridge_mod.PROVIDER_START_TIMEOUT
+        bridge_mod.PROVIDER_START_TIMEOUT = 0.01
+        try:
+            proc, code = asyncio.run(self.b._boot(bridge_mod.Conn("provider"), "ncm"))
+        finally:
+            bridge_mod.PROVIDER_START_TIMEOUT = saved
+        self.assertEqual((proc, code), (None, "provider_start_timeout"))
+        self.assertTrue(hung.killed.is_set())
+        self.assertEqual(self.b.provider_sup.streak, 1)
+
+    def test_slots_keep_their_own_streak(self):
+        slot = bridge_mod.ProviderSlot("standby")
+        slot.sup.path = self.b.provider_sup.path
+
+        async def run():
+            for _ in range(supervisor.CRASH_LOOP_THRESHOLD):
+                await self.b._boot(slot.conn, "qq", slot.sup)
+
+        asyncio.run(run())
+        self.assertGreater(slot.sup.backoff(), 0)
+        self.assertEqual(self.b.provider_sup.streak, 0)  # 热备崩溃循环不拖累活跃方
+        self.assertEqual(self.b.provider_sup.backoff(), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,32 @@
-//! bridge ↔ child 协议 v1 的 Rust 侧实现,player 与 ncm-provider 共用。
+//! bridge ↔ child 协议的 Rust 侧实现,player 与 ncm-provider 共用。
 //! wire 格式见 issue #31:request{id,cmd,args} / response{id,ok,data|error} /
-//! event{ev,type,data} / log{ev:"log",level,where,msg}。
+//! event{ev,type,data} / log{ev:"log",level,where,msg};另有 bridge 发的取消帧 cancel{id}。
+//!
+//! 分帧两版共存:v1 = NDJSON 一行一条;v2 = 4 字节大端长度 + JSON。连入后先发 `hello()`
+//! 声明支持 v2,bridge 认了就改发 v2 帧,我们看到第一帧 v2 再跟着切(见 `read_frame`)。
+//! 与 bridge 的 py_modules/protocol.py、qq-provider/protocol.py 是同一份规格。
 //!
 //! 各二进制自己的命令 args struct 留在各自的 `protocol` 模块里(它把本 crate 整个再导出),
 //! 业务代码照旧写 `protocol::ok(...)` / `protocol::ErrorCode::X`,不碰裸 JSON。
 
+use std::collections::VecDeque;
+use std::fmt::{self, Write};
+use std::sync::Mutex;
+use std::time::{Duration, SystemTime, UNIX_EPOCH};
+
 use serde::de::DeserializeOwned;
 use serde::{Deserialize, Serialize};
 use serde_json::json;
+use tokio::io::{AsyncBufRead, AsyncBufReadExt, AsyncReadExt, AsyncWrite, AsyncWriteExt};
+
+/// 本端支持的最高协议版本。
+pub const PROTO_VERSION: u8 = 2;
+/// v2 载荷上限 16 MiB - 1:长度头首字节恒为 0x00,读端据此与 v1 行首的 `{` 区分。
+pub const MAX_FRAME: usize = (1 << 24) - 1;
+/// 给回包 + IPC 留的余量:child 必须赶在 bridge 的 deadline 之前把错误回过去。
+pub const DEADLINE_MARGIN: Duration = Duration::from_millis(1000);
+/// release 下 debug 日志不发,进定长环的条数(见 `DebugRing`)。与 qq-provider 的 DEBUG_RING 同值。
+pub const DEBUG_RING: usize = 512;
 
 #[derive(Debug)]
 pub struct ProtocolError(pub String);
@@ -20,6 +39,10 @@ pub enum ErrorCode {
     UnknownCmd,
     InvalidRequest,
     MissingField,
+    /// 请求到达时已过 bridge 给的 deadline:不打上游,立刻回它,bridge 据此了结在途请求
+    /// (不回包的话 bridge 要干等满通道超时,再把这个好好的进程判死)。与通道级 `timeout`
+    /// (子进程不响应)分开:这只是调用方的预算用完了,bridge 不拿它判死、不计熔断。
+    DeadlineExceeded,
     // player
     FetchFailed,
     FetchTimeout,
@@ -31,7 +54,7 @@ pub enum ErrorCode {
     // provider
     /// provider 单次上游请求超时。常是瞬时抖动(打游戏抢带宽等),不等于整条链路不可用,
     /// 故与 bridge 自己产出的通道级 `timeout`(子进程整体不响应,30s 上限)分开:
-    /// 后者立即熔断,本码按连续 2 次才熔断。通道级 timeout 只由 bridge 产出,Rust 侧不发。
+    /// 后者立即熔断,本码按连续 2 次才熔断。
     UpstreamTimeout,
     NoPlayable,
     ProviderError,
@@ -55,16 +78,123 @@ pub struct Request {
     pub cmd: String,
     #[serde(default)]
     pub args: serde_json::Value,
+    /// bridge 给的绝对截止时刻(墙钟 epoch 毫秒);旧 bridge 不带。
+    #[serde(default)]
+    pub deadline: Option<u64>,
+}
+
+impl Request {
+    /// 本请求可用的上游预算,不超过 `cap`;扣掉 DEADLINE_MARGIN 后已过期返回 None。
+    pub fn budget(&self, cap: Duration) -> Option<Duration> {
+        let Some(deadline) = self.deadline else {
+            return Some(cap);
+        };
+        let now = SystemTime::now()
+            .duration_since(UNIX_EPOCH)
+            .unwrap_or_default()
+            .as_millis() as u64;
+        let left = Duration::from_millis(deadline.saturating_sub(now));
+        left.checked_sub(DEADLINE_MARGIN)
+            .filter(|d| !d.is_zero())
+            .map(|d| d.min(cap))
+    }
 }
 
 pub fn parse_request(line: &str) -> Result<Request, ProtocolError> {
-    let req: Request = serde_json::from_str(line).map_err(|e| ProtocolError(e.to_string()))?;
+    parse_frame(line.as_bytes())
+}
+
+/// 从一帧载荷(v1 去掉换行前后都行,v2 即长度头之后的字节)解出请求。
+pub fn parse_frame(payload: &[u8]) -> Result<Request, ProtocolError> {
+    let req: Request = serde_json::from_slice(payload).map_err(|e| ProtocolError(e.to_string()))?;
     if req.cmd.is_empty() {
         return Err(ProtocolError("empty cmd".into()));
     }
     Ok(req)
 }
 
+/// bridge → child 的一条入站消息:命令请求,或「调用方已不再等 id 的响应」的取消帧。
+#[derive(Debug)]
+pub enum Incoming {
+    Request(Request),
+    Cancel(u64),
+}
+
+#[derive(Deserialize)]
+struct CancelFrame {
+    cancel: u64,
+}
+
+/// 解一帧入站消息。绝大多数是请求,先按请求解;不是请求再认 `{"cancel":id}`。
+/// 取消帧不回包:对应任务若还在跑就中止,已结束则忽略。
+pub fn parse_incoming(payload: &[u8]) -> Result<Incoming, ProtocolError> {
+    match parse_frame(payload) {
+        Ok(req) => Ok(Incoming::Request(req)),
+        Err(e) => match serde_json::from_slice::<CancelFrame>(payload) {
+            Ok(c) => Ok(Incoming::Cancel(c.cancel)),
+            Err(_) => Err(e),
+        },
+    }
+}
+
+// ---- 分帧 ----
+
+/// 读一帧进 `buf`(先清空),返回该帧的协议版本;EOF 返回 `None`。
+/// 首字节 0x00 → v2:再读 3 字节长度,按长度整段读,不逐字节扫换行;否则 → v1:读到 `\n`。
+pub async fn read_frame<R: AsyncBufRead + Unpin>(
+    r: &mut R,
+    buf: &mut Vec<u8>,
+) -> std::io::Result<Option<u8>> {
+    buf.clear();
+    let head = match r.read_u8().await {
+        Ok(b) => b,
+        Err(e) if e.kind() == std::io::ErrorKind::UnexpectedEof => return Ok(None),
+        Err(e) => return Err(e),
+    };
+    if head == 0 {
+        let mut len = [0u8; 3];
+        r.read_exact(&mut len).await?;
+        let n = u32::from_be_bytes([0, len[0], len[1], len[2]]) as usize;
+        buf.resize(n, 0);
+        r.read_exact(buf).await?;
+        return Ok(Some(2));
+    }
+    buf.push(head);
+    r.read_until(b'\n', buf).await?;
+    Ok(Some(1))
+}
+
+/// 按版本编码一帧:v1 = 载荷 + `\n`;v2 = 4 字节大端长度 + 载荷。
+/// 超过 MAX_FRAME 的 v2 载荷(实际不会出现)退回 v1 行,读端逐帧识别,照样能解。
+pub fn encode_frame(payload: &str, v2: bool) -> Vec<u8> {
+    let body = payload.as_bytes();
+    if !v2 || body.len() > MAX_FRAME {
+        let mut out = Vec::with_capacity(body.len() + 1);
+        out.extend_from_slice(body);
+        out.push(b'\n');
+        return out;
+    }
+    let mut out = Vec::with_capacity(body.len() + 4);
+    out.extend_from_slice(&(body.len() as u32).to_be_bytes());
+    out.extend_from_slice(body);
+    out
+}
+
+/// 写一帧并 flush。
+pub async fn write_frame<W: AsyncWrite + Unpin>(
+    w: &mut W,
+    payload: &str,
+    v2: bool,
+) -> std::io::Result<()> {
+    w.write_all(&encode_frame(payload, v2)).await?;
+    w.flush().await
+}
+
+/// 连入后的首帧:声明本端支持的最高协议版本。
+pub fn hello() -> String {
+    event("hello", "hello", json!({ "proto": PROTO_VERSION }))
+}
+
 /// 把 request.args 解成命令自己的 struct;缺字段/类型错 → 错误(调用方映射成 missing_field)。
 pub fn parse_args<T: DeserializeOwned>(req: &Request) -> Result<T, ProtocolError> {
     serde_json::from_value(req.args.clone()).map_err(|e| ProtocolError(e.to_string()))
@@ -117,6 +247,11 @@ pub fn err(id: u64, code: ErrorCode, message: &str) -> String {
     .unwrap_or_else(|_| err_static(id))
 }
 
+/// 流式响应的中间帧:同一 id 可以先来若干条 partial,最后仍以一条 ok/err 收尾。
+pub fn partial<T: Serialize>(id: u64, data: T) -> String {
+    json!({ "id": id, "partial": data }).to_string()
+}
+
 /// 事件(child 主动上报,无 id)。ev = 域(player/login/provider),typ = 域内类型。
 pub fn event<T: Serialize>(ev: &str, typ: &str, data: T) -> String {
     serde_json::to_string(&Event { ev, typ, data }).unwrap_or_default()
@@ -128,6 +263,129 @@ pub fn log_json(level: LogLevel, place: &str, msg: &str) -> String {
     json!({ "ev": "log", "level": level, "where": place, "msg": msg }).to_string()
 }
 
+/// 一条 debug 记录最多带几个参数(见 `DebugArg`)。
+pub const DEBUG_ARGS: usize = 3;
+
+/// debug 记录的一个原始参数:入环时只搬值,`DebugRing::dump` 时才填进模板的 `{}`。
+/// 与 Python 侧 `log(..., msg, *args)` 的惰性 %-填参同一个意思。
+#[derive(Debug, Default)]
+pub enum DebugArg {
+    #[default]
+    Nil,
+    Num(u64),
+    Tag(&'static str),
+    /// 已经在手里的 String(如命令名、歌曲 id):搬进来,不另拼
+    Text(String),
+}
+
+impl From<u64> for DebugArg {
+    fn from(n: u64) -> Self {
+        Self::Num(n)
+    }
+}
+
+impl From<&'static str> for DebugArg {
+    fn from(s: &'static str) -> Self {
+        Self::Tag(s)
+    }
+}
+
+impl From<String> for DebugArg {
+    fn from(s: String) -> Self {
+        Self::Text(s)
+    }
+}
+
+impl fmt::Display for DebugArg {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        match self {
+            Self::Nil => Ok(()),
+            Self::Num(n) => write!(f, "{n}"),
+            Self::Tag(s) => f.write_str(s),
+            Self::Text(s) => f.write_str(s),
+        }
+    }
+}
+
+/// 把参数依次填进模板里的 `{}`;参数不够的占位原样留着。dump 与 dev 下直发时才调。
+pub fn render(msg: &str, args: &[DebugArg]) -> String {
+    let mut out = String::with_capacity(msg.len() + 16);
+    let (mut rest, mut args) = (msg, args.iter());
+    while let Some(at) = rest.find("{}") {
+        out.push_str(&rest[..at]);
+        match args.next() {
+            Some(arg) => {
+                let _ = write!(out, "{arg}");
+            }
+            None => out.push_str("{}"),
+        }
+        rest = &rest[at + 2..];
+    }
+    out.push_str(rest);
+    out
+}
+
+/// 最近的 debug 记录定长环:release 下 debug 不走 IPC,记在这里,bridge 发 `dump_debug` 时整环回包。
+/// 记录时不格式化:place 是静态标签,msg 是静态模板,参数原样搬进定长数组(`DebugArg`),
+/// 到 `dump` 才拼成字符串。满了挤掉最旧的一条。
+pub struct DebugRing {
+    buf: Mutex<
+        VecDeque<(
+            SystemTime,
+            &'static str,
+            &'static str,
+            [DebugArg; DEBUG_ARGS],
+        )>,
+    >,
+}
+
+impl DebugRing {
+    pub fn new() -> Self {
+        Self {
+            buf: Mutex::new(VecDeque::with_capacity(DEBUG_RING)),
+        }
+    }
+
+    /// 入环。args 至多 `DEBUG_ARGS` 个,多出来的丢掉。
+    pub fn record<const N: usize>(
+        &self,
+        place: &'static str,
+        msg: &'static str,
+        args: [DebugArg; N],
+    ) {
+        debug_assert!(N <= DEBUG_ARGS);
+        let mut slots: [DebugArg; DEBUG_ARGS] = Default::default();
+        for (slot, arg) in slots.iter_mut().zip(args) {
+            *slot = arg;
+        }
+        let mut buf = self.buf.lock().unwrap_or_else(|e| e.into_inner());
+        if buf.len() == DEBUG_RING {
+            buf.pop_front();
+        }
+        buf.push_back((SystemTime::now(), place, msg, slots));
+    }
+
+    /// dump_debug 的回包:`[[epoch 毫秒, where, msg], ...]`,旧 → 新。模板在这里才填参。
+    pub fn dump(&self) -> Vec<(u64, &'static str, String)> {
+        let buf = self.buf.lock().unwrap_or_else(|e| e.into_inner());
+        buf.iter()
+            .map(|(at, place, msg, args)| {
+                let ms = at
+                    .duration_since(UNIX_EPOCH)
+                    .unwrap_or_default()
+                    .as_millis() as u64;
+                (ms, *place, render(msg, args))
+            })
+            .collect()
+    }
+}
+
+impl Default for DebugRing {
+    fn default() -> Self {
+        Self::new()
+    }
+}
+
 // 序列化兜底:极端情况下也回一条合法 internal_error(几乎不会触发)
 fn err_static(id: u64) -> String {
     format!(
@@ -145,6 +403,68 @@ mod tests {
         url: String,
     }
 
+    fn now_ms() -> u64 {
+        SystemTime::now()
+            .duration_since(UNIX_EPOCH)
+            .unwrap()
+            .as_millis() as u64
+    }
+
+    #[test]
+    fn budget_without_deadline_is_cap() {
+        let r = parse_request(r#"{"id":1,"cmd":"x"}"#).unwrap();
+        assert_eq!(r.deadline, None);
+        assert_eq!(
+            r.budget(Duration::from_secs(15)),
+            Some(Duration::from_secs(15))
+        );
+    }
+
+    #[test]
+    fn budget_follows_deadline() {
+        let line = format!(r#"{{"id":1,"cmd":"x","deadline":{}}}"#, now_ms() + 5000);
+        let b = parse_request(&line)
+            .unwrap()
+            .budget(Duration::from_secs(15))
+            .unwrap();
+        assert!(
+            b <= Duration::from_secs(4) && b > Duration::from_millis(3500),
+            "{b:?}"
+        );
+        let line = format!(r#"{{"id":1,"cmd":"x","deadline":{}}}"#, now_ms() + 60_000);
+        let b = parse_request(&line)
+            .unwrap()
+            .budget(Duration::from_secs(15));
+        assert_eq!(b, Some(Duration::from_secs(15)));
+    }
+
+    #[test]
+    fn budget_expired_is_none() {
+        let line = format!(r#"{{"id":1,"cmd":"x","deadline":{}}}"#, now_ms() + 500);
+        assert_eq!(
+            parse_request(&line)
+                .unwrap()
+                .budget(Duration::from_secs(15)),
+            None
+        );
+        let line = r#"{"id":1,"cmd":"x","deadline":1}"#;
+        assert_eq!(
+            parse_request(line).unwrap().budget(Duration::from_secs(15)),
+            None
+        );
+    }
+
+    #[test]
+    fn parse_incoming_request_and_cancel() {
+        let m = parse_incoming(br#"{"id":3,"cmd":"load","args":{}}"#).unwrap();
+        assert!(matches!(m, Incoming::Request(r) if r.id == 3));
+        let m = parse_incoming(br#"{"cancel":3}"#).unwrap();
+        assert!(matches!(m, Incoming::Cancel(3)));
+        // 两样都不是:报的是请求的解析错误
+        let e = parse_incoming(br#"{"id":3}"#).unwrap_err();
+        assert!(e.0.contains("cmd"), "{}", e.0);
+    }
+
     #[test]
     fn parse_request_ok() {
         let r = parse_request(r#"{"id":1,"cmd":"load","args":{"url":"u"}}"#).unwrap();
@@ -196,6 +516,7 @@ mod tests {
         );
         for (code, want) in [
             (ErrorCode::UnknownCmd, "unknown_cmd"),
+            (ErrorCode::DeadlineExceeded, "deadline_exceeded"),
             (ErrorCode::AudioDeviceFailed, "audio_device_failed"),
             (ErrorCode::NoPlayable, "no_playable"),
             (ErrorCode::UpstreamTimeout, "upstream_timeout"),
@@ -212,6 +533,40 @@ mod tests {
         assert_eq!(v, json!({"ev":"player","type":"ended","data":{}}));
     }
 
+    fn frames(v2: bool) -> Vec<u8> {
+        let mut all = encode_frame(r#"{"id":1,"cmd":"pause","args":{}}"#, false);
+        all.extend(encode_frame(
+            r#"{"id":2,"cmd":"seek","args":{"sec":1.5}}"#,
+            v2,
+        ));
+        all
+    }
+
+    #[tokio::test]
+    async fn read_frame_detects_version_per_frame() {
+        let bytes = frames(true);
+        let mut r = tokio::io::BufReader::new(&bytes[..]);
+        let mut buf = Vec::new();
+        assert_eq!(read_frame(&mut r, &mut buf).await.unwrap(), Some(1));
+        assert_eq!(parse_frame(&buf).unwrap().cmd, "pause");
+        assert_eq!(read_frame(&mut r, &mut buf).await.unwrap(), Some(2));
+        assert_eq!(parse_frame(&buf).unwrap().cmd, "seek");
+        assert_eq!(read_frame(&mut r, &mut buf).await.unwrap(), None);
+    }
+
+    #[test]
+    fn v2_header_is_big_endian_length() {
+        let f = encode_frame("{}", true);
+        assert_eq!(f, vec![0, 0, 0, 2, b'{', b'}']);
+        assert_eq!(encode_frame("{}", false), b"{}\n".to_vec());
+    }
+
+    #[test]
+    fn hello_announces_version() {
+        let v: Value = serde_json::from_str(&hello()).unwrap();
+        assert_eq!(v, json!({"ev":"hello","type":"hello","data":{"proto":2}}));
+    }
+
     #[test]
     fn log_json_escapes_and_labels() {
         let v: Value = serde_json::from_str(&log_json(LogLevel::Warn, "a\"b", "m\nsg")).unwrap();
@@ -220,4 +575,42 @@ mod tests {
             json!({"ev":"log","level":"warn","where":"a\"b","msg":"m\nsg"})
         );
     }
+
+    #[test]
+    fn partial_frame_carries_id_and_chunk() {
+        let v: Value = serde_json::from_str(&partial(9, json!({"songs": [1, 2]}))).unwrap();
+        assert_eq!(v, json!({"id": 9, "partial": {"songs": [1, 2]}}));
+    }
+
+    #[test]
+    fn render_fills_placeholders_in_order() {
+        assert_eq!(render("cancelled {}", &[7u64.into()]), "cancelled 7");
+        assert_eq!(render("{} past deadline", &[]), "{} past deadline");
+        assert_eq!(render("plain", &[DebugArg::Nil]), "plain");
+    }
+
+    #[test]
+    fn debug_ring_keeps_the_latest_records() {
+        let ring = DebugRing::new();
+        for i in 0..DEBUG_RING + 3 {
+            ring.record("cmd", "n={}", [(i as u64).into()]);
+        }
+        ring.record("load", "cancelled", []);
+        let recs = ring.dump();
+        assert_eq!(recs.len(), DEBUG_RING);
+        assert_eq!(recs[0].2, "n=4");
+        assert_eq!(
+            (recs[DEBUG_RING - 1].1, recs[DEBUG_RING - 1].2.as_str()),
+            ("load", "cancelled")
+        );
+        ring.record(
+            "song_url",
+            "id={} got={}",
+            [String::from("42").into(), "exhigh".into()],
+        );
+        assert_eq!(ring.dump()[DEBUG_RING - 1].2, "id=42 got=exhigh");
+        let v = serde_json::to_value(&recs[..1]).unwrap();
+        assert!(v[0][0].as_u64().unwrap() > 0);
+        assert_eq!(v[0][1], "cmd");
+    }
 }